@@ -0,0 +1,51 @@
+"""add_candles_daily_table
+
+Revision ID: 3e7a9c2d5b14
+Revises: 8b4e2f61c0d9
+Create Date: 2026-03-02 14:21:06.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e7a9c2d5b14'
+down_revision: Union[str, Sequence[str], None] = '8b4e2f61c0d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - locally stored daily candles for the risk models."""
+    bind = op.get_bind()
+
+    # Check if the table exists
+    if bind.dialect.has_table(bind, "candles_daily"):
+        return
+
+    op.create_table(
+        'candles_daily',
+        sa.Column('symbol', sa.String(), primary_key=True, nullable=False),
+        sa.Column('trade_date', sa.Date(), primary_key=True, nullable=False),
+        sa.Column('open', sa.Float(), nullable=True),
+        sa.Column('high', sa.Float(), nullable=True),
+        sa.Column('low', sa.Float(), nullable=True),
+        sa.Column('close', sa.Float(), nullable=False),
+        sa.Column('volume', sa.Float(), nullable=True),
+    )
+    op.create_index('ix_candles_daily_trade_date', 'candles_daily', ['trade_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "candles_daily"):
+        return
+
+    op.drop_index('ix_candles_daily_trade_date', table_name='candles_daily')
+    op.drop_table('candles_daily')
@@ -0,0 +1,42 @@
+"""add_instruments_row_hash
+
+Revision ID: 4f8d2a61c9e7
+Revises: c30a497fb3ff
+Create Date: 2026-02-02 21:14:05.512903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f8d2a61c9e7'
+down_revision: Union[str, Sequence[str], None] = 'c30a497fb3ff'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - store a content hash per instrument for incremental refreshes."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "instruments"):
+        return
+    
+    # Existing rows keep a NULL hash and are rewritten once by the next refresh
+    op.add_column('instruments', sa.Column('row_hash', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "instruments"):
+        return
+    
+    with op.batch_alter_table('instruments') as batch_op:
+        batch_op.drop_column('row_hash')
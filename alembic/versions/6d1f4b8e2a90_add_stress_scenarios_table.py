@@ -0,0 +1,48 @@
+"""add_stress_scenarios_table
+
+Revision ID: 6d1f4b8e2a90
+Revises: 3e7a9c2d5b14
+Create Date: 2026-03-04 10:12:44.503921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6d1f4b8e2a90'
+down_revision: Union[str, Sequence[str], None] = '3e7a9c2d5b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - user-defined stress scenarios."""
+    bind = op.get_bind()
+
+    # Check if the table exists
+    if bind.dialect.has_table(bind, "stress_scenarios"):
+        return
+
+    op.create_table(
+        'stress_scenarios',
+        sa.Column('name', sa.String(), primary_key=True, nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('spot_shock', sa.Float(), nullable=False),
+        sa.Column('vol_shock', sa.Float(), nullable=False),
+        sa.Column('overrides', sa.JSON(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "stress_scenarios"):
+        return
+
+    op.drop_table('stress_scenarios')
@@ -0,0 +1,94 @@
+"""add_account_id
+
+Revision ID: 8b4e2f61c0d9
+Revises: f5a1c8d37e20
+Create Date: 2026-02-23 10:17:52.640318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e2f61c0d9'
+down_revision: Union[str, Sequence[str], None] = 'f5a1c8d37e20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Existing rows belong to the account of the original groww/api secret
+DEFAULT_ACCOUNT = 'default'
+
+# Primary keys before and after; account_id leads so per-account reads are ranges
+_KEYS = {
+    'holdings_daily': (['symbol', 'as_of_date'], ['account_id', 'symbol', 'as_of_date']),
+    'portfolio_snapshots': (['kind', 'symbol', 'captured_at'], ['account_id', 'kind', 'symbol', 'captured_at']),
+    'portfolio_snapshots_daily': (['kind', 'symbol', 'as_of_date'], ['account_id', 'kind', 'symbol', 'as_of_date']),
+}
+
+
+def _columns(bind, table: str) -> set:
+    return {col["name"] for col in sa.inspect(bind).get_columns(table)}
+
+
+def _old_unique(bind, table: str):
+    # The pre-PK (symbol, as_of_date) unique constraint still exists on some holdings_daily tables
+    return [
+        uc["name"] for uc in sa.inspect(bind).get_unique_constraints(table)
+        if uc["name"] and "account_id" not in uc["column_names"]
+    ]
+
+
+def _replace_primary_key(bind, table: str, columns, drop_unique=()) -> None:
+    if bind.dialect.name == "sqlite":
+        # SQLite cannot alter a primary key; batch mode recreates the table. It is copied from a
+        # reflection that already carries the new key, so no old key columns are left flagged.
+        source = sa.Table(table, sa.MetaData(), autoload_with=bind)
+        for column in source.columns:
+            column.primary_key = column.name in columns
+        source.append_constraint(sa.PrimaryKeyConstraint(*columns, name=f"pk_{table}"))
+        with op.batch_alter_table(table, recreate="always", copy_from=source) as batch:
+            for name in drop_unique:
+                batch.drop_constraint(name, type_="unique")
+    else:
+        # Also works on the partitioned portfolio_snapshots; its partitions follow the parent
+        for name in drop_unique:
+            op.drop_constraint(name, table, type_="unique")
+        name = sa.inspect(bind).get_pk_constraint(table)["name"]
+        drop = f'DROP CONSTRAINT "{name}", ' if name else ""
+        op.execute(f'ALTER TABLE {table} {drop}ADD CONSTRAINT pk_{table} PRIMARY KEY ({", ".join(columns)})')
+
+
+def upgrade() -> None:
+    """Upgrade schema - account dimension for holdings, positions and snapshots."""
+    bind = op.get_bind()
+
+    for table, (_, key) in _KEYS.items():
+        if not bind.dialect.has_table(bind, table) or "account_id" in _columns(bind, table):
+            continue
+        op.add_column(table, sa.Column('account_id', sa.String(), nullable=False, server_default=DEFAULT_ACCOUNT))
+        _replace_primary_key(bind, table, key, drop_unique=_old_unique(bind, table))
+
+    if bind.dialect.has_table(bind, "positions") and "account_id" not in _columns(bind, "positions"):
+        op.add_column('positions', sa.Column('account_id', sa.String(), nullable=False, server_default=DEFAULT_ACCOUNT))
+        op.create_index('ix_positions_account_id', 'positions', ['account_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - keeps only the default account's rows."""
+    bind = op.get_bind()
+
+    if bind.dialect.has_table(bind, "positions") and "account_id" in _columns(bind, "positions"):
+        op.execute(f"DELETE FROM positions WHERE account_id <> '{DEFAULT_ACCOUNT}'")
+        op.drop_index('ix_positions_account_id', table_name='positions')
+        with op.batch_alter_table('positions') as batch:
+            batch.drop_column('account_id')
+
+    for table, (key, _) in _KEYS.items():
+        if not bind.dialect.has_table(bind, table) or "account_id" not in _columns(bind, table):
+            continue
+        op.execute(f"DELETE FROM {table} WHERE account_id <> '{DEFAULT_ACCOUNT}'")
+        _replace_primary_key(bind, table, key)
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('account_id')
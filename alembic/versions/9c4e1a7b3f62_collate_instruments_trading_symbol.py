@@ -0,0 +1,44 @@
+"""collate_instruments_trading_symbol
+
+Revision ID: 9c4e1a7b3f62
+Revises: 6d1f4b8e2a90
+Create Date: 2026-03-05 09:41:17.208356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4e1a7b3f62'
+down_revision: Union[str, Sequence[str], None] = '6d1f4b8e2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - byte-order trading_symbol, so keyset pages from the database and from
+    the in-memory index sort and seek alike. PostgreSQL rebuilds the indexes on the column."""
+    bind = op.get_bind()
+
+    # SQLite already compares strings bytewise
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.alter_column(
+        'instruments', 'trading_symbol', type_=sa.String(collation='C'), existing_type=sa.String(), existing_nullable=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.name != 'postgresql':
+        return
+
+    op.alter_column(
+        'instruments', 'trading_symbol', type_=sa.String(), existing_type=sa.String(collation='C'), existing_nullable=False
+    )
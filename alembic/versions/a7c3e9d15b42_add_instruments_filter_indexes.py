@@ -0,0 +1,81 @@
+"""add_instruments_filter_indexes
+
+Revision ID: a7c3e9d15b42
+Revises: 4f8d2a61c9e7
+Create Date: 2026-02-06 18:42:11.803417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e9d15b42'
+down_revision: Union[str, Sequence[str], None] = '4f8d2a61c9e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Only derivatives carry an underlying, so this index skips every cash-segment row
+DERIVATIVES_WHERE = sa.text("underlying_symbol IS NOT NULL")
+
+
+def upgrade() -> None:
+    """Upgrade schema - composite indexes for the instrument router's filter combinations."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "instruments"):
+        return
+    
+    # Databases created from the models already have every index below (create_all)
+    inspector = sa.inspect(bind)
+    
+    def create_index(name: str, columns: list, **kwargs) -> None:
+        if not inspector.has_index('instruments', name):
+            op.create_index(name, 'instruments', columns, **kwargs)
+    
+    # Contracts of an underlying in chain order (expiry, then strike); its leading column
+    # replaces the single-column underlying_symbol index
+    create_index(
+        'ix_instruments_underlying_expiry_strike',
+        ['underlying_symbol', 'expiry_date', 'strike_price'],
+        postgresql_where=DERIVATIVES_WHERE,
+        sqlite_where=DERIVATIVES_WHERE,
+    )
+    if inspector.has_index('instruments', 'ix_instruments_underlying_symbol'):
+        op.drop_index('ix_instruments_underlying_symbol', table_name='instruments')
+    
+    # One index per leading filter column; trading_symbol last keeps keyset pages in index order
+    create_index('ix_instruments_exchange_type_symbol', ['exchange', 'instrument_type', 'trading_symbol'])
+    create_index('ix_instruments_type_symbol', ['instrument_type', 'trading_symbol'])
+    create_index('ix_instruments_segment_symbol', ['segment', 'trading_symbol'])
+    
+    # The models' single-column indexes (index=True), for schemas built by the migrations
+    create_index('ix_instruments_exchange', ['exchange'])
+    create_index('ix_instruments_instrument_type', ['instrument_type'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "instruments"):
+        return
+    
+    inspector = sa.inspect(bind)
+    for name in (
+        'ix_instruments_instrument_type',
+        'ix_instruments_exchange',
+        'ix_instruments_segment_symbol',
+        'ix_instruments_type_symbol',
+        'ix_instruments_exchange_type_symbol',
+    ):
+        if inspector.has_index('instruments', name):
+            op.drop_index(name, table_name='instruments')
+    if not inspector.has_index('instruments', 'ix_instruments_underlying_symbol'):
+        op.create_index('ix_instruments_underlying_symbol', 'instruments', ['underlying_symbol'])
+    if inspector.has_index('instruments', 'ix_instruments_underlying_expiry_strike'):
+        op.drop_index('ix_instruments_underlying_expiry_strike', table_name='instruments')
@@ -0,0 +1,45 @@
+"""add_dataset_versions_table
+
+Revision ID: d2b6f0a4e871
+Revises: a7c3e9d15b42
+Create Date: 2026-02-09 11:05:37.214950
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2b6f0a4e871'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e9d15b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - version stamps for HTTP caching of reference data."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if bind.dialect.has_table(bind, "dataset_versions"):
+        return
+    
+    op.create_table(
+        'dataset_versions',
+        sa.Column('name', sa.String(), primary_key=True, nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    
+    # Check if the table exists
+    if not bind.dialect.has_table(bind, "dataset_versions"):
+        return
+    
+    op.drop_table('dataset_versions')
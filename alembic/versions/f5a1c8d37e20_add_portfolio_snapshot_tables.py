@@ -0,0 +1,82 @@
+"""add_portfolio_snapshot_tables
+
+Revision ID: f5a1c8d37e20
+Revises: d2b6f0a4e871
+Create Date: 2026-02-16 09:42:18.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a1c8d37e20'
+down_revision: Union[str, Sequence[str], None] = 'd2b6f0a4e871'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - intraday snapshot change-points and their daily rollup.
+
+    On PostgreSQL portfolio_snapshots is declaratively range partitioned by captured_at, one
+    partition per day (created ahead by the rollup job), so retention drops whole partitions.
+    The DEFAULT partition catches rows for days that have no partition yet.
+    """
+    bind = op.get_bind()
+
+    if not bind.dialect.has_table(bind, "portfolio_snapshots"):
+        if bind.dialect.name == "postgresql":
+            op.execute(
+                """
+                CREATE TABLE portfolio_snapshots (
+                    kind VARCHAR NOT NULL,
+                    symbol VARCHAR NOT NULL,
+                    captured_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                    quantity DOUBLE PRECISION NOT NULL,
+                    avg_price DOUBLE PRECISION,
+                    ltp DOUBLE PRECISION,
+                    PRIMARY KEY (kind, symbol, captured_at)
+                ) PARTITION BY RANGE (captured_at)
+                """
+            )
+            op.execute("CREATE TABLE portfolio_snapshots_default PARTITION OF portfolio_snapshots DEFAULT")
+        else:
+            op.create_table(
+                'portfolio_snapshots',
+                sa.Column('kind', sa.String(), primary_key=True, nullable=False),
+                sa.Column('symbol', sa.String(), primary_key=True, nullable=False),
+                sa.Column('captured_at', sa.DateTime(), primary_key=True, nullable=False),
+                sa.Column('quantity', sa.Float(), nullable=False),
+                sa.Column('avg_price', sa.Float(), nullable=True),
+                sa.Column('ltp', sa.Float(), nullable=True),
+            )
+        op.create_index('ix_portfolio_snapshots_captured_at', 'portfolio_snapshots', ['captured_at'])
+
+    if not bind.dialect.has_table(bind, "portfolio_snapshots_daily"):
+        op.create_table(
+            'portfolio_snapshots_daily',
+            sa.Column('kind', sa.String(), primary_key=True, nullable=False),
+            sa.Column('symbol', sa.String(), primary_key=True, nullable=False),
+            sa.Column('as_of_date', sa.Date(), primary_key=True, nullable=False),
+            sa.Column('quantity', sa.Float(), nullable=False),
+            sa.Column('avg_price', sa.Float(), nullable=True),
+            sa.Column('ltp', sa.Float(), nullable=True),
+            sa.Column('ltp_low', sa.Float(), nullable=True),
+            sa.Column('ltp_high', sa.Float(), nullable=True),
+            sa.Column('changes', sa.Integer(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+
+    if bind.dialect.has_table(bind, "portfolio_snapshots_daily"):
+        op.drop_table('portfolio_snapshots_daily')
+
+    # Dropping the parent drops its partitions with it
+    if bind.dialect.has_table(bind, "portfolio_snapshots"):
+        op.drop_table('portfolio_snapshots')
@@ -0,0 +1,17 @@
+import os
+from typing import List
+
+# Account whose credentials are the original `groww/api` secret; rows written before accounts
+# existed belong to it.
+DEFAULT_ACCOUNT = "default"
+# Comma-separated account ids the scheduled jobs ingest.
+ACCOUNTS = [a.strip() for a in os.getenv("GROWW_ACCOUNTS", DEFAULT_ACCOUNT).split(",") if a.strip()]
+
+
+def configured_accounts() -> List[str]:
+    return list(ACCOUNTS)
+
+
+def secret_name(account_id: str) -> str:
+    """Secrets Manager id holding an account's GROWW_API_KEY and GROWW_API_SECRET."""
+    return "groww/api" if account_id == DEFAULT_ACCOUNT else f"groww/api/{account_id}"
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Groww accepts at most this many exchange_trading_symbols per LTP/OHLC request.
+MAX_SYMBOLS_PER_REQUEST = int(os.getenv("GROWW_MAX_SYMBOLS_PER_REQUEST", "50"))
+# How long to hold a partial batch open for other callers before sending it.
+BATCH_WINDOW_SECONDS = float(os.getenv("GROWW_BATCH_WINDOW_MS", "5")) / 1000
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingBatch:
+    def __init__(self, client: Any):
+        self.client = client
+        self.symbols: Dict[str, None] = {}
+        self.requests: List[Tuple[Tuple[str, ...], asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class SymbolBatcher:
+    """Merges LTP/OHLC lookups from concurrent callers into broker-sized batches.
+
+    Requests for the same (kind, segment) arriving within BATCH_WINDOW_SECONDS are merged and
+    deduplicated. A batch is sent as soon as it is full or the window closes, and each caller
+    receives only the symbols it asked for. Requests that alone exceed the per-request limit
+    skip the window and are split into chunks sent in parallel.
+    """
+
+    def __init__(self, max_batch: int = MAX_SYMBOLS_PER_REQUEST, window: float = BATCH_WINDOW_SECONDS):
+        self.max_batch = max_batch
+        self.window = window
+        self._pending: Dict[Tuple[str, str], _PendingBatch] = {}
+        # Batches being sent; the loop only keeps weak references to tasks
+        self._dispatching: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.upstream_calls = 0
+
+    async def get_ltp(self, client: Any, exchange_trading_symbols: Tuple[str, ...], segment: str) -> dict:
+        return await self.fetch("ltp", client, exchange_trading_symbols, segment)
+
+    async def get_ohlc(self, client: Any, exchange_trading_symbols: Tuple[str, ...], segment: str) -> dict:
+        return await self.fetch("ohlc", client, exchange_trading_symbols, segment)
+
+    async def fetch(self, kind: str, client: Any, exchange_trading_symbols: Tuple[str, ...], segment: str) -> dict:
+        symbols = tuple(dict.fromkeys(exchange_trading_symbols))
+        self.requests += 1
+        if not symbols:
+            return {}
+        if len(symbols) >= self.max_batch:
+            return await self._fetch_chunks(kind, client, symbols, segment)
+
+        key = (kind, segment)
+        pending = self._pending.get(key)
+        if pending is not None and len(pending.symbols.keys() | set(symbols)) > self.max_batch:
+            # Send what we have as a full batch rather than overflowing into a small remainder
+            self._flush(key)
+            pending = None
+        if pending is None:
+            pending = self._pending[key] = _PendingBatch(client)
+        # Latest client wins: it carries the freshest token
+        pending.client = client
+
+        future = asyncio.get_running_loop().create_future()
+        pending.requests.append((symbols, future))
+        pending.symbols.update(dict.fromkeys(symbols))
+        if len(pending.symbols) >= self.max_batch:
+            self._flush(key)
+        elif pending.timer is None:
+            pending.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "pending_batches": len(self._pending),
+            "dispatching": len(self._dispatching),
+        }
+
+    def _chunks(self, symbols: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+        return [symbols[i:i + self.max_batch] for i in range(0, len(symbols), self.max_batch)]
+
+    async def _call(self, kind: str, client: Any, chunk: Tuple[str, ...], segment: str) -> dict:
+        self.upstream_calls += 1
+        return await getattr(client, f"get_{kind}")(exchange_trading_symbols=chunk, segment=segment)
+
+    async def _fetch_chunks(self, kind: str, client: Any, symbols: Tuple[str, ...], segment: str) -> dict:
+        merged: Dict[str, Any] = {}
+        for payload in await asyncio.gather(*(self._call(kind, client, chunk, segment) for chunk in self._chunks(symbols))):
+            merged.update(payload)
+        return merged
+
+    def _flush(self, key: Tuple[str, str]) -> None:
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._dispatch(key[0], key[1], pending))
+        self._dispatching.add(task)
+        task.add_done_callback(self._dispatching.discard)
+
+    async def _dispatch(self, kind: str, segment: str, pending: _PendingBatch) -> None:
+        chunks = self._chunks(tuple(pending.symbols))
+        outcomes = await asyncio.gather(*(self._call(kind, pending.client, chunk, segment) for chunk in chunks), return_exceptions=True)
+
+        merged: Dict[str, Any] = {}
+        failed: Dict[str, BaseException] = {}
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, BaseException):
+                failed.update(dict.fromkeys(chunk, outcome))
+            else:
+                merged.update(outcome)
+
+        for symbols, future in pending.requests:
+            if future.done():
+                continue
+            error = next((failed[s] for s in symbols if s in failed), None)
+            if error is not None:
+                future.set_exception(error)
+                future.exception()
+            else:
+                future.set_result({s: merged[s] for s in symbols if s in merged})
+
+
+_batcher = SymbolBatcher()
+
+
+def get_symbol_batcher() -> SymbolBatcher:
+    return _batcher
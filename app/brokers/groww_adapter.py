@@ -1,10 +1,92 @@
-from typing import Any, Optional, Tuple
+import io
+import os
+from typing import Any, Callable, Optional, Tuple
 
+import pandas as pd
+import requests
 from growwapi import GrowwAPI
+from growwapi.groww.exceptions import GrowwAPITimeoutException
+
+from app.brokers.rate_limit import BrokerRateLimiter
+from app.brokers.resilience import BrokerGuard
+
+# Base URL for the Groww REST API; overridable so load tests can point at a local stub broker.
+API_DOMAIN = os.getenv("GROWW_API_DOMAIN", "https://api.groww.in/v1")
+
+
+class _SessionGrowwAPI(GrowwAPI):
+    """GrowwAPI that sends requests through a shared `requests.Session`.
+
+    The SDK calls the module-level `requests.get/post/put`, which opens a new TCP and
+    TLS connection per call. Routing through a session keeps connections alive, and
+    gives one place to apply the client-side rate limit, retry policy, circuit breakers
+    and bulkheads.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        session: requests.Session,
+        domain: str = API_DOMAIN,
+        limiter: Optional[BrokerRateLimiter] = None,
+        guard: Optional[BrokerGuard] = None,
+    ) -> None:
+        # Set first: the SDK constructor already sends its changelog request
+        self._session = session
+        self._limiter = limiter
+        self._guard = guard
+        super().__init__(token)
+        self.domain = domain
+
+    def _send(self, url: str, send: Callable[[], requests.Response]) -> requests.Response:
+        def attempt() -> requests.Response:
+            try:
+                return send()
+            except requests.Timeout as e:
+                raise GrowwAPITimeoutException() from e
+
+        def guarded() -> requests.Response:
+            # The bulkhead slot is held only for the send itself, not while queued in the
+            # limiter or sleeping between retries, and the breaker sees every attempt
+            if self._guard is None:
+                return attempt()
+            return self._guard.call(url, attempt)
+
+        if self._limiter is None:
+            return guarded()
+        return self._limiter.send(url, guarded)
+
+    def _request_get(self, url: str, params: Optional[dict] = None, headers: Optional[dict] = None, timeout: Optional[int] = None, **kwargs: Any) -> requests.Response:
+        return self._send(url, lambda: self._session.get(url, params=params, headers=headers, timeout=timeout, **kwargs))
+
+    def _request_post(self, url: str, json: Any = None, headers: Optional[dict] = None, timeout: Optional[int] = None, **kwargs: Any) -> requests.Response:
+        return self._send(url, lambda: self._session.post(url=url, json=json, headers=headers, timeout=timeout, **kwargs))
+
+    def _request_put(self, url: str, json: Any = None, headers: Optional[dict] = None, timeout: Optional[int] = None, **kwargs: Any) -> requests.Response:
+        return self._send(url, lambda: self._session.put(url=url, json=json, headers=headers, timeout=timeout, **kwargs))
+
+    def _download_and_load_instruments(self) -> pd.DataFrame:
+        # The SDK downloads the CSV with module-level requests.get and writes it next to the
+        # package; fetch it on the session, under the "instruments" rate class, and parse in memory
+        response = self._request_get(self.INSTRUMENT_CSV_URL)
+        response.raise_for_status()
+        return pd.read_csv(io.BytesIO(response.content), dtype="str")
+
 
 class GrowwAdapter:
-    def __init__(self, access_token: str):
-        self.client = GrowwAPI(access_token)
+    def __init__(
+        self,
+        access_token: str,
+        session: Optional[requests.Session] = None,
+        domain: str = API_DOMAIN,
+        limiter: Optional[BrokerRateLimiter] = None,
+        guard: Optional[BrokerGuard] = None,
+    ):
+        self.access_token = access_token
+        if session is not None:
+            self.client = _SessionGrowwAPI(access_token, session, domain, limiter, guard)
+        else:
+            self.client = GrowwAPI(access_token)
 
     @staticmethod
     def get_access_token(api_key: str, totp: Optional[str] = None, secret: Optional[str] = None) -> dict:
@@ -107,6 +189,10 @@ class GrowwAdapter:
     def get_instruments(self) -> Any:
         return self.get_all_instruments()
 
+    def forget_instruments(self) -> None:
+        """Drop the instrument CSV the SDK keeps after its first download; the next lookup fetches it again."""
+        self.client.instruments = None
+
     def get_ltp(self, exchange_trading_symbols: Tuple[str], segment: str, timeout: Optional[int] = None) -> dict:
         return self.client.get_ltp(exchange_trading_symbols=exchange_trading_symbols, segment=segment, timeout=timeout)
 
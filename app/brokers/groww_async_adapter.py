@@ -0,0 +1,372 @@
+import asyncio
+import random
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from growwapi import GrowwAPI
+from growwapi.groww.exceptions import GrowwAPIException, GrowwAPITimeoutException
+
+from app.brokers.groww_adapter import API_DOMAIN, GrowwAdapter
+from app.brokers.rate_limit import BrokerRateLimiter
+from app.brokers.resilience import BrokerGuard
+
+
+def _drop_none(params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # requests silently omits None-valued params; httpx would send them as empty strings
+    if params is None:
+        return None
+    return {k: v for k, v in params.items() if v is not None}
+
+
+class AsyncGrowwAdapter:
+    """asyncio counterpart of GrowwAdapter with the same method surface.
+
+    REST calls go through a shared `httpx.AsyncClient`, so an in-flight broker call only
+    holds a coroutine rather than a worker thread. Instrument-master lookups are answered
+    locally by the SDK from its CSV cache, so they are delegated to the sync adapter in a
+    worker thread. With a `limiter`, every request is subject to the client-side rate limit
+    and retry policy; with a `guard`, to the per-class circuit breakers and bulkheads.
+    """
+
+    def __init__(
+        self,
+        access_token: str,
+        http: httpx.AsyncClient,
+        sync_adapter: Optional[Callable[[], GrowwAdapter]] = None,
+        domain: str = API_DOMAIN,
+        limiter: Optional[BrokerRateLimiter] = None,
+        guard: Optional[BrokerGuard] = None,
+    ):
+        self.access_token = access_token
+        self.http = http
+        self.domain = domain
+        self._sync_adapter = sync_adapter
+        self._limiter = limiter
+        self._guard = guard
+
+    @staticmethod
+    def get_access_token(api_key: str, totp: Optional[str] = None, secret: Optional[str] = None) -> dict:
+        return GrowwAPI.get_access_token(api_key=api_key, totp=totp, secret=secret)
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        timeout: Optional[float] = None,
+    ) -> dict:
+        async def attempt() -> httpx.Response:
+            try:
+                return await self.http.request(
+                    method,
+                    url,
+                    params=_drop_none(params),
+                    json=json,
+                    headers=GrowwAPI._build_headers(self.access_token),
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                )
+            except httpx.TimeoutException as e:
+                raise GrowwAPITimeoutException() from e
+
+        async def guarded() -> httpx.Response:
+            # Same order as the sync adapter: rate limit first, then bulkhead/breaker per attempt
+            if self._guard is None:
+                return await attempt()
+            return await self._guard.call_async(url, attempt)
+
+        if self._limiter is None:
+            response = await guarded()
+        else:
+            response = await self._limiter.send_async(url, guarded)
+        return self._parse_response(response)
+
+    @staticmethod
+    def _parse_response(response: httpx.Response) -> dict:
+        # Mirrors GrowwAPI._parse_response so callers see the same exceptions as the sync adapter
+        response_map = response.json()
+        if response_map.get("status") == "FAILURE":
+            error = response_map["error"]
+            raise GrowwAPIException(code=error["code"], msg=error["message"])
+        if response.status_code in GrowwAPI._ERROR_MAP:
+            raise GrowwAPI._ERROR_MAP[response.status_code]()
+        if not response.is_success:
+            raise GrowwAPIException(code=str(response.status_code), msg="The request to the Groww API failed.")
+        return dict(response_map["payload"] if "payload" in response_map else response_map)
+
+    async def _run_sync(self, method: str, **kwargs: Any) -> Any:
+        if self._sync_adapter is None:
+            raise RuntimeError(f"{method} needs the sync adapter for instrument-master lookups")
+        adapter = self._sync_adapter()
+        return await asyncio.to_thread(getattr(adapter, method), **kwargs)
+
+    async def cancel_order(self, groww_order_id: str, segment: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "POST",
+            f"{self.domain}/order/cancel",
+            json={"segment": segment, "groww_order_id": groww_order_id},
+            timeout=timeout,
+        )
+
+    async def generate_socket_token(self, key_pair) -> dict:
+        return await self._request(
+            "POST",
+            GrowwAPI._GROWW_GENERATE_SOCKET_TOKEN_URL,
+            json={"socketKey": key_pair.public_key.decode("utf-8")},
+        )
+
+    async def get_all_instruments(self) -> Any:
+        return await self._run_sync("get_all_instruments")
+
+    async def get_available_margin_details(self, timeout: Optional[int] = None) -> dict:
+        return await self._request("GET", f"{self.domain}/margins/detail/user", timeout=timeout)
+
+    async def get_contracts(self, exchange: str, underlying_symbol: str, expiry_date: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/historical/contracts",
+            params={"exchange": exchange, "underlying_symbol": underlying_symbol, "expiry_date": expiry_date},
+            timeout=timeout,
+        )
+
+    async def get_expiries(
+        self,
+        exchange: str,
+        underlying_symbol: str,
+        year: Optional[int] = None,
+        month: Optional[int] = None,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/historical/expiries",
+            params={
+                "exchange": exchange,
+                "underlying_symbol": underlying_symbol,
+                "year": str(year) if year is not None else None,
+                "month": str(month) if month is not None else None,
+            },
+            timeout=timeout,
+        )
+
+    async def get_greeks(self, exchange: str, underlying: str, trading_symbol: str, expiry: str) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/live-data/greeks/exchange/{exchange}/underlying/{underlying}/trading_symbol/{trading_symbol}/expiry/{expiry}",
+        )
+
+    async def get_historical_candle_data(
+        self,
+        trading_symbol: str,
+        exchange: str,
+        segment: str,
+        start_time: str,
+        end_time: str,
+        interval_in_minutes: Optional[int] = None,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/historical/candle/range",
+            params={
+                "exchange": exchange,
+                "segment": segment,
+                "trading_symbol": trading_symbol,
+                "start_time": start_time,
+                "end_time": end_time,
+                "interval_in_minutes": interval_in_minutes,
+            },
+            timeout=timeout,
+        )
+
+    async def get_historical_candles(
+        self,
+        exchange: str,
+        segment: str,
+        groww_symbol: str,
+        start_time: str,
+        end_time: str,
+        candle_interval: str,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/historical/candles",
+            params={
+                "exchange": exchange,
+                "segment": segment,
+                "groww_symbol": groww_symbol,
+                "start_time": start_time,
+                "end_time": end_time,
+                "candle_interval": candle_interval,
+            },
+            timeout=timeout,
+        )
+
+    async def get_holdings_for_user(self, timeout: Optional[int] = None) -> dict:
+        return await self._request("GET", f"{self.domain}/holdings/user", timeout=timeout)
+
+    async def get_holdings(self):
+        return await self.get_holdings_for_user()
+
+    async def get_instrument_by_exchange_and_trading_symbol(self, exchange: str, trading_symbol: str) -> dict:
+        return await self._run_sync("get_instrument_by_exchange_and_trading_symbol", exchange=exchange, trading_symbol=trading_symbol)
+
+    async def get_instrument_by_exchange_token(self, exchange_token: str) -> dict:
+        return await self._run_sync("get_instrument_by_exchange_token", exchange_token=exchange_token)
+
+    async def get_instrument_by_groww_symbol(self, groww_symbol: str) -> dict:
+        return await self._run_sync("get_instrument_by_groww_symbol", groww_symbol=groww_symbol)
+
+    async def get_instruments(self) -> Any:
+        return await self.get_all_instruments()
+
+    async def get_ltp(self, exchange_trading_symbols: Tuple[str], segment: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/live-data/ltp",
+            params={"segment": segment, "exchange_symbols": exchange_trading_symbols},
+            timeout=timeout,
+        )
+
+    async def get_ohlc(self, exchange_trading_symbols: Tuple[str], segment: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/live-data/ohlc",
+            params={"segment": segment, "exchange_symbols": exchange_trading_symbols},
+            timeout=timeout,
+        )
+
+    async def get_order_detail(self, segment: str, groww_order_id: str, timeout: Optional[int] = None) -> dict:
+        return await self._request("GET", f"{self.domain}/order/detail/{groww_order_id}", params={"segment": segment}, timeout=timeout)
+
+    async def get_order_list(
+        self,
+        page: Optional[int] = 0,
+        page_size: Optional[int] = 25,
+        segment: Optional[str] = None,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        # Same as the SDK: paging params are only sent together with a segment
+        params = {"segment": segment, "page": page} if segment else {}
+        return await self._request("GET", f"{self.domain}/order/list", params=params, timeout=timeout)
+
+    async def get_order_margin_details(self, segment: str, orders: list, timeout: Optional[int] = None) -> dict:
+        body = [
+            {
+                "trading_symbol": order["trading_symbol"],
+                "transaction_type": order["transaction_type"],
+                "quantity": order["quantity"],
+                "price": order["price"],
+                "order_type": order["order_type"],
+                "product": order["product"],
+                "exchange": order["exchange"],
+            }
+            for order in orders
+        ]
+        return await self._request("POST", f"{self.domain}/margins/detail/orders", params={"segment": segment}, json=body, timeout=timeout)
+
+    async def get_order_status(self, segment: str, groww_order_id: str, timeout: Optional[int] = None) -> dict:
+        return await self._request("GET", f"{self.domain}/order/status/{groww_order_id}", params={"segment": segment}, timeout=timeout)
+
+    async def get_order_status_by_reference(self, segment: str, order_reference_id: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET", f"{self.domain}/order/status/reference/{order_reference_id}", params={"segment": segment}, timeout=timeout
+        )
+
+    async def get_position_for_trading_symbol(self, trading_symbol: str, segment: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/positions/trading-symbol",
+            params={"trading_symbol": trading_symbol, "segment": segment},
+            timeout=timeout,
+        )
+
+    async def get_positions_for_user(self, segment: Optional[str] = None, timeout: Optional[int] = None) -> dict:
+        return await self._request("GET", f"{self.domain}/positions/user", params={"segment": segment}, timeout=timeout)
+
+    async def get_positions(self):
+        return await self.get_positions_for_user()
+
+    async def get_quote(self, trading_symbol: str, exchange: str, segment: str, timeout: Optional[int] = None) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/live-data/quote",
+            params={"exchange": exchange, "segment": segment, "trading_symbol": trading_symbol},
+            timeout=timeout,
+        )
+
+    async def get_trade_list_for_order(
+        self,
+        groww_order_id: str,
+        segment: str,
+        page: Optional[int] = 0,
+        page_size: Optional[int] = 25,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        return await self._request(
+            "GET",
+            f"{self.domain}/order/trades/{groww_order_id}",
+            params={"segment": segment, "page": page, "page_size": page_size},
+            timeout=timeout,
+        )
+
+    async def modify_order(
+        self,
+        order_type: str,
+        segment: str,
+        groww_order_id: str,
+        quantity: int,
+        price: Optional[float] = None,
+        trigger_price: Optional[float] = None,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        return await self._request(
+            "POST",
+            f"{self.domain}/order/modify",
+            json={
+                "quantity": quantity,
+                "price": price,
+                "trigger_price": trigger_price,
+                "groww_order_id": groww_order_id,
+                "order_type": order_type,
+                "segment": segment,
+            },
+            timeout=timeout,
+        )
+
+    async def place_order(
+        self,
+        validity: str,
+        exchange: str,
+        order_type: str,
+        product: str,
+        quantity: int,
+        segment: str,
+        trading_symbol: str,
+        transaction_type: str,
+        order_reference_id: Optional[str] = None,
+        price: Optional[float] = 0.0,
+        trigger_price: Optional[float] = None,
+        timeout: Optional[int] = None,
+    ) -> dict:
+        if order_reference_id is None:
+            order_reference_id = str(random.randint(10000000, 99999999))
+        return await self._request(
+            "POST",
+            f"{self.domain}/order/create",
+            json={
+                "trading_symbol": trading_symbol,
+                "quantity": quantity,
+                "price": price,
+                "trigger_price": trigger_price,
+                "validity": validity,
+                "exchange": exchange,
+                "segment": segment,
+                "product": product,
+                "order_type": order_type,
+                "transaction_type": transaction_type,
+                "order_reference_id": order_reference_id,
+            },
+            timeout=timeout,
+        )
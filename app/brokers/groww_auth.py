@@ -1,23 +1,44 @@
+import base64
 import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Callable, Dict, Optional
 
 import boto3
 from botocore.exceptions import ClientError, NoCredentialsError, ProfileNotFound
 from growwapi import GrowwAPI
 
-SECRET_NAME = "groww/api"
+from app.brokers.accounts import DEFAULT_ACCOUNT, secret_name
+
+SECRET_NAME = secret_name(DEFAULT_ACCOUNT)
 REGION = "ap-south-1"
 
-def _load_groww_secrets():
+# Refresh the token this many seconds before it expires so in-flight calls never carry a stale token.
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("GROWW_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+# Secrets rarely change; re-read them from Secrets Manager at most this often.
+SECRETS_TTL_SECONDS = int(os.getenv("GROWW_SECRETS_TTL_SECONDS", "3600"))
+
+# Groww access tokens are invalidated daily at 06:00 IST; used when the token carries no `exp` claim.
+_IST = timezone(timedelta(hours=5, minutes=30))
+_DAILY_EXPIRY_HOUR_IST = 6
+
+logger = logging.getLogger(__name__)
+
+
+def _load_groww_secrets(secret_id: str = SECRET_NAME):
     try:
         client = boto3.client("secretsmanager", region_name=REGION)
-        resp = client.get_secret_value(SecretId=SECRET_NAME)
+        resp = client.get_secret_value(SecretId=secret_id)
         return json.loads(resp["SecretString"])
     except (NoCredentialsError, ClientError, ProfileNotFound) as exc:
         raise RuntimeError(f"Failed to retrieve Groww credentials from AWS Secrets Manager: {exc}") from exc
 
-def get_access_token() -> str:
-    secrets = _load_groww_secrets()
 
+def _login(secrets: Dict[str, Any]) -> str:
     api_key = secrets.get("GROWW_API_KEY")
     api_secret = secrets.get("GROWW_API_SECRET")
 
@@ -28,3 +49,141 @@ def get_access_token() -> str:
         api_key=api_key,
         secret=api_secret
     )
+
+
+def _token_expiry(token: str, now: float) -> float:
+    """Return the epoch expiry of a token: its JWT `exp` claim, else the next 06:00 IST rollover."""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        exp = claims.get("exp")
+        if exp:
+            return float(exp)
+    except (IndexError, ValueError, AttributeError):
+        pass
+
+    local_now = datetime.fromtimestamp(now, _IST)
+    rollover = local_now.replace(hour=_DAILY_EXPIRY_HOUR_IST, minute=0, second=0, microsecond=0)
+    if rollover <= local_now:
+        rollover += timedelta(days=1)
+    return rollover.timestamp()
+
+
+class TokenManager:
+    """Process-wide cache for one account's Groww secrets and access token.
+
+    The token is refreshed TOKEN_REFRESH_MARGIN_SECONDS before it expires, or less for a token
+    issued close to its expiry (e.g. just before the 06:00 IST rollover), so every login is used
+    for at least that long. Refreshes are single-flight: concurrent callers that find the token
+    stale wait on one login instead of each performing their own.
+    """
+
+    def __init__(
+        self,
+        load_secrets: Callable[[], Dict[str, Any]] = _load_groww_secrets,
+        login: Callable[[Dict[str, Any]], str] = _login,
+        refresh_margin: float = TOKEN_REFRESH_MARGIN_SECONDS,
+        secrets_ttl: float = SECRETS_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._load_secrets = load_secrets
+        self._login = login
+        self._refresh_margin = refresh_margin
+        self._secrets_ttl = secrets_ttl
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._secrets: Optional[Dict[str, Any]] = None
+        self._secrets_loaded_at = 0.0
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        # The refresh margin applied to the current token
+        self._margin = refresh_margin
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.secret_loads = 0
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at - self._margin
+
+    def _hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def get_token(self) -> str:
+        token = self._token
+        if token is not None and self._is_fresh(self._clock()):
+            self._hit()
+            return token
+
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock.
+            now = self._clock()
+            if self._is_fresh(now):
+                self.hits += 1
+                return self._token
+            self.misses += 1
+            return self._refresh(now)
+
+    def peek(self) -> Optional[str]:
+        """Return the cached token if it is still fresh, without ever blocking on a refresh."""
+        token = self._token
+        if token is not None and self._is_fresh(self._clock()):
+            self._hit()
+            return token
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "secret_loads": self.secret_loads,
+                "expires_at": self._expires_at or None,
+            }
+
+    def _get_secrets(self, now: float) -> Dict[str, Any]:
+        if self._secrets is None or now - self._secrets_loaded_at >= self._secrets_ttl:
+            self._secrets = self._load_secrets()
+            self._secrets_loaded_at = now
+            self.secret_loads += 1
+        return self._secrets
+
+    def _refresh(self, now: float) -> str:
+        token = self._login(self._get_secrets(now))
+        self._token = token
+        self._expires_at = _token_expiry(token, now)
+        # Shrink the margin for a short-lived token so it is still used for at least one margin
+        # (or until it expires), instead of being stale as soon as it is issued
+        self._margin = max(0.0, min(self._refresh_margin, self._expires_at - now - self._refresh_margin))
+        self.refreshes += 1
+        logger.info("Refreshed Groww access token; valid until %s", datetime.fromtimestamp(self._expires_at, timezone.utc).isoformat())
+        return token
+
+
+_token_manager = TokenManager()
+_token_managers: Dict[str, TokenManager] = {DEFAULT_ACCOUNT: _token_manager}
+_token_managers_lock = threading.Lock()
+
+
+def get_token_manager(account_id: str = DEFAULT_ACCOUNT) -> TokenManager:
+    """The account's token manager, created on first use with its own secret."""
+    manager = _token_managers.get(account_id)
+    if manager is None:
+        with _token_managers_lock:
+            manager = _token_managers.get(account_id)
+            if manager is None:
+                manager = TokenManager(load_secrets=partial(_load_groww_secrets, secret_name(account_id)))
+                _token_managers[account_id] = manager
+    return manager
+
+
+def get_access_token(account_id: str = DEFAULT_ACCOUNT) -> str:
+    return get_token_manager(account_id).get_token()
+
+
+def peek_access_token(account_id: str = DEFAULT_ACCOUNT) -> Optional[str]:
+    return get_token_manager(account_id).peek()
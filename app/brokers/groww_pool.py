@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+import threading
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.brokers.groww_adapter import GrowwAdapter
+from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+from app.brokers.groww_auth import get_access_token, peek_access_token
+from app.brokers.rate_limit import BrokerRateLimiter, get_rate_limiter
+from app.brokers.resilience import BrokerGuard, get_broker_guard
+
+# Keep-alive connections held open per broker host.
+POOL_SIZE = int(os.getenv("GROWW_POOL_SIZE", "20"))
+# Distinct hosts to keep pools for (api.groww.in, the instruments CSV host, ...).
+POOL_HOSTS = 4
+# Upper bound on concurrent in-flight requests on the async client.
+ASYNC_MAX_CONNECTIONS = int(os.getenv("GROWW_ASYNC_MAX_CONNECTIONS", "500"))
+# Default per-request timeout for async calls that do not pass their own.
+ASYNC_TIMEOUT_SECONDS = float(os.getenv("GROWW_ASYNC_TIMEOUT_SECONDS", "15"))
+
+logger = logging.getLogger(__name__)
+
+
+def _build_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _build_async_client(pool_size: int) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=ASYNC_MAX_CONNECTIONS, max_keepalive_connections=pool_size),
+        timeout=ASYNC_TIMEOUT_SECONDS,
+    )
+
+
+class GrowwAdapterPool:
+    """Long-lived GrowwAdapter instances backed by one keep-alive HTTP session.
+
+    `acquire()` returns the adapter for the current access token. Adapters are cheap
+    wrappers and safe to share across threads; the expensive part, the HTTP connection
+    pool, lives in the session and survives token rotation. When the token manager
+    hands out a new token the adapter is rebuilt on the same session.
+
+    `acquire_async()` does the same for AsyncGrowwAdapter on an `httpx.AsyncClient`,
+    which is bound to the event loop that created it; the client of a previous loop is closed.
+    """
+
+    def __init__(
+        self,
+        token_provider: Callable[[], str] = get_access_token,
+        pool_size: int = POOL_SIZE,
+        token_peek: Callable[[], Optional[str]] = peek_access_token,
+        limiter: Optional[BrokerRateLimiter] = None,
+        guard: Optional[BrokerGuard] = None,
+    ):
+        self._token_provider = token_provider
+        self._token_peek = token_peek
+        self.limiter = limiter
+        self.guard = guard
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._adapter: Optional[GrowwAdapter] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self._http_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_adapter: Optional[AsyncGrowwAdapter] = None
+        self.builds = 0
+        self.async_builds = 0
+
+    def acquire(self) -> GrowwAdapter:
+        token = self._token_provider()
+        adapter = self._adapter
+        if adapter is not None and adapter.access_token == token:
+            return adapter
+
+        with self._lock:
+            if self._adapter is None or self._adapter.access_token != token:
+                if self._session is None:
+                    self._session = _build_session(self.pool_size)
+                self._adapter = GrowwAdapter(token, session=self._session, limiter=self.limiter, guard=self.guard)
+                self.builds += 1
+                logger.info("Built pooled Groww adapter (build #%d)", self.builds)
+            return self._adapter
+
+    async def acquire_async(self) -> AsyncGrowwAdapter:
+        # A token refresh is a blocking login; keep it off the event loop
+        token = self._token_peek() or await asyncio.to_thread(self._token_provider)
+        loop = asyncio.get_running_loop()
+        adapter = self._async_adapter
+        if adapter is not None and adapter.access_token == token and self._http_loop is loop:
+            return adapter
+
+        if self._http is None or self._http_loop is not loop:
+            retired, retired_loop = self._http, self._http_loop
+            self._http = _build_async_client(self.pool_size)
+            self._http_loop = loop
+            if retired is not None:
+                await self._retire(retired, retired_loop)
+        self._async_adapter = AsyncGrowwAdapter(
+            token, self._http, sync_adapter=self.acquire, limiter=self.limiter, guard=self.guard
+        )
+        self.async_builds += 1
+        logger.info("Built pooled async Groww adapter (build #%d)", self.async_builds)
+        return self._async_adapter
+
+    @staticmethod
+    async def _retire(http: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close a client left behind by another event loop, on that loop while it still runs."""
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(http.aclose(), loop)
+            return
+        try:
+            await http.aclose()
+        except RuntimeError:
+            # Its connections died with their loop; nothing left to close cleanly
+            logger.debug("Dropped async Groww client of a closed event loop")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+    async def aclose(self) -> None:
+        http = self._http
+        self._http = None
+        self._http_loop = None
+        self._async_adapter = None
+        if http is not None:
+            await http.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "builds": self.builds,
+            "async_builds": self.async_builds,
+            "active": self._adapter is not None,
+            "async_active": self._async_adapter is not None,
+        }
+
+
+_pool = GrowwAdapterPool(limiter=get_rate_limiter(), guard=get_broker_guard())
+_pools: Dict[str, GrowwAdapterPool] = {DEFAULT_ACCOUNT: _pool}
+_pools_lock = threading.Lock()
+
+
+def get_adapter_pool(account_id: str = DEFAULT_ACCOUNT) -> GrowwAdapterPool:
+    """The account's adapter pool, created on first use.
+
+    Each account has its own token and HTTP session and, since Groww's limits apply per API
+    key, its own rate limiter and its own breakers and bulkheads.
+    """
+    pool = _pools.get(account_id)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(account_id)
+            if pool is None:
+                pool = GrowwAdapterPool(
+                    token_provider=partial(get_access_token, account_id),
+                    token_peek=partial(peek_access_token, account_id),
+                    limiter=BrokerRateLimiter(),
+                    guard=get_broker_guard(account_id),
+                )
+                _pools[account_id] = pool
+    return pool
+
+
+def get_adapter_pools() -> Dict[str, GrowwAdapterPool]:
+    return dict(_pools)
+
+
+def get_groww_client() -> GrowwAdapter:
+    """FastAPI dependency returning the pooled adapter for the current token."""
+    return _pool.acquire()
+
+
+async def get_async_groww_client() -> AsyncGrowwAdapter:
+    """FastAPI dependency returning the pooled async adapter for the current token."""
+    return await _pool.acquire_async()
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.brokers.batching import SymbolBatcher, get_symbol_batcher
+
+# How long a quote/LTP/OHLC answer is served from memory. Sub-second keeps dashboards live
+# while collapsing bursts of identical polls into one upstream call.
+MARKET_CACHE_TTL_SECONDS = float(os.getenv("MARKET_CACHE_TTL_SECONDS", "1.0"))
+# Upper bound on cached entries; least recently used entries are evicted first.
+MARKET_CACHE_MAX_ENTRIES = int(os.getenv("MARKET_CACHE_MAX_ENTRIES", "20000"))
+# Option Greeks move with the underlying but are fetched one contract per call, so a portfolio
+# aggregation can reuse them for longer than quotes.
+GREEKS_CACHE_TTL_SECONDS = float(os.getenv("GREEKS_CACHE_TTL_SECONDS", "15.0"))
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU-bounded mapping whose entries expire `ttl` seconds after they are stored."""
+
+    def __init__(self, ttl: float, maxsize: int, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or `_MISSING` if absent or expired."""
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class MarketDataCache:
+    """Short-TTL cache for quote, LTP and OHLC lookups with request coalescing.
+
+    Entries are keyed by (kind, segment, exchange:symbol). Concurrent misses for the same key
+    share one upstream call, and multi-symbol LTP/OHLC requests only send the symbols that are
+    neither cached nor already being fetched. Upstream calls run in their own task so a
+    disconnecting caller does not cancel a fetch that others are waiting on; the cache holds
+    those tasks until they finish. Coalescing is per event loop, as futures cannot be awaited
+    from another loop.
+
+    With a `batcher`, LTP/OHLC misses from concurrent callers are merged into broker-sized
+    batches before going upstream.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MARKET_CACHE_TTL_SECONDS,
+        maxsize: int = MARKET_CACHE_MAX_ENTRIES,
+        batcher: Optional[SymbolBatcher] = None,
+    ):
+        self.cache = TTLCache(ttl, maxsize)
+        self._batcher = batcher
+        # Keyed by (event loop, cache key)
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    async def get_quote(self, client: Any, trading_symbol: str, exchange: str, segment: str) -> dict:
+        key = ("quote", segment, f"{exchange}:{trading_symbol}")
+
+        async def fetch(keys: List[Hashable]) -> Dict[Hashable, Any]:
+            return {key: await client.get_quote(trading_symbol=trading_symbol, exchange=exchange, segment=segment)}
+
+        return (await self._get_many([key], fetch))[key]
+
+    async def get_greeks(self, client: Any, exchange: str, underlying: str, trading_symbol: str, expiry: str) -> dict:
+        key = ("greeks", exchange, f"{underlying}:{trading_symbol}:{expiry}")
+
+        async def fetch(keys: List[Hashable]) -> Dict[Hashable, Any]:
+            return {key: await client.get_greeks(exchange=exchange, underlying=underlying, trading_symbol=trading_symbol, expiry=expiry)}
+
+        return (await self._get_many([key], fetch))[key]
+
+    async def get_ltp(
+        self,
+        client: Any,
+        exchange_trading_symbols: Iterable[str],
+        segment: str,
+        fetch: Optional[Callable[[Tuple[str, ...], str], Awaitable[dict]]] = None,
+    ) -> dict:
+        return await self._get_symbols("ltp", fetch or self._upstream("ltp", client), exchange_trading_symbols, segment)
+
+    async def get_ohlc(
+        self,
+        client: Any,
+        exchange_trading_symbols: Iterable[str],
+        segment: str,
+        fetch: Optional[Callable[[Tuple[str, ...], str], Awaitable[dict]]] = None,
+    ) -> dict:
+        return await self._get_symbols("ohlc", fetch or self._upstream("ohlc", client), exchange_trading_symbols, segment)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "inflight": len(self._inflight), "upstream_calls": self.upstream_calls, "coalesced": self.coalesced}
+
+    def _upstream(self, kind: str, client: Any) -> Callable[..., Awaitable[dict]]:
+        if self._batcher is not None:
+            return partial(self._batcher.fetch, kind, client)
+        return getattr(client, f"get_{kind}")
+
+    async def _get_symbols(self, kind: str, upstream: Callable[..., Awaitable[dict]], symbols: Iterable[str], segment: str) -> dict:
+        symbols = list(dict.fromkeys(symbols))
+        keys = [(kind, segment, symbol) for symbol in symbols]
+
+        async def fetch(missing: List[Hashable]) -> Dict[Hashable, Any]:
+            payload = await upstream(exchange_trading_symbols=tuple(k[2] for k in missing), segment=segment)
+            return {k: payload[k[2]] for k in missing if k[2] in payload}
+
+        values = await self._get_many(keys, fetch)
+        # Symbols the broker did not return are omitted, as they would be upstream
+        return {key[2]: value for key, value in values.items() if value is not _MISSING}
+
+    async def _get_many(self, keys: List[Hashable], fetch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]) -> Dict[Hashable, Any]:
+        values: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing: List[Hashable] = []
+        loop = asyncio.get_running_loop()
+
+        for key in keys:
+            value = self.cache.get(key)
+            if value is not _MISSING:
+                values[key] = value
+            elif (loop, key) in self._inflight:
+                waiting[key] = self._inflight[(loop, key)]
+                self.coalesced += 1
+            else:
+                missing.append(key)
+
+        if missing:
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(((loop, key), future) for key, future in futures.items())
+            waiting.update(futures)
+            self.upstream_calls += 1
+            # The loop only keeps a weak reference to the task; hold it until it is done
+            task = loop.create_task(self._resolve(loop, missing, futures, fetch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        for key, future in waiting.items():
+            values[key] = await asyncio.shield(future)
+        return values
+
+    async def _resolve(
+        self, loop: asyncio.AbstractEventLoop, missing: List[Hashable], futures: Dict[Hashable, asyncio.Future], fetch: Callable
+    ) -> None:
+        try:
+            fetched = await fetch(missing)
+        except BaseException as exc:
+            for key, future in futures.items():
+                self._inflight.pop((loop, key), None)
+                if future.done():
+                    continue
+                if isinstance(exc, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(exc)
+                    # Mark retrieved: a key nobody else awaited must not log "exception never retrieved"
+                    future.exception()
+            if not isinstance(exc, Exception):
+                raise
+            return
+
+        for key, future in futures.items():
+            self._inflight.pop((loop, key), None)
+            value = fetched.get(key, _MISSING)
+            if value is not _MISSING:
+                self.cache.set(key, value)
+            if not future.done():
+                future.set_result(value)
+
+
+_market_cache = MarketDataCache(batcher=get_symbol_batcher())
+_greeks_cache = MarketDataCache(ttl=GREEKS_CACHE_TTL_SECONDS)
+
+
+def get_market_cache() -> MarketDataCache:
+    return _market_cache
+
+
+def get_greeks_cache() -> MarketDataCache:
+    return _greeks_cache
@@ -0,0 +1,278 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from growwapi.groww.exceptions import GrowwAPITimeoutException
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first when calls are queued behind a class budget.
+PRIORITY_ORDER = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BULK = 2
+
+# Requests per second and burst size for each endpoint class, from Groww's published limits
+# with some headroom. Override with GROWW_RATE_<CLASS>=<rate>:<burst>, e.g. GROWW_RATE_QUOTES=8:8.
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "orders": (10.0, 10.0),
+    "quotes": (8.0, 8.0),
+    "historical": (8.0, 8.0),
+    "instruments": (1.0, 2.0),
+    "portfolio": (15.0, 15.0),
+    # The SDK's changelog fetch, once per adapter build; kept off the portfolio budget
+    "changelog": (1.0, 5.0),
+}
+
+MAX_RETRIES = int(os.getenv("GROWW_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = float(os.getenv("GROWW_BACKOFF_BASE_SECONDS", "0.25"))
+BACKOFF_MAX_SECONDS = float(os.getenv("GROWW_BACKOFF_MAX_SECONDS", "8"))
+
+# Writes that may already have executed when the broker times out or answers 5xx. These are
+# only retried on 429, which the broker returns before processing the request.
+_NON_IDEMPOTENT_PATHS = ("/order/create", "/order/modify", "/order/cancel")
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("broker_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextlib.contextmanager
+def request_priority(level: int) -> Iterator[None]:
+    """Run broker calls made inside the block at `level` (e.g. PRIORITY_BULK for scheduled jobs)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def endpoint_class(url: str) -> str:
+    if "/live-data/" in url:
+        return "quotes"
+    if "/order/" in url or "/margins/detail/orders" in url:
+        return "orders"
+    if "/historical/" in url:
+        return "historical"
+    if "instrument" in url:
+        return "instruments"
+    if url.endswith("/changelog"):
+        return "changelog"
+    return "portfolio"
+
+
+def _priority_for(url: str) -> int:
+    if any(path in url for path in _NON_IDEMPOTENT_PATHS):
+        return PRIORITY_ORDER
+    return _priority.get()
+
+
+def _load_limits() -> Dict[str, Tuple[float, float]]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for name in limits:
+        override = os.getenv(f"GROWW_RATE_{name.upper()}")
+        if override:
+            rate, _, burst = override.partition(":")
+            limits[name] = (float(rate), float(burst or rate))
+    return limits
+
+
+class PriorityTokenBucket:
+    """Token bucket whose waiters are served in (priority, arrival) order.
+
+    Waiters register a ticket and poll; only the ticket at the head of the queue may take a
+    token. Polling keeps the bucket usable from both threads (`acquire`) and coroutines
+    (`acquire_async`) without cross-waking primitives.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self._queue: List[List[Any]] = []
+        self._seq = itertools.count()
+        self.granted = 0
+        self.delayed = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _enqueue(self, priority: int) -> List[Any]:
+        ticket = [priority, next(self._seq), True]
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _cancel(self, ticket: List[Any]) -> None:
+        with self._lock:
+            ticket[2] = False
+
+    def _try_take(self, ticket: List[Any]) -> float:
+        """Take a token for `ticket` and return 0, or return how long to wait before retrying."""
+        with self._lock:
+            while self._queue and not self._queue[0][2]:
+                heapq.heappop(self._queue)
+            self._refill(self._clock())
+            if self._queue and self._queue[0] is ticket and self._tokens >= 1:
+                heapq.heappop(self._queue)
+                ticket[2] = False
+                self._tokens -= 1
+                self.granted += 1
+                return 0.0
+            return max((1 - self._tokens) / self.rate, 0.001)
+
+    def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        ticket = self._enqueue(priority)
+        try:
+            if (wait := self._try_take(ticket)) > 0:
+                self.delayed += 1
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._try_take(ticket)
+        finally:
+            self._cancel(ticket)
+
+    async def acquire_async(self, priority: int = PRIORITY_INTERACTIVE) -> None:
+        ticket = self._enqueue(priority)
+        try:
+            if (wait := self._try_take(ticket)) > 0:
+                self.delayed += 1
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._try_take(ticket)
+        finally:
+            self._cancel(ticket)
+
+    def penalize(self, seconds: float) -> None:
+        """Push the bucket into debt so every caller of this class slows down after a 429."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self._tokens, 2),
+            "waiting": sum(1 for t in self._queue if t[2]),
+            "granted": self.granted,
+            "delayed": self.delayed,
+        }
+
+
+class BrokerRateLimiter:
+    """Client-side budget and retry policy for every Groww REST call.
+
+    `send`/`send_async` wrap a zero-argument callable that performs one HTTP request and
+    returns the raw response (requests or httpx). Each attempt first takes a token from the
+    bucket for the URL's endpoint class. 429 and 5xx responses and timeouts are retried with
+    full-jitter exponential backoff, honouring Retry-After. A 429 waits out its delay as debt on
+    the class bucket instead of sleeping, so the retry and concurrent callers back off together.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = BACKOFF_BASE_SECONDS,
+        max_delay: float = BACKOFF_MAX_SECONDS,
+    ):
+        self.buckets = {name: PriorityTokenBucket(rate, burst) for name, (rate, burst) in (limits or _load_limits()).items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries: Dict[str, int] = {name: 0 for name in self.buckets}
+        self.throttled: Dict[str, int] = {name: 0 for name in self.buckets}
+
+    def _backoff(self, attempt: int, response: Any = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _retry_delay(self, url: str, attempt: int, response: Any = None, timed_out: bool = False) -> Optional[float]:
+        """Return how long to sleep before retrying (0 after a 429, whose delay is taken in the
+        bucket), or None if the outcome should be returned as is."""
+        if attempt >= self.max_retries:
+            return None
+        cls = endpoint_class(url)
+        idempotent = not any(path in url for path in _NON_IDEMPOTENT_PATHS)
+        status = response.status_code if response is not None else None
+
+        if status == 429:
+            delay = self._backoff(attempt, response)
+            self.buckets[cls].penalize(delay)
+            self.throttled[cls] += 1
+            sleep = 0.0
+        elif idempotent and (timed_out or (status is not None and status >= 500)):
+            delay = sleep = self._backoff(attempt, response)
+        else:
+            return None
+        self.retries[cls] += 1
+        logger.warning("Groww %s call to %s got %s; retry %d in %.2fs", cls, url, status or "timeout", attempt + 1, delay)
+        return sleep
+
+    def send(self, url: str, send: Callable[[], Any]) -> Any:
+        bucket = self.buckets[endpoint_class(url)]
+        priority = _priority_for(url)
+        attempt = 0
+        while True:
+            bucket.acquire(priority)
+            try:
+                response = send()
+            except GrowwAPITimeoutException:
+                delay = self._retry_delay(url, attempt, timed_out=True)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(url, attempt, response)
+                if delay is None:
+                    return response
+            if delay:
+                time.sleep(delay)
+            attempt += 1
+
+    async def send_async(self, url: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        bucket = self.buckets[endpoint_class(url)]
+        priority = _priority_for(url)
+        attempt = 0
+        while True:
+            await bucket.acquire_async(priority)
+            try:
+                response = await send()
+            except GrowwAPITimeoutException:
+                delay = self._retry_delay(url, attempt, timed_out=True)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(url, attempt, response)
+                if delay is None:
+                    return response
+            if delay:
+                await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {**bucket.stats(), "retries": self.retries[name], "throttled": self.throttled[name]}
+            for name, bucket in self.buckets.items()
+        }
+
+
+_limiter = BrokerRateLimiter()
+
+
+def get_rate_limiter() -> BrokerRateLimiter:
+    return _limiter
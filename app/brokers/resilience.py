@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.brokers.rate_limit import DEFAULT_RATE_LIMITS, endpoint_class
+
+logger = logging.getLogger(__name__)
+
+# Consecutive failures (timeouts, connection errors, 5xx) that open a class's breaker.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("GROWW_BREAKER_FAILURE_THRESHOLD", "5"))
+# How long an open breaker rejects calls before letting a probe through.
+BREAKER_RESET_SECONDS = float(os.getenv("GROWW_BREAKER_RESET_SECONDS", "30"))
+# Concurrent probe calls allowed while half-open.
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("GROWW_BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Concurrent in-flight calls per endpoint class. Override with GROWW_BULKHEAD_<CLASS>=<n>.
+DEFAULT_BULKHEADS: Dict[str, int] = {
+    "quotes": 64,
+    "orders": 16,
+    "historical": 16,
+    "instruments": 4,
+    "portfolio": 32,
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BrokerUnavailableError(Exception):
+    """Raised instead of calling the broker when a breaker is open or a bulkhead is full."""
+
+    def __init__(self, endpoint_class: str, reason: str, retry_after: float):
+        super().__init__(f"Groww {endpoint_class} calls unavailable: {reason}")
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; open -> half-open after
+    `reset_timeout`, when up to `half_open_probes` calls are let through. A successful probe
+    closes the breaker, a failed one reopens it."""
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self.rejected = 0
+        self.opened = 0
+
+    def retry_after(self) -> float:
+        return max(self._opened_at + self.reset_timeout - self._clock(), 0.0)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("Groww circuit breaker closed")
+            self.state = CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                    logger.warning("Groww circuit breaker opened after %d failures", self._failures)
+                self.state = OPEN
+                self._opened_at = self._clock()
+
+    def release_probe(self) -> None:
+        """Give back a half-open probe slot whose call ended without an outcome (e.g. cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class Bulkhead:
+    """Caps concurrent in-flight sends for one endpoint class; sends over the cap are rejected
+    at once rather than queued, so a slow class cannot hold workers that others need. Waiting
+    for a rate-limit token happens before a slot is taken."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.rejected = 0
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.active >= self.limit:
+                self.rejected += 1
+                return False
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            return True
+
+    def leave(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "active": self.active, "peak": self.peak, "rejected": self.rejected}
+
+
+def _is_failure(response: Any) -> bool:
+    return getattr(response, "status_code", 200) >= 500
+
+
+def _load_bulkheads() -> Dict[str, int]:
+    limits = dict(DEFAULT_BULKHEADS)
+    for name in limits:
+        override = os.getenv(f"GROWW_BULKHEAD_{name.upper()}")
+        if override:
+            limits[name] = int(override)
+    return limits
+
+
+class BrokerGuard:
+    """Per-endpoint-class circuit breakers and bulkheads around broker calls.
+
+    `call`/`call_async` wrap a zero-argument callable that performs one HTTP attempt, after it
+    has been granted a rate-limit token, and returns the raw response; retries go back through
+    the limiter and the guard, so each attempt is reported to the breaker. Exceptions and 5xx
+    responses count as failures; anything else, including 4xx, counts as success since the
+    broker answered. Each account has its own guard (see get_broker_guard).
+    """
+
+    def __init__(
+        self,
+        bulkheads: Optional[Dict[str, int]] = None,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+    ):
+        bulkheads = bulkheads or _load_bulkheads()
+        classes = set(DEFAULT_RATE_LIMITS) | set(bulkheads)
+        self.breakers = {name: breaker_factory() for name in classes}
+        self.bulkheads = {name: Bulkhead(bulkheads.get(name, DEFAULT_BULKHEADS.get(name, 16))) for name in classes}
+
+    def _enter(self, url: str) -> Tuple[CircuitBreaker, Bulkhead]:
+        cls = endpoint_class(url)
+        breaker, bulkhead = self.breakers[cls], self.bulkheads[cls]
+        if not bulkhead.try_enter():
+            raise BrokerUnavailableError(cls, "too many concurrent calls", 1.0)
+        if not breaker.allow():
+            bulkhead.leave()
+            raise BrokerUnavailableError(cls, "circuit open", breaker.retry_after())
+        return breaker, bulkhead
+
+    def call(self, url: str, send: Callable[[], Any]) -> Any:
+        breaker, bulkhead = self._enter(url)
+        try:
+            response = send()
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        finally:
+            bulkhead.leave()
+        if _is_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def call_async(self, url: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        breaker, bulkhead = self._enter(url)
+        try:
+            response = await send()
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        finally:
+            bulkhead.leave()
+        if _is_failure(response):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {"breaker": self.breakers[name].stats(), "bulkhead": self.bulkheads[name].stats()}
+            for name in sorted(self.breakers)
+        }
+
+
+_guards: Dict[str, BrokerGuard] = {DEFAULT_ACCOUNT: BrokerGuard()}
+_guards_lock = threading.Lock()
+
+
+def get_broker_guard(account_id: str = DEFAULT_ACCOUNT) -> BrokerGuard:
+    """The account's breakers and bulkheads, created on first use. Keyed by account like the
+    rate limiters, so one throttled or failing account cannot trip or starve another."""
+    guard = _guards.get(account_id)
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.setdefault(account_id, BrokerGuard())
+    return guard
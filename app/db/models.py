@@ -1,12 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, JSON, text
 from sqlalchemy.orm import declarative_base
 
+from app.brokers.accounts import DEFAULT_ACCOUNT
+
 Base = declarative_base()
 
+
 class Position(Base):
     __tablename__ = "positions"
 
     id = Column(Integer, primary_key=True, index=True)
+    account_id = Column(String, index=True, nullable=False, default=DEFAULT_ACCOUNT, server_default=DEFAULT_ACCOUNT)
     symbol = Column(String, index=True)
     quantity = Column(Float)
     avg_price = Column(Float)
@@ -15,6 +19,8 @@ class Position(Base):
 class HoldingDaily(Base):
     __tablename__ = "holdings_daily"
 
+    # Leads the key so every per-account read is a range; see migration 8b4e2f61c0d9
+    account_id = Column(String, primary_key=True, nullable=False, default=DEFAULT_ACCOUNT, server_default=DEFAULT_ACCOUNT)
     symbol = Column(String, primary_key=True, index=True, nullable=False)
     as_of_date = Column(Date, primary_key=True, index=True, nullable=False)
     quantity = Column(Float, nullable=False)
@@ -24,7 +30,8 @@ class HoldingDaily(Base):
 class Instrument(Base):
     __tablename__ = "instruments"
 
-    trading_symbol = Column(String, primary_key=True, index=True, nullable=False)
+    # Byte order on PostgreSQL too, as the in-memory index sorts; see migration 9c4e1a7b3f62
+    trading_symbol = Column(String().with_variant(String(collation="C"), "postgresql"), primary_key=True, index=True, nullable=False)
     exchange = Column(String, index=True, nullable=True)
     exchange_token = Column(String, nullable=True)
     groww_symbol = Column(String, nullable=True)
@@ -43,3 +50,99 @@ class Instrument(Base):
     is_reserved = Column(Integer, nullable=True)
     buy_allowed = Column(Integer, nullable=True)
     sell_allowed = Column(Integer, nullable=True)
+    # Hash of the normalized broker row, used to skip unchanged rows on refresh
+    row_hash = Column(String, nullable=True)
+
+    # Matched to the router's filter combinations; see migration a7c3e9d15b42
+    __table_args__ = (
+        Index(
+            "ix_instruments_underlying_expiry_strike",
+            "underlying_symbol",
+            "expiry_date",
+            "strike_price",
+            postgresql_where=text("underlying_symbol IS NOT NULL"),
+            sqlite_where=text("underlying_symbol IS NOT NULL"),
+        ),
+        Index("ix_instruments_exchange_type_symbol", "exchange", "instrument_type", "trading_symbol"),
+        Index("ix_instruments_type_symbol", "instrument_type", "trading_symbol"),
+        Index("ix_instruments_segment_symbol", "segment", "trading_symbol"),
+    )
+
+
+class DatasetVersion(Base):
+    """Version stamp per reference dataset, bumped in the same transaction as each change."""
+
+    __tablename__ = "dataset_versions"
+
+    name = Column(String, primary_key=True, nullable=False)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class PortfolioSnapshot(Base):
+    """Intraday holdings/positions, delta encoded: a row is a change-point, written only when
+    quantity, avg_price or ltp differ from the symbol's previous row. Range partitioned by
+    captured_at on PostgreSQL; see migration f5a1c8d37e20."""
+
+    __tablename__ = "portfolio_snapshots"
+
+    account_id = Column(String, primary_key=True, nullable=False, default=DEFAULT_ACCOUNT, server_default=DEFAULT_ACCOUNT)
+    # 'holding' or 'position'
+    kind = Column(String, primary_key=True, nullable=False)
+    symbol = Column(String, primary_key=True, nullable=False)
+    captured_at = Column(DateTime, primary_key=True, nullable=False)
+    # 0 once the symbol is no longer held
+    quantity = Column(Float, nullable=False)
+    avg_price = Column(Float, nullable=True)
+    ltp = Column(Float, nullable=True)
+
+    __table_args__ = (Index("ix_portfolio_snapshots_captured_at", "captured_at"),)
+
+
+class PortfolioSnapshotDaily(Base):
+    """Intraday snapshots rolled up once they age out of the retention window."""
+
+    __tablename__ = "portfolio_snapshots_daily"
+
+    account_id = Column(String, primary_key=True, nullable=False, default=DEFAULT_ACCOUNT, server_default=DEFAULT_ACCOUNT)
+    kind = Column(String, primary_key=True, nullable=False)
+    symbol = Column(String, primary_key=True, nullable=False)
+    as_of_date = Column(Date, primary_key=True, nullable=False)
+    # State at the end of the day
+    quantity = Column(Float, nullable=False)
+    avg_price = Column(Float, nullable=True)
+    ltp = Column(Float, nullable=True)
+    ltp_low = Column(Float, nullable=True)
+    ltp_high = Column(Float, nullable=True)
+    # Change-points recorded during the day
+    changes = Column(Integer, nullable=False)
+
+
+class CandleDaily(Base):
+    """Daily candles from the broker's historical API, kept locally as the input to risk models."""
+
+    __tablename__ = "candles_daily"
+
+    symbol = Column(String, primary_key=True, nullable=False)
+    trade_date = Column(Date, primary_key=True, index=True, nullable=False)
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=True)
+
+
+class StressScenario(Base):
+    """A named market move for /risk/stress, applied to every underlying unless overridden."""
+
+    __tablename__ = "stress_scenarios"
+
+    name = Column(String, primary_key=True, nullable=False)
+    description = Column(String, nullable=True)
+    # Percent move of each underlying's spot
+    spot_shock = Column(Float, nullable=False)
+    # Change of each underlying's annualized volatility, in vol points
+    vol_shock = Column(Float, nullable=False, default=0.0)
+    # {underlying: {"spot_shock": ..., "vol_shock": ...}}, replacing the defaults above
+    overrides = Column(JSON, nullable=True)
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,67 @@
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Rows per multi-VALUES upsert statement.
+UPSERT_BATCH_ROWS = 1000
+# Dialects with INSERT ... ON CONFLICT, and their insert constructs.
+_ON_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert_rows(
+    session: Session,
+    model: Type[Any],
+    rows: List[Dict[str, Any]],
+    update: Sequence[str],
+    changed: Optional[Sequence[str]] = None,
+    batch_rows: int = UPSERT_BATCH_ROWS,
+) -> int:
+    """Insert `rows` (unique by primary key) into `model`'s table, or set the `update` columns of
+    the rows already there, inside the caller's transaction. A stored row is rewritten only if one
+    of the `changed` columns (default: `update`) differs.
+
+    PostgreSQL and SQLite take one INSERT ... ON CONFLICT DO UPDATE per `batch_rows`; other
+    dialects fall back to loading and updating row by row. Returns the number of rows inserted or changed.
+    """
+    changed = list(changed or update)
+    dialect = session.get_bind().dialect.name
+    if dialect not in _ON_CONFLICT_INSERTS:
+        return _merge_rows(session, model, rows, update, changed)
+
+    written = 0
+    for i in range(0, len(rows), batch_rows):
+        written += session.execute(upsert_statement(dialect, model, rows[i:i + batch_rows], update, changed)).rowcount
+    return written
+
+
+def upsert_statement(dialect: str, model: Type[Any], rows: List[Dict[str, Any]], update: Sequence[str], changed: Optional[Sequence[str]] = None):
+    """One INSERT ... ON CONFLICT (primary key) DO UPDATE for `rows`, skipping unchanged rows."""
+    changed = list(changed or update)
+    table = model.__table__
+    statement = _ON_CONFLICT_INSERTS[dialect](table).values(rows)
+    excluded = statement.excluded
+    differs = table.c[changed[0]].is_distinct_from(excluded[changed[0]])
+    for name in changed[1:]:
+        differs = differs | table.c[name].is_distinct_from(excluded[name])
+    return statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={name: excluded[name] for name in update},
+        where=differs,
+    )
+
+
+def _merge_rows(session: Session, model: Type[Any], rows: List[Dict[str, Any]], update: Sequence[str], changed: Sequence[str]) -> int:
+    key = [column.name for column in model.__table__.primary_key.columns]
+    written = 0
+    for row in rows:
+        existing = session.get(model, {name: row[name] for name in key})
+        if existing is None:
+            session.add(model(**row))
+            written += 1
+        elif any(getattr(existing, name) != row.get(name) for name in changed):
+            for name in update:
+                setattr(existing, name, row.get(name))
+            written += 1
+    session.flush()
+    return written
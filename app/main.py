@@ -1,13 +1,37 @@
-from fastapi import FastAPI
+import math
 
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.brokers.groww_pool import get_adapter_pools
+from app.brokers.resilience import BrokerUnavailableError
 from app.routers import groww as groww_router
 from app.routers import instruments as instruments_router
+from app.routers import metrics as metrics_router
+from app.routers import portfolio as portfolio_router
+from app.routers import risk as risk_router
 from app.scheduler import start_scheduler as _start_scheduler, stop_scheduler as _stop_scheduler
+from app.services.instrument_index import reload_instrument_index
+from app.services.monte_carlo import shutdown_executor
 
 app = FastAPI(title="Risk Engine API")
 
 app.include_router(groww_router.router)
 app.include_router(instruments_router.router)
+app.include_router(metrics_router.router)
+app.include_router(portfolio_router.router)
+app.include_router(risk_router.router)
+
+
+@app.exception_handler(BrokerUnavailableError)
+async def broker_unavailable(request: Request, exc: BrokerUnavailableError):
+    # Shed load quickly while the broker is degraded instead of tying up workers
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "endpoint_class": exc.endpoint_class},
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))},
+    )
+
 
 @app.get("/health")
 def health():
@@ -19,6 +43,23 @@ def start_scheduler():
     _start_scheduler()
 
 
+@app.on_event("startup")
+def load_instrument_index():
+    reload_instrument_index()
+
+
 @app.on_event("shutdown")
 def stop_scheduler():
     _stop_scheduler()
+
+
+@app.on_event("shutdown")
+async def close_broker_pool():
+    for pool in get_adapter_pools().values():
+        pool.close()
+        await pool.aclose()
+
+
+@app.on_event("shutdown")
+def stop_simulation_workers():
+    shutdown_executor()
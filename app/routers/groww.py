@@ -1,18 +1,22 @@
 from typing import List, Optional, Any
 import logging
 
-from fastapi import APIRouter, Body, Query, Depends, HTTPException
+from fastapi import APIRouter, Body, Query, Depends, HTTPException, Request, Response
 import numpy as np
 import pandas as pd
 from sqlalchemy.orm import Session
 
-from app.brokers.groww_adapter import GrowwAdapter
-from app.brokers.groww_auth import get_access_token
+from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+from app.brokers.groww_pool import get_async_groww_client
+from app.brokers.market_cache import get_market_cache
 from app.db.models import Instrument
 from app.db.session import SessionLocal
 from app.schemas.groww import PlaceOrderRequest, ModifyOrderRequest, OrderMarginRequest
+from app.services.composite_fetch import fetch_concurrently
 from app.services.holdings_job import upsert_today_holdings
+from app.services.http_cache import INSTRUMENTS_MAX_AGE, conditional, table_stamp
 from app.services.instrument_job import replace_instruments
+from app.services.instrument_listing import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, page_size
 
 router = APIRouter(prefix="/groww", tags=["Groww"])
 logger = logging.getLogger(__name__)
@@ -26,9 +30,8 @@ def get_db():
         db.close()
 
 
-def _client() -> GrowwAdapter:
-    token = get_access_token()
-    return GrowwAdapter(token)
+def instruments_cache(request: Request, response: Response, db: Session = Depends(get_db)):
+    return conditional(request, response, table_stamp(db), INSTRUMENTS_MAX_AGE)
 
 
 def _sanitize_dataframe(df: pd.DataFrame) -> list[dict[str, Any]]:
@@ -37,27 +40,40 @@ def _sanitize_dataframe(df: pd.DataFrame) -> list[dict[str, Any]]:
 
 # Portfolio
 @router.get("/portfolio")
-def get_portfolio():
-    return {
-        "holdings": _client().get_holdings(),
-        "positions": _client().get_positions_for_user(),
-    }
+async def get_portfolio(client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    result = await fetch_concurrently(
+        {
+            "holdings": client.get_holdings,
+            "positions": client.get_positions_for_user,
+        }
+    )
+    if not result.results:
+        raise HTTPException(status_code=502, detail=result.errors)
+    return result.to_payload()
 
 
 @router.get("/holdings")
-def get_holdings():
-    return _client().get_holdings()
+async def get_holdings(client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_holdings()
 
 
 @router.get("/positions")
-def get_positions(segment: Optional[str] = Query(None)):
-    return _client().get_positions_for_user(segment=segment)
+async def get_positions(segment: Optional[str] = Query(None), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_positions_for_user(segment=segment)
 
 
 # Instruments and quotes
-@router.get("/instruments")
-def get_instruments(db: Session = Depends(get_db)):
-    instruments = db.query(Instrument).all()
+@router.get("/instruments", dependencies=[Depends(instruments_cache)])
+def get_instruments(
+    response: Response,
+    after: Optional[str] = None,
+    limit: int = MAX_PAGE_SIZE,
+    db: Session = Depends(get_db),
+):
+    # Keyset pages on trading_symbol; use /instruments/export for the full master in one stream
+    instruments, cursor = keyset_page(db.query(Instrument), after, page_size(limit))
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return [
         {
             "trading_symbol": inst.trading_symbol,
@@ -72,61 +88,62 @@ def get_instruments(db: Session = Depends(get_db)):
 
 
 @router.get("/quote")
-def get_quote(trading_symbol: str, exchange: str, segment: str):
-    return _client().get_quote(trading_symbol=trading_symbol, exchange=exchange, segment=segment)
+async def get_quote(trading_symbol: str, exchange: str, segment: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await get_market_cache().get_quote(client, trading_symbol=trading_symbol, exchange=exchange, segment=segment)
 
 
 @router.get("/ltp")
-def get_ltp(segment: str, symbols: List[str] = Query(..., description="List of exchange:trading_symbol")):
-    return _client().get_ltp(exchange_trading_symbols=tuple(symbols), segment=segment)
+async def get_ltp(segment: str, symbols: List[str] = Query(..., description="List of exchange:trading_symbol"), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await get_market_cache().get_ltp(client, exchange_trading_symbols=symbols, segment=segment)
 
 
 @router.get("/ohlc")
-def get_ohlc(segment: str, symbols: List[str] = Query(..., description="List of exchange:trading_symbol")):
-    return _client().get_ohlc(exchange_trading_symbols=tuple(symbols), segment=segment)
+async def get_ohlc(segment: str, symbols: List[str] = Query(..., description="List of exchange:trading_symbol"), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await get_market_cache().get_ohlc(client, exchange_trading_symbols=symbols, segment=segment)
 
 
 @router.get("/instrument/by-token/{exchange_token}")
-def get_instrument_by_exchange_token(exchange_token: str):
-    return _client().get_instrument_by_exchange_token(exchange_token=exchange_token)
+async def get_instrument_by_exchange_token(exchange_token: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_instrument_by_exchange_token(exchange_token=exchange_token)
 
 
 @router.get("/instrument/by-symbol")
-def get_instrument_by_exchange_and_trading_symbol(exchange: str, trading_symbol: str):
-    return _client().get_instrument_by_exchange_and_trading_symbol(exchange=exchange, trading_symbol=trading_symbol)
+async def get_instrument_by_exchange_and_trading_symbol(exchange: str, trading_symbol: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_instrument_by_exchange_and_trading_symbol(exchange=exchange, trading_symbol=trading_symbol)
 
 
 @router.get("/instrument/by-groww/{groww_symbol}")
-def get_instrument_by_groww_symbol(groww_symbol: str):
-    return _client().get_instrument_by_groww_symbol(groww_symbol=groww_symbol)
+async def get_instrument_by_groww_symbol(groww_symbol: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_instrument_by_groww_symbol(groww_symbol=groww_symbol)
 
 
 # Derivatives and historical
 @router.get("/expiries")
-def get_expiries(exchange: str, underlying_symbol: str, year: Optional[int] = None, month: Optional[int] = None):
-    return _client().get_expiries(exchange=exchange, underlying_symbol=underlying_symbol, year=year, month=month)
+async def get_expiries(exchange: str, underlying_symbol: str, year: Optional[int] = None, month: Optional[int] = None, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_expiries(exchange=exchange, underlying_symbol=underlying_symbol, year=year, month=month)
 
 
 @router.get("/contracts")
-def get_contracts(exchange: str, underlying_symbol: str, expiry_date: str):
-    return _client().get_contracts(exchange=exchange, underlying_symbol=underlying_symbol, expiry_date=expiry_date)
+async def get_contracts(exchange: str, underlying_symbol: str, expiry_date: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_contracts(exchange=exchange, underlying_symbol=underlying_symbol, expiry_date=expiry_date)
 
 
 @router.get("/greeks")
-def get_greeks(exchange: str, underlying: str, trading_symbol: str, expiry: str):
-    return _client().get_greeks(exchange=exchange, underlying=underlying, trading_symbol=trading_symbol, expiry=expiry)
+async def get_greeks(exchange: str, underlying: str, trading_symbol: str, expiry: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_greeks(exchange=exchange, underlying=underlying, trading_symbol=trading_symbol, expiry=expiry)
 
 
 @router.get("/historical/candle-data")
-def get_historical_candle_data(
+async def get_historical_candle_data(
     trading_symbol: str,
     exchange: str,
     segment: str,
     start_time: str,
     end_time: str,
     interval_in_minutes: Optional[int] = None,
+    client: AsyncGrowwAdapter = Depends(get_async_groww_client),
 ):
-    return _client().get_historical_candle_data(
+    return await client.get_historical_candle_data(
         trading_symbol=trading_symbol,
         exchange=exchange,
         segment=segment,
@@ -137,15 +154,16 @@ def get_historical_candle_data(
 
 
 @router.get("/historical/candles")
-def get_historical_candles(
+async def get_historical_candles(
     exchange: str,
     segment: str,
     groww_symbol: str,
     start_time: str,
     end_time: str,
     candle_interval: str,
+    client: AsyncGrowwAdapter = Depends(get_async_groww_client),
 ):
-    return _client().get_historical_candles(
+    return await client.get_historical_candles(
         exchange=exchange,
         segment=segment,
         groww_symbol=groww_symbol,
@@ -157,28 +175,28 @@ def get_historical_candles(
 
 # Orders and margins
 @router.get("/orders")
-def get_order_list(page: Optional[int] = 0, page_size: Optional[int] = 25, segment: Optional[str] = None):
-    return _client().get_order_list(page=page, page_size=page_size, segment=segment)
+async def get_order_list(page: Optional[int] = 0, page_size: Optional[int] = 25, segment: Optional[str] = None, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_order_list(page=page, page_size=page_size, segment=segment)
 
 
 @router.get("/orders/{order_id}")
-def get_order_detail(order_id: str, segment: str):
-    return _client().get_order_detail(segment=segment, groww_order_id=order_id)
+async def get_order_detail(order_id: str, segment: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_order_detail(segment=segment, groww_order_id=order_id)
 
 
 @router.get("/orders/{order_id}/status")
-def get_order_status(order_id: str, segment: str):
-    return _client().get_order_status(segment=segment, groww_order_id=order_id)
+async def get_order_status(order_id: str, segment: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_order_status(segment=segment, groww_order_id=order_id)
 
 
 @router.get("/orders/{order_id}/trades")
-def get_trade_list_for_order(order_id: str, segment: str, page: Optional[int] = 0, page_size: Optional[int] = 25):
-    return _client().get_trade_list_for_order(groww_order_id=order_id, segment=segment, page=page, page_size=page_size)
+async def get_trade_list_for_order(order_id: str, segment: str, page: Optional[int] = 0, page_size: Optional[int] = 25, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_trade_list_for_order(groww_order_id=order_id, segment=segment, page=page, page_size=page_size)
 
 
 @router.post("/orders")
-def place_order(payload: PlaceOrderRequest = Body(...)):
-    return _client().place_order(
+async def place_order(payload: PlaceOrderRequest = Body(...), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.place_order(
         validity=payload.validity,
         exchange=payload.exchange,
         order_type=payload.order_type,
@@ -194,8 +212,8 @@ def place_order(payload: PlaceOrderRequest = Body(...)):
 
 
 @router.post("/orders/{order_id}/modify")
-def modify_order(order_id: str, payload: ModifyOrderRequest = Body(...)):
-    return _client().modify_order(
+async def modify_order(order_id: str, payload: ModifyOrderRequest = Body(...), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.modify_order(
         order_type=payload.order_type,
         segment=payload.segment,
         groww_order_id=order_id,
@@ -206,18 +224,18 @@ def modify_order(order_id: str, payload: ModifyOrderRequest = Body(...)):
 
 
 @router.post("/orders/{order_id}/cancel")
-def cancel_order(order_id: str, segment: str):
-    return _client().cancel_order(groww_order_id=order_id, segment=segment)
+async def cancel_order(order_id: str, segment: str, client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.cancel_order(groww_order_id=order_id, segment=segment)
 
 
 @router.get("/margin/available")
-def get_available_margin_details():
-    return _client().get_available_margin_details()
+async def get_available_margin_details(client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_available_margin_details()
 
 
 @router.post("/margin/orders")
-def get_order_margin_details(payload: OrderMarginRequest = Body(...)):
-    return _client().get_order_margin_details(segment=payload.segment, orders=payload.orders)
+async def get_order_margin_details(payload: OrderMarginRequest = Body(...), client: AsyncGrowwAdapter = Depends(get_async_groww_client)):
+    return await client.get_order_margin_details(segment=payload.segment, orders=payload.orders)
 
 
 # Manual job triggers
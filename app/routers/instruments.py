@@ -1,13 +1,24 @@
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Dict, Optional, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
 from app.db.models import Instrument
 from app.db.session import SessionLocal
-from app.schemas.instruments import Instrument as InstrumentSchema
-
-router = APIRouter(prefix="/instruments", tags=["Instruments"])
-
+from app.schemas.instruments import Instrument as InstrumentSchema, InstrumentSearchHit, OptionChain
+from app.services.http_cache import INSTRUMENTS_MAX_AGE, conditional, instruments_stamp, table_stamp
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.instrument_listing import (
+    EXPORT_FORMATS,
+    NEXT_CURSOR_HEADER,
+    iter_export,
+    keyset_page,
+    next_cursor,
+    page_size,
+)
+from app.services.option_chain import ChainNotFound
 
 def get_db():
     db = SessionLocal()
@@ -17,7 +28,30 @@ def get_db():
         db.close()
 
 
-@router.get("/underlying/{underlying_symbol}", response_model=List[InstrumentSchema])
+# Instrument data only changes on refresh, so every route is conditional on the version stamp
+# of the source it reads: the in-memory index or the table.
+router = APIRouter(prefix="/instruments", tags=["Instruments"])
+
+
+def instruments_cache(request: Request, response: Response, db: Session = Depends(get_db)):
+    """ETag/Cache-Control for index-served responses; answers 304 for a current If-None-Match."""
+    return conditional(request, response, instruments_stamp(db), INSTRUMENTS_MAX_AGE)
+
+
+def table_cache(request: Request, response: Response, db: Session = Depends(get_db)):
+    """ETag/Cache-Control for responses read from the table."""
+    return conditional(request, response, table_stamp(db), INSTRUMENTS_MAX_AGE)
+
+
+def symbol_cache(trading_symbol: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Index-stamped when the index has the symbol, table-stamped when the route falls back to the table."""
+    index = get_instrument_index()
+    if index is not None and index.get(trading_symbol) is not None:
+        return conditional(request, response, index.version, INSTRUMENTS_MAX_AGE)
+    return conditional(request, response, table_stamp(db), INSTRUMENTS_MAX_AGE)
+
+
+@router.get("/underlying/{underlying_symbol}", response_model=List[InstrumentSchema], dependencies=[Depends(instruments_cache)])
 def get_instruments_by_underlying(
     underlying_symbol: str,
     instrument_type: Optional[str] = None,
@@ -39,6 +73,11 @@ def get_instruments_by_underlying(
     Returns:
         List of all options/futures contracts for the given underlying symbol
     """
+    limit = min(limit, 1000)
+    index = get_instrument_index()
+    if index is not None:
+        return index.by_underlying(underlying_symbol, instrument_type, segment, exchange, limit)
+
     query = db.query(Instrument).filter(Instrument.underlying_symbol == underlying_symbol)
     
     if instrument_type:
@@ -50,14 +89,144 @@ def get_instruments_by_underlying(
     if exchange:
         query = query.filter(Instrument.exchange == exchange)
     
-    # Limit results
-    limit = min(limit, 1000)
-    instruments = query.limit(limit).all()
+    # Chain order, the same as the index serves; ix_instruments_underlying_expiry_strike returns it presorted
+    instruments = query.order_by(Instrument.expiry_date, Instrument.strike_price).limit(limit).all()
     
     return instruments
 
 
-@router.get("/{trading_symbol}", response_model=InstrumentSchema)
+@router.get("/chain/{underlying}", response_model=OptionChain, dependencies=[Depends(instruments_cache)])
+def get_option_chain(
+    underlying: str,
+    expiry: Optional[date] = None,
+    strike_min: Optional[float] = None,
+    strike_max: Optional[float] = None,
+    atm: Optional[float] = None,
+    width: Optional[int] = Query(None, ge=0, le=500),
+    db: Session = Depends(get_db)
+):
+    """
+    Fetch the option chain for an underlying: CE/PE pairs by strike for one expiry.
+    
+    Args:
+        underlying: The underlying symbol (e.g., 'NIFTY', 'BANKNIFTY')
+        expiry: Expiry date (default: nearest expiry on or after today)
+        strike_min: Lowest strike to include
+        strike_max: Highest strike to include
+        atm: Spot/reference price; selects the nearest strike as ATM
+        width: Strikes to return on each side of ATM (default: 10, requires atm)
+        
+    Returns:
+        The chain for the selected expiry, the list of available expiries and the ATM strike
+    """
+    index = get_instrument_index()
+    if index is None:
+        # No index loaded yet: build this underlying's chain from its own rows
+        index = InstrumentIndex.from_session(db, underlying_symbol=underlying)
+    try:
+        return index.chains.get(underlying, expiry, strike_min, strike_max, atm, width)
+    except ChainNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/search", response_model=List[InstrumentSearchHit], dependencies=[Depends(instruments_cache)])
+def search_instruments(
+    q: str = Query(..., min_length=1, max_length=64),
+    exchange: Optional[str] = None,
+    segment: Optional[str] = None,
+    instrument_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Type-ahead search over trading symbols and names.
+    
+    Args:
+        q: Search text (e.g., 'reli', 'tata mot', 'RELAINCE')
+        exchange: Filter by exchange (e.g., 'NSE', 'BSE')
+        segment: Filter by segment (e.g., 'CASH', 'FNO')
+        instrument_type: Filter by instrument type (e.g., 'EQ', 'CE', 'PE', 'FUT')
+        limit: Maximum number of results (default: 20, max: 100)
+        
+    Returns:
+        Ranked matches, best first: exact symbol, symbol prefix, name prefix, then fuzzy
+        (misspelled) matches. Each carries its match type and a 0-1 score.
+    """
+    index = get_instrument_index()
+    if index is not None:
+        return index.search.find(q, exchange=exchange, segment=segment, instrument_type=instrument_type, limit=limit)
+
+    # No index loaded yet: case-insensitive symbol or name prefix matches, straight from the
+    # table. This scans; it only serves until the in-memory index has loaded.
+    text = q.strip().upper()
+    pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    query = db.query(Instrument).filter(
+        or_(
+            func.upper(Instrument.trading_symbol).like(pattern, escape="\\"),
+            func.upper(Instrument.name).like(pattern, escape="\\"),
+        )
+    )
+    
+    if exchange:
+        query = query.filter(Instrument.exchange == exchange)
+    
+    if segment:
+        query = query.filter(Instrument.segment == segment)
+    
+    if instrument_type:
+        query = query.filter(Instrument.instrument_type == instrument_type)
+    
+    instruments = query.order_by(func.length(Instrument.trading_symbol), Instrument.trading_symbol).limit(limit).all()
+    
+    hits = []
+    for instrument in instruments:
+        symbol = instrument.trading_symbol.upper()
+        match = "exact" if symbol == text else "prefix" if symbol.startswith(text) else "name"
+        hit = InstrumentSchema.model_validate(instrument).model_dump()
+        hit.update(match=match, score=round(len(text) / max(len(symbol), len(text)), 4))
+        hits.append(hit)
+    return hits
+
+
+@router.get("/export")
+def export_instruments(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    exchange: Optional[str] = None,
+    instrument_type: Optional[str] = None,
+    segment: Optional[str] = None,
+    underlying_symbol: Optional[str] = None,
+    cache_headers: Dict[str, str] = Depends(table_cache),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream the instrument master (or a filtered slice of it) in trading_symbol order.
+    
+    Args:
+        format: 'ndjson' (one JSON object per line, default) or 'csv' (with a header row)
+        exchange: Filter by exchange (e.g., 'NSE', 'BSE')
+        instrument_type: Filter by instrument type (e.g., 'EQ', 'CE', 'PE', 'FUT')
+        segment: Filter by segment (e.g., 'EQ', 'FNO')
+        underlying_symbol: Filter by underlying symbol (e.g., 'BANKNIFTY', 'NIFTY')
+        
+    Returns:
+        A streamed body with every matching instrument; nothing is paged or truncated
+    """
+    rows = iter_export(
+        db,
+        fmt,
+        exchange=exchange,
+        instrument_type=instrument_type,
+        segment=segment,
+        underlying_symbol=underlying_symbol,
+    )
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f"attachment; filename=instruments.{fmt}", **cache_headers},
+    )
+
+
+@router.get("/{trading_symbol}", response_model=InstrumentSchema, dependencies=[Depends(symbol_cache)])
 def get_instrument_by_symbol(trading_symbol: str, db: Session = Depends(get_db)):
     """
     Fetch a single instrument by its trading symbol.
@@ -68,6 +237,13 @@ def get_instrument_by_symbol(trading_symbol: str, db: Session = Depends(get_db))
     Returns:
         Instrument details including exchange, type, name, options data, etc.
     """
+    index = get_instrument_index()
+    if index is not None:
+        instrument = index.get(trading_symbol)
+        if instrument is not None:
+            return instrument
+
+    # Not indexed yet (first load pending, or listed since this process last refreshed)
     instrument = db.query(Instrument).filter(Instrument.trading_symbol == trading_symbol).first()
     
     if not instrument:
@@ -76,17 +252,19 @@ def get_instrument_by_symbol(trading_symbol: str, db: Session = Depends(get_db))
     return instrument
 
 
-@router.get("/", response_model=List[InstrumentSchema])
+@router.get("/", response_model=List[InstrumentSchema], dependencies=[Depends(instruments_cache)])
 def get_instruments(
+    response: Response,
     exchange: Optional[str] = None,
     instrument_type: Optional[str] = None,
     segment: Optional[str] = None,
     underlying_symbol: Optional[str] = None,
     limit: int = 100,
+    after: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Fetch instruments with optional filters.
+    Fetch instruments with optional filters, one page at a time in trading_symbol order.
     
     Args:
         exchange: Filter by exchange (e.g., 'NSE', 'BSE')
@@ -94,26 +272,35 @@ def get_instruments(
         segment: Filter by segment (e.g., 'EQ', 'FNO')
         underlying_symbol: Filter by underlying symbol (e.g., 'BANKNIFTY', 'NIFTY')
         limit: Maximum number of results (default: 100, max: 1000)
+        after: Cursor from a previous page's X-Next-Cursor header
         
     Returns:
-        List of instruments matching the filters
+        List of instruments matching the filters. When more follow, the X-Next-Cursor
+        response header holds the cursor for the next page.
     """
-    query = db.query(Instrument)
-    
-    if exchange:
-        query = query.filter(Instrument.exchange == exchange)
-    
-    if instrument_type:
-        query = query.filter(Instrument.instrument_type == instrument_type)
-    
-    if segment:
-        query = query.filter(Instrument.segment == segment)
-    
-    if underlying_symbol:
-        query = query.filter(Instrument.underlying_symbol == underlying_symbol)
+    limit = page_size(limit)
+    index = get_instrument_index()
+    if index is not None:
+        rows = index.filter(exchange, instrument_type, segment, underlying_symbol, limit + 1, after)
+        instruments, cursor = next_cursor(rows, limit)
+    else:
+        query = db.query(Instrument)
+        
+        if exchange:
+            query = query.filter(Instrument.exchange == exchange)
+        
+        if instrument_type:
+            query = query.filter(Instrument.instrument_type == instrument_type)
+        
+        if segment:
+            query = query.filter(Instrument.segment == segment)
+        
+        if underlying_symbol:
+            query = query.filter(Instrument.underlying_symbol == underlying_symbol)
+        
+        instruments, cursor = keyset_page(query, after, limit)
     
-    # Limit results
-    limit = min(limit, 1000)
-    instruments = query.limit(limit).all()
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     
     return instruments
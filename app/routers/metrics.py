@@ -0,0 +1,38 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.brokers.batching import get_symbol_batcher
+from app.brokers.groww_auth import get_token_manager
+from app.brokers.groww_pool import get_adapter_pool, get_adapter_pools
+from app.brokers.market_cache import get_greeks_cache, get_market_cache
+from app.brokers.rate_limit import get_rate_limiter
+from app.brokers.resilience import get_broker_guard
+from app.services.account_ingestion import last_runs
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/broker")
+def get_broker_metrics() -> Dict[str, Any]:
+    """Breaker state, bulkhead and rate-limit counters, and cache/pool stats for the Groww integration."""
+    return {
+        "endpoints": get_broker_guard().stats(),
+        "rate_limits": get_rate_limiter().stats(),
+        "pool": get_adapter_pool().stats(),
+        "market_cache": get_market_cache().stats(),
+        "greeks_cache": get_greeks_cache().stats(),
+        "batcher": get_symbol_batcher().stats(),
+        "token": get_token_manager().stats(),
+        # Accounts with a pool in this process; `endpoints`/`pool`/`token` above are the default account's
+        "accounts": {
+            account_id: {
+                "pool": pool.stats(),
+                "endpoints": get_broker_guard(account_id).stats(),
+                "rate_limits": pool.limiter.stats() if pool.limiter else None,
+                "token": get_token_manager(account_id).stats(),
+            }
+            for account_id, pool in get_adapter_pools().items()
+        },
+        "ingestion": last_runs(),
+    }
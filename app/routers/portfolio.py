@@ -1,8 +1,69 @@
-from fastapi import APIRouter
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import DEFAULT_ACCOUNT, configured_accounts
+from app.db.session import SessionLocal
+from app.schemas.portfolio import SnapshotHistory, SnapshotRow
 from app.services.portfolio_service import fetch_portfolio
+from app.services.portfolio_snapshots import KINDS, utcnow, history, state_at
 
 router = APIRouter(prefix="/portfolio", tags=["Portfolio"])
 
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def account(account_id: str = Query(DEFAULT_ACCOUNT, description="Client account; see GROWW_ACCOUNTS")) -> str:
+    if account_id not in configured_accounts():
+        raise HTTPException(status_code=404, detail=f"Unknown account: {account_id}")
+    return account_id
+
+
+def _kind(kind: Optional[str]) -> Optional[str]:
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+    return kind
+
+
 @router.get("/")
-def get_portfolio():
-    return fetch_portfolio()
+async def get_portfolio(account_id: str = Depends(account)):
+    return await fetch_portfolio(account_id)
+
+
+@router.get("/snapshot", response_model=List[SnapshotRow])
+def get_snapshot(
+    at: Optional[datetime] = Query(None, description="UTC time to reconstruct; defaults to now"),
+    kind: Optional[str] = Query(None, description="'holding' or 'position'; both when omitted"),
+    account_id: str = Depends(account),
+    db: Session = Depends(get_db),
+):
+    """An account's holdings and positions as they stood at `at`, from the intraday change-points."""
+    return state_at(db, at or utcnow(), kind=_kind(kind), account_id=account_id)
+
+
+@router.get("/history/{symbol}", response_model=SnapshotHistory)
+def get_history(
+    symbol: str,
+    kind: str = "holding",
+    start: Optional[datetime] = Query(None, description="UTC; defaults to one day before end"),
+    end: Optional[datetime] = Query(None, description="UTC; defaults to now"),
+    account_id: str = Depends(account),
+    db: Session = Depends(get_db),
+):
+    """A symbol's snapshot series: daily rollups for older days and intraday change-points.
+
+    The first intraday point is the state in effect at `start`; each later point is a change.
+    """
+    end = end or utcnow()
+    start = start or end - timedelta(days=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return {"account_id": account_id, "kind": _kind(kind), "symbol": symbol, **history(db, symbol, kind, start, end, account_id)}
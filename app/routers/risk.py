@@ -0,0 +1,130 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.brokers.groww_pool import get_adapter_pool
+from app.db.session import SessionLocal
+from app.routers.portfolio import account
+from app.schemas.risk import Scenario, ScenarioRequest
+from app.services import stress
+from app.services.monte_carlo import MC_PATHS, MC_SEED, monte_carlo
+from app.services.portfolio_greeks import portfolio_greeks
+from app.services.portfolio_snapshots import utcnow
+from app.services.valuation import valuation
+from app.services.value_at_risk import METHODS, value_at_risk
+
+router = APIRouter(prefix="/risk", tags=["Risk"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/valuation")
+async def get_valuation(
+    account_id: str = Depends(account),
+    at: Optional[datetime] = Query(None, description="UTC time of the book to value; defaults to now. Past books use snapshot prices"),
+    lines: bool = Query(False, description="Include every line, not only totals and breakdowns"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """Market value, unrealized and day P&L, and exposure of the account's holdings and positions,
+    in total and per symbol, underlying and segment."""
+    client = await get_adapter_pool(account_id).acquire_async()
+    return await valuation(db, client, account_id, at or utcnow(), include_lines=lines)
+
+
+@router.get("/var")
+def get_var(
+    account_id: str = Depends(account),
+    confidence: float = Query(0.99, gt=0.5, lt=1.0),
+    horizon_days: int = Query(1, ge=1, le=250, description="Scaled from one-day figures by the square root of time"),
+    method: Optional[List[str]] = Query(None, description=f"Any of {', '.join(METHODS)}; all when omitted"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """Historical, parametric and filtered historical VaR and expected shortfall of the account's
+    current holdings, from the cached return matrix of stored daily candles."""
+    methods = method or list(METHODS)
+    unknown = sorted(set(methods) - set(METHODS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown method: {', '.join(unknown)}")
+    return value_at_risk(db, account_id, confidence, horizon_days, methods)
+
+
+@router.get("/montecarlo")
+def get_monte_carlo(
+    account_id: str = Depends(account),
+    paths: int = Query(MC_PATHS, ge=100, le=1_000_000),
+    horizon_days: int = Query(1, ge=1, le=250),
+    confidence: float = Query(0.99, gt=0.5, lt=1.0),
+    seed: int = Query(MC_SEED, ge=0, description="Same seed and book give the same result"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """Monte Carlo VaR/ES with full Black-Scholes revaluation of holdings and F&O positions
+    under correlated shocks to their underlyings."""
+    return monte_carlo(db, account_id, paths, horizon_days, confidence, seed)
+
+
+@router.get("/greeks")
+async def get_greeks(
+    account_id: str = Depends(account),
+    at: Optional[datetime] = Query(None, description="UTC time of the book; defaults to now"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """Delta, gamma, vega and theta of the account's F&O book and holdings, in total and per
+    underlying and expiry. Broker Greeks where available, local Black-Scholes otherwise."""
+    client = await get_adapter_pool(account_id).acquire_async()
+    return await portfolio_greeks(db, client, account_id, at or utcnow())
+
+
+@router.get("/stress/grid")
+def get_stress_grid(
+    account_id: str = Depends(account),
+    spot_range: float = Query(10.0, gt=0, le=90, description="Largest spot move, in percent"),
+    spot_points: int = Query(9, ge=2, le=101),
+    vol_range: float = Query(10.0, ge=0, le=100, description="Largest vol move, in vol points"),
+    vol_points: int = Query(5, ge=1, le=101),
+    at: Optional[datetime] = Query(None, description="UTC time of the book; defaults to now"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """P&L of the account's book over a spot x vol shock grid, in total and per underlying,
+    from repricing surfaces precomputed per underlying."""
+    if spot_points * vol_points > stress.STRESS_MAX_GRID_POINTS:
+        raise HTTPException(status_code=400, detail=f"Grid larger than {stress.STRESS_MAX_GRID_POINTS} points")
+    return stress.stress_grid(db, account_id, spot_range, spot_points, vol_range, vol_points, at)
+
+
+@router.get("/stress/scenarios", response_model=List[Scenario])
+def list_stress_scenarios(db: Session = Depends(get_db)):
+    return stress.list_scenarios(db)
+
+
+@router.put("/stress/scenarios/{name}", response_model=Scenario)
+def put_stress_scenario(name: str, payload: ScenarioRequest = Body(...), db: Session = Depends(get_db)):
+    """Create or replace a named scenario."""
+    overrides = {underlying: shock.model_dump() for underlying, shock in payload.overrides.items()}
+    return stress.save_scenario(db, name, payload.spot_shock, payload.vol_shock, overrides, payload.description)
+
+
+@router.delete("/stress/scenarios/{name}")
+def delete_stress_scenario(name: str, db: Session = Depends(get_db)) -> Dict[str, Any]:
+    if not stress.delete_scenario(db, name):
+        raise HTTPException(status_code=404, detail=f"Scenario not found: {name}")
+    return {"deleted": name}
+
+
+@router.get("/stress")
+def get_stress_scenarios(
+    account_id: str = Depends(account),
+    name: Optional[List[str]] = Query(None, description="Scenarios to evaluate; all stored scenarios when omitted"),
+    at: Optional[datetime] = Query(None, description="UTC time of the book; defaults to now"),
+    db: Session = Depends(get_db),
+) -> Dict[str, Any]:
+    """P&L of the account's book under each stored scenario. Repricings are cached per scenario,
+    so after a position change only the changed lines are re-summed."""
+    return stress.stress_scenarios(db, account_id, name, at)
@@ -2,14 +2,26 @@ from datetime import datetime, timedelta
 import logging
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.combining import OrTrigger
 from apscheduler.triggers.cron import CronTrigger
 
-from app.services.holdings_job import upsert_today_holdings
+from app.services.account_ingestion import ingest_holdings_daily, ingest_snapshots
+from app.services.candles import refresh_candles
 from app.services.instrument_job import replace_instruments
+from app.services.portfolio_snapshots import SNAPSHOT_INTERVAL_MINUTES, rollup_portfolio_snapshots
 
 _scheduler: AsyncIOScheduler | None = None
 logger = logging.getLogger(__name__)
 
+def market_hours_trigger(interval_minutes: int) -> OrTrigger:
+    """Every `interval_minutes` while NSE trades, 09:15-15:30 IST (03:45-10:00 UTC), on weekdays."""
+    return OrTrigger([
+        CronTrigger(day_of_week="mon-fri", hour=3, minute=f"45-59/{interval_minutes}"),
+        CronTrigger(day_of_week="mon-fri", hour="4-9", minute=f"*/{interval_minutes}"),
+        CronTrigger(day_of_week="mon-fri", hour=10, minute=0),
+    ])
+
+
 def start_scheduler() -> None:
     """Configure and start the shared AsyncIO scheduler."""
     global _scheduler
@@ -18,17 +30,29 @@ def start_scheduler() -> None:
         return
 
     scheduler = AsyncIOScheduler(timezone="UTC")
-    scheduler.add_job(upsert_today_holdings, CronTrigger(hour=2, minute=0), id="holdings-daily", replace_existing=True)
+    scheduler.add_job(ingest_holdings_daily, CronTrigger(hour=2, minute=0), id="holdings-daily", replace_existing=True)
     scheduler.add_job(replace_instruments, CronTrigger(hour=3, minute=0), id="instruments-daily", replace_existing=True)
+    scheduler.add_job(rollup_portfolio_snapshots, CronTrigger(hour=2, minute=30), id="snapshots-rollup", replace_existing=True)
+    # Only while the market is open; unchanged captures write nothing, but still cost broker calls
+    scheduler.add_job(
+        ingest_snapshots,
+        market_hours_trigger(SNAPSHOT_INTERVAL_MINUTES),
+        id="snapshots-intraday",
+        replace_existing=True,
+    )
+    # After the close, so the day's candle is final
+    scheduler.add_job(refresh_candles, CronTrigger(day_of_week="mon-fri", hour=11, minute=0), id="candles-daily", replace_existing=True)
 
     # Run once shortly after startup to ensure fresh data without waiting for the first window
     now = datetime.utcnow()
-    scheduler.add_job(upsert_today_holdings, trigger="date", run_date=now + timedelta(seconds=5), id="holdings-seed", replace_existing=True)
+    scheduler.add_job(ingest_holdings_daily, trigger="date", run_date=now + timedelta(seconds=5), id="holdings-seed", replace_existing=True)
     scheduler.add_job(replace_instruments, trigger="date", run_date=now + timedelta(seconds=10), id="instruments-seed", replace_existing=True)
+    scheduler.add_job(rollup_portfolio_snapshots, trigger="date", run_date=now + timedelta(seconds=15), id="snapshots-seed", replace_existing=True)
+    scheduler.add_job(refresh_candles, trigger="date", run_date=now + timedelta(seconds=20), id="candles-seed", replace_existing=True)
 
     scheduler.start()
     _scheduler = scheduler
-    logger.info("Scheduler started with daily and seed jobs")
+    logger.info("Scheduler started with daily, intraday and seed jobs")
 
 def stop_scheduler() -> None:
     """Stop the shared scheduler if running."""
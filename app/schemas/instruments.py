@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 
 class Instrument(BaseModel):
@@ -25,3 +25,31 @@ class Instrument(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class InstrumentSearchHit(Instrument):
+    match: str
+    score: float
+
+
+class OptionLeg(BaseModel):
+    trading_symbol: str
+    exchange: Optional[str] = None
+    exchange_token: Optional[str] = None
+    groww_symbol: Optional[str] = None
+    lot_size: Optional[int] = None
+    tick_size: Optional[float] = None
+
+
+class OptionChainRow(BaseModel):
+    strike: float
+    CE: Optional[OptionLeg] = None
+    PE: Optional[OptionLeg] = None
+
+
+class OptionChain(BaseModel):
+    underlying: str
+    expiry: date
+    expiries: List[date]
+    atm_strike: Optional[float] = None
+    strikes: List[OptionChainRow]
@@ -1,3 +1,4 @@
+from datetime import date, datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -17,3 +18,34 @@ class Position(BaseModel):
 class PortfolioResponse(BaseModel):
     holdings: List[Holding]
     positions: List[Position]
+
+class SnapshotRow(BaseModel):
+    account_id: str
+    kind: str
+    symbol: str
+    captured_at: datetime
+    quantity: float
+    avg_price: Optional[float] = None
+    ltp: Optional[float] = None
+
+class SnapshotPoint(BaseModel):
+    captured_at: datetime
+    quantity: float
+    avg_price: Optional[float] = None
+    ltp: Optional[float] = None
+
+class SnapshotDay(BaseModel):
+    as_of_date: date
+    quantity: float
+    avg_price: Optional[float] = None
+    ltp: Optional[float] = None
+    ltp_low: Optional[float] = None
+    ltp_high: Optional[float] = None
+    changes: int
+
+class SnapshotHistory(BaseModel):
+    account_id: str
+    kind: str
+    symbol: str
+    daily: List[SnapshotDay]
+    intraday: List[SnapshotPoint]
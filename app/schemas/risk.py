@@ -0,0 +1,20 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class ScenarioShock(BaseModel):
+    spot_shock: Optional[float] = None
+    vol_shock: Optional[float] = None
+
+class ScenarioRequest(BaseModel):
+    description: Optional[str] = None
+    spot_shock: float
+    vol_shock: float = 0.0
+    overrides: Dict[str, ScenarioShock] = {}
+
+class Scenario(ScenarioRequest):
+    name: str
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
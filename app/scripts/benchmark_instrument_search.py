@@ -0,0 +1,96 @@
+"""Benchmark /instruments/search over a synthetic NSE/BSE/FNO-sized instrument master.
+
+Usage (from repo root):
+  python -m app.scripts.benchmark_instrument_search --equities 6000 --underlyings 200
+
+It will:
+- Build a master of equities on NSE and BSE plus futures and CE/PE strikes per underlying
+- Time building the search structures
+- Run prefix, name and misspelled queries (with and without filters) and print p50/p99/max
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+WORDS = [
+    "TATA", "RELIANCE", "INFRA", "MOTORS", "STEEL", "POWER", "BANK", "FINANCE", "CEMENT", "PHARMA",
+    "CHEMICALS", "TEXTILES", "ENERGY", "HOUSING", "CAPITAL", "LABS", "AUTO", "FOODS", "PAPER", "GLASS",
+]
+
+
+def _symbol(rng: random.Random) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(3, 10)))
+
+
+def _master(equities: int, underlyings: int, seed: int):
+    rng = random.Random(seed)
+    rows, symbols = [], set()
+    while len(symbols) < equities:
+        symbols.add(_symbol(rng))
+    for symbol in sorted(symbols):
+        name = " ".join(rng.sample(WORDS, rng.randint(1, 3))) + " LTD"
+        rows.append({"trading_symbol": symbol, "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "name": name})
+        rows.append({"trading_symbol": f"{symbol}-BE", "exchange": "BSE", "segment": "CASH", "instrument_type": "EQ", "name": name})
+
+    expiries = [date(2026, 1, 29) + timedelta(days=28 * i) for i in range(6)]
+    for underlying in sorted(symbols)[:underlyings]:
+        for expiry in expiries:
+            tag = f"{underlying}{expiry:%y%b}".upper()
+            rows.append({"trading_symbol": f"{tag}FUT", "exchange": "NSE", "segment": "FNO", "instrument_type": "FUT",
+                         "name": underlying, "underlying_symbol": underlying, "expiry_date": expiry})
+            for strike in range(1000, 1000 + 50 * 20, 20):
+                for kind in ("CE", "PE"):
+                    rows.append({"trading_symbol": f"{tag}{strike}{kind}", "exchange": "NSE", "segment": "FNO",
+                                 "instrument_type": kind, "name": underlying, "underlying_symbol": underlying,
+                                 "expiry_date": expiry, "strike_price": float(strike)})
+    return rows, sorted(symbols)
+
+
+def _queries(symbols, count: int, seed: int):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        symbol = rng.choice(symbols)
+        kind = rng.random()
+        if kind < 0.5:
+            queries.append((symbol[: rng.randint(1, len(symbol))].lower(), {}))
+        elif kind < 0.7:
+            queries.append((rng.choice(WORDS)[: rng.randint(2, 6)], {}))
+        elif kind < 0.85:
+            i = rng.randrange(len(symbol) - 1)
+            queries.append((symbol[:i] + symbol[i + 1] + symbol[i] + symbol[i + 2:], {}))
+        else:
+            queries.append((symbol[:2], {"segment": "FNO", "instrument_type": rng.choice(["CE", "PE"])}))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--equities", type=int, default=6000)
+    parser.add_argument("--underlyings", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows, symbols = _master(args.equities, args.underlyings, args.seed)
+    index = InstrumentIndex(normalize_instruments(rows))
+    start = time.perf_counter()
+    search = index.search
+    print(f"rows={len(index)} build={time.perf_counter() - start:.2f}s")
+
+    timings = []
+    for query, filters in _queries(symbols, args.queries, args.seed):
+        start = time.perf_counter()
+        search.find(query, limit=20, **filters)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p50, p99 = timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+    print(f"queries={len(timings)} p50={p50:.2f}ms p99={p99:.2f}ms max={timings[-1]:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
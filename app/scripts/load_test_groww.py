@@ -0,0 +1,118 @@
+"""Load-test the sync and async Groww adapters against a local stub broker.
+
+Usage (from repo root):
+  python -m app.scripts.load_test_groww --requests 500 --latency-ms 100
+
+It will:
+- Start a stub broker on localhost that answers /live-data/ltp after a fixed delay
+- Fire N concurrent LTP calls the way the old sync router did (GrowwAdapter in
+  Starlette's worker threadpool) and the way the async router does (AsyncGrowwAdapter)
+- Print wall time, throughput and latency percentiles for both paths
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.brokers.groww_adapter import GrowwAdapter
+from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+from app.brokers.groww_pool import POOL_SIZE, _build_async_client, _build_session
+
+
+def _stub_broker(latency: float) -> Starlette:
+    async def ltp(request):
+        await asyncio.sleep(latency)
+        symbols = request.query_params.getlist("exchange_symbols")
+        return JSONResponse({"status": "SUCCESS", "payload": {s: 100.0 for s in symbols}})
+
+    async def changelog(request):
+        return JSONResponse({})
+
+    return Starlette(routes=[Route("/v1/live-data/ltp", ltp), Route("/v1/changelog", changelog)])
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_stub(port: int, latency: float) -> None:
+    uvicorn.run(_stub_broker(latency), host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def _start_stub(latency: float) -> tuple:
+    # Separate process so the stub does not compete with the client for the GIL
+    port = _free_port()
+    process = multiprocessing.Process(target=_serve_stub, args=(port, latency), daemon=True)
+    process.start()
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1", process
+
+
+async def _timed(call) -> float:
+    start = time.perf_counter()
+    await call()
+    return time.perf_counter() - start
+
+
+def _report(name: str, wall: float, latencies: list) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<6} requests={len(latencies)} wall={wall:.2f}s rps={len(latencies) / wall:.0f} p50={p50 * 1000:.0f}ms p99={p99 * 1000:.0f}ms")
+
+
+async def _run(domain: str, n: int) -> None:
+    symbols = ("NSE_RELIANCE",)
+
+    sync_adapter = GrowwAdapter("stub-token", session=_build_session(POOL_SIZE), domain=domain)
+
+    async def sync_call():
+        # What a sync `def` route does: occupy one of the threadpool's worker slots
+        await run_in_threadpool(sync_adapter.get_ltp, exchange_trading_symbols=symbols, segment="CASH")
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_timed(sync_call) for _ in range(n)))
+    _report("sync", time.perf_counter() - start, latencies)
+
+    http = _build_async_client(POOL_SIZE)
+    async_adapter = AsyncGrowwAdapter("stub-token", http, domain=domain)
+
+    async def async_call():
+        await async_adapter.get_ltp(exchange_trading_symbols=symbols, segment="CASH")
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(_timed(async_call) for _ in range(n)))
+    _report("async", time.perf_counter() - start, latencies)
+    await http.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    domain, process = _start_stub(args.latency_ms / 1000)
+    try:
+        asyncio.run(_run(domain, args.requests))
+    finally:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    main()
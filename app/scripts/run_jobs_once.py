@@ -4,7 +4,7 @@ Usage (from repo root):
   docker compose exec api python -m app.scripts.run_jobs_once
 
 It will:
-- Refresh instruments (truncate + insert latest)
+- Refresh instruments (apply inserts/updates/deletes against the latest master)
 - Upsert today's holdings snapshot
 - Print counts and a few sample records
 """
@@ -30,7 +30,7 @@ def _sample_rows(session: Session, model, limit: int = 5):
 
 def main():
     # Run instrument refresh
-    inserted_instruments = replace_instruments()
+    instrument_changes = replace_instruments()
 
     # Run holdings upsert for today
     inserted_holdings = upsert_today_holdings()
@@ -51,7 +51,7 @@ def main():
     finally:
         session.close()
 
-    print("Instruments inserted:", inserted_instruments)
+    print("Instrument changes:", instrument_changes)
     print("Holdings upserted today:", inserted_holdings)
     print("Total instruments in DB:", instruments_count)
     print("Total holdings rows:", holdings_count)
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.brokers.accounts import configured_accounts
+from app.services.holdings_job import HoldingsBusyError, upsert_today_holdings
+from app.services.portfolio_snapshots import capture_snapshot
+
+# Accounts ingested at once. Each has its own token, session and rate budget, so this bounds
+# DB connections and total broker fan-out rather than any one account's throughput.
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+# Budget for one account in one run; a slower account is reported as timed out and frees its slot.
+INGEST_ACCOUNT_TIMEOUT_SECONDS = float(os.getenv("INGEST_ACCOUNT_TIMEOUT_SECONDS", "120"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AccountRun:
+    """Outcome of one job for one account."""
+
+    job: str
+    account_id: str
+    # "ok", "failed", "timeout" or "skipped" (the previous run is still going)
+    status: str
+    started_at: datetime
+    seconds: float
+    result: Any = None
+    error: Optional[str] = None
+
+
+_last_runs: Dict[Tuple[str, str], AccountRun] = {}
+
+
+def last_runs() -> List[Dict[str, Any]]:
+    """Latest run of each (job, account), for the metrics endpoint."""
+    return [asdict(run) for _, run in sorted(_last_runs.items())]
+
+
+async def run_for_accounts(
+    job: str,
+    work: Callable[[str], Awaitable[Any]],
+    accounts: Optional[List[str]] = None,
+    concurrency: int = INGEST_CONCURRENCY,
+    timeout: float = INGEST_ACCOUNT_TIMEOUT_SECONDS,
+) -> Dict[str, AccountRun]:
+    """Run `work(account_id)` for every account, at most `concurrency` at a time.
+
+    Each account succeeds, fails or times out on its own: an error or a slow broker for one
+    account is recorded against it and never holds back or aborts the others.
+    """
+    accounts = configured_accounts() if accounts is None else accounts
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(account_id: str) -> AccountRun:
+        async with slots:
+            started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            started = time.perf_counter()
+            status, result, error = "ok", None, None
+            try:
+                result = await asyncio.wait_for(work(account_id), timeout)
+            except asyncio.TimeoutError:
+                status, error = "timeout", f"timed out after {timeout}s"
+            except HoldingsBusyError as exc:
+                status, error = "skipped", str(exc)
+            except Exception as exc:
+                status, error = "failed", str(exc) or type(exc).__name__
+            run = AccountRun(job, account_id, status, started_at, time.perf_counter() - started, result, error)
+        if error:
+            logger.warning("%s for %s %s in %.1fs: %s", job, account_id, status, run.seconds, error)
+        _last_runs[(job, account_id)] = run
+        return run
+
+    runs = await asyncio.gather(*(run_one(account_id) for account_id in accounts))
+    ok = sum(run.status == "ok" for run in runs)
+    logger.info("%s: %d/%d accounts ok", job, ok, len(runs))
+    return {run.account_id: run for run in runs}
+
+
+async def ingest_holdings_daily(accounts: Optional[List[str]] = None) -> Dict[str, AccountRun]:
+    """Daily holdings upsert for every account. The sync job runs in a worker thread; on timeout
+    the thread is left to finish in the background while the slot goes to the next account, and
+    the account is skipped by later runs until it has."""
+    return await run_for_accounts("holdings-daily", lambda a: asyncio.to_thread(upsert_today_holdings, a), accounts)
+
+
+async def ingest_snapshots(accounts: Optional[List[str]] = None) -> Dict[str, AccountRun]:
+    """Intraday holdings and positions capture for every account."""
+    return await run_for_accounts("snapshots", capture_snapshot, accounts)
@@ -0,0 +1,103 @@
+import os
+from typing import Dict
+
+import numpy as np
+
+# Continuously compounded rate used to price options.
+RISK_FREE_RATE = float(os.getenv("RISK_FREE_RATE", "0.065"))
+# Trading days per year, for annualizing daily volatility and horizons.
+TRADING_DAYS = 252
+# Calendar days per year, for time to expiry.
+CALENDAR_DAYS = 365.0
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF, vectorized (erfc approximation, relative error below 1.2e-7)."""
+    z = np.abs(np.asarray(x, dtype=np.float64)) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.5 * z)
+    poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277))))))))
+    erfc = t * np.exp(poly)
+    return np.where(np.asarray(x) >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * np.square(x)) / np.sqrt(2.0 * np.pi)
+
+
+def d1_d2(spot, strike, years, vol, rate):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root = vol * np.sqrt(years)
+        d1 = (np.log(spot / strike) + (rate + 0.5 * np.square(vol)) * years) / root
+    return d1, d1 - root
+
+
+def price(spot, strike, years, vol, rate, is_call) -> np.ndarray:
+    """Black-Scholes value of European options; all arguments broadcast against each other.
+
+    Expired contracts (years <= 0) and zero-vol inputs are worth their discounted intrinsic value.
+    """
+    spot, strike, years, vol = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (spot, strike, years, vol)))
+    years = np.maximum(years, 0.0)
+    discount = np.exp(-rate * years)
+    d1, d2 = d1_d2(spot, strike, years, vol, rate)
+    call = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+    put = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    live = (years > 0) & (vol > 0) & (spot > 0) & (strike > 0)
+    forward_intrinsic = np.where(is_call, spot - strike * discount, strike * discount - spot)
+    return np.where(live, np.where(is_call, call, put), np.maximum(forward_intrinsic, 0.0))
+
+
+def greeks(spot, strike, years, vol, rate, is_call) -> Dict[str, np.ndarray]:
+    """Per-unit delta, gamma, vega (per vol point) and theta (per calendar day), matching the
+    broker's conventions. Expired or zero-vol contracts have intrinsic delta and no other Greeks."""
+    spot, strike, years, vol = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (spot, strike, years, vol)))
+    live = (years > 0) & (vol > 0) & (spot > 0) & (strike > 0)
+    years = np.where(live, years, 1.0)
+    vol = np.where(live, vol, 1.0)
+    d1, d2 = d1_d2(spot, strike, years, vol, rate)
+    root = np.sqrt(years)
+    density = norm_pdf(d1)
+    carry = rate * strike * np.exp(-rate * years)
+    call_theta = -spot * density * vol / (2 * root) - carry * norm_cdf(d2)
+    put_theta = -spot * density * vol / (2 * root) + carry * norm_cdf(-d2)
+    in_the_money = np.where(is_call, spot > strike, spot < strike)
+    intrinsic_delta = np.where(in_the_money, np.where(is_call, 1.0, -1.0), 0.0)
+    return {
+        "delta": np.where(live, np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0), intrinsic_delta),
+        "gamma": np.where(live, density / (spot * vol * root), 0.0),
+        "vega": np.where(live, spot * density * root / 100.0, 0.0),
+        "theta": np.where(live, np.where(is_call, call_theta, put_theta) / CALENDAR_DAYS, 0.0),
+    }
+
+
+def implied_vol(
+    value, spot, strike, years, rate, is_call, low: float = 1e-4, high: float = 5.0, iterations: int = 100
+) -> np.ndarray:
+    """Implied volatility of each option price, solved for all contracts at once.
+
+    Newton steps are kept inside a bisection bracket that narrows every iteration, so a step
+    that overshoots (deep in or out of the money, tiny vega) falls back to the midpoint. NaN
+    where the price is outside the no-arbitrage bounds or the solve does not converge.
+    """
+    value, spot, strike, years = np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (value, spot, strike, years)))
+    is_call = np.broadcast_to(is_call, value.shape)
+    lo, hi = np.full(value.shape, low), np.full(value.shape, high)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Brenner-Subrahmanyam starting point
+        vol = np.clip(np.sqrt(2 * np.pi / years) * value / spot, low, high)
+    vol = np.where(np.isfinite(vol), vol, 0.2)
+    for _ in range(iterations):
+        diff = price(spot, strike, years, vol, rate, is_call) - value
+        hi = np.where(diff > 0, vol, hi)
+        lo = np.where(diff <= 0, vol, lo)
+        d1, _ = d1_d2(spot, strike, years, vol, rate)
+        vega = spot * norm_pdf(d1) * np.sqrt(years)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = vol - diff / vega
+        vol = np.where((vega > 1e-12) & (step > lo) & (step < hi), step, 0.5 * (lo + hi))
+        if np.all(np.abs(diff) < 1e-10 * np.maximum(value, 1.0)):
+            break
+    error = np.abs(price(spot, strike, years, vol, rate, is_call) - value)
+    converged = (error <= 1e-6 * np.maximum(value, 1.0)) & (years > 0) & (value > 0)
+    return np.where(converged, vol, np.nan)
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import configured_accounts
+from app.brokers.groww_pool import get_adapter_pool
+from app.brokers.rate_limit import PRIORITY_BULK, request_priority
+from app.db.models import CandleDaily, HoldingDaily
+from app.db.session import SessionLocal
+from app.db.upsert import upsert_rows
+from app.services.dataset_version import CANDLES, bump
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.portfolio_snapshots import state_at, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Calendar days of history fetched for a symbol seen for the first time.
+CANDLE_HISTORY_DAYS = int(os.getenv("CANDLE_HISTORY_DAYS", "400"))
+# Broker candle_interval for daily candles.
+CANDLE_INTERVAL = os.getenv("CANDLE_INTERVAL", "1day")
+# Symbols fetched at once; the historical endpoint class is rate limited on its own.
+CANDLE_FETCH_CONCURRENCY = int(os.getenv("CANDLE_FETCH_CONCURRENCY", "8"))
+# Rows per multi-VALUES upsert statement.
+CANDLE_UPSERT_BATCH_ROWS = 1000
+
+# Groww candles are [timestamp, open, high, low, close, volume, ...]
+_FIELDS = ("open", "high", "low", "close", "volume")
+# Epoch timestamps are in IST trading days
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def _trade_date(stamp: Any) -> Optional[date]:
+    if isinstance(stamp, (int, float)):
+        # Seconds, or milliseconds from newer endpoints
+        seconds = stamp / 1000 if stamp > 1e11 else stamp
+        return datetime.fromtimestamp(seconds, _IST).date()
+    if isinstance(stamp, str) and len(stamp) >= 10:
+        try:
+            return date.fromisoformat(stamp[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def parse_candles(payload: Any) -> List[Dict[str, Any]]:
+    """Daily candles from a historical candles payload, one row per trade date (the last wins)."""
+    candles = payload.get("candles", []) if isinstance(payload, dict) else payload
+    rows: Dict[date, Dict[str, Any]] = {}
+    for candle in candles if isinstance(candles, list) else []:
+        if isinstance(candle, dict):
+            stamp, values = candle.get("timestamp"), [candle.get(name) for name in _FIELDS]
+        elif isinstance(candle, (list, tuple)) and len(candle) >= 5:
+            stamp, values = candle[0], list(candle[1:6]) + [None] * (6 - len(candle))
+        else:
+            continue
+        trade_date = _trade_date(stamp)
+        if trade_date is None or values[3] is None:
+            continue
+        rows[trade_date] = {"trade_date": trade_date, **{name: value for name, value in zip(_FIELDS, values)}}
+    return [rows[day] for day in sorted(rows)]
+
+
+def candle_universe(session: Session, index: Optional[InstrumentIndex] = None) -> List[str]:
+    """Symbols the risk models need: every account's latest holdings plus the underlyings of
+    its open positions."""
+    latest = (
+        select(HoldingDaily.account_id, func.max(HoldingDaily.as_of_date).label("as_of_date"))
+        .group_by(HoldingDaily.account_id)
+        .subquery()
+    )
+    symbols = set(session.scalars(
+        select(HoldingDaily.symbol)
+        .join(latest, and_(HoldingDaily.account_id == latest.c.account_id, HoldingDaily.as_of_date == latest.c.as_of_date))
+        .where(HoldingDaily.quantity != 0)
+        .distinct()
+    ))
+    now = utcnow()
+    for account_id in configured_accounts():
+        for row in state_at(session, now, kind="position", account_id=account_id):
+            instrument = index.get(row["symbol"]) if index is not None else None
+            symbols.add((instrument or {}).get("underlying_symbol") or row["symbol"])
+    return sorted(symbols)
+
+
+def market_of(index: Optional[InstrumentIndex], symbol: str) -> Tuple[str, str, str]:
+    """(exchange, segment, groww_symbol) for a historical candles request."""
+    instrument = (index.get(symbol) if index is not None else None) or {}
+    exchange = instrument.get("exchange") or "NSE"
+    return exchange, instrument.get("segment") or "CASH", instrument.get("groww_symbol") or f"{exchange}-{symbol}"
+
+
+def last_trade_dates(session: Session, symbols: Iterable[str]) -> Dict[str, date]:
+    return dict(session.execute(
+        select(CandleDaily.symbol, func.max(CandleDaily.trade_date))
+        .where(CandleDaily.symbol.in_(list(symbols)))
+        .group_by(CandleDaily.symbol)
+    ).all())
+
+
+def upsert_candles(session: Session, rows: List[Dict[str, Any]]) -> int:
+    """Write candle rows (unique by symbol and trade_date) inside the caller's transaction; a
+    re-fetched candle replaces the stored one only if it changed. Returns rows inserted or changed."""
+    return upsert_rows(session, CandleDaily, rows, update=_FIELDS, changed=("close", "volume"), batch_rows=CANDLE_UPSERT_BATCH_ROWS)
+
+
+async def fetch_candles(client: Any, symbol: str, market: Tuple[str, str, str], start: date, end: date) -> List[Dict[str, Any]]:
+    exchange, segment, groww_symbol = market
+    payload = await client.get_historical_candles(
+        exchange=exchange,
+        segment=segment,
+        groww_symbol=groww_symbol,
+        start_time=f"{start.isoformat()} 00:00:00",
+        end_time=f"{end.isoformat()} 23:59:59",
+        candle_interval=CANDLE_INTERVAL,
+    )
+    return [dict(row, symbol=symbol) for row in parse_candles(payload)]
+
+
+async def refresh_candles(symbols: Optional[List[str]] = None) -> Dict[str, int]:
+    """Daily job: fetch candles from each symbol's last stored day (re-fetched, in case it was
+    partial) to today, and bump the candles version if anything changed."""
+    index = get_instrument_index()
+    session: Session = SessionLocal()
+    try:
+        symbols = candle_universe(session, index) if symbols is None else symbols
+        last = last_trade_dates(session, symbols)
+    finally:
+        session.close()
+
+    today = utcnow().date()
+    first = today - timedelta(days=CANDLE_HISTORY_DAYS)
+    client = await get_adapter_pool().acquire_async()
+    slots = asyncio.Semaphore(max(1, CANDLE_FETCH_CONCURRENCY))
+
+    async def one(symbol: str) -> List[Dict[str, Any]]:
+        async with slots:
+            return await fetch_candles(client, symbol, market_of(index, symbol), last.get(symbol, first), today)
+
+    # Scheduled refreshes yield to interactive and order traffic under the rate limit
+    with request_priority(PRIORITY_BULK):
+        fetched = await asyncio.gather(*(one(symbol) for symbol in symbols), return_exceptions=True)
+    rows, failed = [], 0
+    for symbol, outcome in zip(symbols, fetched):
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, Exception):
+            failed += 1
+            logger.warning("Candles for %s failed: %s", symbol, outcome)
+        else:
+            rows.extend(outcome)
+
+    session = SessionLocal()
+    try:
+        written = upsert_candles(session, rows)
+        if written:
+            bump(session, CANDLES)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    logger.info("Candles refreshed for %d symbols (%d failed): %d rows written", len(symbols), failed, written)
+    return {"symbols": len(symbols), "failed": failed, "written": written}
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Default per-call budget for a fan-out leg; a slow leg is dropped rather than holding up the rest.
+DEFAULT_CALL_TIMEOUT_SECONDS = float(os.getenv("COMPOSITE_CALL_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompositeResult:
+    """Outcome of a fan-out: successful results and per-call error messages, keyed by call name."""
+
+    names: List[str] = field(default_factory=list)
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return not self.errors
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Flatten into a response body: one key per call (None if it failed) plus `errors` when partial."""
+        payload: Dict[str, Any] = {name: self.results.get(name) for name in self.names}
+        if self.errors:
+            payload["errors"] = self.errors
+        return payload
+
+
+async def fetch_concurrently(
+    calls: Dict[str, Callable[[], Awaitable[Any]]],
+    timeout: float = DEFAULT_CALL_TIMEOUT_SECONDS,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> CompositeResult:
+    """Run independent broker calls concurrently and collect whatever succeeds.
+
+    Each call gets its own timeout (`timeouts[name]`, else `timeout`). A call that fails or
+    times out is reported in `errors` without affecting the others, so total latency is
+    that of the slowest call that finishes within its budget.
+    """
+    timeouts = timeouts or {}
+    names = list(calls)
+    outcomes = await asyncio.gather(
+        *(asyncio.wait_for(calls[name](), timeouts.get(name, timeout)) for name in names),
+        return_exceptions=True,
+    )
+
+    result = CompositeResult(names=names)
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, asyncio.TimeoutError):
+            result.errors[name] = f"timed out after {timeouts.get(name, timeout)}s"
+        elif isinstance(outcome, Exception):
+            result.errors[name] = str(outcome) or type(outcome).__name__
+        else:
+            result.results[name] = outcome
+    if result.errors:
+        logger.warning("Composite fetch partially failed: %s", result.errors)
+    return result
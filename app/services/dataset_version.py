@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db.models import DatasetVersion
+
+INSTRUMENTS = "instruments"
+CANDLES = "candles_daily"
+
+
+def _stamp(version: int, updated_at: datetime) -> str:
+    # The timestamp keeps stamps unique even if the table is recreated and counting restarts
+    return f"{version}.{int(updated_at.replace(tzinfo=timezone.utc).timestamp())}"
+
+
+def get_stamp(session: Session, name: str) -> str:
+    """Current version stamp of a dataset; "0" if it was never bumped."""
+    row = session.execute(
+        select(DatasetVersion.version, DatasetVersion.updated_at).where(DatasetVersion.name == name)
+    ).first()
+    return "0" if row is None else _stamp(*row)
+
+
+def bump(session: Session, name: str) -> str:
+    """Advance a dataset's version inside the caller's transaction and return the new stamp."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    updated = session.execute(
+        update(DatasetVersion)
+        .where(DatasetVersion.name == name)
+        .values(version=DatasetVersion.version + 1, updated_at=now)
+    ).rowcount
+    if not updated:
+        session.execute(insert(DatasetVersion).values(name=name, version=1, updated_at=now))
+    return get_stamp(session, name)
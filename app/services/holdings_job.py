@@ -1,12 +1,29 @@
+import logging
+import threading
 from datetime import date
 from typing import Any, Dict, List, Optional
 
 from sqlalchemy.orm import Session
 
-from app.brokers.groww_adapter import GrowwAdapter
-from app.brokers.groww_auth import get_access_token
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.brokers.groww_pool import get_adapter_pool
+from app.brokers.rate_limit import PRIORITY_BULK, request_priority
 from app.db.models import HoldingDaily
 from app.db.session import SessionLocal
+from app.db.upsert import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+# Rows per multi-VALUES upsert statement; a single account's snapshot fits in one.
+UPSERT_BATCH_ROWS = 1000
+
+# Held while an account's snapshot is fetched and written, including by a run its caller gave up on
+_running: Dict[str, threading.Lock] = {}
+_running_lock = threading.Lock()
+
+
+class HoldingsBusyError(RuntimeError):
+    """Another holdings snapshot of the same account is still running."""
 
 
 def _normalize_symbol(entry: Dict[str, Any]) -> Optional[str]:
@@ -27,10 +44,11 @@ def _normalize_holding(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     return {"symbol": symbol, "quantity": quantity or 0.0, "avg_price": avg_price}
 
 
-def fetch_holdings() -> List[Dict[str, Any]]:
-    token = get_access_token()
-    client = GrowwAdapter(token)
-    data = client.get_holdings()
+def fetch_holdings(account_id: str = DEFAULT_ACCOUNT) -> List[Dict[str, Any]]:
+    client = get_adapter_pool(account_id).acquire()
+    # Scheduled refreshes yield to interactive and order traffic under the rate limit
+    with request_priority(PRIORITY_BULK):
+        data = client.get_holdings()
     if isinstance(data, dict) and "holdings" in data:
         data = data.get("holdings", [])
     if not isinstance(data, list):
@@ -45,37 +63,78 @@ def fetch_holdings() -> List[Dict[str, Any]]:
     return normalized
 
 
-def upsert_today_holdings() -> int:
+def aggregate_holdings(holdings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One row per symbol: quantities summed, avg_price weighted by quantity.
+
+    The broker can report a symbol more than once (e.g. separate demat and pledged lots), and
+    a single upsert statement may touch each (symbol, as_of_date) only once.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for h in holdings:
+        quantity = float(h.get("quantity") or 0.0)
+        avg_price = h.get("avg_price")
+        row = merged.get(h["symbol"])
+        if row is None:
+            row = merged[h["symbol"]] = {"quantity": 0.0, "cost": 0.0, "priced": 0.0, "price": None}
+        row["quantity"] += quantity
+        if avg_price is not None:
+            row["cost"] += quantity * float(avg_price)
+            row["priced"] += quantity
+            row["price"] = float(avg_price)
+
+    return [
+        {
+            "symbol": symbol,
+            "quantity": row["quantity"],
+            # Lots without a price don't dilute the average; with no priced quantity, keep the last price
+            "avg_price": row["cost"] / row["priced"] if row["priced"] else row["price"],
+        }
+        for symbol, row in merged.items()
+    ]
+
+
+def upsert_holdings(
+    session: Session, rows: List[Dict[str, Any]], as_of_date: date, account_id: str = DEFAULT_ACCOUNT
+) -> int:
+    """Write an account's `rows` (unique by symbol) for `as_of_date` with INSERT ... ON CONFLICT DO UPDATE,
+    one statement per UPSERT_BATCH_ROWS (row by row on other dialects), inside the caller's transaction. Rows whose values
+    are unchanged are left alone. Returns the number of rows inserted or changed."""
+    batch = [dict(row, account_id=account_id, as_of_date=as_of_date) for row in rows]
+    return upsert_rows(session, HoldingDaily, batch, update=("quantity", "avg_price"), batch_rows=UPSERT_BATCH_ROWS)
+
+
+def upsert_today_holdings(account_id: str = DEFAULT_ACCOUNT) -> int:
+    """Snapshot an account's broker holdings for today. Returns the number of holdings the broker
+    reported, as it always has; the symbols and rows actually written are logged.
+
+    Raises HoldingsBusyError instead of running alongside an earlier snapshot of the account,
+    e.g. one still running in a worker thread after its caller timed out.
+    """
+    with _running_lock:
+        lock = _running.setdefault(account_id, threading.Lock())
+    if not lock.acquire(blocking=False):
+        raise HoldingsBusyError(f"holdings snapshot for {account_id} still running")
+    try:
+        return _upsert_today_holdings(account_id)
+    finally:
+        lock.release()
+
+
+def _upsert_today_holdings(account_id: str) -> int:
     today = date.today()
-    holdings = fetch_holdings()
+    holdings = fetch_holdings(account_id)
     if not holdings:
         return 0
 
+    rows = aggregate_holdings(holdings)
     session: Session = SessionLocal()
-    inserted_or_updated = 0
     try:
-        for h in holdings:
-            symbol = h["symbol"]
-            quantity = h.get("quantity", 0.0) or 0.0
-            avg_price = h.get("avg_price")
-            existing = session.get(HoldingDaily, {"symbol": symbol, "as_of_date": today})
-            if existing:
-                existing.quantity = quantity
-                existing.avg_price = avg_price
-            else:
-                session.add(
-                    HoldingDaily(
-                        symbol=symbol,
-                        as_of_date=today,
-                        quantity=quantity,
-                        avg_price=avg_price,
-                    )
-                )
-            inserted_or_updated += 1
+        written = upsert_holdings(session, rows, today, account_id)
         session.commit()
+        logger.info("Holdings snapshot %s for %s: %d symbols, %d written", today, account_id, len(rows), written)
     except Exception:
         session.rollback()
         raise
     finally:
         session.close()
-    return inserted_or_updated
+    return len(holdings)
@@ -0,0 +1,53 @@
+import hashlib
+import os
+from typing import Dict
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Session
+
+from app.services.dataset_version import INSTRUMENTS, get_stamp
+from app.services.instrument_index import get_instrument_index
+
+# How long clients and the nginx proxy may reuse an instrument response before revalidating.
+INSTRUMENTS_MAX_AGE = int(os.getenv("INSTRUMENTS_CACHE_MAX_AGE", "300"))
+
+
+def instruments_stamp(db: Session) -> str:
+    """Version stamp of responses served from the in-memory index: the loaded index's, else
+    the table's (routes only read the table while no index is loaded)."""
+    index = get_instrument_index()
+    return index.version if index is not None else get_stamp(db, INSTRUMENTS)
+
+
+def table_stamp(db: Session) -> str:
+    """Version stamp of responses read from the instruments table. Another worker may have
+    refreshed the table since this process loaded its index, so never the index's version."""
+    return get_stamp(db, INSTRUMENTS)
+
+
+def etag(request: Request, stamp: str) -> str:
+    """Strong ETag over the dataset stamp, the path and the (order-insensitive) query."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{stamp}|{request.url.path}|{query}".encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def _matches(if_none_match: str, tag: str) -> bool:
+    # Weak comparison (RFC 9110): a proxy that compresses the body marks the tag W/
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return "*" in candidates or tag in candidates
+
+
+def conditional(request: Request, response: Response, stamp: str, max_age: int) -> Dict[str, str]:
+    """Tag the response, or end the request with 304 Not Modified when the client's copy is current.
+
+    Returns the cache headers for endpoints that build their own Response (they are set on
+    `response` for everything else).
+    """
+    tag = etag(request, stamp)
+    headers = {"ETag": tag, "Cache-Control": f"public, max-age={max_age}, must-revalidate"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, tag):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return headers
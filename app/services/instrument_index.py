@@ -0,0 +1,224 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.models import Instrument
+from app.db.session import SessionLocal
+from app.services.dataset_version import INSTRUMENTS, get_stamp
+from app.services.instrument_loader import INSTRUMENT_COLUMNS
+from app.services.instrument_search import InstrumentSearch
+from app.services.option_chain import OptionChains
+
+# Columns served from the index, grouped by how they are stored.
+FLOAT_COLUMNS = ("strike_price", "tick_size")
+INT_COLUMNS = ("lot_size", "freeze_quantity", "is_reserved", "buy_allowed", "sell_allowed")
+DATE_COLUMNS = ("expiry_date",)
+# Secondary keys with a hash index; several rows may share one (e.g. an ISIN listed on NSE and BSE).
+LOOKUP_COLUMNS = ("exchange_token", "groww_symbol", "isin")
+
+logger = logging.getLogger(__name__)
+
+
+def _as_python(column: str, values: np.ndarray) -> List[Any]:
+    if column in DATE_COLUMNS:
+        # datetime64[D] converts to datetime.date, and NaT to None
+        return values.astype(object).tolist()
+    if column in FLOAT_COLUMNS:
+        return [None if v != v else v for v in values.tolist()]
+    if column in INT_COLUMNS:
+        return [None if v != v else int(v) for v in values.tolist()]
+    return values.tolist()
+
+
+class InstrumentIndex:
+    """Immutable, array-backed snapshot of the instruments table.
+
+    Each column is one NumPy array (object for text, float64 with NaN for numbers, datetime64[D]
+    for dates) and rows are addressed by position. Lookups go through plain dicts: a unique index
+    on trading_symbol, multi-valued indexes on LOOKUP_COLUMNS and a grouped index of positions
+    per underlying_symbol, ordered by expiry then strike. A refresh builds a new index and swaps
+    the module-level reference, so readers never see a half-built one.
+    """
+
+    def __init__(self, frame: pd.DataFrame, version: str = "0"):
+        # Version stamp of the table contents this index was built from (see dataset_version)
+        self.version = version
+        frame = frame.reindex(columns=list(INSTRUMENT_COLUMNS)).reset_index(drop=True)
+        self.columns: Dict[str, np.ndarray] = {}
+        for name in INSTRUMENT_COLUMNS:
+            column = frame[name]
+            if name in DATE_COLUMNS:
+                self.columns[name] = pd.to_datetime(column).to_numpy(dtype="datetime64[D]")
+            elif name in FLOAT_COLUMNS or name in INT_COLUMNS:
+                self.columns[name] = pd.to_numeric(column).to_numpy(dtype="float64", na_value=np.nan)
+            else:
+                self.columns[name] = column.astype(object).where(column.notna(), None).to_numpy(dtype=object)
+
+        symbols = self.columns["trading_symbol"]
+        self._by_symbol: Dict[str, int] = {symbol: i for i, symbol in enumerate(symbols)}
+        # trading_symbol order for keyset pages: positions by symbol, and each position's rank
+        self._symbol_order = np.argsort(symbols.astype(str), kind="stable")
+        self._sorted_symbols = symbols[self._symbol_order].astype(str)
+        self._symbol_rank = np.empty_like(self._symbol_order)
+        self._symbol_rank[self._symbol_order] = np.arange(len(symbols))
+        self._lookups: Dict[str, Dict[str, np.ndarray]] = {name: self._group(name) for name in LOOKUP_COLUMNS}
+
+        order = np.lexsort((self.columns["strike_price"], self.columns["expiry_date"]))
+        self._by_underlying = self._group("underlying_symbol", order)
+        self._chains: Optional[OptionChains] = None
+        self._search: Optional[InstrumentSearch] = None
+        self.built_at = time.time()
+
+    def _group(self, column: str, order: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        values = self.columns[column]
+        positions = np.arange(len(values)) if order is None else order
+        keyed = values[positions]
+        present = np.array([v is not None for v in keyed], dtype=bool)
+        positions, keyed = positions[present], keyed[present]
+        if not len(positions):
+            return {}
+        # Stable sort by key keeps the requested order inside each group
+        by_key = np.argsort(keyed.astype(str), kind="stable")
+        positions, keyed = positions[by_key], keyed[by_key]
+        starts = np.flatnonzero(np.r_[True, keyed[1:] != keyed[:-1]])
+        return {keyed[s]: group for s, group in zip(starts, np.split(positions, starts[1:]))}
+
+    @classmethod
+    def from_session(cls, session: Session, underlying_symbol: Optional[str] = None) -> "InstrumentIndex":
+        """Load the whole table, or only one underlying's contracts when `underlying_symbol` is set."""
+        query = select(*(getattr(Instrument, name) for name in INSTRUMENT_COLUMNS))
+        if underlying_symbol is not None:
+            query = query.where(Instrument.underlying_symbol == underlying_symbol)
+        version = get_stamp(session, INSTRUMENTS)
+        rows = session.execute(query).all()
+        return cls(pd.DataFrame.from_records(rows, columns=list(INSTRUMENT_COLUMNS)), version)
+
+    def __len__(self) -> int:
+        return len(self.columns["trading_symbol"])
+
+    @property
+    def chains(self) -> OptionChains:
+        if self._chains is None:
+            self._chains = OptionChains.build(self)
+        return self._chains
+
+    @property
+    def search(self) -> InstrumentSearch:
+        if self._search is None:
+            self._search = InstrumentSearch(self)
+        return self._search
+
+    def underlying_groups(self) -> Dict[str, np.ndarray]:
+        """Row positions per underlying_symbol, ordered by expiry then strike."""
+        return self._by_underlying
+
+    def rows(self, positions: Union[np.ndarray, slice]) -> List[Dict[str, Any]]:
+        """Materialize rows as plain dicts, one column slice at a time."""
+        names = list(self.columns)
+        values = [_as_python(name, self.columns[name][positions]) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def get(self, trading_symbol: str) -> Optional[Dict[str, Any]]:
+        position = self._by_symbol.get(trading_symbol)
+        return None if position is None else self.rows(slice(position, position + 1))[0]
+
+    def positions_of(self, trading_symbols: np.ndarray) -> np.ndarray:
+        """Row position of each symbol, -1 where it is not listed; one binary search for the batch."""
+        keys = np.asarray(trading_symbols, dtype=object).astype(str)
+        if not len(self._sorted_symbols):
+            return np.full(len(keys), -1, dtype=np.intp)
+        slots = np.minimum(np.searchsorted(self._sorted_symbols, keys), len(self._sorted_symbols) - 1)
+        return np.where(self._sorted_symbols[slots] == keys, self._symbol_order[slots], -1)
+
+    def lookup(self, column: str, value: str) -> List[Dict[str, Any]]:
+        """Rows whose `column` (one of LOOKUP_COLUMNS) equals `value`."""
+        return self.rows(self._lookups[column].get(value, np.empty(0, dtype=int)))
+
+    def by_underlying(
+        self,
+        underlying_symbol: str,
+        instrument_type: Optional[str] = None,
+        segment: Optional[str] = None,
+        exchange: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        positions = self._by_underlying.get(underlying_symbol)
+        if positions is None:
+            return []
+        positions = self._filter(positions, instrument_type=instrument_type, segment=segment, exchange=exchange)
+        return self.rows(positions[:limit])
+
+    def filter(
+        self,
+        exchange: Optional[str] = None,
+        instrument_type: Optional[str] = None,
+        segment: Optional[str] = None,
+        underlying_symbol: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Matching rows in trading_symbol order, starting after the `after` cursor."""
+        start = 0 if after is None else int(np.searchsorted(self._sorted_symbols, after, side="right"))
+        if underlying_symbol:
+            group = self._by_underlying.get(underlying_symbol, np.empty(0, dtype=np.intp))
+            ranks = np.sort(self._symbol_rank[group])
+            positions = self._symbol_order[ranks[ranks >= start]]
+        else:
+            positions = self._symbol_order[start:]
+        positions = self._filter(positions, exchange=exchange, instrument_type=instrument_type, segment=segment)
+        return self.rows(positions[:limit])
+
+    def _filter(self, positions: np.ndarray, **equals: Optional[str]) -> np.ndarray:
+        for column, value in equals.items():
+            if value:
+                positions = positions[self.columns[column][positions] == value]
+        return positions
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self),
+            "version": self.version,
+            "underlyings": len(self._by_underlying),
+            "built_at": self.built_at,
+            "bytes": int(sum(values.nbytes for values in self.columns.values())),
+        }
+
+
+_index: Optional[InstrumentIndex] = None
+_reload_lock = threading.Lock()
+
+
+def get_instrument_index() -> Optional[InstrumentIndex]:
+    """The current index, or None before the first successful load (callers fall back to the DB)."""
+    return _index
+
+
+def set_instrument_index(index: InstrumentIndex) -> None:
+    global _index
+    previous = _index
+    # Chains and search are derived before the swap so readers get all of them from one reference
+    index._chains = OptionChains.build(index, previous._chains if previous is not None else None)
+    index._search = InstrumentSearch(index)
+    _index = index
+    logger.info("Instrument index swapped in: %d rows", len(index))
+
+
+def reload_instrument_index() -> Optional[InstrumentIndex]:
+    """Rebuild the index from the instruments table. Failures keep the previous index."""
+    with _reload_lock:
+        session: Session = SessionLocal()
+        try:
+            index = InstrumentIndex.from_session(session)
+        except Exception:
+            logger.exception("Failed to load instrument index; serving instruments from the DB")
+            return _index
+        finally:
+            session.close()
+        set_instrument_index(index)
+        return index
@@ -1,14 +1,20 @@
+import logging
 from typing import Any, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
-from sqlalchemy import delete, inspect
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
 
-from app.brokers.groww_adapter import GrowwAdapter
-from app.brokers.groww_auth import get_access_token
+from app.brokers.groww_pool import get_adapter_pool
+from app.brokers.rate_limit import PRIORITY_BULK, request_priority
 from app.db.models import Instrument
 from app.db.session import SessionLocal
+from app.services import dataset_version
+from app.services.instrument_index import InstrumentIndex, set_instrument_index
+from app.services.instrument_loader import load_instruments, prepare_frame
+
+logger = logging.getLogger(__name__)
 
 DERIVATIVE_TYPES = {
     "FUT",
@@ -20,115 +26,132 @@ DERIVATIVE_TYPES = {
 }
 
 
-def _sanitize_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
-    clean = df.replace([np.inf, -np.inf], None).where(pd.notnull(df), None)
-    return clean.to_dict(orient="records")
-
-
-def _extract_field(entry: Dict[str, Any], keys: List[str]) -> Optional[Any]:
-    for k in keys:
-        if k in entry and entry[k] is not None:
-            return entry[k]
-    return None
-
-
-def fetch_instruments() -> List[Dict[str, Any]]:
-    token = get_access_token()
-    client = GrowwAdapter(token)
-    data = client.get_instruments()
-    if isinstance(data, pd.DataFrame):
-        data = _sanitize_dataframe(data)
-    if not isinstance(data, list):
-        return []
-
-    normalized: List[Dict[str, Any]] = []
-    for entry in data:
-        if not isinstance(entry, dict):
-            continue
-        trading_symbol = _extract_field(entry, ["trading_symbol", "tradingSymbol", "symbol", "tradingsymbol"])
-        if not trading_symbol:
-            continue
-        normalized.append(
-            {
-                "trading_symbol": trading_symbol,
-                "exchange": _extract_field(entry, ["exchange"]),
-                "instrument_type": _extract_field(entry, ["instrument_type", "instrumentType"]),
-                "name": _extract_field(entry, ["name", "description", "instrument_name"]),
-                "exchange_token": _extract_field(entry, ["exchange_token", "exchangeToken", "token", "exchangeTokenString"]),
-                "groww_symbol": _extract_field(entry, ["groww_symbol", "growwInstrumentId", "groww_id"]),
-                "segment": _extract_field(entry, ["segment"]),
-                "series": _extract_field(entry, ["series"]),
-                "isin": _extract_field(entry, ["isin"]),
-                "underlying_symbol": _extract_field(entry, ["underlying_symbol", "underlyingSymbol"]),
-                "underlying_exchange_token": _extract_field(entry, ["underlying_exchange_token", "underlyingExchangeToken"]),
-                "expiry_date": _extract_field(entry, ["expiry_date", "expiryDate", "expiry"]),
-                "strike_price": _extract_field(entry, ["strike_price", "strikePrice", "strike"]),
-                "lot_size": _extract_field(entry, ["lot_size", "lotSize"]),
-                "tick_size": _extract_field(entry, ["tick_size", "tickSize"]),
-                "freeze_quantity": _extract_field(entry, ["freeze_quantity", "freezeQuantity"]),
-                "is_reserved": _extract_field(entry, ["is_reserved", "isReserved"]),
-                "buy_allowed": _extract_field(entry, ["buy_allowed", "buyAllowed"]),
-                "sell_allowed": _extract_field(entry, ["sell_allowed", "sellAllowed"]),
-            }
-        )
-    return normalized
+# Accepted source column names for each normalized field, resolved once per frame.
+FIELD_ALIASES: Dict[str, List[str]] = {
+    "trading_symbol": ["trading_symbol", "tradingSymbol", "symbol", "tradingsymbol"],
+    "exchange": ["exchange"],
+    "instrument_type": ["instrument_type", "instrumentType"],
+    "name": ["name", "description", "instrument_name"],
+    "exchange_token": ["exchange_token", "exchangeToken", "token", "exchangeTokenString"],
+    "groww_symbol": ["groww_symbol", "growwInstrumentId", "groww_id"],
+    "segment": ["segment"],
+    "series": ["series"],
+    "isin": ["isin"],
+    "underlying_symbol": ["underlying_symbol", "underlyingSymbol"],
+    "underlying_exchange_token": ["underlying_exchange_token", "underlyingExchangeToken"],
+    "expiry_date": ["expiry_date", "expiryDate", "expiry"],
+    "strike_price": ["strike_price", "strikePrice", "strike"],
+    "lot_size": ["lot_size", "lotSize"],
+    "tick_size": ["tick_size", "tickSize"],
+    "freeze_quantity": ["freeze_quantity", "freezeQuantity"],
+    "is_reserved": ["is_reserved", "isReserved"],
+    "buy_allowed": ["buy_allowed", "buyAllowed"],
+    "sell_allowed": ["sell_allowed", "sellAllowed"],
+}
+DATE_FIELDS = {"expiry_date"}
+FLOAT_FIELDS = {"strike_price", "tick_size"}
+INT_FIELDS = {"lot_size", "freeze_quantity", "is_reserved", "buy_allowed", "sell_allowed"}
+
+
+def _resolve_column(df: pd.DataFrame, aliases: List[str]) -> Optional[pd.Series]:
+    """Coalesce the alias columns present in `df`, earlier aliases winning."""
+    present = [alias for alias in aliases if alias in df.columns]
+    if not present:
+        return None
+    column = df[present[0]]
+    for alias in present[1:]:
+        column = column.where(column.notna(), df[alias])
+    return column
+
+
+def _to_string(column: pd.Series) -> pd.Series:
+    numeric = pd.to_numeric(column, errors="coerce") if column.dtype != object else None
+    if numeric is not None and numeric.notna().equals(column.notna()) and (numeric.dropna() % 1 == 0).all():
+        # Tokens read from CSV arrive as floats when the column has gaps; keep "2885", not "2885.0"
+        return numeric.astype("Int64").astype("string")
+    return column.astype("string").str.strip().replace("", pd.NA)
+
+
+def _coerce(field: str, column: pd.Series) -> pd.Series:
+    if field in DATE_FIELDS:
+        return pd.to_datetime(column, errors="coerce").dt.normalize()
+    if field in FLOAT_FIELDS:
+        return pd.to_numeric(column, errors="coerce").replace([np.inf, -np.inf], np.nan).astype("float64")
+    if field in INT_FIELDS:
+        numeric = pd.to_numeric(column, errors="coerce").replace([np.inf, -np.inf], np.nan)
+        return numeric.round().astype("Int64")
+    return _to_string(column)
+
 
+def normalize_instruments(data: Any) -> pd.DataFrame:
+    """Normalize a raw instrument master into one typed column per field, unique by trading_symbol.
 
-def replace_instruments() -> int:
-    items = fetch_instruments()
-    if not items:
-        return 0
+    Works column-wise: aliases are resolved once per frame, dtypes are coerced in bulk, rows
+    without a symbol are dropped, and duplicate symbols keep their last occurrence.
+    """
+    if isinstance(data, list):
+        data = pd.DataFrame([entry for entry in data if isinstance(entry, dict)])
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        return pd.DataFrame(columns=list(FIELD_ALIASES))
+
+    columns = {}
+    for field, aliases in FIELD_ALIASES.items():
+        column = _resolve_column(data, aliases)
+        if column is None:
+            column = pd.Series(pd.NA, index=data.index, dtype=object)
+        columns[field] = _coerce(field, column)
+
+    frame = pd.DataFrame(columns)
+    frame = frame[frame["trading_symbol"].notna()]
+    return frame.drop_duplicates("trading_symbol", keep="last").reset_index(drop=True)
+
+
+def fetch_instruments() -> pd.DataFrame:
+    client = get_adapter_pool().acquire()
+    # The pooled adapter outlives each day's master list; download the current one
+    client.forget_instruments()
+    # Scheduled refreshes yield to interactive and order traffic under the rate limit
+    with request_priority(PRIORITY_BULK):
+        data = client.get_instruments()
+    return normalize_instruments(data)
+
+
+def replace_instruments() -> Dict[str, int]:
+    """Bring the instruments table in line with the broker's master list.
+
+    Only rows whose content hash changed are written, and inserts, updates and deletes are
+    applied in one transaction, so readers never see a partially refreshed table.
+    """
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    frame = fetch_instruments()
+    if frame.empty:
+        # An empty feed is far more likely an upstream failure than a delisting of everything
+        return counts
 
     session: Session = SessionLocal()
     try:
         if not inspect(session.get_bind()).has_table(Instrument.__tablename__):
-            return 0
-        
-        # Delete all existing records first and commit
-        session.execute(delete(Instrument))
-        session.commit()
-        
-        # Deduplicate items by trading_symbol (keep last occurrence)
-        seen = {}
-        for item in items:
-            trading_symbol = item.get("trading_symbol")
-            if trading_symbol:
-                seen[trading_symbol] = item
-        
-        # Bulk insert deduplicated instruments
-        instruments = [
-            Instrument(
-                trading_symbol=item.get("trading_symbol"),
-                exchange=item.get("exchange"),
-                instrument_type=item.get("instrument_type"),
-                name=item.get("name"),
-                exchange_token=item.get("exchange_token"),
-                groww_symbol=item.get("groww_symbol"),
-                segment=item.get("segment"),
-                series=item.get("series"),
-                isin=item.get("isin"),
-                underlying_symbol=item.get("underlying_symbol"),
-                underlying_exchange_token=item.get("underlying_exchange_token"),
-                expiry_date=item.get("expiry_date"),
-                strike_price=item.get("strike_price"),
-                lot_size=item.get("lot_size"),
-                tick_size=item.get("tick_size"),
-                freeze_quantity=item.get("freeze_quantity"),
-                is_reserved=item.get("is_reserved"),
-                buy_allowed=item.get("buy_allowed"),
-                sell_allowed=item.get("sell_allowed"),
-            )
-            for item in seen.values()
-        ]
-        session.bulk_save_objects(instruments)
+            return counts
+
+        prepared = prepare_frame(frame)
+        counts = load_instruments(session, prepared)
+        # Only a real change invalidates cached responses (ETags are derived from this stamp)
+        if counts["inserted"] or counts["updated"] or counts["deleted"]:
+            version = dataset_version.bump(session, dataset_version.INSTRUMENTS)
+        else:
+            version = dataset_version.get_stamp(session, dataset_version.INSTRUMENTS)
         session.commit()
-        return len(instruments)
+        logger.info("Instrument refresh: %s", counts)
     except Exception:
         session.rollback()
         raise
     finally:
         session.close()
 
+    # The table now holds exactly the prepared rows, so the index is built from them without a re-read
+    set_instrument_index(InstrumentIndex(prepared, version))
+    return counts
+
 
 def get_nse_bse_derivative_symbols() -> list[str]:
     """Return symbols listed on NSE/BSE that have futures or options contracts."""
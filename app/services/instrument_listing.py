@@ -0,0 +1,96 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Query, Session
+
+from app.db.models import Instrument
+from app.services.instrument_loader import INSTRUMENT_COLUMNS
+
+# Largest page the list endpoints return; callers page on with the X-Next-Cursor header.
+MAX_PAGE_SIZE = 1000
+# Rows fetched from the server-side cursor, and encoded, per batch during an export.
+EXPORT_BATCH_ROWS = 2000
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def next_cursor(rows: List[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Trim a page fetched with `limit + 1` rows; the cursor is the last trading_symbol returned
+    when more rows follow, else None."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, last["trading_symbol"] if isinstance(last, dict) else last.trading_symbol
+
+
+def keyset_page(query: Query, after: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """One page of `query` in trading_symbol order, starting after the `after` cursor.
+
+    Seeks on the primary key instead of using OFFSET, so every page costs the same however deep
+    the caller is. The column is byte-ordered ("C" collation on PostgreSQL), the same order the
+    in-memory index pages in, so a cursor from either path continues on the other.
+    """
+    if after is not None:
+        query = query.filter(Instrument.trading_symbol > after)
+    rows = query.order_by(Instrument.trading_symbol).limit(limit + 1).all()
+    return next_cursor(rows, limit)
+
+
+def _filtered(statement, **equals: Optional[str]):
+    for column, value in equals.items():
+        if value:
+            statement = statement.where(getattr(Instrument, column) == value)
+    return statement
+
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _ndjson(batch: Sequence[Sequence[Any]], columns: Sequence[str]) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, map(_json_value, row))), separators=(",", ":")) + "\n" for row in batch
+    )
+
+
+def _csv(batch: Sequence[Sequence[Any]], writer: Any, buffer: io.StringIO) -> str:
+    writer.writerows(batch)
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def iter_export(session: Session, fmt: str, **filters: Optional[str]) -> Iterator[str]:
+    """Encode matching instruments as NDJSON or CSV, one batch at a time.
+
+    Rows come from a server-side cursor (`yield_per` streams results on PostgreSQL) in
+    trading_symbol order, so memory stays at one batch however large the table is.
+    """
+    columns = list(INSTRUMENT_COLUMNS)
+    statement = _filtered(select(*(getattr(Instrument, name) for name in columns)), **filters)
+    statement = statement.order_by(Instrument.trading_symbol).execution_options(yield_per=EXPORT_BATCH_ROWS)
+    result = session.execute(statement)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if fmt == "csv":
+        yield _csv([columns], writer, buffer)
+    try:
+        for batch in result.partitions():
+            yield _ndjson(batch, columns) if fmt == "ndjson" else _csv(batch, writer, buffer)
+    finally:
+        result.close()
+
@@ -0,0 +1,166 @@
+import io
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app.db.models import Instrument
+
+# Columns populated from the broker feed, in the order they are hashed and copied.
+INSTRUMENT_COLUMNS = (
+    "trading_symbol",
+    "exchange",
+    "instrument_type",
+    "name",
+    "exchange_token",
+    "groww_symbol",
+    "segment",
+    "series",
+    "isin",
+    "underlying_symbol",
+    "underlying_exchange_token",
+    "expiry_date",
+    "strike_price",
+    "lot_size",
+    "tick_size",
+    "freeze_quantity",
+    "is_reserved",
+    "buy_allowed",
+    "sell_allowed",
+)
+LOAD_COLUMNS = INSTRUMENT_COLUMNS + ("row_hash",)
+# Symbols per DELETE ... WHERE trading_symbol IN (...) statement.
+DELETE_BATCH_SIZE = 1000
+# Rows encoded per chunk when streaming into COPY.
+COPY_CHUNK_ROWS = 5000
+
+logger = logging.getLogger(__name__)
+
+
+def row_hashes(frame: pd.DataFrame) -> pd.Series:
+    """Content hash of each row over INSTRUMENT_COLUMNS, as 16 hex digits."""
+    hashes = pd.util.hash_pandas_object(frame[list(INSTRUMENT_COLUMNS)], index=False)
+    return pd.Series([f"{h:016x}" for h in hashes.to_numpy()], index=frame.index, dtype=object)
+
+
+def prepare_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Project a normalized frame onto the loaded columns and stamp each row with its hash."""
+    frame = frame.reindex(columns=list(INSTRUMENT_COLUMNS))
+    frame["expiry_date"] = pd.to_datetime(frame["expiry_date"])
+    frame["row_hash"] = row_hashes(frame)
+    return frame
+
+
+def diff_instruments(
+    frame: pd.DataFrame, stored_hashes: Dict[str, Optional[str]]
+) -> Tuple[pd.DataFrame, pd.DataFrame, List[str]]:
+    """Split a prepared frame into inserts and updates, and list stored symbols to delete."""
+    stored = frame["trading_symbol"].map(stored_hashes)
+    known = frame["trading_symbol"].isin(stored_hashes.keys())
+    inserts = frame[~known]
+    updates = frame[known & (stored != frame["row_hash"])]
+    incoming = set(frame["trading_symbol"])
+    deletes = [symbol for symbol in stored_hashes if symbol not in incoming]
+    return inserts, updates, deletes
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Plain Python rows for executemany: dates as `date`, missing values as None."""
+    columns = {}
+    for name, column in frame.items():
+        if name == "expiry_date":
+            column = column.dt.date
+        columns[name] = column.astype(object).where(column.notna(), None).tolist()
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def load_instruments(session: Session, frame: pd.DataFrame) -> Dict[str, int]:
+    """Merge a prepared frame (unique by trading_symbol) into `instruments` within the session's
+    transaction; the caller commits. PostgreSQL streams the rows into a staging table with
+    COPY and merges in SQL; other databases diff in pandas and apply with executemany."""
+    if session.get_bind().dialect.name == "postgresql":
+        counts = _merge_with_copy(session, frame)
+    else:
+        counts = _merge_with_executemany(session, frame)
+    counts["unchanged"] = len(frame) - counts["inserted"] - counts["updated"]
+    return counts
+
+
+def _merge_with_executemany(session: Session, frame: pd.DataFrame) -> Dict[str, int]:
+    stored_hashes = dict(session.execute(select(Instrument.trading_symbol, Instrument.row_hash)).all())
+    inserts, updates, deletes = diff_instruments(frame, stored_hashes)
+    if len(inserts):
+        session.execute(insert(Instrument), _records(inserts))
+    if len(updates):
+        session.execute(update(Instrument), _records(updates))
+    for i in range(0, len(deletes), DELETE_BATCH_SIZE):
+        session.execute(delete(Instrument).where(Instrument.trading_symbol.in_(deletes[i:i + DELETE_BATCH_SIZE])))
+    return {"inserted": len(inserts), "updated": len(updates), "deleted": len(deletes)}
+
+
+class _CsvStream(io.TextIOBase):
+    """File-like reader that encodes a frame to CSV a chunk at a time, so COPY never holds the
+    whole feed as text."""
+
+    def __init__(self, frame: pd.DataFrame):
+        frame = frame[list(LOAD_COLUMNS)].copy()
+        frame["expiry_date"] = frame["expiry_date"].dt.strftime("%Y-%m-%d")
+        self._chunks = (
+            frame.iloc[i:i + COPY_CHUNK_ROWS].to_csv(header=False, index=False, na_rep="")
+            for i in range(0, len(frame), COPY_CHUNK_ROWS)
+        )
+        self._buffer = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+_MERGE_SQL = """
+WITH upserted AS (
+    INSERT INTO instruments ({columns})
+    SELECT {columns} FROM instruments_staging
+    ON CONFLICT (trading_symbol) DO UPDATE SET {assignments}
+    WHERE instruments.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM upserted
+"""
+
+_DELETE_MISSING_SQL = """
+DELETE FROM instruments i
+WHERE NOT EXISTS (SELECT 1 FROM instruments_staging s WHERE s.trading_symbol = i.trading_symbol)
+"""
+
+
+def _merge_with_copy(session: Session, frame: pd.DataFrame) -> Dict[str, int]:
+    columns = ", ".join(LOAD_COLUMNS)
+    session.execute(
+        text(
+            "CREATE TEMP TABLE instruments_staging (LIKE instruments INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+    )
+    # Raw DBAPI cursor on the session's own connection, so COPY joins the same transaction
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY instruments_staging ({columns}) FROM STDIN WITH (FORMAT csv)", _CsvStream(frame))
+    finally:
+        cursor.close()
+
+    assignments = ", ".join(f"{c} = EXCLUDED.{c}" for c in LOAD_COLUMNS if c != "trading_symbol")
+    inserted, updated = session.execute(text(_MERGE_SQL.format(columns=columns, assignments=assignments))).one()
+    deleted = session.execute(text(_DELETE_MISSING_SQL)).rowcount
+    return {"inserted": inserted, "updated": updated, "deleted": deleted}
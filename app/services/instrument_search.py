@@ -0,0 +1,231 @@
+import logging
+import re
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.instrument_index import InstrumentIndex
+
+# Ranking tiers, best first.
+MATCH_TYPES = ("exact", "prefix", "name", "fuzzy")
+# Trigram similarity (shared / union, as pg_trgm computes it) a fuzzy match must reach.
+FUZZY_MIN_SIMILARITY = 0.3
+# Shorter queries only get exact and prefix matches; their trigrams match too much to rank.
+FUZZY_MIN_QUERY = 3
+# Characters of each key that contribute trigrams.
+TRIGRAM_KEY_WIDTH = 64
+
+_WORD = re.compile(r"[A-Z0-9&]+")
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Uppercase words of a name, joined by single spaces ('Tata Motors Ltd.' -> 'TATA MOTORS LTD')."""
+    return " ".join(_WORD.findall(value.upper())) if value else ""
+
+
+def _ranges(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(start, stop) for each pair, without a Python loop."""
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.intp)
+    offsets = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return offsets + np.arange(total)
+
+
+class _Trigrams:
+    """Inverted index from trigram to key ids. Keys are padded pg_trgm style ('  KEY ') and
+    packed into fixed-width byte rows so every trigram is computed in one vectorized pass."""
+
+    def __init__(self, keys: np.ndarray):
+        padded = [b"  " + key.encode("ascii", "ignore")[:TRIGRAM_KEY_WIDTH] + b" " for key in keys.tolist()]
+        width = max((len(p) for p in padded), default=3)
+        chars = np.array(padded, dtype=f"S{width}").view(np.uint8).reshape(len(padded), width).astype(np.int64)
+        codes = (chars[:, :-2] << 16) | (chars[:, 1:-1] << 8) | chars[:, 2:]
+        # Keys shorter than the row width are null-padded at the end
+        valid = chars[:, 2:] != 0
+        key_ids = np.broadcast_to(np.arange(len(padded))[:, None], codes.shape)[valid]
+        # Sort (gram, key) pairs and drop repeats; a sort is much faster than np.unique's hashing here
+        packed = np.sort((codes[valid] << 32) | key_ids)
+        packed = packed[np.r_[True, packed[1:] != packed[:-1]]] if len(packed) else packed
+        grams = packed >> 32
+        self.key_ids = packed & 0xFFFFFFFF
+        starts = np.flatnonzero(np.r_[True, grams[1:] != grams[:-1]]) if len(grams) else np.empty(0, dtype=np.intp)
+        self.grams = grams[starts]
+        self.offsets = np.r_[starts, len(packed)]
+        self.counts = np.bincount(self.key_ids, minlength=len(padded))
+
+    @staticmethod
+    def grams_of(text: str) -> np.ndarray:
+        raw = np.frombuffer(b"  " + text.encode("ascii", "ignore")[:TRIGRAM_KEY_WIDTH] + b" ", dtype=np.uint8)
+        raw = raw.astype(np.int64)
+        return np.unique((raw[:-2] << 16) | (raw[1:-1] << 8) | raw[2:])
+
+    def similar(self, text: str, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Key ids whose trigram similarity to `text` is at least `threshold`, with the scores."""
+        query = self.grams_of(text)
+        if not len(self.grams):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        slots = np.searchsorted(self.grams, query)
+        slots = slots[(slots < len(self.grams)) & (self.grams[np.minimum(slots, len(self.grams) - 1)] == query)]
+        if not len(slots):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        shared = np.bincount(self.key_ids[_ranges(self.offsets[slots], self.offsets[slots + 1])], minlength=len(self.counts))
+        key_ids = np.flatnonzero(shared)
+        scores = shared[key_ids] / (len(query) + self.counts[key_ids] - shared[key_ids])
+        keep = scores >= threshold
+        return key_ids[keep], scores[keep]
+
+
+class _KeyIndex:
+    """Sorted, de-duplicated string keys mapped to index rows (CSR layout), for exact and
+    prefix ranges by binary search and, optionally, trigram similarity."""
+
+    def __init__(self, keys: np.ndarray, rows: np.ndarray, trigrams: bool = False):
+        order = np.argsort(keys, kind="stable")
+        keys, self.rows = keys[order], rows[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.empty(0, dtype=np.intp)
+        self.keys = keys[starts]
+        self.offsets = np.r_[starts, len(keys)].astype(np.intp)
+        self.trigrams = _Trigrams(self.keys) if trigrams else None
+
+    def _rows(self, lo: int, hi: int) -> np.ndarray:
+        return self.rows[self.offsets[lo]:self.offsets[hi]]
+
+    def exact(self, text: str) -> np.ndarray:
+        lo = int(np.searchsorted(self.keys, text, side="left"))
+        return self._rows(lo, lo + 1) if lo < len(self.keys) and self.keys[lo] == text else self._rows(0, 0)
+
+    def prefix(self, text: str) -> np.ndarray:
+        lo = int(np.searchsorted(self.keys, text, side="left"))
+        hi = int(np.searchsorted(self.keys, text + "\uffff", side="left"))
+        return self._rows(lo, hi)
+
+    def similar(self, text: str, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        key_ids, scores = self.trigrams.similar(text, threshold)
+        lengths = self.offsets[key_ids + 1] - self.offsets[key_ids]
+        return self.rows[_ranges(self.offsets[key_ids], self.offsets[key_ids + 1])], np.repeat(scores, lengths)
+
+
+class InstrumentSearch:
+    """Type-ahead over trading_symbol and name, derived from an InstrumentIndex.
+
+    Matches are ranked in tiers: exact symbol, symbol prefix, prefix of any word-start of the
+    name ('MOT' finds 'TATA MOTORS LTD'), then trigram similarity on either field for typos.
+    Inside a tier, shorter symbols come first (so the equity precedes its derivatives), then
+    alphabetical; fuzzy matches order by similarity first. All lookups are binary searches or
+    array scans over prebuilt structures, so a query never iterates rows in Python.
+    """
+
+    def __init__(self, index: "InstrumentIndex"):
+        started = time.perf_counter()
+        self._index = index
+        count = len(index)
+        rows = np.arange(count)
+        symbols = np.array([s.upper() for s in index.columns["trading_symbol"].tolist()], dtype=object)
+        self._symbols = _KeyIndex(symbols, rows, trigrams=True)
+
+        names = np.array([normalize_name(n) for n in index.columns["name"].tolist()], dtype=object)
+        self._names = _KeyIndex(names[names != ""], rows[names != ""], trigrams=True)
+        # Every word-start suffix of each distinct name, pointing back at the rows with that name
+        suffixes, suffix_names = [], []
+        for name_id, name in enumerate(self._names.keys.tolist()):
+            starts = [0] + [m.start() + 1 for m in re.finditer(" ", name)]
+            suffixes.extend(name[s:] for s in starts)
+            suffix_names.extend([name_id] * len(starts))
+        self._name_suffixes = _KeyIndex(np.array(suffixes, dtype=object), np.array(suffix_names, dtype=np.intp))
+
+        # Static order inside a tier: symbol length, then alphabetical
+        alphabetical = np.empty(count, dtype=np.intp)
+        alphabetical[self._symbols.rows] = np.arange(count)
+        lengths = np.fromiter((len(s) for s in symbols.tolist()), dtype=np.intp, count=count)
+        self._rank = np.empty(count, dtype=np.intp)
+        self._rank[np.lexsort((alphabetical, lengths))] = np.arange(count)
+        self._lengths = lengths
+        self._name_lengths = np.fromiter((len(n) for n in names.tolist()), dtype=np.intp, count=count)
+        self.build_seconds = time.perf_counter() - started
+        logger.info("Instrument search built for %d rows in %.2fs", count, self.build_seconds)
+
+    def _name_rows(self, text: str) -> np.ndarray:
+        name_ids = np.unique(self._name_suffixes.prefix(text))
+        names = self._names
+        return names.rows[_ranges(names.offsets[name_ids], names.offsets[name_ids + 1])]
+
+    def _fuzzy(self, symbol: str, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        rows_s, scores_s = self._symbols.similar(symbol, FUZZY_MIN_SIMILARITY)
+        rows_n, scores_n = self._names.similar(name, FUZZY_MIN_SIMILARITY) if name else (rows_s[:0], scores_s[:0])
+        rows, scores = np.r_[rows_s, rows_n], np.r_[scores_s, scores_n]
+        # Best score per row
+        order = np.lexsort((-scores, rows))
+        rows, scores = rows[order], scores[order]
+        first = np.r_[True, rows[1:] != rows[:-1]] if len(rows) else np.empty(0, dtype=bool)
+        return rows[first], scores[first]
+
+    def _keep(self, rows: np.ndarray, taken: np.ndarray, equals: Dict[str, Optional[str]]) -> np.ndarray:
+        mask = ~taken[rows]
+        for column, value in equals.items():
+            if value:
+                mask &= self._index.columns[column][rows] == value
+        return mask
+
+    def _top(self, rows: np.ndarray, keys: np.ndarray, k: int) -> np.ndarray:
+        if len(rows) > k:
+            cut = np.argpartition(keys, k - 1)[:k]
+            rows, keys = rows[cut], keys[cut]
+        return rows[np.argsort(keys, kind="stable")]
+
+    def find(
+        self,
+        query: str,
+        exchange: Optional[str] = None,
+        segment: Optional[str] = None,
+        instrument_type: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[Dict[str, Any]]:
+        symbol = query.strip().upper()
+        name = normalize_name(query)
+        if not symbol:
+            return []
+        equals = {"exchange": exchange, "segment": segment, "instrument_type": instrument_type}
+        taken = np.zeros(len(self._index), dtype=bool)
+        hits: List[Tuple[np.ndarray, str, np.ndarray]] = []
+        remaining = limit
+
+        tiers = [
+            ("exact", lambda: self._symbols.exact(symbol)),
+            ("prefix", lambda: self._symbols.prefix(symbol)),
+            ("name", lambda: self._name_rows(name) if name else np.empty(0, dtype=np.intp)),
+        ]
+        for match, candidates in tiers:
+            rows = candidates()
+            rows = rows[self._keep(rows, taken, equals)]
+            rows = self._top(rows, self._rank[rows], remaining)
+            if match == "name":
+                scores = len(name) / np.maximum(self._name_lengths[rows], len(name))
+            else:
+                scores = len(symbol) / self._lengths[rows]
+            hits.append((rows, match, scores))
+            taken[rows] = True
+            remaining -= len(rows)
+            if remaining <= 0:
+                break
+
+        if remaining > 0 and len(symbol) >= FUZZY_MIN_QUERY:
+            rows, scores = self._fuzzy(symbol, name)
+            keep = self._keep(rows, taken, equals)
+            rows, scores = rows[keep], scores[keep]
+            # Similarity first, static rank breaks ties
+            order = np.lexsort((self._rank[rows], -scores))[:remaining]
+            hits.append((rows[order], "fuzzy", scores[order]))
+
+        results = []
+        for rows, match, scores in hits:
+            for row, score in zip(self._index.rows(rows), scores.tolist()):
+                row["match"] = match
+                row["score"] = round(min(score, 1.0), 4)
+                results.append(row)
+        return results
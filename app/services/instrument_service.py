@@ -3,8 +3,7 @@ from typing import Any, List, Dict
 import numpy as np
 import pandas as pd
 
-from app.brokers.groww_auth import get_access_token
-from app.brokers.groww_adapter import GrowwAdapter
+from app.brokers.groww_pool import get_adapter_pool
 
 def _sanitize_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
     # Replace NaN/inf with None for JSON serialization
@@ -13,8 +12,7 @@ def _sanitize_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
 
 
 def fetch_instruments():
-    token = get_access_token()
-    groww = GrowwAdapter(token)
+    groww = get_adapter_pool().acquire()
 
     data = groww.get_instruments()
     if isinstance(data, pd.DataFrame):
@@ -0,0 +1,300 @@
+import logging
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.services import black_scholes
+from app.services.black_scholes import CALENDAR_DAYS, TRADING_DAYS
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.portfolio_snapshots import utcnow
+from app.services.valuation import Book, load_book
+from app.services.value_at_risk import ReturnMatrix, get_return_matrix
+
+logger = logging.getLogger(__name__)
+
+# Paths per simulation unless the caller asks for another number.
+MC_PATHS = int(os.getenv("MC_PATHS", "20000"))
+# Paths per shard. Shards, and so results for a given seed, do not depend on the worker count.
+MC_SHARD_PATHS = int(os.getenv("MC_SHARD_PATHS", "5000"))
+# Worker processes; 0 runs shards in the calling thread.
+MC_WORKERS = int(os.getenv("MC_WORKERS", str(os.cpu_count() or 1)))
+# Default seed, so repeated runs over an unchanged book agree.
+MC_SEED = int(os.getenv("MC_SEED", "20240101"))
+# Continuously compounded rate used to price options.
+MC_RISK_FREE_RATE = float(os.getenv("MC_RISK_FREE_RATE", str(black_scholes.RISK_FREE_RATE)))
+# Upper bound on paths x option lines repriced at once inside a shard (memory, not results).
+MC_CHUNK_ELEMENTS = 2_000_000
+
+OPTION_TYPES = ("CE", "PE")
+# Calendar days a trading day spans: five of them take a week.
+CALENDAR_DAYS_PER_TRADING_DAY = 7 / 5
+
+
+@dataclass
+class SimulationInputs:
+    """Everything a shard needs, as float64 arrays so they fit one shared memory block.
+
+    `factor` is a square root of the daily covariance of the underlyings' log returns. Linear
+    lines (equities, futures) are collapsed into `delta`, units per underlying; options are
+    repriced one by one.
+    """
+
+    spot: np.ndarray
+    factor: np.ndarray
+    delta: np.ndarray
+    option_underlying: np.ndarray
+    option_strike: np.ndarray
+    option_years: np.ndarray
+    option_vol: np.ndarray
+    option_quantity: np.ndarray
+    option_is_call: np.ndarray
+    option_value: np.ndarray
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: np.asarray(value, dtype=np.float64) for name, value in vars(self).items()}
+
+
+def covariance_factor(covariance: np.ndarray) -> np.ndarray:
+    """A with A @ A.T == covariance: Cholesky, or the eigen square root when the sample
+    covariance is singular (more underlyings than days, or constant prices)."""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(covariance)
+        return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+def build_inputs(
+    matrix: ReturnMatrix, index: Optional[InstrumentIndex], book: Book, as_of: date, rate: float = MC_RISK_FREE_RATE
+) -> Tuple[SimulationInputs, List[str], List[str]]:
+    """Resolve each line to its underlying and contract terms through the instruments index.
+
+    Returns the inputs, the simulated underlyings and the symbols that could not be simulated
+    (no return history for the underlying). Options are priced at the underlying's historical
+    volatility; P&L is measured against that same model value today.
+    """
+    symbols = book.symbol.astype(str)
+    positions = index.positions_of(symbols) if index is not None else np.full(len(symbols), -1)
+    listed = positions >= 0
+
+    def column(name: str) -> np.ndarray:
+        values = index.columns[name] if index is not None else np.empty(0, dtype=object)
+        out = np.full(len(symbols), None, dtype=object) if values.dtype == object else np.full(
+            len(symbols), np.datetime64("NaT") if values.dtype.kind == "M" else np.nan, dtype=values.dtype)
+        out[listed] = values[positions[listed]]
+        return out
+
+    instrument_type = column("instrument_type")
+    underlying = column("underlying_symbol")
+    # Equities are their own underlying
+    underlying = np.where(np.equal(underlying, None), symbols, underlying).astype(str)
+    rows = matrix.positions_of(underlying)
+    covered = rows >= 0
+    uncovered = sorted(set(symbols[~covered].tolist()))
+
+    held, inverse = np.unique(rows[covered], return_inverse=True)
+    slot = np.full(len(symbols), -1)
+    slot[covered] = inverse
+    spot = np.asarray(matrix.last_close[held], dtype=np.float64)
+    covariance = np.asarray(matrix.covariance[np.ix_(held, held)], dtype=np.float64)
+    vol = np.sqrt(np.diag(covariance) * TRADING_DAYS)
+
+    option = covered & np.isin(instrument_type, OPTION_TYPES)
+    linear = covered & ~option
+    delta = np.bincount(slot[linear], weights=book.quantity[linear], minlength=len(held))
+
+    expiry = column("expiry_date")[option]
+    days = (expiry - np.datetime64(as_of, "D")).astype(np.float64)
+    years = np.where(np.isnat(expiry), 0.0, days) / CALENDAR_DAYS
+    strike = column("strike_price")[option].astype(np.float64)
+    is_call = instrument_type[option] == "CE"
+    option_underlying = slot[option]
+    option_vol = vol[option_underlying]
+    value = black_scholes.price(spot[option_underlying], strike, years, option_vol, rate, is_call)
+    inputs = SimulationInputs(
+        spot=spot,
+        factor=covariance_factor(covariance),
+        delta=delta,
+        option_underlying=option_underlying,
+        option_strike=strike,
+        option_years=years,
+        option_vol=option_vol,
+        option_quantity=book.quantity[option],
+        option_is_call=is_call,
+        option_value=value,
+    )
+    return inputs, matrix.symbols[held].tolist(), uncovered
+
+
+def horizon_years(horizon_days: int) -> float:
+    """The calendar time a horizon of `horizon_days` trading days spans, in the CALENDAR_DAYS
+    years that option expiries are measured in."""
+    return horizon_days * CALENDAR_DAYS_PER_TRADING_DAY / CALENDAR_DAYS
+
+
+def simulate_shard(arrays: Dict[str, np.ndarray], paths: int, rng: np.random.Generator, horizon_days: int, rate: float) -> np.ndarray:
+    """Portfolio P&L on `paths` correlated lognormal paths of the underlyings over the horizon."""
+    spot, factor = arrays["spot"], arrays["factor"]
+    shocks = rng.standard_normal((paths, len(spot))) @ factor.T
+    variance = np.square(factor).sum(axis=1)
+    # Martingale log returns over the horizon
+    terminal = spot * np.exp(shocks * np.sqrt(horizon_days) - 0.5 * variance * horizon_days)
+    pnl = (terminal - spot) @ arrays["delta"]
+
+    options = len(arrays["option_strike"])
+    if options:
+        underlying = arrays["option_underlying"].astype(np.intp)
+        years = np.maximum(arrays["option_years"] - horizon_years(horizon_days), 0.0)
+        is_call = arrays["option_is_call"] > 0
+        step = max(1, MC_CHUNK_ELEMENTS // options)
+        for start in range(0, paths, step):
+            values = black_scholes.price(
+                terminal[start:start + step, underlying], arrays["option_strike"], years, arrays["option_vol"], rate, is_call
+            )
+            pnl[start:start + step] += (values - arrays["option_value"]) @ arrays["option_quantity"]
+    return pnl
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Tuple[SharedMemory, Dict[str, Tuple[int, Tuple[int, ...]]]]:
+    layout, offset = {}, 0
+    for name, values in arrays.items():
+        layout[name] = (offset, values.shape)
+        offset += values.nbytes
+    block = SharedMemory(create=True, size=max(offset, 1))
+    for name, (start, shape) in layout.items():
+        np.ndarray(shape, dtype=np.float64, buffer=block.buf, offset=start)[...] = arrays[name]
+    return block, layout
+
+
+def _run_shard(block_name: str, layout, paths: int, seed: np.random.SeedSequence, horizon_days: int, rate: float) -> np.ndarray:
+    # Runs in a worker process: inputs are read in place from the parent's shared memory block
+    block = SharedMemory(name=block_name)
+    arrays: Dict[str, np.ndarray] = {}
+    try:
+        arrays.update(
+            (name, np.ndarray(shape, dtype=np.float64, buffer=block.buf, offset=start))
+            for name, (start, shape) in layout.items()
+        )
+        return simulate_shard(arrays, paths, np.random.default_rng(seed), horizon_days, rate)
+    except BaseException as exc:
+        # The traceback keeps the shard's frames, and their views of the block, alive
+        traceback.clear_frames(exc.__traceback__)
+        raise
+    finally:
+        # close() raises BufferError while any view of the block is still referenced
+        arrays.clear()
+        block.close()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """The shared worker pool, started on first use. Workers are spawned, not forked, so they do
+    not inherit the server's threads, sockets or DB connections."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = workers
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def simulate(
+    inputs: SimulationInputs,
+    paths: int = MC_PATHS,
+    horizon_days: int = 1,
+    seed: int = MC_SEED,
+    workers: int = MC_WORKERS,
+    rate: float = MC_RISK_FREE_RATE,
+    shard_paths: int = MC_SHARD_PATHS,
+) -> np.ndarray:
+    """P&L per path, in path order. Shard i draws from the i-th child of SeedSequence(seed), so
+    a seed gives the same paths whether shards run inline or on any number of workers."""
+    sizes = [min(shard_paths, paths - start) for start in range(0, paths, shard_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    arrays = inputs.arrays()
+    if workers <= 0 or len(sizes) == 1:
+        return np.concatenate([
+            simulate_shard(arrays, size, np.random.default_rng(s), horizon_days, rate) for size, s in zip(sizes, seeds)
+        ]) if sizes else np.empty(0)
+
+    block, layout = _share(arrays)
+    try:
+        executor = get_executor(workers)
+        futures = [
+            executor.submit(_run_shard, block.name, layout, size, s, horizon_days, rate) for size, s in zip(sizes, seeds)
+        ]
+        return np.concatenate([future.result() for future in futures])
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _tail(pnl: np.ndarray, confidence: float) -> Dict[str, float]:
+    losses = -pnl
+    var = float(np.quantile(losses, confidence))
+    return {"var": round(var, 2), "es": round(float(losses[losses >= var].mean()), 2)}
+
+
+def monte_carlo(
+    session: Session,
+    account_id: str = DEFAULT_ACCOUNT,
+    paths: int = MC_PATHS,
+    horizon_days: int = 1,
+    confidence: float = 0.99,
+    seed: int = MC_SEED,
+    at: Optional[datetime] = None,
+    workers: int = MC_WORKERS,
+) -> Dict[str, Any]:
+    """Full-revaluation Monte Carlo VaR/ES of the account's holdings and open positions."""
+    at = at or utcnow()
+    book, _, _ = load_book(session, account_id, at)
+    matrix = get_return_matrix(session)
+    index = get_instrument_index() or InstrumentIndex.from_session(session)
+    inputs, underlyings, uncovered = build_inputs(matrix, index, book, at.date())
+    result: Dict[str, Any] = {
+        "account_id": account_id,
+        "as_of": matrix.as_of,
+        "paths": paths,
+        "horizon_days": horizon_days,
+        "confidence": confidence,
+        "seed": seed,
+        "lines": len(book),
+        "options": int(len(inputs.option_strike)),
+        "underlyings": underlyings,
+        "uncovered": uncovered,
+    }
+    if not underlyings or not paths:
+        return result
+
+    pnl = simulate(inputs, paths, horizon_days, seed, workers)
+    result.update(_tail(pnl, confidence))
+    result["mean"] = round(float(pnl.mean()), 2)
+    result["std"] = round(float(pnl.std()), 2)
+    result["percentiles"] = {
+        f"p{q}": round(float(value), 2) for q, value in zip((1, 5, 50, 95, 99), np.percentile(pnl, (1, 5, 50, 95, 99)))
+    }
+    return result
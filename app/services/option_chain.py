@@ -0,0 +1,171 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from app.services.instrument_index import InstrumentIndex
+
+OPTION_TYPES = ("CE", "PE")
+# Fields carried on each CE/PE leg of a chain row.
+LEG_FIELDS = ("trading_symbol", "exchange", "exchange_token", "groww_symbol", "lot_size", "tick_size")
+# Strikes returned on each side of the ATM strike when `atm` is given without `width`.
+DEFAULT_ATM_WIDTH = 10
+
+logger = logging.getLogger(__name__)
+
+
+class ChainNotFound(LookupError):
+    pass
+
+
+@dataclass
+class ExpiryChain:
+    """Sorted strikes for one expiry, with the CE and PE leg at each strike (None if not listed)."""
+
+    strikes: np.ndarray
+    ce: List[Optional[Dict[str, Any]]]
+    pe: List[Optional[Dict[str, Any]]]
+
+    def window(
+        self,
+        strike_min: Optional[float] = None,
+        strike_max: Optional[float] = None,
+        atm: Optional[float] = None,
+        width: Optional[int] = None,
+    ) -> Tuple[slice, Optional[float]]:
+        """Slice of strikes inside [strike_min, strike_max], narrowed to `width` strikes each side
+        of the strike closest to `atm`. Returns the slice and the ATM strike."""
+        lo = 0 if strike_min is None else int(np.searchsorted(self.strikes, strike_min, side="left"))
+        hi = len(self.strikes) if strike_max is None else int(np.searchsorted(self.strikes, strike_max, side="right"))
+        atm_strike = None
+        if atm is not None and len(self.strikes):
+            i = int(np.searchsorted(self.strikes, atm))
+            # Nearest of the neighbours either side of the insertion point
+            if i == len(self.strikes) or (i > 0 and atm - self.strikes[i - 1] <= self.strikes[i] - atm):
+                i -= 1
+            atm_strike = float(self.strikes[i])
+            width = DEFAULT_ATM_WIDTH if width is None else width
+            lo, hi = max(lo, i - width), min(hi, i + width + 1)
+        return slice(lo, max(lo, hi)), atm_strike
+
+    def rows(self, window: slice) -> List[Dict[str, Any]]:
+        return [
+            {"strike": float(strike), "CE": ce, "PE": pe}
+            for strike, ce, pe in zip(self.strikes[window], self.ce[window], self.pe[window])
+        ]
+
+
+@dataclass
+class UnderlyingChain:
+    expiries: List[date]
+    by_expiry: Dict[date, ExpiryChain] = field(default_factory=dict)
+
+    def resolve_expiry(self, expiry: Optional[date], today: date) -> date:
+        if expiry is None:
+            # Nearest live expiry, else the last one listed
+            return next((e for e in self.expiries if e >= today), self.expiries[-1])
+        if expiry not in self.by_expiry:
+            raise ChainNotFound(f"No {expiry.isoformat()} expiry")
+        return expiry
+
+
+def _build_underlying(index: "InstrumentIndex", positions: np.ndarray) -> UnderlyingChain:
+    columns = index.columns
+    expiries = columns["expiry_date"][positions]
+    strikes = columns["strike_price"][positions]
+    kinds = columns["instrument_type"][positions]
+    legs = index.rows(positions)
+
+    chain = UnderlyingChain(expiries=[])
+    # Positions arrive ordered by expiry then strike, so each expiry is one contiguous run
+    starts = np.flatnonzero(np.r_[True, expiries[1:] != expiries[:-1]])
+    for start, stop in zip(starts, np.r_[starts[1:], len(positions)]):
+        unique_strikes, slot = np.unique(strikes[start:stop], return_inverse=True)
+        ce: List[Optional[Dict[str, Any]]] = [None] * len(unique_strikes)
+        pe: List[Optional[Dict[str, Any]]] = [None] * len(unique_strikes)
+        for offset, kind in enumerate(kinds[start:stop]):
+            leg = {name: legs[start + offset][name] for name in LEG_FIELDS}
+            (ce if kind == "CE" else pe)[slot[offset]] = leg
+        expiry = expiries[start].astype(object)
+        chain.expiries.append(expiry)
+        chain.by_expiry[expiry] = ExpiryChain(strikes=unique_strikes, ce=ce, pe=pe)
+    return chain
+
+
+def _fingerprint(columns: Dict[str, np.ndarray], positions: np.ndarray) -> int:
+    parts = []
+    for name in LEG_FIELDS + ("instrument_type", "strike_price", "expiry_date"):
+        values = columns[name][positions]
+        # Numeric arrays hash by bytes: NaN floats hash by identity, so tuples of them never match
+        parts.append(tuple(values.tolist()) if values.dtype == object else values.tobytes())
+    return hash(tuple(parts))
+
+
+class OptionChains:
+    """Option chains for every underlying, derived from an InstrumentIndex.
+
+    Built once per index; `build(index, previous)` reuses the previous chain for any underlying
+    whose option rows are unchanged, so a nightly refresh only rebuilds what moved.
+    """
+
+    def __init__(self) -> None:
+        self._chains: Dict[str, UnderlyingChain] = {}
+        self._fingerprints: Dict[str, int] = {}
+        self.rebuilt = 0
+        self.reused = 0
+
+    @classmethod
+    def build(cls, index: "InstrumentIndex", previous: Optional["OptionChains"] = None) -> "OptionChains":
+        chains = cls()
+        columns = index.columns
+        for underlying, positions in index.underlying_groups().items():
+            kinds = columns["instrument_type"][positions]
+            usable = np.isin(kinds, OPTION_TYPES)
+            usable &= ~np.isnan(columns["strike_price"][positions]) & ~np.isnat(columns["expiry_date"][positions])
+            options = positions[usable]
+            if not len(options):
+                continue
+
+            fingerprint = _fingerprint(columns, options)
+            if previous is not None and previous._fingerprints.get(underlying) == fingerprint:
+                chains._chains[underlying] = previous._chains[underlying]
+                chains.reused += 1
+            else:
+                chains._chains[underlying] = _build_underlying(index, options)
+                chains.rebuilt += 1
+            chains._fingerprints[underlying] = fingerprint
+        logger.info("Option chains built: %d rebuilt, %d reused", chains.rebuilt, chains.reused)
+        return chains
+
+    def __contains__(self, underlying: str) -> bool:
+        return underlying in self._chains
+
+    def underlyings(self) -> List[str]:
+        return sorted(self._chains)
+
+    def get(
+        self,
+        underlying: str,
+        expiry: Optional[date] = None,
+        strike_min: Optional[float] = None,
+        strike_max: Optional[float] = None,
+        atm: Optional[float] = None,
+        width: Optional[int] = None,
+        today: Optional[date] = None,
+    ) -> Dict[str, Any]:
+        chain = self._chains.get(underlying)
+        if chain is None:
+            raise ChainNotFound(f"No option chain for '{underlying}'")
+        expiry = chain.resolve_expiry(expiry, today or date.today())
+        expiry_chain = chain.by_expiry[expiry]
+        window, atm_strike = expiry_chain.window(strike_min, strike_max, atm, width)
+        return {
+            "underlying": underlying,
+            "expiry": expiry,
+            "expiries": chain.expiries,
+            "atm_strike": atm_strike,
+            "strikes": expiry_chain.rows(window),
+        }
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.brokers.market_cache import get_greeks_cache
+from app.db.models import CandleDaily
+from app.services import black_scholes
+from app.services.black_scholes import CALENDAR_DAYS, RISK_FREE_RATE
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.option_chain import OPTION_TYPES, ChainNotFound
+from app.services.valuation import Book, fetch_quotes, load_book
+
+logger = logging.getLogger(__name__)
+
+# Broker Greeks requests in flight at once for one aggregation.
+GREEKS_CONCURRENCY = int(os.getenv("GREEKS_CONCURRENCY", "16"))
+# Budget per broker Greeks call; slower contracts are computed locally instead.
+GREEKS_BROKER_TIMEOUT_SECONDS = float(os.getenv("GREEKS_BROKER_TIMEOUT_SECONDS", "1.5"))
+# Strikes each side of ATM whose prices feed the local volatility smile.
+GREEKS_CHAIN_WIDTH = int(os.getenv("GREEKS_CHAIN_WIDTH", "5"))
+
+GREEKS = ("delta", "gamma", "vega", "theta")
+
+
+def parse_greeks(payload: Any) -> Optional[Dict[str, float]]:
+    """Per-unit Greeks from a broker payload, or None if any is missing."""
+    values = payload.get("greeks", payload) if isinstance(payload, dict) else None
+    if not isinstance(values, dict):
+        return None
+    try:
+        return {name: float(values[name]) for name in GREEKS}
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def resolve_lines(index: InstrumentIndex, book: Book, as_of: date) -> Dict[str, np.ndarray]:
+    """Contract terms of each line from the instruments index. Equities are their own
+    underlying; anything that is not a listed CE/PE is delta-one."""
+    symbols = book.symbol.astype(str)
+    positions = index.positions_of(symbols)
+    listed = positions >= 0
+
+    def column(name: str, empty: Any) -> np.ndarray:
+        values = index.columns[name]
+        out = np.full(len(symbols), empty, dtype=values.dtype)
+        out[listed] = values[positions[listed]]
+        return out
+
+    instrument_type = column("instrument_type", None)
+    underlying = column("underlying_symbol", None)
+    exchange = column("exchange", None)
+    expiry = column("expiry_date", np.datetime64("NaT"))
+    strike = column("strike_price", np.nan)
+    return {
+        "symbol": symbols,
+        "quantity": book.quantity,
+        "exchange": np.where(np.equal(exchange, None), "NSE", exchange).astype(str),
+        "underlying": np.where(np.equal(underlying, None), symbols, underlying).astype(str),
+        "expiry": expiry,
+        "strike": strike,
+        "is_call": instrument_type == "CE",
+        "option": np.isin(instrument_type, OPTION_TYPES) & ~np.isnan(strike) & ~np.isnat(expiry),
+        "years": np.maximum((expiry - np.datetime64(as_of, "D")).astype(np.float64), 0.0) / CALENDAR_DAYS,
+    }
+
+
+async def broker_greeks(client: Any, lines: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Broker Greeks for every option line, fetched concurrently through the Greeks cache.
+    Rows stay NaN where the call failed, timed out or returned an incomplete payload."""
+    wanted = np.flatnonzero(lines["option"])
+    out = {name: np.full(len(lines["symbol"]), np.nan) for name in GREEKS}
+    slots = asyncio.Semaphore(max(1, GREEKS_CONCURRENCY))
+    cache = get_greeks_cache()
+
+    async def one(i: int) -> Optional[Dict[str, float]]:
+        async with slots:
+            payload = await asyncio.wait_for(cache.get_greeks(
+                client,
+                exchange=lines["exchange"][i],
+                underlying=lines["underlying"][i],
+                trading_symbol=lines["symbol"][i],
+                expiry=str(lines["expiry"][i]),
+            ), GREEKS_BROKER_TIMEOUT_SECONDS)
+            return parse_greeks(payload)
+
+    outcomes = await asyncio.gather(*(one(i) for i in wanted), return_exceptions=True)
+    failed = 0
+    for i, outcome in zip(wanted, outcomes):
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, dict):
+            for name in GREEKS:
+                out[name][i] = outcome[name]
+        else:
+            failed += 1
+    if failed:
+        logger.warning("Broker Greeks unavailable for %d of %d contracts; computing locally", failed, len(wanted))
+    return out
+
+
+def chain_legs(index: InstrumentIndex, spots: Dict[Tuple[str, date], float]) -> Dict[str, np.ndarray]:
+    """Out-of-the-money legs within GREEKS_CHAIN_WIDTH strikes of ATM for each (underlying,
+    expiry), as parallel arrays. OTM prices carry the most volatility information."""
+    legs: Dict[str, List[Any]] = {name: [] for name in ("symbol", "exchange", "underlying", "expiry", "strike", "is_call", "spot")}
+    for (underlying, expiry), spot in spots.items():
+        try:
+            chain = index.chains.get(underlying, expiry=expiry, atm=spot, width=GREEKS_CHAIN_WIDTH)
+        except ChainNotFound:
+            continue
+        for row in chain["strikes"]:
+            is_call = row["strike"] >= spot
+            leg = row["CE"] if is_call else row["PE"]
+            if leg is None:
+                continue
+            for name, value in zip(legs, (leg["trading_symbol"], leg["exchange"] or "NSE", underlying, expiry, row["strike"], is_call, spot)):
+                legs[name].append(value)
+    return {
+        "symbol": np.array(legs["symbol"], dtype=object),
+        "exchange": np.array(legs["exchange"], dtype=object),
+        "underlying": np.array(legs["underlying"], dtype=object),
+        "expiry": np.array(legs["expiry"], dtype="datetime64[D]"),
+        "strike": np.array(legs["strike"], dtype=np.float64),
+        "is_call": np.array(legs["is_call"], dtype=bool),
+        "spot": np.array(legs["spot"], dtype=np.float64),
+    }
+
+
+def smile_vols(
+    underlying: np.ndarray, expiry: np.ndarray, strike: np.ndarray, legs: Dict[str, np.ndarray], leg_vols: np.ndarray
+) -> np.ndarray:
+    """Volatility at each strike, interpolated (flat beyond the ends) over the solved leg vols of
+    the same underlying and expiry; NaN where that chain has none."""
+    out = np.full(len(strike), np.nan)
+    solved = np.isfinite(leg_vols)
+    for key in set(zip(underlying.tolist(), expiry.tolist())):
+        group = solved & (legs["underlying"] == key[0]) & (legs["expiry"] == np.datetime64(key[1], "D"))
+        if not group.any():
+            continue
+        order = np.argsort(legs["strike"][group])
+        rows = (underlying == key[0]) & (expiry == np.datetime64(key[1], "D"))
+        out[rows] = np.interp(strike[rows], legs["strike"][group][order], leg_vols[group][order])
+    return out
+
+
+def last_closes(session: Session, symbols: List[str]) -> Dict[str, float]:
+    """Latest stored close per symbol; the spot of last resort."""
+    latest = (
+        select(CandleDaily.symbol, func.max(CandleDaily.trade_date).label("trade_date"))
+        .where(CandleDaily.symbol.in_(symbols))
+        .group_by(CandleDaily.symbol)
+        .subquery()
+    )
+    return dict(session.execute(
+        select(CandleDaily.symbol, CandleDaily.close)
+        .join(latest, (CandleDaily.symbol == latest.c.symbol) & (CandleDaily.trade_date == latest.c.trade_date))
+    ).all())
+
+
+async def local_greeks(
+    session: Session,
+    client: Any,
+    index: InstrumentIndex,
+    lines: Dict[str, np.ndarray],
+    rows: np.ndarray,
+    as_of: date,
+    rate: float = RISK_FREE_RATE,
+) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Black-Scholes Greeks for option `rows`, at each contract's own implied vol, or the vol
+    interpolated from its chain's OTM smile when its price is missing or does not solve.
+
+    Spots, held contract prices and chain prices are each fetched in one batched LTP call.
+    Returns per-unit Greeks and the vol used (NaN where none could be found).
+    """
+    underlying, expiry, strike = lines["underlying"][rows], lines["expiry"][rows], lines["strike"][rows]
+    names, first = np.unique(underlying, return_index=True)
+    quoted = await fetch_quotes(client, lines["exchange"][rows][first], np.full(len(names), "CASH", dtype=object), names)
+    missing = names[np.isnan(quoted)].tolist()
+    if missing:
+        closes = await asyncio.to_thread(last_closes, session, missing)
+        quoted = np.array([closes.get(n, np.nan) if np.isnan(q) else q for n, q in zip(names.tolist(), quoted.tolist())])
+    spot = quoted[np.searchsorted(names, underlying)]
+
+    priced = np.isfinite(spot)
+    spots = {(u, e): s for u, e, s in zip(underlying[priced].tolist(), expiry[priced].tolist(), spot[priced].tolist())}
+    legs = chain_legs(index, spots)
+    symbols = np.concatenate([lines["symbol"][rows].astype(object), legs["symbol"]])
+    exchanges = np.concatenate([lines["exchange"][rows].astype(object), legs["exchange"]])
+    prices = await fetch_quotes(client, exchanges, np.full(len(symbols), "FNO", dtype=object), symbols)
+    held_prices, leg_prices = prices[:len(rows)], prices[len(rows):]
+
+    years = lines["years"][rows]
+    vol = black_scholes.implied_vol(held_prices, spot, strike, years, rate, lines["is_call"][rows])
+    if np.isnan(vol).any() and len(legs["symbol"]):
+        leg_years = (legs["expiry"] - np.datetime64(as_of, "D")).astype(np.float64) / CALENDAR_DAYS
+        leg_vols = black_scholes.implied_vol(leg_prices, legs["spot"], legs["strike"], leg_years, rate, legs["is_call"])
+        vol = np.where(np.isnan(vol), smile_vols(underlying, expiry, strike, legs, leg_vols), vol)
+    return black_scholes.greeks(spot, strike, years, vol, rate, lines["is_call"][rows]), vol
+
+
+def _group(labels: List[Tuple[Any, ...]], names: Tuple[str, ...], values: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    if not labels:
+        return []
+    keys, first, inverse = np.unique(
+        np.array(["\x1f".join(map(str, label)) for label in labels]), return_index=True, return_inverse=True
+    )
+    counts = np.bincount(inverse, minlength=len(keys))
+    sums = {name: np.bincount(inverse, weights=values[name], minlength=len(keys)) for name in GREEKS}
+    return [
+        {**dict(zip(names, labels[first[k]])), "lines": int(counts[k]), **{name: round(float(sums[name][k]), 4) for name in GREEKS}}
+        for k in range(len(keys))
+    ]
+
+
+def aggregate(lines: Dict[str, np.ndarray], exposure: Dict[str, np.ndarray], source: np.ndarray) -> Dict[str, Any]:
+    """Position Greeks summed in total, per underlying and per (underlying, expiry)."""
+    usable = source != "unavailable"
+    values = {name: np.where(usable, exposure[name], 0.0) for name in GREEKS}
+    underlying = lines["underlying"].tolist()
+    expiry = [None if e is None else e.isoformat() for e in lines["expiry"].astype(object).tolist()]
+    kept = np.flatnonzero(usable)
+    picked = {name: values[name][kept] for name in GREEKS}
+    return {
+        "totals": {name: round(float(values[name].sum()), 4) for name in GREEKS},
+        "by_underlying": _group([(underlying[i],) for i in kept], ("underlying",), picked),
+        "by_expiry": _group([(underlying[i], expiry[i]) for i in kept], ("underlying", "expiry"), picked),
+        "sources": {name: int((source == name).sum()) for name in ("broker", "local", "linear", "unavailable")},
+        "unavailable": sorted(set(lines["symbol"][~usable].tolist())),
+    }
+
+
+def _load(session: Session, account_id: str, at: datetime):
+    book, _, _ = load_book(session, account_id, at)
+    return book, get_instrument_index() or InstrumentIndex.from_session(session)
+
+
+async def portfolio_greeks(
+    session: Session, client: Any, account_id: str, at: datetime, rate: float = RISK_FREE_RATE
+) -> Dict[str, Any]:
+    """Delta, gamma, vega and theta of the account's book, in underlying units per line.
+
+    Options take the broker's Greeks, fetched concurrently and cached; contracts the broker
+    does not answer for in time are computed locally. Futures and equities are delta one.
+    """
+    book, index = await asyncio.to_thread(_load, session, account_id, at)
+    lines = resolve_lines(index, book, at.date())
+    per_unit = await broker_greeks(client, lines)
+
+    option = lines["option"]
+    source = np.where(option, np.where(np.isfinite(per_unit["delta"]), "broker", "local"), "linear").astype(object)
+    per_unit["delta"][~option] = 1.0
+    for name in ("gamma", "vega", "theta"):
+        per_unit[name][~option] = 0.0
+
+    pending = np.flatnonzero(source == "local")
+    if len(pending):
+        computed, vol = await local_greeks(session, client, index, lines, pending, at.date(), rate)
+        for name in GREEKS:
+            per_unit[name][pending] = computed[name]
+        source[pending[np.isnan(vol)]] = "unavailable"
+
+    exposure = {name: per_unit[name] * lines["quantity"] for name in GREEKS}
+    return {"account_id": account_id, "as_of": at, **aggregate(lines, exposure, source)}
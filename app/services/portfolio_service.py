@@ -1,14 +1,14 @@
-from app.brokers.groww_auth import get_access_token
-from app.brokers.groww_adapter import GrowwAdapter
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.brokers.groww_pool import get_adapter_pool
+from app.services.composite_fetch import fetch_concurrently
 
-def fetch_portfolio():
-    token = get_access_token()
-    groww = GrowwAdapter(token)
+async def fetch_portfolio(account_id: str = DEFAULT_ACCOUNT):
+    groww = await get_adapter_pool(account_id).acquire_async()
 
-    holdings = groww.get_holdings()
-    positions = groww.get_positions()
-
-    return {
-        "holdings": holdings,
-        "positions": positions,
-    }
+    result = await fetch_concurrently(
+        {
+            "holdings": groww.get_holdings,
+            "positions": groww.get_positions,
+        }
+    )
+    return result.to_payload()
@@ -0,0 +1,378 @@
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.brokers.groww_pool import get_adapter_pool
+from app.brokers.market_cache import get_market_cache
+from app.brokers.rate_limit import PRIORITY_BULK, request_priority
+from app.db.models import PortfolioSnapshot, PortfolioSnapshotDaily
+from app.db.session import SessionLocal
+from app.db.upsert import upsert_rows
+from app.services.composite_fetch import fetch_concurrently
+from app.services.holdings_job import _normalize_holding, _normalize_symbol, aggregate_holdings
+
+logger = logging.getLogger(__name__)
+
+# Minutes between intraday captures while the market is open.
+SNAPSHOT_INTERVAL_MINUTES = int(os.getenv("SNAPSHOT_INTERVAL_MINUTES", "5"))
+# Days of intraday change-points kept before they are rolled up into daily rows.
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "7"))
+# Relative LTP move below which a price change alone does not write a row (0 records every change).
+SNAPSHOT_LTP_TOLERANCE = float(os.getenv("SNAPSHOT_LTP_TOLERANCE", "0"))
+# Daily partitions the rollup job keeps created ahead of today (PostgreSQL only). Today's is
+# never created late: rows already in the DEFAULT partition for that day would block it.
+SNAPSHOT_PARTITIONS_AHEAD = 3
+
+KINDS = ("holding", "position")
+_PARTITION_PREFIX = "portfolio_snapshots_p"
+_KEY_COLUMNS = ("account_id", "kind", "symbol")
+_STATE_COLUMNS = ("quantity", "avg_price", "ltp")
+_DAILY_COLUMNS = _STATE_COLUMNS + ("ltp_low", "ltp_high", "changes")
+
+
+def utcnow() -> datetime:
+    """Naive UTC, to the second, as snapshot timestamps are stored."""
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def _entries(payload: Any, key: str) -> List[Dict[str, Any]]:
+    if isinstance(payload, dict):
+        payload = payload.get(key, [])
+    return [entry for entry in payload or [] if isinstance(entry, dict)]
+
+
+def _normalize_position(entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    symbol = _normalize_symbol(entry)
+    if not symbol:
+        return None
+    quantity = entry.get("quantity") or entry.get("net_quantity") or entry.get("net_qty")
+    avg_price = entry.get("net_price") or entry.get("avg_price") or entry.get("average_price")
+    return {"symbol": symbol, "quantity": quantity or 0.0, "avg_price": avg_price}
+
+
+def _ltp_in(entry: Dict[str, Any]) -> Optional[float]:
+    value = entry.get("ltp") or entry.get("last_price") or entry.get("lastPrice")
+    return float(value) if value is not None else None
+
+
+def normalize_snapshot(kind: str, payload: Any) -> Tuple[List[Dict[str, Any]], Dict[str, Tuple[str, str]]]:
+    """Broker holdings or positions as one row per symbol, plus each symbol's (exchange, segment)
+    for the LTP lookup. Rows carry the broker's ltp when the payload has one."""
+    entries = _entries(payload, "holdings" if kind == "holding" else "positions")
+    normalize = _normalize_holding if kind == "holding" else _normalize_position
+    parsed, markets, ltps = [], {}, {}
+    for entry in entries:
+        row = normalize(entry)
+        if not row:
+            continue
+        parsed.append(row)
+        # Holdings are delivery equity; the broker does not say where, so price them on NSE
+        markets.setdefault(row["symbol"], (entry.get("exchange") or "NSE", entry.get("segment") or "CASH"))
+        if _ltp_in(entry) is not None:
+            ltps[row["symbol"]] = _ltp_in(entry)
+    rows = aggregate_holdings(parsed)
+    for row in rows:
+        row["ltp"] = ltps.get(row["symbol"])
+    return rows, markets
+
+
+async def fetch_ltps(client: Any, rows: List[Dict[str, Any]], markets: Dict[str, Tuple[str, str]]) -> None:
+    """Fill in ltp for rows the broker payload left without one, one cached lookup per segment."""
+    by_segment: Dict[str, Dict[str, str]] = {}
+    for row in rows:
+        if row["ltp"] is None and row["quantity"]:
+            exchange, segment = markets[row["symbol"]]
+            by_segment.setdefault(segment, {})[f"{exchange}_{row['symbol']}"] = row["symbol"]
+    prices: Dict[str, float] = {}
+    for segment, keys in by_segment.items():
+        try:
+            quoted = await get_market_cache().get_ltp(client, exchange_trading_symbols=tuple(keys), segment=segment)
+        except Exception as exc:
+            # Rows keep their previous ltp; positions and quantities are still recorded
+            logger.warning("LTP lookup for %d %s symbols failed: %s", len(keys), segment, exc)
+            continue
+        prices.update({keys[key]: value for key, value in quoted.items() if key in keys})
+    for row in rows:
+        if row["ltp"] is None and row["symbol"] in prices:
+            row["ltp"] = float(prices[row["symbol"]])
+
+
+def _ltp_changed(old: Optional[float], new: Optional[float], tolerance: float) -> bool:
+    if old is None or new is None:
+        return new is not None
+    return abs(new - old) > tolerance * abs(old)
+
+
+def encode_deltas(
+    kind: str,
+    rows: List[Dict[str, Any]],
+    previous: Dict[str, Dict[str, Any]],
+    captured_at: datetime,
+    tolerance: float = SNAPSHOT_LTP_TOLERANCE,
+    account_id: str = DEFAULT_ACCOUNT,
+) -> List[Dict[str, Any]]:
+    """Change-points to store for one capture of `kind`.
+
+    A symbol is written when it is new or its quantity, avg_price or ltp moved against
+    `previous` (the last stored row per symbol). A symbol that was held and is now absent gets
+    a quantity 0 row. A missing ltp keeps the previous one rather than recording a gap.
+    """
+    deltas = []
+    for row in rows:
+        last = previous.get(row["symbol"])
+        ltp = row.get("ltp") if row.get("ltp") is not None else (last or {}).get("ltp")
+        if (
+            last is None
+            or last["quantity"] != row["quantity"]
+            or last["avg_price"] != row["avg_price"]
+            or _ltp_changed(last["ltp"], ltp, tolerance)
+        ):
+            deltas.append({"account_id": account_id, "kind": kind, "symbol": row["symbol"], "captured_at": captured_at,
+                           "quantity": row["quantity"], "avg_price": row["avg_price"], "ltp": ltp})
+    seen = {row["symbol"] for row in rows}
+    for symbol, last in previous.items():
+        if symbol not in seen and last["quantity"]:
+            deltas.append({"account_id": account_id, "kind": kind, "symbol": symbol, "captured_at": captured_at,
+                           "quantity": 0.0, "avg_price": None, "ltp": last["ltp"]})
+    return deltas
+
+
+def state_at(
+    session: Session,
+    at: datetime,
+    kind: Optional[str] = None,
+    include_closed: bool = False,
+    account_id: str = DEFAULT_ACCOUNT,
+) -> List[Dict[str, Any]]:
+    """An account's holdings/positions as of `at`: the latest change-point at or before it, per symbol.
+
+    Only rows inside the retention window exist, and the rollup leaves a full row per held
+    symbol at the window's start, so this reads at most one window of change-points.
+    """
+    snapshot = PortfolioSnapshot.__table__
+    latest = select(snapshot.c.kind, snapshot.c.symbol, func.max(snapshot.c.captured_at).label("captured_at"))
+    latest = latest.where(snapshot.c.account_id == account_id, snapshot.c.captured_at <= at)
+    if kind:
+        latest = latest.where(snapshot.c.kind == kind)
+    latest = latest.group_by(snapshot.c.kind, snapshot.c.symbol).subquery()
+    statement = (
+        select(snapshot)
+        .join(latest, and_(
+            snapshot.c.account_id == account_id,
+            snapshot.c.kind == latest.c.kind,
+            snapshot.c.symbol == latest.c.symbol,
+            snapshot.c.captured_at == latest.c.captured_at,
+        ))
+        .order_by(snapshot.c.kind, snapshot.c.symbol)
+    )
+    rows = [dict(row) for row in session.execute(statement).mappings()]
+    return rows if include_closed else [row for row in rows if row["quantity"]]
+
+
+def insert_snapshots(session: Session, deltas: List[Dict[str, Any]]) -> int:
+    """Bulk insert change-points in one executemany, inside the caller's transaction."""
+    if deltas:
+        session.execute(insert(PortfolioSnapshot), deltas)
+    return len(deltas)
+
+
+async def capture_snapshot(account_id: str = DEFAULT_ACCOUNT) -> int:
+    """Record an account's current holdings and positions as change-points. Returns rows written.
+
+    A kind whose broker call fails is skipped for this capture, so a transient error is not
+    mistaken for every symbol being closed.
+    """
+    client = await get_adapter_pool(account_id).acquire_async()
+    # Scheduled captures yield to interactive and order traffic under the rate limit
+    with request_priority(PRIORITY_BULK):
+        fetched = await fetch_concurrently({"holding": client.get_holdings, "position": client.get_positions})
+        captured = {}
+        for kind in KINDS:
+            if kind in fetched.errors:
+                logger.warning("Skipping %s snapshot for %s: %s", kind, account_id, fetched.errors[kind])
+                continue
+            rows, markets = normalize_snapshot(kind, fetched.results[kind])
+            await fetch_ltps(client, rows, markets)
+            captured[kind] = rows
+
+    captured_at = utcnow()
+    session: Session = SessionLocal()
+    try:
+        previous = {kind: {} for kind in captured}
+        for row in state_at(session, captured_at, include_closed=True, account_id=account_id):
+            if row["kind"] in previous:
+                previous[row["kind"]][row["symbol"]] = row
+        deltas = [
+            delta for kind, rows in captured.items()
+            for delta in encode_deltas(kind, rows, previous[kind], captured_at, account_id=account_id)
+        ]
+        written = insert_snapshots(session, deltas)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    logger.info("Portfolio snapshot %s for %s: %d change-points written", captured_at, account_id, written)
+    return written
+
+
+def history(
+    session: Session, symbol: str, kind: str, start: datetime, end: datetime, account_id: str = DEFAULT_ACCOUNT
+) -> Dict[str, List[Dict[str, Any]]]:
+    """A symbol's series over [start, end]: daily rows for days already rolled up, and the
+    intraday change-points, led by the state in effect at `start`. Both are primary-key ranges."""
+    daily = PortfolioSnapshotDaily.__table__
+    days = session.execute(
+        select(daily)
+        .where(daily.c.account_id == account_id, daily.c.kind == kind, daily.c.symbol == symbol)
+        .where(daily.c.as_of_date.between(start.date(), end.date()))
+        .order_by(daily.c.as_of_date)
+    ).mappings()
+
+    snapshot = PortfolioSnapshot.__table__
+    columns = (snapshot.c.captured_at, *(snapshot.c[name] for name in _STATE_COLUMNS))
+    scope = (snapshot.c.account_id == account_id, snapshot.c.kind == kind, snapshot.c.symbol == symbol)
+    opening = session.execute(
+        select(*columns).where(*scope, snapshot.c.captured_at <= start)
+        .order_by(snapshot.c.captured_at.desc()).limit(1)
+    ).mappings().first()
+    points = session.execute(
+        select(*columns).where(*scope, snapshot.c.captured_at > start, snapshot.c.captured_at <= end)
+        .order_by(snapshot.c.captured_at)
+    ).mappings()
+    intraday = ([dict(opening)] if opening else []) + [dict(point) for point in points]
+    return {"daily": [dict(day) for day in days], "intraday": intraday}
+
+
+def _daily_rows(
+    key: Dict[str, str], points: List[Dict[str, Any]], cutoff: date
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """Roll one (account_id, kind, symbol)'s change-points (ordered, all before `cutoff`) into a row per day up to
+    the day before `cutoff`, carrying the state across days without changes. Also returns the
+    state in effect at the cutoff."""
+    rows, state, i = [], None, 0
+    day = points[0]["captured_at"].date()
+    while day < cutoff:
+        opening, changes = state, 0
+        ltps = [state["ltp"]] if state and state["ltp"] is not None else []
+        while i < len(points) and points[i]["captured_at"].date() == day:
+            state, changes = points[i], changes + 1
+            if state["ltp"] is not None:
+                ltps.append(state["ltp"])
+            i += 1
+        # A day is recorded while the symbol is held, including the day it is closed
+        if changes or (opening and opening["quantity"]):
+            rows.append({
+                **key, "as_of_date": day,
+                "quantity": state["quantity"], "avg_price": state["avg_price"], "ltp": state["ltp"],
+                "ltp_low": min(ltps, default=None), "ltp_high": max(ltps, default=None), "changes": changes,
+            })
+        elif state is not None and not state["quantity"] and i == len(points):
+            break
+        day += timedelta(days=1)
+    return rows, state
+
+
+def rollup_snapshots(session: Session, cutoff: datetime) -> Dict[str, int]:
+    """Compact change-points before `cutoff` (a midnight) into portfolio_snapshots_daily and
+    remove them, inside the caller's transaction.
+
+    Each symbol still held at the cutoff gets a full row stamped at the cutoff, so the
+    remaining change-points are self-contained: the state at any later time is still the
+    latest row at or before it.
+    """
+    snapshot = PortfolioSnapshot.__table__
+    result = session.execute(
+        select(snapshot).where(snapshot.c.captured_at < cutoff)
+        .order_by(snapshot.c.account_id, snapshot.c.kind, snapshot.c.symbol, snapshot.c.captured_at)
+        .execution_options(yield_per=5000)
+    ).mappings()
+    at_cutoff = set(map(tuple, session.execute(
+        select(snapshot.c.account_id, snapshot.c.kind, snapshot.c.symbol).where(snapshot.c.captured_at == cutoff)
+    )))
+
+    daily, keyframes = [], []
+    for key, points in groupby(result, key=lambda row: (row["account_id"], row["kind"], row["symbol"])):
+        rows, state = _daily_rows(dict(zip(_KEY_COLUMNS, key)), list(points), cutoff.date())
+        daily.extend(rows)
+        if state["quantity"] and key not in at_cutoff:
+            keyframes.append(dict(state, captured_at=cutoff))
+
+    # A day rolled up again (e.g. after change-points were backfilled) replaces its earlier row
+    upsert_rows(session, PortfolioSnapshotDaily, daily, update=_DAILY_COLUMNS)
+    insert_snapshots(session, keyframes)
+    dropped = drop_partitions(session, cutoff)
+    deleted = session.execute(delete(PortfolioSnapshot).where(PortfolioSnapshot.captured_at < cutoff)).rowcount
+    return {"daily": len(daily), "keyframes": len(keyframes), "partitions_dropped": dropped, "deleted": deleted}
+
+
+def _partition_day(name: str) -> Optional[date]:
+    try:
+        return datetime.strptime(name[len(_PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+def _partitions(session: Session) -> Dict[str, date]:
+    names = session.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'portfolio_snapshots'"
+    )).scalars()
+    return {name: _partition_day(name) for name in names if name.startswith(_PARTITION_PREFIX) and _partition_day(name)}
+
+
+def ensure_partitions(session: Session, days: Iterable[date]) -> int:
+    """Create the daily partitions for `days` that do not exist yet (PostgreSQL only)."""
+    if session.get_bind().dialect.name != "postgresql":
+        return 0
+    existing = set(_partitions(session).values())
+    created = 0
+    for day in days:
+        if day in existing:
+            continue
+        session.execute(text(
+            f"CREATE TABLE {_PARTITION_PREFIX}{day:%Y%m%d} PARTITION OF portfolio_snapshots "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        ))
+        created += 1
+    return created
+
+
+def drop_partitions(session: Session, cutoff: datetime) -> int:
+    """Drop daily partitions that end at or before `cutoff`; far cheaper than deleting their rows."""
+    if session.get_bind().dialect.name != "postgresql":
+        return 0
+    dropped = 0
+    for name, day in _partitions(session).items():
+        if datetime.combine(day + timedelta(days=1), time()) <= cutoff:
+            session.execute(text(f"DROP TABLE {name}"))
+            dropped += 1
+    return dropped
+
+
+def rollup_portfolio_snapshots() -> Dict[str, int]:
+    """Daily job: roll up change-points older than the retention window and create upcoming partitions."""
+    today = utcnow().date()
+    cutoff = datetime.combine(today - timedelta(days=SNAPSHOT_RETENTION_DAYS), time())
+    session: Session = SessionLocal()
+    try:
+        counts = rollup_snapshots(session, cutoff)
+        counts["partitions_created"] = ensure_partitions(
+            session, (today + timedelta(days=n) for n in range(1, SNAPSHOT_PARTITIONS_AHEAD + 1))
+        )
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    logger.info("Portfolio snapshot rollup before %s: %s", cutoff, counts)
+    return counts
@@ -0,0 +1,409 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.db.models import StressScenario
+from app.services import black_scholes
+from app.services.black_scholes import CALENDAR_DAYS, RISK_FREE_RATE, TRADING_DAYS
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.option_chain import OPTION_TYPES
+from app.services.portfolio_snapshots import utcnow
+from app.services.valuation import Book, load_book
+from app.services.value_at_risk import ReturnMatrix, get_return_matrix
+
+logger = logging.getLogger(__name__)
+
+# Lowest volatility a downward vol shock can take an underlying to.
+STRESS_MIN_VOL = float(os.getenv("STRESS_MIN_VOL", "0.01"))
+# Largest spot x vol grid one request may ask for.
+STRESS_MAX_GRID_POINTS = int(os.getenv("STRESS_MAX_GRID_POINTS", "441"))
+# Market inputs (candles version, instruments version, trade date) whose caches are kept at once.
+STRESS_MARKET_CACHE_SIZE = int(os.getenv("STRESS_MARKET_CACHE_SIZE", "4"))
+
+Grid = Tuple[Tuple[float, ...], Tuple[float, ...]]
+Market = Tuple[str, str, date]
+
+
+def _shocks(extent: float, points: int) -> Tuple[float, ...]:
+    values = np.linspace(-extent, extent, points) if points > 1 else np.zeros(points)
+    return tuple(round(float(x), 6) for x in values)
+
+
+def shock_grid(spot_range: float, spot_points: int, vol_range: float, vol_points: int) -> Grid:
+    """Spot moves in percent and vol moves in vol points, each evenly spaced and symmetric
+    around zero (a single point is no move)."""
+    return _shocks(spot_range, spot_points), _shocks(vol_range, vol_points)
+
+
+@dataclass
+class Chain:
+    """Every live contract on one underlying, sorted by trading symbol, priced per lot.
+
+    The underlying itself is one of the linear contracts (a lot of 1), so holdings are
+    repriced like any other line. Options are valued at the underlying's historical volatility.
+    """
+
+    underlying: str
+    spot: float
+    vol: float
+    symbols: np.ndarray
+    lot_size: np.ndarray
+    option: np.ndarray
+    is_call: np.ndarray
+    strike: np.ndarray
+    years: np.ndarray
+    base: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def rows_of(self, symbols: np.ndarray) -> np.ndarray:
+        """Row of each symbol, -1 where it is not a live contract on this underlying."""
+        keys = np.asarray(symbols, dtype=object).astype(str)
+        slots = np.minimum(np.searchsorted(self.symbols, keys), len(self.symbols) - 1)
+        return np.where(self.symbols[slots] == keys, slots, -1)
+
+    def reprice(self, spot_shocks: np.ndarray, vol_shocks: np.ndarray, rate: float = RISK_FREE_RATE) -> np.ndarray:
+        """P&L per lot of every contract, contracts x spot shocks x vol shocks. Moves are
+        instantaneous: time to expiry is unchanged."""
+        moves = np.asarray(spot_shocks, dtype=np.float64) / 100.0
+        vols = np.maximum(self.vol + np.asarray(vol_shocks, dtype=np.float64) / 100.0, STRESS_MIN_VOL)
+        pnl = np.broadcast_to(
+            (self.lot_size * self.spot)[:, None, None] * moves[None, :, None],
+            (len(self), len(moves), len(vols)),
+        ).copy()
+        if self.option.any():
+            options = np.flatnonzero(self.option)
+            values = black_scholes.price(
+                self.spot * (1.0 + moves)[None, :, None],
+                self.strike[options, None, None],
+                self.years[options, None, None],
+                vols[None, None, :],
+                rate,
+                self.is_call[options, None, None],
+            )
+            pnl[options] = self.lot_size[options, None, None] * (values - self.base[options, None, None])
+        return pnl
+
+
+def build_chain(
+    index: Optional[InstrumentIndex], underlying: str, spot: float, vol: float, as_of: date, rate: float = RISK_FREE_RATE
+) -> Chain:
+    """Contract terms from the instruments index (strike_price, expiry_date, lot_size); contracts
+    that expired before `as_of` are left out."""
+    positions = np.empty(0, dtype=np.intp)
+    if index is not None:
+        positions = index.underlying_groups().get(underlying, positions)
+    today = np.datetime64(as_of, "D")
+
+    def column(name: str, head: Any) -> np.ndarray:
+        if not len(positions):
+            return np.array([head])
+        values = index.columns[name][positions]
+        return np.concatenate([np.array([head], dtype=values.dtype), values])
+
+    expiry = column("expiry_date", np.datetime64("NaT"))
+    live = np.isnat(expiry) | (expiry >= today)
+    symbols = column("trading_symbol", underlying)[live].astype(str)
+    kind = column("instrument_type", None)[live]
+    lot_size = column("lot_size", 1.0)[live].astype(np.float64)
+    strike = column("strike_price", np.nan)[live].astype(np.float64)
+    days = np.where(np.isnat(expiry[live]), 0.0, (expiry[live] - today).astype(np.float64))
+    order = np.argsort(symbols, kind="stable")
+    symbols, kind, lot_size, strike, days = symbols[order], kind[order], lot_size[order], strike[order], days[order]
+
+    option = np.isin(kind, OPTION_TYPES) & np.isfinite(strike)
+    is_call = kind == "CE"
+    years = days / CALENDAR_DAYS
+    lot_size = np.where(np.isfinite(lot_size) & (lot_size > 0), lot_size, 1.0)
+    base = np.where(option, black_scholes.price(spot, np.where(option, strike, spot), years, vol, rate, is_call), 0.0)
+    return Chain(underlying, spot, vol, symbols, lot_size, option, is_call, strike, years, base)
+
+
+@dataclass
+class ScenarioBook:
+    updated_at: datetime
+    lots: Dict[Tuple[str, str], Tuple[str, float]]
+    pnl: Dict[str, float]
+
+
+@dataclass
+class MarketCache:
+    """Chains, grid surfaces and per-scenario repricings for one set of market inputs, and the
+    last evaluated lots and P&L per (account, scenario), re-summed only where positions changed."""
+
+    chains: Dict[str, Chain] = field(default_factory=dict)
+    surfaces: Dict[Tuple[str, Grid], np.ndarray] = field(default_factory=dict)
+    scenario_pnl: Dict[Tuple[str, str, datetime], np.ndarray] = field(default_factory=dict)
+    books: Dict[Tuple[str, str], ScenarioBook] = field(default_factory=dict)
+
+
+# Least recently used last; requests for other dates or versions get their own cache
+_markets: "OrderedDict[Market, MarketCache]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def market_cache(market: Market) -> MarketCache:
+    with _lock:
+        cache = _markets.get(market)
+        if cache is None:
+            cache = _markets[market] = MarketCache()
+            while len(_markets) > STRESS_MARKET_CACHE_SIZE:
+                _markets.popitem(last=False)
+        else:
+            _markets.move_to_end(market)
+        return cache
+
+
+def _cached(store: Dict[Any, Any], key: Any, build: Callable[[], Any]) -> Any:
+    with _lock:
+        value = store.get(key)
+    if value is None:
+        value = build()
+        with _lock:
+            value = store.setdefault(key, value)
+    return value
+
+
+def forget_scenario(name: str) -> None:
+    """Drop cached repricings and account state of a scenario that was changed or deleted."""
+    with _lock:
+        for cache in _markets.values():
+            for key in [key for key in cache.scenario_pnl if key[1] == name]:
+                del cache.scenario_pnl[key]
+            for key in [key for key in cache.books if key[1] == name]:
+                del cache.books[key]
+
+
+@dataclass
+class Exposure:
+    """The book's lines resolved to chains: per underlying, the chain rows and lots held, and
+    the cache of the market they were resolved against."""
+
+    market: MarketCache
+    chains: Dict[str, Chain]
+    rows: Dict[str, np.ndarray]
+    lots: Dict[str, np.ndarray]
+    keys: Dict[str, List[Tuple[str, str]]]
+    uncovered: List[str]
+
+
+def resolve(matrix: ReturnMatrix, index: Optional[InstrumentIndex], book: Book, as_of: date, market: Optional[MarketCache] = None) -> Exposure:
+    """Group the book's lines by underlying (the instrument's underlying_symbol, else the symbol
+    itself) and find each in its underlying's chain. Lines without price history for their
+    underlying, or that are not live contracts, are uncovered. Chains are cached in `market`,
+    which must belong to `matrix`, `index` and `as_of`."""
+    symbols = book.symbol.astype(str)
+    positions = index.positions_of(symbols) if index is not None else np.full(len(symbols), -1)
+    underlying = np.full(len(symbols), None, dtype=object)
+    if index is not None:
+        listed = positions >= 0
+        underlying[listed] = index.columns["underlying_symbol"][positions[listed]]
+    underlying = np.where(np.equal(underlying, None), symbols, underlying).astype(str)
+
+    held = np.unique(underlying)
+    matrix_rows = matrix.positions_of(held)
+    vols = np.sqrt(np.diag(np.asarray(matrix.covariance)) * TRADING_DAYS) if len(matrix) else np.empty(0)
+    exposure = Exposure(market or MarketCache(), {}, {}, {}, {}, [])
+    keys = book.keys()
+    for name, row in zip(held.tolist(), matrix_rows.tolist()):
+        lines = np.flatnonzero(underlying == name)
+        if row < 0:
+            exposure.uncovered.extend(symbols[lines].tolist())
+            continue
+        chain = _cached(exposure.market.chains, name, lambda: build_chain(index, name, float(matrix.last_close[row]), float(vols[row]), as_of))
+        rows = chain.rows_of(symbols[lines])
+        exposure.uncovered.extend(symbols[lines[rows < 0]].tolist())
+        lines, rows = lines[rows >= 0], rows[rows >= 0]
+        if not len(lines):
+            continue
+        exposure.chains[name] = chain
+        exposure.rows[name] = rows
+        exposure.lots[name] = book.quantity[lines] / chain.lot_size[rows]
+        exposure.keys[name] = [keys[i] for i in lines]
+    exposure.uncovered = sorted(set(exposure.uncovered))
+    return exposure
+
+
+def _load(session: Session, account_id: str, at: datetime) -> Tuple[ReturnMatrix, Exposure, int]:
+    book, _, _ = load_book(session, account_id, at)
+    matrix = get_return_matrix(session)
+    index = get_instrument_index() or InstrumentIndex.from_session(session)
+    market = market_cache((matrix.version, index.version, at.date()))
+    return matrix, resolve(matrix, index, book, at.date(), market), len(book)
+
+
+def grid_pnl(exposure: Exposure, grid: Grid) -> Dict[str, np.ndarray]:
+    """Portfolio P&L per underlying over the grid: the lots held weighting each contract's
+    surface, which is computed once per chain and grid."""
+    spot_shocks, vol_shocks = grid
+    result = {}
+    for name, chain in exposure.chains.items():
+        surface = _cached(exposure.market.surfaces, (name, grid), lambda: chain.reprice(np.array(spot_shocks), np.array(vol_shocks)))
+        result[name] = np.tensordot(exposure.lots[name], surface[exposure.rows[name]], axes=1)
+    return result
+
+
+def stress_grid(
+    session: Session,
+    account_id: str = DEFAULT_ACCOUNT,
+    spot_range: float = 10.0,
+    spot_points: int = 9,
+    vol_range: float = 10.0,
+    vol_points: int = 5,
+    at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """P&L of the account's book with every underlying moved by each spot shock (percent) and
+    vol shock (vol points), in total and per underlying."""
+    at = at or utcnow()
+    matrix, exposure, lines = _load(session, account_id, at)
+    grid = shock_grid(spot_range, spot_points, vol_range, vol_points)
+    by_underlying = grid_pnl(exposure, grid)
+    total = sum(by_underlying.values(), np.zeros((len(grid[0]), len(grid[1]))))
+    worst = np.unravel_index(np.argmin(total), total.shape)
+    return {
+        "account_id": account_id,
+        "as_of": matrix.as_of,
+        "lines": lines,
+        "spot_shocks": list(grid[0]),
+        "vol_shocks": list(grid[1]),
+        "total": np.round(total, 2).tolist(),
+        "worst": {
+            "spot_shock": grid[0][worst[0]],
+            "vol_shock": grid[1][worst[1]],
+            "pnl": round(float(total[worst]), 2),
+        },
+        "by_underlying": [
+            {
+                "underlying": name,
+                "spot": round(exposure.chains[name].spot, 4),
+                "vol": round(exposure.chains[name].vol, 4),
+                "pnl": np.round(values, 2).tolist(),
+            }
+            for name, values in sorted(by_underlying.items())
+        ],
+        "uncovered": exposure.uncovered,
+    }
+
+
+def list_scenarios(session: Session) -> List[StressScenario]:
+    return session.scalars(select(StressScenario).order_by(StressScenario.name)).all()
+
+
+def save_scenario(
+    session: Session,
+    name: str,
+    spot_shock: float,
+    vol_shock: float = 0.0,
+    overrides: Optional[Dict[str, Dict[str, Optional[float]]]] = None,
+    description: Optional[str] = None,
+) -> StressScenario:
+    scenario = session.get(StressScenario, name) or StressScenario(name=name)
+    scenario.description = description
+    scenario.spot_shock = spot_shock
+    scenario.vol_shock = vol_shock
+    scenario.overrides = overrides or {}
+    scenario.updated_at = utcnow()
+    session.add(scenario)
+    session.commit()
+    forget_scenario(name)
+    return scenario
+
+
+def delete_scenario(session: Session, name: str) -> bool:
+    scenario = session.get(StressScenario, name)
+    if scenario is None:
+        return False
+    session.delete(scenario)
+    session.commit()
+    forget_scenario(name)
+    return True
+
+
+def scenario_shocks(scenario: StressScenario, underlying: str) -> Tuple[float, float]:
+    """The scenario's (spot percent, vol points) move for one underlying."""
+    override = (scenario.overrides or {}).get(underlying) or {}
+    spot = override.get("spot_shock")
+    vol = override.get("vol_shock")
+    return (
+        scenario.spot_shock if spot is None else spot,
+        (scenario.vol_shock or 0.0) if vol is None else vol,
+    )
+
+
+def _unit_pnl(market: MarketCache, chain: Chain, scenario: StressScenario) -> np.ndarray:
+    spot, vol = scenario_shocks(scenario, chain.underlying)
+    return _cached(
+        market.scenario_pnl,
+        (chain.underlying, scenario.name, scenario.updated_at),
+        lambda: chain.reprice(np.array([spot]), np.array([vol]))[:, 0, 0],
+    )
+
+
+def evaluate_scenario(account_id: str, exposure: Exposure, scenario: StressScenario) -> Dict[str, Any]:
+    """P&L of one scenario. The account's lots and per-underlying P&L from the last evaluation
+    are kept, so when only positions changed just those lines are repriced and re-summed."""
+    lots = {
+        key: (name, float(value))
+        for name in exposure.chains
+        for key, value in zip(exposure.keys[name], exposure.lots[name].tolist())
+    }
+    market = exposure.market
+    with _lock:
+        previous = market.books.get((account_id, scenario.name))
+    if previous is None or previous.updated_at != scenario.updated_at:
+        previous = ScenarioBook(scenario.updated_at, {}, {})
+
+    pnl = dict(previous.pnl)
+    changed = 0
+    for key in set(previous.lots) | set(lots):
+        old_name, old_lots = previous.lots.get(key, (None, 0.0))
+        new_name, new_lots = lots.get(key, (old_name, 0.0))
+        if old_name == new_name and old_lots == new_lots:
+            continue
+        changed += 1
+        for name, delta in ((old_name, -old_lots), (new_name, new_lots)):
+            if name is None or not delta:
+                continue
+            chain = market.chains.get(name) or exposure.chains[name]
+            row = chain.rows_of(np.array([key[1]]))[0]
+            pnl[name] = pnl.get(name, 0.0) + delta * float(_unit_pnl(market, chain, scenario)[row])
+    pnl = {name: value for name, value in pnl.items() if name in exposure.chains}
+
+    with _lock:
+        market.books[(account_id, scenario.name)] = ScenarioBook(scenario.updated_at, lots, pnl)
+    return {
+        "name": scenario.name,
+        "description": scenario.description,
+        "pnl": round(sum(pnl.values()), 2),
+        "by_underlying": {name: round(value, 2) for name, value in sorted(pnl.items())},
+        "repriced_lines": changed,
+    }
+
+
+def stress_scenarios(
+    session: Session, account_id: str = DEFAULT_ACCOUNT, names: Optional[List[str]] = None, at: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """P&L of the account's book under each stored scenario (or only those named).
+
+    Only the repricing is incremental: every request still loads the full book with load_book and
+    resolves all of its lines against the chains."""
+    at = at or utcnow()
+    matrix, exposure, lines = _load(session, account_id, at)
+    scenarios = [s for s in list_scenarios(session) if names is None or s.name in names]
+    return {
+        "account_id": account_id,
+        "as_of": matrix.as_of,
+        "lines": lines,
+        "scenarios": [evaluate_scenario(account_id, exposure, scenario) for scenario in scenarios],
+        "uncovered": exposure.uncovered,
+    }
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.brokers.market_cache import get_market_cache
+from app.db.models import HoldingDaily
+from app.services.instrument_index import InstrumentIndex, get_instrument_index
+from app.services.portfolio_snapshots import state_at, utcnow
+
+# Instrument master columns carried onto each book line.
+REFERENCE_COLUMNS = ("exchange", "segment", "instrument_type", "underlying_symbol", "lot_size")
+# Per-line figures summed in the totals and in every breakdown.
+SUM_COLUMNS = ("market_value", "cost", "unrealized_pnl", "day_pnl", "gross_exposure")
+# Breakdowns returned, keyed by the line column they group on.
+BREAKDOWNS = {"by_symbol": "symbol", "by_underlying": "underlying", "by_segment": "segment"}
+# How far before now `at` may be and still be priced with live quotes; older books are valued
+# at the snapshot prices recorded as of `at`.
+VALUATION_LIVE_SECONDS = float(os.getenv("VALUATION_LIVE_SECONDS", "300"))
+
+# The trading day, and so day P&L, starts at midnight IST.
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Book:
+    """An account's lines, holdings and open positions, as parallel arrays."""
+
+    kind: np.ndarray
+    symbol: np.ndarray
+    quantity: np.ndarray
+    avg_price: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.symbol)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict[str, Any]]) -> "Book":
+        return cls(
+            kind=np.array([row["kind"] for row in rows], dtype=object),
+            symbol=np.array([row["symbol"] for row in rows], dtype=object),
+            quantity=np.array([row["quantity"] for row in rows], dtype=np.float64),
+            avg_price=np.array([row["avg_price"] for row in rows], dtype=np.float64),
+        )
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return list(zip(self.kind.tolist(), self.symbol.tolist()))
+
+
+def trading_day_start(at: datetime) -> datetime:
+    """Naive UTC time of the IST midnight that starts `at`'s trading day."""
+    local = at.replace(tzinfo=timezone.utc).astimezone(_IST)
+    return datetime.combine(local.date(), time(), _IST).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def load_book(session: Session, account_id: str, at: datetime) -> Tuple[Book, Dict[Tuple[str, str], float], Dict[Tuple[str, str], float]]:
+    """The account's holdings_daily rows of the last day up to `at` plus its open positions at `at`,
+    with the last recorded price of each line at `at` (from the snapshots), and of each line held
+    at the start of the trading day (NaN where none was recorded)."""
+    latest = session.scalar(
+        select(func.max(HoldingDaily.as_of_date))
+        .where(HoldingDaily.account_id == account_id, HoldingDaily.as_of_date <= at.date())
+    )
+    holdings = [] if latest is None else session.execute(
+        select(HoldingDaily.symbol, HoldingDaily.quantity, HoldingDaily.avg_price)
+        .where(HoldingDaily.account_id == account_id, HoldingDaily.as_of_date == latest, HoldingDaily.quantity != 0)
+    ).mappings().all()
+
+    current = state_at(session, at, include_closed=True, account_id=account_id)
+    opening = state_at(session, trading_day_start(at), include_closed=True, account_id=account_id)
+    rows = [dict(row, kind="holding") for row in holdings]
+    rows += [row for row in current if row["kind"] == "position" and row["quantity"]]
+    return (
+        Book.from_rows(rows),
+        {(row["kind"], row["symbol"]): row["ltp"] for row in current if row["ltp"] is not None},
+        {(row["kind"], row["symbol"]): np.nan if row["ltp"] is None else row["ltp"] for row in opening if row["quantity"]},
+    )
+
+
+def reference_data(index: InstrumentIndex, symbols: np.ndarray) -> Dict[str, np.ndarray]:
+    """Instrument master columns for each symbol; unlisted symbols get None / NaN."""
+    positions = index.positions_of(symbols)
+    listed = positions >= 0
+    reference = {}
+    for name in REFERENCE_COLUMNS:
+        column = index.columns[name]
+        values = np.full(len(symbols), np.nan if column.dtype.kind == "f" else None, dtype=column.dtype)
+        values[listed] = column[positions[listed]]
+        reference[name] = values
+    return reference
+
+
+async def fetch_quotes(client: Any, exchange: np.ndarray, segment: np.ndarray, symbol: np.ndarray) -> np.ndarray:
+    """LTP for every line, one cached, batched lookup per segment (run concurrently). NaN where
+    the broker returned nothing or the segment's lookup failed."""
+    keys = np.array([f"{e or 'NSE'}_{s}" for e, s in zip(exchange.tolist(), symbol.tolist())], dtype=object)
+    segment = np.array([s or "CASH" for s in segment.tolist()], dtype=object)
+    segments = np.unique(segment.astype(str)).tolist() if len(segment) else []
+
+    async def one(name: str) -> Dict[str, Any]:
+        wanted = tuple(dict.fromkeys(keys[segment == name].tolist()))
+        try:
+            return await get_market_cache().get_ltp(client, exchange_trading_symbols=wanted, segment=name)
+        except Exception as exc:
+            logger.warning("LTP lookup for %d %s lines failed: %s", len(wanted), name, exc)
+            return {}
+
+    quoted: Dict[str, Any] = {}
+    for result in await asyncio.gather(*(one(name) for name in segments)):
+        quoted.update(result)
+    return np.array([quoted.get(key, np.nan) for key in keys.tolist()], dtype=np.float64)
+
+
+def _or(values: np.ndarray, fallback: Any) -> np.ndarray:
+    return np.where(np.equal(values, None), fallback, values)
+
+
+def _lookup(mapping: Dict[Tuple[str, str], float], keys: List[Tuple[str, str]]) -> np.ndarray:
+    return np.array([mapping.get(key, np.nan) for key in keys], dtype=np.float64)
+
+
+def value_book(
+    book: Book,
+    reference: Dict[str, np.ndarray],
+    ltp: np.ndarray,
+    day_open: np.ndarray,
+    opened_today: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """Per-line valuation as arrays, computed over the whole book at once.
+
+    Quantities are in units (Groww reports F&O quantity in units, not lots), so value is
+    quantity x price for every instrument type. Day P&L is measured from the last price before
+    the trading day; a line opened today (by default, a position without that price) is measured
+    from its avg_price. Lines without an LTP, and other lines without an opening price, stay NaN
+    in the affected columns and are left out of the sums.
+    """
+    quantity = book.quantity
+    if opened_today is None:
+        opened_today = np.isnan(day_open) & (book.kind == "position")
+    day_basis = np.where(opened_today, book.avg_price, day_open)
+    market_value = quantity * ltp
+    lot_size = reference["lot_size"]
+    return {
+        "kind": book.kind,
+        "symbol": book.symbol,
+        # Equities are their own underlying
+        "underlying": _or(reference["underlying_symbol"], book.symbol),
+        "segment": _or(reference["segment"], "UNKNOWN"),
+        "exchange": reference["exchange"],
+        "instrument_type": reference["instrument_type"],
+        "quantity": quantity,
+        "lots": np.where(lot_size > 0, quantity / np.where(lot_size > 0, lot_size, 1.0), np.nan),
+        "avg_price": book.avg_price,
+        "ltp": ltp,
+        "market_value": market_value,
+        "cost": quantity * book.avg_price,
+        "unrealized_pnl": quantity * (ltp - book.avg_price),
+        "day_pnl": quantity * (ltp - day_basis),
+        "gross_exposure": np.abs(market_value),
+    }
+
+
+def _sums(inverse: np.ndarray, groups: int, lines: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {
+        name: np.bincount(inverse, weights=np.nan_to_num(lines[name]), minlength=groups)
+        for name in SUM_COLUMNS
+    }
+
+
+def breakdown(lines: Dict[str, np.ndarray], column: str) -> List[Dict[str, Any]]:
+    """Sums of SUM_COLUMNS per value of `column`, largest gross exposure first."""
+    if not len(lines[column]):
+        return []
+    labels, inverse = np.unique(lines[column].astype(str), return_inverse=True)
+    sums = _sums(inverse, len(labels), lines)
+    counts = np.bincount(inverse, minlength=len(labels))
+    net = sums["market_value"]
+    order = np.argsort(-sums["gross_exposure"], kind="stable")
+    values = {name: np.round(sums[name][order], 2).tolist() for name in SUM_COLUMNS}
+    return [
+        {column: label, "lines": count, "net_exposure": round(n, 2), **{name: values[name][i] for name in SUM_COLUMNS}}
+        for i, (label, count, n) in enumerate(zip(labels[order].tolist(), counts[order].tolist(), net[order].tolist()))
+    ]
+
+
+def summarize(lines: Dict[str, np.ndarray], include_lines: bool = False) -> Dict[str, Any]:
+    totals = {name: round(float(np.nansum(lines[name])), 2) for name in SUM_COLUMNS}
+    totals["net_exposure"] = totals["market_value"]
+    unpriced = np.isnan(lines["ltp"])
+    result: Dict[str, Any] = {
+        "lines": len(lines["symbol"]),
+        "totals": totals,
+        "unpriced": lines["symbol"][unpriced].tolist(),
+        # Priced, but with no price at the start of the day to measure day P&L from
+        "day_pnl_unknown": lines["symbol"][~unpriced & np.isnan(lines["day_pnl"])].tolist(),
+        **{name: breakdown(lines, column) for name, column in BREAKDOWNS.items()},
+    }
+    if include_lines:
+        names = list(lines)
+        columns = [
+            [None if v != v else v for v in lines[name].tolist()] if lines[name].dtype.kind == "f" else lines[name].tolist()
+            for name in names
+        ]
+        result["positions"] = [dict(zip(names, row)) for row in zip(*columns)]
+    return result
+
+
+def _load(session: Session, account_id: str, at: datetime):
+    # All DB work in one worker-thread hop; the loaded index is used when there is one
+    book, last_seen, day_open = load_book(session, account_id, at)
+    return book, last_seen, day_open, get_instrument_index() or InstrumentIndex.from_session(session)
+
+
+async def valuation(
+    session: Session, client: Any, account_id: str, at: datetime, include_lines: bool = False
+) -> Dict[str, Any]:
+    """Value the account's book as it was at `at`. A book within VALUATION_LIVE_SECONDS of now is
+    priced with live LTPs, falling back to the last snapshot price for lines the broker does not
+    quote; an older one only with the snapshot prices recorded up to `at`.
+
+    A line missing from the day's opening state was opened today, and its day P&L is measured
+    from avg_price. Holdings get that only if there is an opening state at all; without one their
+    day P&L is unknown and reported as null.
+    """
+    book, last_seen, day_open, index = await asyncio.to_thread(_load, session, account_id, at)
+    reference = reference_data(index, book.symbol)
+    keys = book.keys()
+    live = at >= utcnow() - timedelta(seconds=VALUATION_LIVE_SECONDS)
+    ltp = _lookup(last_seen, keys)
+    if live:
+        quoted = await fetch_quotes(client, reference["exchange"], reference["segment"], book.symbol)
+        ltp = np.where(np.isnan(quoted), ltp, quoted)
+    held_at_open = np.array([key in day_open for key in keys], dtype=bool)
+    opened_today = ~held_at_open & ((book.kind == "position") | bool(day_open))
+    lines = value_book(book, reference, ltp, _lookup(day_open, keys), opened_today)
+    return {
+        "account_id": account_id,
+        "as_of": at,
+        "prices": "live" if live else "snapshots",
+        **summarize(lines, include_lines),
+    }
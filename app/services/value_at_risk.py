@@ -0,0 +1,306 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import date
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.brokers.accounts import DEFAULT_ACCOUNT
+from app.db.models import CandleDaily, HoldingDaily
+from app.services.dataset_version import CANDLES, get_stamp
+
+logger = logging.getLogger(__name__)
+
+# Daily returns per symbol in the matrix.
+VAR_LOOKBACK_DAYS = int(os.getenv("VAR_LOOKBACK_DAYS", "250"))
+# Returns a symbol needs inside the lookback to be modelled; thinner histories are reported as uncovered.
+VAR_MIN_OBSERVATIONS = int(os.getenv("VAR_MIN_OBSERVATIONS", "20"))
+# EWMA decay of the volatility filter in filtered historical simulation (RiskMetrics daily value).
+VAR_EWMA_LAMBDA = float(os.getenv("VAR_EWMA_LAMBDA", "0.94"))
+# Where the memory-mapped matrices live, one directory per candles version and lookback.
+VAR_CACHE_DIR = os.getenv("VAR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "risk-engine-var"))
+
+METHODS = ("historical", "parametric", "filtered")
+# Arrays persisted per matrix; all but `symbols` are opened memory-mapped.
+_ARRAYS = ("symbols", "dates", "last_close", "returns", "filtered", "covariance")
+
+
+class ReturnMatrix:
+    """Daily log returns of every symbol with stored candles, symbols x days.
+
+    Built once per candles version (see dataset_version) along with everything that does not
+    depend on the book: the covariance matrix and the EWMA-filtered returns. Arrays are saved
+    as .npy files and opened memory-mapped, so worker processes and restarts share one copy
+    and a VaR run only reads the rows of the symbols it holds.
+    """
+
+    def __init__(self, version: str, lookback: int, arrays: Dict[str, np.ndarray]):
+        self.version = version
+        self.lookback = lookback
+        self.symbols = arrays["symbols"]
+        self.dates = arrays["dates"]
+        self.last_close = arrays["last_close"]
+        self.returns = arrays["returns"]
+        self.filtered = arrays["filtered"]
+        self.covariance = arrays["covariance"]
+        self._sorted = np.argsort(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def as_of(self) -> Optional[date]:
+        return self.dates[-1].astype(object) if len(self.dates) else None
+
+    def positions_of(self, symbols: Sequence[str]) -> np.ndarray:
+        """Row of each symbol, -1 where it is not in the matrix."""
+        keys = np.asarray(symbols, dtype=str)
+        if not len(self.symbols):
+            return np.full(len(keys), -1, dtype=np.intp)
+        slots = np.minimum(np.searchsorted(self.symbols, keys, sorter=self._sorted), len(self.symbols) - 1)
+        rows = self._sorted[slots]
+        return np.where(self.symbols[rows] == keys, rows, -1)
+
+    @classmethod
+    def build(cls, session: Session, version: str, lookback: int = VAR_LOOKBACK_DAYS) -> "ReturnMatrix":
+        return cls(version, lookback, compute_arrays(load_closes(session, lookback)))
+
+    def save(self, directory: str) -> None:
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=False)
+
+    @classmethod
+    def open(cls, directory: str, version: str, lookback: int) -> "ReturnMatrix":
+        return cls(version, lookback, {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=None if name == "symbols" else "r")
+            for name in _ARRAYS
+        })
+
+
+def load_closes(session: Session, lookback: int) -> pd.DataFrame:
+    """Closes of every symbol over the last `lookback` + 1 trade dates, symbols x dates."""
+    dates = session.scalars(
+        select(CandleDaily.trade_date).distinct().order_by(CandleDaily.trade_date.desc()).limit(lookback + 1)
+    ).all()
+    if not dates:
+        return pd.DataFrame()
+    rows = session.execute(
+        select(CandleDaily.symbol, CandleDaily.trade_date, CandleDaily.close).where(CandleDaily.trade_date >= min(dates))
+    ).all()
+    frame = pd.DataFrame.from_records(rows, columns=["symbol", "trade_date", "close"])
+    return frame.pivot(index="symbol", columns="trade_date", values="close").sort_index(axis=1)
+
+
+def ewma_filter(returns: np.ndarray, decay: float = VAR_EWMA_LAMBDA) -> np.ndarray:
+    """Returns rescaled to today's volatility: each day's return divided by the EWMA volatility
+    forecast for that day, times the forecast for tomorrow. Vectorized across symbols."""
+    symbols, days = returns.shape
+    if not days:
+        return returns.copy()
+    variance = np.empty_like(returns)
+    # Seeded with the sample variance so the first forecasts are not degenerate
+    variance[:, 0] = np.mean(returns ** 2, axis=1)
+    for t in range(1, days):
+        variance[:, t] = decay * variance[:, t - 1] + (1 - decay) * returns[:, t - 1] ** 2
+    tomorrow = decay * variance[:, -1] + (1 - decay) * returns[:, -1] ** 2
+    volatility = np.sqrt(variance)
+    standardized = np.divide(returns, volatility, out=np.zeros_like(returns), where=volatility > 0)
+    return standardized * np.sqrt(tomorrow)[:, None]
+
+
+def compute_arrays(closes: pd.DataFrame, min_observations: int = VAR_MIN_OBSERVATIONS) -> Dict[str, np.ndarray]:
+    """Log returns, their covariance and filtered returns from a symbols x dates close table.
+
+    Gaps (holidays of one exchange, suspensions) are forward filled, so a missing day is a zero
+    return; days before a symbol's first close are zero too. Symbols with fewer than
+    `min_observations` real returns are dropped.
+    """
+    values = closes.to_numpy(dtype=np.float64)
+    if values.shape[1] < 2:
+        values = np.empty((0, 1))
+        closes = closes.iloc[:0]
+    observed = np.isfinite(values)
+    counts = (observed[:, 1:] & observed[:, :-1]).sum(axis=1)
+    keep = counts >= min_observations
+    filled = closes.ffill(axis=1).to_numpy(dtype=np.float64)[keep]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.log(filled[:, 1:] / filled[:, :-1])
+    returns = np.where(np.isfinite(returns), returns, 0.0)
+    demeaned = returns - returns.mean(axis=1, keepdims=True) if returns.shape[1] else returns
+    return {
+        "symbols": closes.index.to_numpy(dtype=str)[keep],
+        "dates": closes.columns.to_numpy(dtype="datetime64[D]")[1:],
+        "last_close": filled[:, -1] if len(filled) else np.empty(0),
+        "returns": returns,
+        "filtered": ewma_filter(returns),
+        "covariance": demeaned @ demeaned.T / max(returns.shape[1] - 1, 1),
+    }
+
+
+_matrix: Optional[ReturnMatrix] = None
+_lock = threading.Lock()
+
+
+def _stamp_order(stamp: str) -> Optional[Tuple[int, int]]:
+    # Stamps are "<version>.<timestamp>"; the timestamp orders them even across a version restart
+    version, _, updated = stamp.partition(".")
+    try:
+        return int(updated or 0), int(version)
+    except ValueError:
+        return None
+
+
+def _save_matrix(matrix: ReturnMatrix, cache_dir: str, directory: str) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir, prefix=".building-")
+    matrix.save(staging)
+    try:
+        # Renamed into place whole, so a reader never opens a partly written matrix
+        os.rename(staging, directory)
+    except OSError:
+        # Another process saved the same version first
+        shutil.rmtree(staging, ignore_errors=True)
+    # Only older versions go; another worker may already have saved a newer one, or another lookback
+    saved = _stamp_order(matrix.version)
+    for name in os.listdir(cache_dir):
+        order = _stamp_order(name.rpartition("-")[0])
+        if not name.startswith(".") and order is not None and saved is not None and order < saved:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def get_return_matrix(session: Session, lookback: int = VAR_LOOKBACK_DAYS, cache_dir: Optional[str] = None) -> ReturnMatrix:
+    """The matrix for the current candles version: from memory, else from the memory-mapped
+    cache, else built and cached. Older versions' files are removed once a new one is saved."""
+    global _matrix
+    version = get_stamp(session, CANDLES)
+    current = _matrix
+    if current is not None and (current.version, current.lookback) == (version, lookback):
+        return current
+    cache_dir = cache_dir or VAR_CACHE_DIR
+    with _lock:
+        if _matrix is not None and (_matrix.version, _matrix.lookback) == (version, lookback):
+            return _matrix
+        directory = os.path.join(cache_dir, f"{version}-{lookback}")
+        try:
+            _matrix = ReturnMatrix.open(directory, version, lookback)
+            return _matrix
+        except FileNotFoundError:
+            # Not cached yet, or pruned by a worker that saw a newer version
+            pass
+        matrix = ReturnMatrix.build(session, version, lookback)
+        _save_matrix(matrix, cache_dir, directory)
+        logger.info("Return matrix %s built: %d symbols x %d days", version, len(matrix), len(matrix.dates))
+        try:
+            _matrix = ReturnMatrix.open(directory, version, lookback)
+        except FileNotFoundError:
+            # Superseded and pruned before it could be mapped; serve the arrays just built
+            _matrix = matrix
+        return _matrix
+
+
+def _tail(losses: np.ndarray, confidence: float) -> Dict[str, float]:
+    var = float(np.quantile(losses, confidence))
+    return {"var": var, "es": float(losses[losses >= var].mean())}
+
+
+def portfolio_var(
+    matrix: ReturnMatrix,
+    symbols: Sequence[str],
+    quantities: Sequence[float],
+    confidence: float = 0.99,
+    horizon_days: int = 1,
+    methods: Sequence[str] = METHODS,
+) -> Dict[str, Any]:
+    """VaR and expected shortfall (positive losses, in currency) of a book over `horizon_days`.
+
+    Exposures are quantity x last close. Only the held rows of the cached matrices are read,
+    so the work per call is the weights product: w @ R for the historical and filtered loss
+    series and sqrt(w' S w) for the parametric (zero-mean normal) figure. Multi-day figures
+    use square-root-of-time scaling.
+    """
+    rows = matrix.positions_of(symbols)
+    quantities = np.asarray(quantities, dtype=np.float64)
+    covered = rows >= 0
+    held, inverse = np.unique(rows[covered], return_inverse=True)
+    weights = np.bincount(inverse, weights=quantities[covered], minlength=len(held)) * matrix.last_close[held]
+    scale = np.sqrt(horizon_days)
+    result: Dict[str, Any] = {
+        "as_of": matrix.as_of,
+        "confidence": confidence,
+        "horizon_days": horizon_days,
+        "observations": int(len(matrix.dates)),
+        "exposure": round(float(weights.sum()), 2),
+        "gross_exposure": round(float(np.abs(weights).sum()), 2),
+        "symbols": int(len(held)),
+        "uncovered": sorted(set(np.asarray(symbols, dtype=str)[~covered].tolist())),
+    }
+    if not len(held) or not len(matrix.dates):
+        result.update({method: None for method in methods})
+        return result
+
+    if "historical" in methods:
+        result["historical"] = _rounded(_tail(-(weights @ matrix.returns[held]) * scale, confidence))
+    if "filtered" in methods:
+        result["filtered"] = _rounded(_tail(-(weights @ matrix.filtered[held]) * scale, confidence))
+    if "parametric" in methods:
+        covariance = matrix.covariance[np.ix_(held, held)]
+        marginal = covariance @ weights
+        volatility = float(np.sqrt(max(weights @ marginal, 0.0)))
+        z = NormalDist().inv_cdf(confidence)
+        result["parametric"] = _rounded({
+            "var": z * volatility * scale,
+            "es": volatility * scale * NormalDist().pdf(z) / (1 - confidence),
+            "volatility": volatility * scale,
+        })
+        # Euler allocation: component VaRs sum to the parametric VaR
+        components = weights * marginal / volatility * z * scale if volatility > 0 else np.zeros_like(weights)
+        order = np.argsort(-components, kind="stable")
+        result["contributions"] = [
+            {"symbol": symbol, "exposure": round(exposure, 2), "component_var": round(component, 2)}
+            for symbol, exposure, component in zip(
+                matrix.symbols[held][order].tolist(), weights[order].tolist(), components[order].tolist()
+            )
+        ]
+    return result
+
+
+def _rounded(values: Dict[str, float]) -> Dict[str, float]:
+    return {name: round(float(value), 2) for name, value in values.items()}
+
+
+def holdings_book(session: Session, account_id: str = DEFAULT_ACCOUNT) -> Dict[str, List[Any]]:
+    """Symbols and quantities of the account's latest holdings_daily snapshot."""
+    latest = session.execute(
+        select(HoldingDaily.as_of_date).where(HoldingDaily.account_id == account_id)
+        .order_by(HoldingDaily.as_of_date.desc()).limit(1)
+    ).scalar()
+    rows = [] if latest is None else session.execute(
+        select(HoldingDaily.symbol, HoldingDaily.quantity)
+        .where(HoldingDaily.account_id == account_id, HoldingDaily.as_of_date == latest, HoldingDaily.quantity != 0)
+    ).all()
+    return {"as_of_date": latest, "symbols": [row.symbol for row in rows], "quantities": [row.quantity for row in rows]}
+
+
+def value_at_risk(
+    session: Session,
+    account_id: str = DEFAULT_ACCOUNT,
+    confidence: float = 0.99,
+    horizon_days: int = 1,
+    methods: Sequence[str] = METHODS,
+) -> Dict[str, Any]:
+    """VaR/ES of the account's current holdings against the cached return matrix."""
+    book = holdings_book(session, account_id)
+    matrix = get_return_matrix(session)
+    return {
+        "account_id": account_id,
+        "holdings_as_of": book["as_of_date"],
+        **portfolio_var(matrix, book["symbols"], book["quantities"], confidence, horizon_days, methods),
+    }
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.main as main_module
+from app.db.models import Base
+from app.routers import groww as groww_router
+from app.routers import instruments as instruments_router
+from app.routers import portfolio as portfolio_router
+from app.routers import risk as risk_router
+
+
+@pytest.fixture()
+def create_schema():
+    """Builds the schema on the test database; override it to build the schema another way."""
+    return Base.metadata.create_all
+
+
+@pytest.fixture()
+def session_factory(tmp_path, monkeypatch, create_schema):
+    """A sessionmaker on a fresh SQLite file, also served to the app by every router's get_db.
+    The app's scheduler is not started."""
+    monkeypatch.setattr(main_module, "_start_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(main_module, "_stop_scheduler", lambda: None, raising=False)
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    create_schema(engine)
+    factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        with factory() as db:
+            yield db
+
+    for router in (groww_router, instruments_router, portfolio_router, risk_router):
+        main_module.app.dependency_overrides[router.get_db] = override_get_db
+    yield factory
+    main_module.app.dependency_overrides.clear()
+    engine.dispose()
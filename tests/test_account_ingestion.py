@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services import account_ingestion
+
+
+def test_accounts_run_in_parallel_up_to_the_limit():
+    active, peak = [0], [0]
+
+    async def work(account_id):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return account_id.upper()
+
+    accounts = [f"acct{i}" for i in range(7)]
+    runs = asyncio.run(account_ingestion.run_for_accounts("test", work, accounts, concurrency=3))
+
+    assert peak[0] == 3
+    assert list(runs) == accounts
+    assert {run.status for run in runs.values()} == {"ok"}
+    assert runs["acct2"].result == "ACCT2"
+
+
+def test_failures_and_timeouts_are_isolated_per_account():
+    finished = []
+
+    async def work(account_id):
+        if account_id == "broken":
+            raise RuntimeError("invalid api key")
+        if account_id == "slow":
+            await asyncio.sleep(5)
+        await asyncio.sleep(0.01)
+        finished.append(account_id)
+        return 1
+
+    runs = asyncio.run(
+        account_ingestion.run_for_accounts("test", work, ["slow", "broken", "a", "b", "c"], concurrency=2, timeout=0.2)
+    )
+
+    assert {account: run.status for account, run in runs.items()} == {
+        "slow": "timeout", "broken": "failed", "a": "ok", "b": "ok", "c": "ok"}
+    assert runs["broken"].error == "invalid api key"
+    # The slow account held one slot; the rest went through the other
+    assert finished == ["a", "b", "c"]
+    assert runs["slow"].seconds < 1
+
+    recorded = {(run["job"], run["account_id"]): run["status"] for run in account_ingestion.last_runs()}
+    assert recorded[("test", "slow")] == "timeout"
+
+
+def test_holdings_run_is_skipped_while_a_timed_out_one_still_writes(monkeypatch):
+    import threading
+
+    from app.services import holdings_job
+
+    release, writes = threading.Event(), []
+
+    def slow_upsert(account_id):
+        release.wait(5)
+        writes.append(account_id)
+        return 1
+
+    monkeypatch.setattr(holdings_job, "_upsert_today_holdings", slow_upsert)
+
+    async def twice():
+        first = await account_ingestion.run_for_accounts(
+            "holdings-daily", lambda a: asyncio.to_thread(holdings_job.upsert_today_holdings, a), ["acct"], timeout=0.1)
+        second = await account_ingestion.ingest_holdings_daily(["acct"])
+        release.set()
+        return first, second
+
+    first, second = asyncio.run(twice())
+    assert first["acct"].status == "timeout"
+    assert second["acct"].status == "skipped"
+    # Only the first run wrote; its thread finished once released
+    assert writes == ["acct"]
@@ -13,6 +13,7 @@ features may behave differently. For full PostgreSQL testing, use a real Postgre
 
 import pytest
 from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SAWarning
 from sqlalchemy.orm import sessionmaker
 from alembic import command
 from alembic.config import Config
@@ -20,6 +21,7 @@ from alembic.script import ScriptDirectory
 from alembic.runtime.migration import MigrationContext
 import tempfile
 import os
+import warnings
 
 from app.db.models import Base, Position, HoldingDaily, Instrument
 
@@ -77,6 +79,17 @@ def test_migrations_run_successfully(alembic_config, test_engine):
         pytest.fail(f"Migration failed: {str(e)}")
 
 
+def test_migrations_run_without_sqlalchemy_warnings(alembic_config, test_engine):
+    """Test that the batch table rebuilds declare their primary keys explicitly."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", SAWarning)
+        command.upgrade(alembic_config, "head")
+
+    inspector = inspect(test_engine)
+    pk = inspector.get_pk_constraint("portfolio_snapshots")["constrained_columns"]
+    assert pk == ["account_id", "kind", "symbol", "captured_at"]
+
+
 def test_can_downgrade_migrations(alembic_config, test_engine):
     """Test that migrations can be rolled back."""
     if is_sqlite(test_engine):
@@ -136,11 +149,12 @@ def test_holdings_daily_table_schema(alembic_config, test_engine):
     assert "quantity" in columns, "holdings_daily table missing 'quantity' column"
     assert "avg_price" in columns, "holdings_daily table missing 'avg_price' column"
     
-    # Check unique constraint exists (symbol, as_of_date)
-    unique_constraints = inspector.get_unique_constraints("holdings_daily")
-    constraint_columns = [set(uc["column_names"]) for uc in unique_constraints]
-    assert {"symbol", "as_of_date"} in constraint_columns, \
-        f"Expected unique constraint on (symbol, as_of_date), got {constraint_columns}"
+    assert "account_id" in columns, "holdings_daily table missing 'account_id' column"
+    
+    # One row per account, symbol and day
+    primary_key = inspector.get_pk_constraint("holdings_daily")["constrained_columns"]
+    assert primary_key == ["account_id", "symbol", "as_of_date"], \
+        f"Expected primary key (account_id, symbol, as_of_date), got {primary_key}"
 
 
 def test_positions_table_schema(alembic_config, test_engine):
@@ -0,0 +1,97 @@
+import asyncio
+
+from app.brokers.batching import SymbolBatcher
+
+
+class RecordingClient:
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+
+    async def get_ltp(self, exchange_trading_symbols, segment):
+        self.calls.append(exchange_trading_symbols)
+        await asyncio.sleep(0.01)
+        if self.fail_on and self.fail_on in exchange_trading_symbols:
+            raise RuntimeError("chunk failed")
+        return {s: 1.0 for s in exchange_trading_symbols}
+
+
+def test_concurrent_requests_merge_into_one_batch():
+    client = RecordingClient()
+    batcher = SymbolBatcher(max_batch=50, window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.get_ltp(client, ("NSE_A", "NSE_B"), "CASH"),
+            batcher.get_ltp(client, ("NSE_B", "NSE_C"), "CASH"),
+            batcher.get_ltp(client, ("NSE_D",), "CASH"),
+        )
+
+    first, second, third = asyncio.run(scenario())
+    assert len(client.calls) == 1
+    assert sorted(client.calls[0]) == ["NSE_A", "NSE_B", "NSE_C", "NSE_D"]
+    # Each caller only sees what it asked for
+    assert first == {"NSE_A": 1.0, "NSE_B": 1.0}
+    assert second == {"NSE_B": 1.0, "NSE_C": 1.0}
+    assert third == {"NSE_D": 1.0}
+
+
+def test_oversized_request_is_split_into_parallel_chunks():
+    client = RecordingClient()
+    batcher = SymbolBatcher(max_batch=50, window=0.01)
+    symbols = tuple(f"NSE_S{i}" for i in range(120))
+
+    result = asyncio.run(batcher.get_ltp(client, symbols, "CASH"))
+
+    assert [len(c) for c in client.calls] == [50, 50, 20]
+    assert len(result) == 120
+
+
+def test_full_batch_is_sent_without_waiting_for_window():
+    client = RecordingClient()
+    batcher = SymbolBatcher(max_batch=4, window=10)
+
+    async def scenario():
+        return await asyncio.wait_for(
+            asyncio.gather(
+                batcher.get_ltp(client, ("NSE_A", "NSE_B"), "CASH"),
+                batcher.get_ltp(client, ("NSE_C", "NSE_D"), "CASH"),
+            ),
+            timeout=1,
+        )
+
+    asyncio.run(scenario())
+    assert len(client.calls) == 1
+
+
+def test_failed_chunk_only_fails_its_callers():
+    client = RecordingClient(fail_on="NSE_BAD")
+    batcher = SymbolBatcher(max_batch=2, window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.get_ltp(client, ("NSE_A", "NSE_B"), "CASH"),
+            batcher.get_ltp(client, ("NSE_BAD",), "CASH"),
+            return_exceptions=True,
+        )
+
+    ok, failed = asyncio.run(scenario())
+    assert ok == {"NSE_A": 1.0, "NSE_B": 1.0}
+    assert isinstance(failed, RuntimeError)
+
+
+def test_dispatch_tasks_are_held_until_done():
+    client = RecordingClient()
+    batcher = SymbolBatcher(max_batch=50, window=0.0)
+
+    async def scenario():
+        request = asyncio.ensure_future(batcher.get_ltp(client, ("NSE_A",), "CASH"))
+        # Once the window closes the batch is sent by a task only the batcher references
+        while not client.calls:
+            await asyncio.sleep(0)
+        dispatching = batcher.stats()["dispatching"]
+        return dispatching, await request
+
+    dispatching, result = asyncio.run(scenario())
+    assert dispatching == 1 and result == {"NSE_A": 1.0}
+    assert batcher.stats()["dispatching"] == 0
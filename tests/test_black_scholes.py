@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services import black_scholes
+
+
+def test_norm_cdf_matches_erf():
+    x = np.linspace(-6, 6, 121)
+    expected = [0.5 * math.erfc(-v / math.sqrt(2)) for v in x]
+    np.testing.assert_allclose(black_scholes.norm_cdf(x), expected, atol=1e-7)
+
+
+def test_price_reference_values_and_parity():
+    call, put = black_scholes.price(100.0, 100.0, 1.0, 0.2, 0.05, np.array([True, False]))
+    assert call == pytest.approx(10.4506, abs=1e-4)
+    assert put == pytest.approx(5.5735, abs=1e-4)
+    assert call - put == pytest.approx(100 - 100 * math.exp(-0.05), abs=1e-6)
+
+
+def test_price_broadcasts_and_handles_expiry():
+    spots = np.array([[90.0], [110.0]])
+    values = black_scholes.price(spots, np.array([100.0, 100.0]), np.array([0.0, 0.5]), 0.25, 0.0, np.array([True, False]))
+    assert values.shape == (2, 2)
+    # Expired: intrinsic value
+    assert values[0, 0] == 0.0 and values[1, 0] == pytest.approx(10.0)
+    assert values[0, 1] > 10.0 and values[1, 1] > 0.0
+
+
+def test_greeks_match_finite_differences():
+    spot, strike, years, vol, rate = 100.0, 105.0, 0.25, 0.3, 0.05
+    is_call = np.array([True, False])
+    g = black_scholes.greeks(spot, strike, years, vol, rate, is_call)
+
+    def value(s=spot, t=years, v=vol):
+        return black_scholes.price(s, strike, t, v, rate, is_call)
+
+    h = 1e-2
+    np.testing.assert_allclose(g["delta"], (value(s=spot + h) - value(s=spot - h)) / (2 * h), atol=1e-5)
+    np.testing.assert_allclose(g["gamma"], (value(s=spot + h) - 2 * value() + value(s=spot - h)) / h ** 2, atol=1e-4)
+    np.testing.assert_allclose(g["vega"], (value(v=vol + 1e-4) - value(v=vol - 1e-4)) / 2e-4 / 100, atol=1e-5)
+    np.testing.assert_allclose(g["theta"], (value(t=years - 1 / 365) - value()), rtol=0.02)
+
+
+def test_implied_vol_recovers_vols_across_moneyness():
+    strikes = np.array([60.0, 90.0, 100.0, 110.0, 160.0])
+    vols = np.array([0.45, 0.25, 0.2, 0.22, 0.6])
+    is_call = strikes >= 100
+    values = black_scholes.price(100.0, strikes, 0.1, vols, 0.06, is_call)
+    np.testing.assert_allclose(black_scholes.implied_vol(values, 100.0, strikes, 0.1, 0.06, is_call), vols, atol=1e-6)
+
+    # Below intrinsic, expired and zero prices have no implied vol
+    solved = black_scholes.implied_vol(np.array([5.0, 3.0, 0.0]), 100.0, np.array([90.0, 100.0, 100.0]), np.array([0.1, 0.0, 0.1]), 0.0, True)
+    assert np.isnan(solved).all()
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.db.models import CandleDaily, HoldingDaily
+from app.services import candles
+from app.services.dataset_version import CANDLES, get_stamp
+
+
+def test_parse_candles_accepts_epoch_iso_and_dict_rows():
+    # 2026-03-02 09:15 IST
+    epoch = int(datetime(2026, 3, 2, 3, 45, tzinfo=timezone.utc).timestamp())
+    rows = candles.parse_candles({"candles": [
+        [epoch, 10, 12, 9, 11, 1000],
+        ["2026-03-03T09:15:00", 11, 13, 10, 12.5, 900, 0],
+        {"timestamp": "2026-03-04 09:15:00", "open": 12, "high": 12, "low": 11, "close": 11.5},
+        [epoch * 1000, 10, 12, 9, 11.25, 1100],
+        ["garbage", 1, 1, 1, 1, 1],
+        [epoch, 1, 1, 1],
+    ]})
+    assert [(row["trade_date"], row["close"]) for row in rows] == [
+        (date(2026, 3, 2), 11.25),
+        (date(2026, 3, 3), 12.5),
+        (date(2026, 3, 4), 11.5),
+    ]
+    assert rows[2]["volume"] is None
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = []
+
+    async def get_historical_candles(self, exchange, segment, groww_symbol, start_time, end_time, candle_interval):
+        self.calls.append((groww_symbol, start_time[:10]))
+        if groww_symbol == "NSE-BROKEN":
+            raise RuntimeError("rate limited")
+        start = date.fromisoformat(start_time[:10])
+        days = [date(2026, 3, 5) + timedelta(days=i) for i in range(3)]
+        return {"candles": [[f"{day}T09:15:00", 1, 1, 1, 100.0 + i, 10] for i, day in enumerate(days) if day >= start]}
+
+
+class StubPool:
+    def __init__(self, client):
+        self.client = client
+
+    async def acquire_async(self):
+        return self.client
+
+
+@pytest.fixture()
+def factory(session_factory, monkeypatch):
+    monkeypatch.setattr(candles, "SessionLocal", session_factory)
+    monkeypatch.setattr(candles, "get_instrument_index", lambda: None)
+    return session_factory
+
+
+def test_refresh_fetches_from_last_stored_day_and_bumps_version(factory, monkeypatch):
+    client = StubClient()
+    monkeypatch.setattr(candles, "get_adapter_pool", lambda account_id="default": StubPool(client))
+    monkeypatch.setattr(candles, "utcnow", lambda: datetime(2026, 3, 10, 11, 0))
+    with factory() as session:
+        session.add_all([
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 9), quantity=5, avg_price=1.0),
+            HoldingDaily(symbol="BROKEN", as_of_date=date(2026, 3, 9), quantity=1, avg_price=1.0),
+            HoldingDaily(symbol="SOLD", as_of_date=date(2026, 3, 9), quantity=0, avg_price=1.0),
+            HoldingDaily(symbol="OLD", as_of_date=date(2026, 3, 8), quantity=1, avg_price=1.0),
+            CandleDaily(symbol="TCS", trade_date=date(2026, 3, 5), close=90.0),
+        ])
+        session.commit()
+
+    result = asyncio.run(candles.refresh_candles())
+
+    assert result == {"symbols": 2, "failed": 1, "written": 3}
+    assert sorted(client.calls) == [("NSE-BROKEN", "2025-02-03"), ("NSE-TCS", "2026-03-05")]
+    with factory() as session:
+        stored = session.execute(select(CandleDaily.trade_date, CandleDaily.close).order_by(CandleDaily.trade_date)).all()
+        assert [close for _, close in stored] == [100.0, 101.0, 102.0]
+        assert get_stamp(session, CANDLES) != "0"
+
+    # Nothing changed: no rows written and the version stays put
+    with factory() as session:
+        stamp = get_stamp(session, CANDLES)
+    assert asyncio.run(candles.refresh_candles(["TCS"]))["written"] == 0
+    with factory() as session:
+        assert get_stamp(session, CANDLES) == stamp
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from app.services.composite_fetch import fetch_concurrently
+
+
+def _after(delay, value=None, error=None):
+    async def call():
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return value
+
+    return call
+
+
+def test_calls_run_concurrently():
+    start = time.perf_counter()
+    result = asyncio.run(
+        fetch_concurrently({"holdings": _after(0.2, [1]), "positions": _after(0.2, [2]), "margin": _after(0.2, {})})
+    )
+    elapsed = time.perf_counter() - start
+
+    assert result.complete
+    assert result.results == {"holdings": [1], "positions": [2], "margin": {}}
+    # Slowest single call, not the sum
+    assert elapsed < 0.4
+
+
+def test_partial_results_on_failure_and_timeout():
+    result = asyncio.run(
+        fetch_concurrently(
+            {
+                "holdings": _after(0.01, [1]),
+                "positions": _after(0.01, error=RuntimeError("broker down")),
+                "ltp": _after(1.0, {}),
+            },
+            timeouts={"ltp": 0.05},
+        )
+    )
+
+    assert not result.complete
+    assert result.results == {"holdings": [1]}
+    assert result.errors["positions"] == "broker down"
+    assert "timed out" in result.errors["ltp"]
+    assert result.to_payload() == {"holdings": [1], "positions": None, "ltp": None, "errors": result.errors}
@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+import pytest
+from growwapi.groww.exceptions import GrowwAPIException, GrowwAPIRateLimitException
+
+from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+
+
+def _adapter(handler) -> AsyncGrowwAdapter:
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncGrowwAdapter("token", http, domain="https://broker.test/v1")
+
+
+def test_get_positions_drops_none_params_and_unwraps_payload():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["url"] = str(request.url)
+        seen["auth"] = request.headers["Authorization"]
+        return httpx.Response(200, json={"status": "SUCCESS", "payload": {"positions": []}})
+
+    result = asyncio.run(_adapter(handler).get_positions_for_user())
+
+    assert result == {"positions": []}
+    assert seen["url"] == "https://broker.test/v1/positions/user"
+    assert seen["auth"] == "Bearer token"
+
+
+def test_get_ltp_sends_repeated_symbols():
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["symbols"] = request.url.params.get_list("exchange_symbols")
+        return httpx.Response(200, json={"status": "SUCCESS", "payload": {"NSE_A": 1.0, "NSE_B": 2.0}})
+
+    result = asyncio.run(_adapter(handler).get_ltp(("NSE_A", "NSE_B"), segment="CASH"))
+
+    assert seen["symbols"] == ["NSE_A", "NSE_B"]
+    assert result == {"NSE_A": 1.0, "NSE_B": 2.0}
+
+
+def test_errors_map_to_sdk_exceptions():
+    def rate_limited(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, json={})
+
+    def failure(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"status": "FAILURE", "error": {"code": "GA001", "message": "bad"}})
+
+    with pytest.raises(GrowwAPIRateLimitException):
+        asyncio.run(_adapter(rate_limited).get_holdings())
+
+    with pytest.raises(GrowwAPIException) as exc:
+        asyncio.run(_adapter(failure).get_holdings())
+    assert exc.value.code == "GA001"
@@ -0,0 +1,158 @@
+import base64
+import json
+import threading
+import time
+
+from app.brokers import groww_auth
+from app.brokers.groww_auth import TokenManager
+
+
+def _jwt(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _manager(clock, logins, secret_loads=None, ttl=3600):
+    def load_secrets():
+        if secret_loads is not None:
+            secret_loads.append(1)
+        return {"GROWW_API_KEY": "key", "GROWW_API_SECRET": "secret"}
+
+    def login(secrets):
+        logins.append(secrets)
+        return _jwt(clock() + ttl)
+
+    return TokenManager(load_secrets=load_secrets, login=login, refresh_margin=300, secrets_ttl=3600, clock=clock)
+
+
+def test_token_is_cached_until_refresh_margin():
+    clock = FakeClock()
+    logins = []
+    manager = _manager(clock, logins)
+
+    first = manager.get_token()
+    assert manager.get_token() == first
+    assert len(logins) == 1
+
+    # Still outside the refresh margin
+    clock.now += 3600 - 301
+    assert manager.get_token() == first
+    assert len(logins) == 1
+
+    # Inside the margin: refreshed before actual expiry
+    clock.now += 2
+    assert manager.get_token() != first
+    assert len(logins) == 2
+
+    stats = manager.stats()
+    assert stats["refreshes"] == 2
+    assert stats["misses"] == 2
+    assert stats["hits"] == 2
+
+
+def test_token_issued_near_expiry_is_used_until_it_expires():
+    clock = FakeClock()
+    logins = []
+    # A plain (non-JWT) token expires at the next 06:00 IST rollover, here 100 s away
+    clock.now = groww_auth._token_expiry("opaque", clock.now) - 100
+    manager = TokenManager(load_secrets=dict, login=lambda secrets: logins.append(secrets) or "opaque", refresh_margin=300, clock=clock)
+
+    for _ in range(5):
+        manager.get_token()
+        clock.now += 10
+    assert len(logins) == 1
+
+    # Past the rollover the next call logs in and gets a full margin again
+    clock.now += 60
+    manager.get_token()
+    assert len(logins) == 2
+    assert manager.stats()["expires_at"] - clock.now > 86000
+
+
+def test_short_lived_token_keeps_one_margin_of_use():
+    clock = FakeClock()
+    logins = []
+    manager = _manager(clock, logins, ttl=400)
+
+    manager.get_token()
+    clock.now += 299
+    manager.get_token()
+    assert len(logins) == 1
+    clock.now += 2
+    manager.get_token()
+    assert len(logins) == 2
+
+
+def test_hits_are_counted_under_concurrency():
+    manager = _manager(FakeClock(), [])
+    manager.get_token()
+
+    def hit():
+        for _ in range(2000):
+            manager.get_token()
+
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert manager.stats()["hits"] == 8 * 2000
+
+
+def test_secrets_are_cached_across_token_refreshes():
+    clock = FakeClock()
+    logins, secret_loads = [], []
+    manager = _manager(clock, logins, secret_loads, ttl=600)
+
+    manager.get_token()
+    clock.now += 400
+    manager.get_token()
+
+    assert len(logins) == 2
+    assert len(secret_loads) == 1
+
+
+def test_concurrent_callers_share_one_refresh():
+    logins = []
+    gate = threading.Event()
+
+    def slow_login(secrets):
+        logins.append(secrets)
+        gate.wait(1)
+        return _jwt(time.time() + 3600)
+
+    manager = TokenManager(load_secrets=lambda: {}, login=slow_login, refresh_margin=300)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.get_token())) for _ in range(10)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert len(logins) == 1
+    assert len(set(results)) == 1
+    assert manager.stats()["refreshes"] == 1
+
+
+def test_each_account_has_its_own_manager_and_secret(monkeypatch):
+    loaded = []
+    monkeypatch.setattr(groww_auth, "_token_managers", {})
+    monkeypatch.setattr(groww_auth, "_load_groww_secrets", lambda secret_id: loaded.append(secret_id) or {"id": secret_id})
+
+    family = groww_auth.get_token_manager("family")
+    assert groww_auth.get_token_manager("family") is family
+    assert groww_auth.get_token_manager("default") is not family
+
+    family._get_secrets(0.0)
+    groww_auth.get_token_manager("default")._get_secrets(0.0)
+    assert loaded == ["groww/api/family", "groww/api"]
@@ -0,0 +1,42 @@
+import asyncio
+
+from app.brokers import groww_pool
+from app.brokers.groww_pool import GrowwAdapterPool
+
+
+class FakeAdapter:
+    def __init__(self, access_token, session=None, limiter=None, guard=None):
+        self.access_token = access_token
+        self.session = session
+
+
+def test_pool_reuses_adapter_and_session_until_token_rotates(monkeypatch):
+    monkeypatch.setattr(groww_pool, "GrowwAdapter", FakeAdapter)
+    tokens = ["t1"]
+    pool = GrowwAdapterPool(token_provider=lambda: tokens[-1], pool_size=5)
+
+    first = pool.acquire()
+    assert pool.acquire() is first
+    assert pool.builds == 1
+
+    tokens.append("t2")
+    rotated = pool.acquire()
+    assert rotated is not first
+    assert rotated.access_token == "t2"
+    # The keep-alive session survives token rotation
+    assert rotated.session is first.session
+    assert pool.builds == 2
+
+    pool.close()
+    assert pool.stats()["active"] is False
+
+
+def test_async_client_of_a_previous_event_loop_is_closed(monkeypatch):
+    monkeypatch.setattr(groww_pool, "AsyncGrowwAdapter", lambda token, http, **kwargs: FakeAdapter(token, http))
+    pool = GrowwAdapterPool(token_provider=lambda: "t1", token_peek=lambda: "t1", pool_size=5)
+
+    first = asyncio.run(pool.acquire_async())
+    assert asyncio.run(pool.acquire_async()).session is not first.session
+    assert first.session.is_closed
+    assert pool.async_builds == 2
+    asyncio.run(pool.aclose())
@@ -31,15 +31,28 @@ class MockQuery:
         # Simple mock - just return self for chaining
         return self
     
+    def order_by(self, *args):
+        # Simple mock - just return self for chaining
+        return self
+    
     def limit(self, n):
         # Simple mock - just return self for chaining
         return self
 
 
+class MockResult:
+    def first(self):
+        return None
+
+
 class MockSession:
     def query(self, model):
         return MockQuery()
     
+    def execute(self, statement):
+        # Dataset version lookups: no stamp recorded yet
+        return MockResult()
+    
     def close(self):
         pass
 
@@ -48,14 +61,14 @@ class StubClient:
     def __init__(self):
         self.last_args: dict[str, Any] = {}
 
-    def get_holdings(self):
+    async def get_holdings(self):
         return [{"trading_symbol": "TEST", "quantity": 1.0}]
 
-    def get_positions_for_user(self, segment=None):
+    async def get_positions_for_user(self, segment=None):
         self.last_args["segment"] = segment
         return [{"trading_symbol": "TEST-POS", "segment": segment or "EQUITY"}]
 
-    def get_instruments(self):
+    async def get_instruments(self):
         # Return a DataFrame including NaN/inf to validate sanitizer
         return pd.DataFrame(
             [
@@ -74,11 +87,12 @@ def disable_scheduler(monkeypatch):
 
 @pytest.fixture()
 def client(monkeypatch):
-    # Patch groww router client factory to use stub
-    monkeypatch.setattr(groww_router, "_client", lambda: StubClient())
-    
     from app.main import app
+    from app.brokers.groww_pool import get_async_groww_client
     from app.routers import instruments as instruments_router
+
+    # Replace the pooled broker client with a stub
+    app.dependency_overrides[get_async_groww_client] = lambda: StubClient()
     
     # Override database dependency to avoid real DB connection
     def override_get_db():
@@ -131,3 +145,12 @@ def test_instruments_endpoint_exists(client: TestClient):
     # Should return 200 with list of instruments (might be empty if no data seeded)
     assert resp.status_code == 200
     assert isinstance(resp.json(), list)
+
+
+def test_portfolio_combines_holdings_and_positions(client: TestClient):
+    resp = client.get("/groww/portfolio")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["holdings"][0]["trading_symbol"] == "TEST"
+    assert data["positions"][0]["trading_symbol"] == "TEST-POS"
+    assert "errors" not in data
@@ -0,0 +1,109 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+
+from app.db.models import HoldingDaily
+from app.db import upsert
+from app.db.upsert import upsert_statement
+from app.services import holdings_job
+
+
+@pytest.fixture()
+def session_factory(session_factory, monkeypatch):
+    monkeypatch.setattr(holdings_job, "SessionLocal", session_factory)
+    return session_factory
+
+
+def _rows(factory):
+    with factory() as session:
+        return {row.symbol: (row.quantity, row.avg_price) for row in session.scalars(select(HoldingDaily))}
+
+
+def test_aggregate_sums_quantity_and_weights_price():
+    rows = holdings_job.aggregate_holdings(
+        [
+            {"symbol": "TCS", "quantity": 10, "avg_price": 3000.0},
+            {"symbol": "INFY", "quantity": 5, "avg_price": None},
+            {"symbol": "TCS", "quantity": 30, "avg_price": 3400.0},
+            {"symbol": "TCS", "quantity": 2, "avg_price": None},
+            {"symbol": "IDEA", "quantity": 0, "avg_price": 12.5},
+        ]
+    )
+    assert rows == [
+        {"symbol": "TCS", "quantity": 42.0, "avg_price": 3300.0},
+        {"symbol": "INFY", "quantity": 5.0, "avg_price": None},
+        {"symbol": "IDEA", "quantity": 0.0, "avg_price": 12.5},
+    ]
+
+
+def test_snapshot_is_one_upsert_statement(session_factory, monkeypatch):
+    payload = [
+        {"symbol": "TCS", "quantity": 10, "avg_price": 3000.0},
+        {"symbol": "TCS", "quantity": 10, "avg_price": 3200.0},
+        {"symbol": "INFY", "quantity": 5, "avg_price": 1500.0},
+    ]
+    monkeypatch.setattr(holdings_job, "fetch_holdings", lambda account_id: payload)
+    statements = []
+    engine = session_factory.kw["bind"]
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        # Counts the broker's holdings, not the merged rows
+        assert holdings_job.upsert_today_holdings() == 3
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 1 and "ON CONFLICT" in statements[0]
+    assert _rows(session_factory) == {"TCS": (20.0, 3100.0), "INFY": (5.0, 1500.0)}
+
+
+@pytest.mark.parametrize("on_conflict", [True, False], ids=["on-conflict", "fallback"])
+def test_rerun_updates_changed_rows_only(session_factory, monkeypatch, on_conflict):
+    if not on_conflict:
+        # Dialects without ON CONFLICT load and update row by row, with the same counts
+        monkeypatch.setattr(upsert, "_ON_CONFLICT_INSERTS", {})
+    today = date(2026, 2, 10)
+    first = [{"symbol": "TCS", "quantity": 1.0, "avg_price": 10.0}, {"symbol": "INFY", "quantity": 2.0, "avg_price": None}]
+    with session_factory() as session:
+        assert holdings_job.upsert_holdings(session, first, today) == 2
+        session.commit()
+    with session_factory() as session:
+        rows = [first[0], dict(first[1], quantity=3.0)]
+        assert holdings_job.upsert_holdings(session, rows, today) == 1
+        # Another day is a separate snapshot
+        assert holdings_job.upsert_holdings(session, rows, date(2026, 2, 11)) == 2
+        session.commit()
+    with session_factory() as session:
+        assert session.get(HoldingDaily, {"account_id": "default", "symbol": "INFY", "as_of_date": today}).quantity == 3.0
+        assert len(session.scalars(select(HoldingDaily)).all()) == 4
+
+
+def test_accounts_keep_separate_rows(session_factory):
+    today = date(2026, 2, 10)
+    rows = [{"symbol": "TCS", "quantity": 1.0, "avg_price": 10.0}]
+    with session_factory() as session:
+        assert holdings_job.upsert_holdings(session, rows, today) == 1
+        assert holdings_job.upsert_holdings(session, [dict(rows[0], quantity=7.0)], today, "family") == 1
+        session.commit()
+    with session_factory() as session:
+        stored = {(r.account_id, r.symbol): r.quantity for r in session.scalars(select(HoldingDaily))}
+    assert stored == {("default", "TCS"): 1.0, ("family", "TCS"): 7.0}
+
+
+def test_batches_split_large_snapshots(session_factory, monkeypatch):
+    monkeypatch.setattr(holdings_job, "UPSERT_BATCH_ROWS", 7)
+    rows = [{"symbol": f"S{i}", "quantity": float(i), "avg_price": 1.0} for i in range(20)]
+    with session_factory() as session:
+        assert holdings_job.upsert_holdings(session, rows, date(2026, 2, 10)) == 20
+        session.commit()
+    assert len(_rows(session_factory)) == 20
+
+
+def test_postgres_statement_targets_the_primary_key():
+    batch = [{"account_id": "default", "symbol": "X", "as_of_date": date(2026, 1, 1), "quantity": 1.0, "avg_price": None}]
+    statement = upsert_statement("postgresql", HoldingDaily, batch, update=("quantity", "avg_price"))
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (account_id, symbol, as_of_date) DO UPDATE" in sql
+    assert "holdings_daily.quantity IS DISTINCT FROM excluded.quantity" in sql
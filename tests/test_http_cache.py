@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.services import dataset_version, instrument_index, instrument_job
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+ITEMS = [
+    {"trading_symbol": "RELIANCE", "exchange": "NSE", "instrument_type": "EQ", "name": "Reliance Industries"},
+    {"trading_symbol": "TCS", "exchange": "NSE", "instrument_type": "EQ", "name": "Tata Consultancy Services"},
+]
+
+
+@pytest.fixture()
+def factory(session_factory, monkeypatch):
+    monkeypatch.setattr(instrument_index, "_index", None)
+    monkeypatch.setattr(instrument_job, "SessionLocal", session_factory)
+    return session_factory
+
+
+def _refresh(monkeypatch, items):
+    monkeypatch.setattr(instrument_job, "fetch_instruments", lambda: normalize_instruments(items))
+    instrument_job.replace_instruments()
+    return instrument_index.get_instrument_index().version
+
+
+def test_stamp_moves_only_when_the_table_changes(factory, monkeypatch):
+    with factory() as db:
+        assert dataset_version.get_stamp(db, dataset_version.INSTRUMENTS) == "0"
+
+    first = _refresh(monkeypatch, ITEMS)
+    assert first.startswith("1.")
+    assert _refresh(monkeypatch, ITEMS) == first
+    second = _refresh(monkeypatch, ITEMS + [{"trading_symbol": "INFY", "exchange": "NSE"}])
+    assert second.startswith("2.")
+    with factory() as db:
+        assert dataset_version.get_stamp(db, dataset_version.INSTRUMENTS) == second
+        assert InstrumentIndex.from_session(db).version == second
+
+
+def test_conditional_get_and_cache_headers(factory, monkeypatch):
+    client = TestClient(main_module.app)
+    _refresh(monkeypatch, ITEMS)
+
+    response = client.get("/instruments/", params={"exchange": "NSE"})
+    assert response.status_code == 200
+    tag = response.headers["etag"]
+    assert response.headers["cache-control"] == "public, max-age=300, must-revalidate"
+
+    # The tag covers the query, in any parameter order
+    assert client.get("/instruments/", params={"exchange": "BSE"}).headers["etag"] != tag
+    assert (
+        client.get("/instruments/?limit=5&exchange=NSE").headers["etag"]
+        == client.get("/instruments/?exchange=NSE&limit=5").headers["etag"]
+    )
+
+    cached = client.get("/instruments/", params={"exchange": "NSE"}, headers={"If-None-Match": f'"x", W/{tag}'})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == tag
+
+    # A refresh that changes the table invalidates every tag
+    _refresh(monkeypatch, ITEMS[:1])
+    fresh = client.get("/instruments/", params={"exchange": "NSE"}, headers={"If-None-Match": tag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != tag
+    assert [row["trading_symbol"] for row in fresh.json()] == ["RELIANCE"]
+
+
+def test_db_path_export_and_groww_listing_are_tagged(factory, monkeypatch):
+    client = TestClient(main_module.app)
+    _refresh(monkeypatch, ITEMS)
+    monkeypatch.setattr(instrument_index, "_index", None)
+
+    listing = client.get("/groww/instruments")
+    assert listing.status_code == 200 and "etag" in listing.headers
+    assert client.get("/groww/instruments", headers={"If-None-Match": listing.headers["etag"]}).status_code == 304
+
+    export = client.get("/instruments/export", params={"format": "csv"})
+    assert export.status_code == 200
+    assert export.headers["cache-control"].startswith("public")
+    assert client.get("/instruments/export", params={"format": "csv"}, headers={"If-None-Match": export.headers["etag"]}).status_code == 304
+
+    # Errors are not cacheable
+    missing = client.get("/instruments/NOPE")
+    assert missing.status_code == 404 and "etag" not in missing.headers
+
+
+def test_tag_changes_when_another_worker_refreshes_the_table(factory, monkeypatch):
+    client = TestClient(main_module.app)
+    _refresh(monkeypatch, ITEMS)
+    tag = client.get("/groww/instruments").headers["etag"]
+
+    # Another process refreshes the table; this one still holds its old index
+    loaded = instrument_index.get_instrument_index()
+    _refresh(monkeypatch, ITEMS + [{"trading_symbol": "INFY", "exchange": "NSE"}])
+    monkeypatch.setattr(instrument_index, "_index", loaded)
+
+    response = client.get("/groww/instruments", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != tag
+    assert "INFY" in response.text
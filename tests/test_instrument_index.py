@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.db.models import Instrument
+from app.routers import instruments as instruments_router
+from app.services import instrument_index
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+
+def _option(symbol, strike, expiry, kind, underlying="NIFTY"):
+    return {
+        "trading_symbol": symbol,
+        "exchange": "NSE",
+        "segment": "FNO",
+        "instrument_type": kind,
+        "underlying_symbol": underlying,
+        "strike_price": strike,
+        "expiry_date": expiry,
+        "lot_size": 75,
+    }
+
+
+ROWS = [
+    {"trading_symbol": "RELIANCE", "exchange": "NSE", "instrument_type": "EQ", "exchange_token": "2885", "isin": "INE002A01018", "groww_symbol": "NSE-RELIANCE"},
+    {"trading_symbol": "RELIANCE-BSE", "exchange": "BSE", "instrument_type": "EQ", "exchange_token": "500325", "isin": "INE002A01018"},
+    _option("NIFTY26FEB23000CE", 23000, "2026-02-26", "CE"),
+    _option("NIFTY26JAN23500CE", 23500, "2026-01-29", "CE"),
+    _option("NIFTY26JAN23000PE", 23000, "2026-01-29", "PE"),
+    _option("BANKNIFTY26JAN48000CE", 48000, "2026-01-29", "CE", underlying="BANKNIFTY"),
+]
+
+
+@pytest.fixture()
+def index():
+    return InstrumentIndex(normalize_instruments(ROWS))
+
+
+def test_hash_lookups(index):
+    row = index.get("RELIANCE")
+    assert row["exchange_token"] == "2885"
+    assert index.get("MISSING") is None
+    assert [r["exchange"] for r in index.lookup("isin", "INE002A01018")] == ["NSE", "BSE"]
+    assert index.lookup("groww_symbol", "NSE-RELIANCE")[0]["trading_symbol"] == "RELIANCE"
+    assert index.lookup("exchange_token", "nope") == []
+
+
+def test_underlying_group_is_ordered_by_expiry_then_strike(index):
+    chain = index.by_underlying("NIFTY")
+    assert [r["trading_symbol"] for r in chain] == ["NIFTY26JAN23000PE", "NIFTY26JAN23500CE", "NIFTY26FEB23000CE"]
+    assert chain[0]["expiry_date"] == date(2026, 1, 29)
+    assert chain[0]["lot_size"] == 75 and chain[0]["strike_price"] == 23000.0
+    assert [r["trading_symbol"] for r in index.by_underlying("NIFTY", instrument_type="CE", limit=1)] == ["NIFTY26JAN23500CE"]
+
+
+def test_filter_without_underlying(index):
+    assert {r["trading_symbol"] for r in index.filter(exchange="BSE")} == {"RELIANCE-BSE"}
+    assert len(index.filter(instrument_type="CE", limit=2)) == 2
+
+
+def test_from_session_round_trips_the_table(session_factory):
+    with session_factory() as session:
+        session.add(Instrument(trading_symbol="X", underlying_symbol="NIFTY", expiry_date=date(2026, 1, 29), lot_size=50))
+        session.commit()
+        index = InstrumentIndex.from_session(session)
+
+    assert index.get("X")["expiry_date"] == date(2026, 1, 29)
+    assert index.by_underlying("NIFTY")[0]["lot_size"] == 50
+
+
+def test_router_serves_from_index_without_touching_the_db(monkeypatch, index):
+    monkeypatch.setattr(main_module, "_start_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(main_module, "_stop_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(instrument_index, "_index", index)
+
+    # A None session would fail on any query, so passing proves the DB is untouched
+    main_module.app.dependency_overrides[instruments_router.get_db] = lambda: None
+    try:
+        client = TestClient(main_module.app)
+        assert client.get("/instruments/RELIANCE").json()["isin"] == "INE002A01018"
+        chain = client.get("/instruments/underlying/NIFTY?instrument_type=CE").json()
+        assert [r["trading_symbol"] for r in chain] == ["NIFTY26JAN23500CE", "NIFTY26FEB23000CE"]
+        assert len(client.get("/instruments/?exchange=NSE").json()) == 5
+    finally:
+        main_module.app.dependency_overrides.clear()
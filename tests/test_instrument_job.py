@@ -0,0 +1,127 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from app.db.models import Instrument
+from app.services import instrument_index, instrument_job
+from app.services.instrument_loader import prepare_frame
+
+
+def _item(symbol, **overrides):
+    item = {"trading_symbol": symbol, "exchange": "NSE", "instrument_type": "EQ", "name": f"{symbol} Ltd"}
+    item.update(overrides)
+    return item
+
+
+@pytest.fixture()
+def session_factory(session_factory, monkeypatch):
+    monkeypatch.setattr(instrument_job, "SessionLocal", session_factory)
+    monkeypatch.setattr(instrument_index, "_index", None)
+    return session_factory
+
+
+def _refresh(monkeypatch, items):
+    monkeypatch.setattr(instrument_job, "fetch_instruments", lambda: instrument_job.normalize_instruments(items))
+    return instrument_job.replace_instruments()
+
+
+def _rows(factory):
+    with factory() as session:
+        return {row.trading_symbol: row for row in session.scalars(select(Instrument))}
+
+
+def test_refresh_applies_only_changed_rows(session_factory, monkeypatch):
+    first = _refresh(monkeypatch, [_item("AAA"), _item("BBB"), _item("CCC", expiry_date=date(2026, 3, 26))])
+    assert first == {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert _rows(session_factory)["CCC"].expiry_date == date(2026, 3, 26)
+
+    second = _refresh(monkeypatch, [_item("AAA"), _item("BBB", name="Renamed"), _item("DDD")])
+    assert second == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 1}
+
+    rows = _rows(session_factory)
+    assert set(rows) == {"AAA", "BBB", "DDD"}
+    assert rows["BBB"].name == "Renamed"
+    # The in-memory index is swapped to match the table
+    index = instrument_index.get_instrument_index()
+    assert len(index) == 3 and index.get("BBB")["name"] == "Renamed" and index.get("CCC") is None
+    assert rows["AAA"].row_hash == prepare_frame(instrument_job.normalize_instruments([_item("AAA")]))["row_hash"][0]
+
+
+def test_refresh_rehashes_rows_without_a_stored_hash(session_factory, monkeypatch):
+    with session_factory() as session:
+        session.add(Instrument(trading_symbol="AAA", exchange="NSE", instrument_type="EQ", name="AAA Ltd"))
+        session.commit()
+
+    assert _refresh(monkeypatch, [_item("AAA")])["updated"] == 1
+    assert _refresh(monkeypatch, [_item("AAA")])["unchanged"] == 1
+
+
+def test_empty_feed_leaves_table_untouched(session_factory, monkeypatch):
+    _refresh(monkeypatch, [_item("AAA")])
+    assert _refresh(monkeypatch, []) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    assert set(_rows(session_factory)) == {"AAA"}
+
+
+def test_duplicate_symbols_keep_last_occurrence(session_factory, monkeypatch):
+    counts = _refresh(monkeypatch, [_item("AAA", name="old"), _item("AAA", name="new")])
+    assert counts["inserted"] == 1
+    assert _rows(session_factory)["AAA"].name == "new"
+
+
+def test_normalize_resolves_aliases_and_coerces_columns():
+    raw = pd.DataFrame(
+        {
+            "tradingSymbol": ["AAA", None, "BBB", "AAA"],
+            "exchangeToken": [2885.0, 1.0, np.nan, 2886.0],
+            "expiry": ["2026-01-29", None, "not a date", "2026-02-26"],
+            "strikePrice": [100.0, 1.0, np.inf, 105.5],
+            "lotSize": [50.0, 1.0, np.nan, 75.0],
+            "isReserved": [False, True, True, True],
+        }
+    )
+
+    frame = instrument_job.normalize_instruments(raw)
+
+    assert list(frame["trading_symbol"]) == ["BBB", "AAA"]
+    last = frame.set_index("trading_symbol").loc["AAA"]
+    assert last["exchange_token"] == "2886"
+    assert last["expiry_date"] == pd.Timestamp("2026-02-26")
+    assert last["strike_price"] == 105.5
+    assert last["lot_size"] == 75
+    assert last["is_reserved"] == 1
+    bbb = frame.set_index("trading_symbol").loc["BBB"]
+    assert pd.isna(bbb["expiry_date"]) and pd.isna(bbb["strike_price"]) and pd.isna(bbb["lot_size"])
+    assert str(frame["lot_size"].dtype) == "Int64"
+
+
+def test_normalize_handles_empty_and_list_input():
+    assert instrument_job.normalize_instruments(None).empty
+    assert list(instrument_job.normalize_instruments([{"symbol": "AAA"}, "junk"])["trading_symbol"]) == ["AAA"]
+
+
+def test_fetch_downloads_the_current_master_from_the_pooled_adapter(monkeypatch):
+    from app.brokers.groww_adapter import GrowwAdapter
+
+    class CsvSession:
+        def __init__(self):
+            self.csv = b"trading_symbol,exchange,instrument_type\nTCS,NSE,EQ\n"
+
+        def get(self, url, **kwargs):
+            response = type("Response", (), {})()
+            response.status_code, response.content = 200, self.csv
+            response.json = lambda: {}
+            response.raise_for_status = lambda: None
+            return response
+
+    session = CsvSession()
+    adapter = GrowwAdapter("token", session=session)
+    monkeypatch.setattr(instrument_job, "get_adapter_pool", lambda: type("Pool", (), {"acquire": lambda self: adapter})())
+    assert instrument_job.fetch_instruments()["trading_symbol"].tolist() == ["TCS"]
+
+    # The SDK caches the CSV on first use; the next refresh still sees a new listing
+    session.csv += b"INFY,NSE,EQ\n"
+    assert adapter.get_instruments()["trading_symbol"].tolist() == ["TCS"]
+    assert instrument_job.fetch_instruments()["trading_symbol"].tolist() == ["TCS", "INFY"]
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+import app.main as main_module
+from app.db.models import Instrument
+from app.services import instrument_index
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+from app.services.instrument_loader import load_instruments, prepare_frame
+
+ITEMS = [
+    {
+        "trading_symbol": f"SYM{i:03d}",
+        "exchange": "NSE" if i % 2 else "BSE",
+        "instrument_type": "CE" if i % 3 else "EQ",
+        "name": f"Instrument {i}",
+        "underlying_symbol": "NIFTY" if i % 5 == 0 else None,
+        "expiry_date": "2026-01-29" if i % 3 else None,
+        "strike_price": 22000.0 + i if i % 3 else None,
+        "lot_size": 75,
+    }
+    for i in range(25)
+]
+
+
+@pytest.fixture()
+def session(session_factory, monkeypatch):
+    monkeypatch.setattr(instrument_index, "_index", None)
+    with session_factory() as db:
+        # Loaded out of symbol order so pages must come back sorted by the query itself
+        load_instruments(db, prepare_frame(normalize_instruments(ITEMS[::-1])))
+        db.commit()
+    return session_factory
+
+
+def _pages(client, path, **params):
+    symbols, cursors = [], []
+    after = None
+    while True:
+        response = client.get(path, params=dict(params, **({"after": after} if after else {})))
+        assert response.status_code == 200
+        symbols += [row["trading_symbol"] for row in response.json()]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return symbols, cursors
+        cursors.append(after)
+
+
+def test_keyset_pages_from_db(session):
+    client = TestClient(main_module.app)
+    symbols, cursors = _pages(client, "/instruments/", limit=10)
+    assert symbols == sorted(item["trading_symbol"] for item in ITEMS)
+    assert cursors == ["SYM009", "SYM019"]
+
+    filtered, _ = _pages(client, "/instruments/", limit=2, exchange="NSE", instrument_type="CE")
+    assert filtered == [s for s in symbols if int(s[3:]) % 2 and int(s[3:]) % 3]
+
+
+def test_keyset_pages_from_index_match_db(session, monkeypatch):
+    client = TestClient(main_module.app)
+    from_db, _ = _pages(client, "/instruments/", limit=4, underlying_symbol="NIFTY")
+    with session() as db:
+        monkeypatch.setattr(instrument_index, "_index", InstrumentIndex.from_session(db))
+    from_index, cursors = _pages(client, "/instruments/", limit=4, underlying_symbol="NIFTY")
+
+    assert from_index == from_db == ["SYM000", "SYM005", "SYM010", "SYM015", "SYM020"]
+    assert cursors == ["SYM015"]
+    assert _pages(client, "/instruments/", limit=4, after="SYM020")[0] == ["SYM021", "SYM022", "SYM023", "SYM024"]
+
+
+def test_index_and_db_pages_agree_on_mixed_case_and_punctuation(session, monkeypatch):
+    symbols = ["M&M", "MM", "M_M", "Mm", "M-M26MARFUT", "bajaj-auto"]
+    with session() as db:
+        load_instruments(db, prepare_frame(normalize_instruments(
+            [{"trading_symbol": symbol, "exchange": "NSE", "underlying_symbol": "MIX"} for symbol in symbols]
+        )))
+        db.commit()
+    client = TestClient(main_module.app)
+    from_db, _ = _pages(client, "/instruments/", limit=2, underlying_symbol="MIX")
+    with session() as db:
+        monkeypatch.setattr(instrument_index, "_index", InstrumentIndex.from_session(db))
+    from_index, _ = _pages(client, "/instruments/", limit=2, underlying_symbol="MIX")
+
+    assert from_index == from_db == sorted(symbols)
+    # PostgreSQL would otherwise order by the database's locale, unlike the index
+    assert 'COLLATE "C"' in str(CreateTable(Instrument.__table__).compile(dialect=postgresql.dialect()))
+
+
+def test_groww_instruments_pages(session):
+    client = TestClient(main_module.app)
+    symbols, cursors = _pages(client, "/groww/instruments", limit=20)
+    assert len(symbols) == len(set(symbols)) == 25
+    assert cursors == ["SYM019"]
+
+
+def test_export_ndjson_and_csv(session, monkeypatch):
+    monkeypatch.setattr("app.services.instrument_listing.EXPORT_BATCH_ROWS", 7)
+    client = TestClient(main_module.app)
+
+    response = client.get("/instruments/export", params={"exchange": "NSE"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["trading_symbol"] for row in rows] == [f"SYM{i:03d}" for i in range(1, 25, 2)]
+    assert rows[0]["expiry_date"] == "2026-01-29" and rows[0]["strike_price"] == 22001.0
+
+    response = client.get("/instruments/export", params={"format": "csv"})
+    assert response.status_code == 200
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(records) == 25
+    assert records[0]["trading_symbol"] == "SYM000" and records[0]["expiry_date"] == ""
+    assert date.fromisoformat(records[1]["expiry_date"]) == date(2026, 1, 29)
+
+    assert client.get("/instruments/export", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,65 @@
+import csv
+import io
+
+import pandas as pd
+
+from app.services import instrument_loader
+from app.services.instrument_job import normalize_instruments
+from app.services.instrument_loader import LOAD_COLUMNS, _CsvStream, _records, diff_instruments, prepare_frame
+
+
+def _frame(items):
+    return prepare_frame(normalize_instruments(items))
+
+
+def test_csv_stream_encodes_frame_in_chunks(monkeypatch):
+    monkeypatch.setattr(instrument_loader, "COPY_CHUNK_ROWS", 2)
+    frame = _frame(
+        [
+            {"trading_symbol": f"SYM{i}", "lot_size": 50.0, "is_reserved": False, "strike_price": 101.5,
+             "name": "a,b", "expiry_date": "2026-01-29"}
+            for i in range(5)
+        ]
+    )
+    stream = _CsvStream(frame)
+
+    parts = []
+    while chunk := stream.read(7):
+        parts.append(chunk)
+    parsed = list(csv.reader(io.StringIO("".join(parts))))
+
+    assert len(parsed) == 5
+    first = dict(zip(LOAD_COLUMNS, parsed[0]))
+    assert first["trading_symbol"] == "SYM0"
+    # Integer columns are written as integers so COPY accepts them
+    assert first["lot_size"] == "50"
+    assert first["is_reserved"] == "0"
+    assert first["strike_price"] == "101.5"
+    assert first["name"] == "a,b"
+    assert first["expiry_date"] == "2026-01-29"
+    # NULLs are unquoted empty fields
+    assert first["isin"] == ""
+
+
+def test_row_hash_is_stable_and_content_sensitive():
+    first = _frame([{"trading_symbol": "A", "lot_size": 50}])["row_hash"][0]
+    assert _frame([{"trading_symbol": "A", "lot_size": 50.0}])["row_hash"][0] == first
+    assert _frame([{"trading_symbol": "A", "lot_size": 25}])["row_hash"][0] != first
+
+
+def test_diff_detects_inserts_updates_and_deletes():
+    frame = _frame([{"trading_symbol": "A"}, {"trading_symbol": "B", "name": "new"}, {"trading_symbol": "C"}])
+    stored = {"A": frame["row_hash"][0], "B": "stale", "D": "gone"}
+
+    inserts, updates, deletes = diff_instruments(frame, stored)
+
+    assert list(inserts["trading_symbol"]) == ["C"]
+    assert list(updates["trading_symbol"]) == ["B"]
+    assert deletes == ["D"]
+
+
+def test_records_use_python_types():
+    record = _records(_frame([{"trading_symbol": "A", "lot_size": 50.0, "expiry_date": "2026-01-29"}]))[0]
+    assert record["lot_size"] == 50 and type(record["lot_size"]) is int
+    assert record["expiry_date"] == pd.Timestamp("2026-01-29").date()
+    assert record["isin"] is None
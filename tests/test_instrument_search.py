@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.services import instrument_index
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+from app.services.instrument_loader import load_instruments, prepare_frame
+
+ROWS = [
+    {"trading_symbol": "RELIANCE", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "name": "Reliance Industries Ltd."},
+    {"trading_symbol": "RELIANCE-BE", "exchange": "BSE", "segment": "CASH", "instrument_type": "EQ", "name": "Reliance Industries Ltd."},
+    {"trading_symbol": "RELIANCE26JAN1300CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE", "name": "RELIANCE"},
+    {"trading_symbol": "RELIANCE26JAN1300PE", "exchange": "NSE", "segment": "FNO", "instrument_type": "PE", "name": "RELIANCE"},
+    {"trading_symbol": "RELINFRA", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "name": "Reliance Infrastructure Ltd"},
+    {"trading_symbol": "TATAMOTORS", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "name": "Tata Motors Ltd"},
+    {"trading_symbol": "M&M", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "name": "Mahindra & Mahindra Ltd"},
+]
+
+
+@pytest.fixture()
+def index():
+    return InstrumentIndex(normalize_instruments(ROWS))
+
+
+def _hits(results):
+    return [(r["trading_symbol"], r["match"]) for r in results]
+
+
+def test_tiers_rank_exact_then_prefix_then_name(index):
+    hits = _hits(index.search.find("reliance"))
+    assert hits[0] == ("RELIANCE", "exact")
+    # Shorter symbols first inside a tier, so the equities precede the options
+    assert hits[1:4] == [("RELIANCE-BE", "prefix"), ("RELIANCE26JAN1300CE", "prefix"), ("RELIANCE26JAN1300PE", "prefix")]
+    assert hits[4] == ("RELINFRA", "name")
+
+
+def test_name_matches_any_word_start(index):
+    assert _hits(index.search.find("mot")) == [("TATAMOTORS", "name")]
+    assert _hits(index.search.find("Tata Mot")) == [("TATAMOTORS", "name")]
+    assert _hits(index.search.find("m&m")) == [("M&M", "exact")]
+
+
+def test_fuzzy_matches_misspellings_by_similarity(index):
+    hits = index.search.find("RELAINCE")
+    assert {r["match"] for r in hits} == {"fuzzy"}
+    assert hits[0]["trading_symbol"] == "RELIANCE"
+    assert all(0.3 <= r["score"] <= 1 for r in hits)
+    assert hits == sorted(hits, key=lambda r: -r["score"])
+    assert index.search.find("QQ") == []
+
+
+def test_filters_and_limit(index):
+    assert _hits(index.search.find("rel", segment="FNO", instrument_type="PE")) == [("RELIANCE26JAN1300PE", "prefix")]
+    assert _hits(index.search.find("rel", exchange="BSE")) == [("RELIANCE-BE", "prefix")]
+    assert len(index.search.find("rel", limit=2)) == 2
+    assert InstrumentIndex(normalize_instruments(ROWS[:0])).search.find("rel") == []
+
+
+def test_search_endpoint_from_index_and_db(session_factory, monkeypatch, index):
+    with session_factory() as db:
+        load_instruments(db, prepare_frame(normalize_instruments(ROWS)))
+        db.commit()
+
+    client = TestClient(main_module.app)
+    monkeypatch.setattr(instrument_index, "_index", index)
+    response = client.get("/instruments/search", params={"q": "relaince", "limit": 1})
+    assert response.status_code == 200
+    assert _hits(response.json()) == [("RELIANCE", "fuzzy")]
+
+    # Before the index loads, the table answers prefix matches
+    monkeypatch.setattr(instrument_index, "_index", None)
+    response = client.get("/instruments/search", params={"q": "reli", "exchange": "NSE"})
+    assert [r["trading_symbol"] for r in response.json()] == ["RELIANCE", "RELINFRA", "RELIANCE26JAN1300CE", "RELIANCE26JAN1300PE"]
+    assert _hits(client.get("/instruments/search", params={"q": "tata"}).json()) == [("TATAMOTORS", "prefix")]
+    assert client.get("/instruments/search", params={"q": "re_"}).json() == []
+    assert client.get("/instruments/search").status_code == 422
@@ -45,6 +45,10 @@ class MockQuery:
         # Simple mock - just return self for chaining
         return self
     
+    def order_by(self, *args):
+        # Mock rows are already in the order the test wants
+        return self
+    
     def limit(self, n):
         self.instruments = self.instruments[:n]
         return self
@@ -56,6 +60,11 @@ class MockQuery:
         return self.instruments[0] if self.instruments else None
 
 
+class MockResult:
+    def first(self):
+        return None
+
+
 class MockSession:
     def __init__(self, instruments=None):
         if instruments is None:
@@ -69,6 +78,10 @@ class MockSession:
     def query(self, model):
         return MockQuery(self.instruments)
     
+    def execute(self, statement):
+        # Dataset version lookups: no stamp recorded yet
+        return MockResult()
+    
     def close(self):
         pass
 
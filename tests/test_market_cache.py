@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from app.brokers.market_cache import _MISSING, MarketDataCache, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.ltp_calls = []
+        self.quote_calls = 0
+
+    async def get_ltp(self, exchange_trading_symbols, segment):
+        self.ltp_calls.append(exchange_trading_symbols)
+        await asyncio.sleep(self.delay)
+        return {s: float(len(s)) for s in exchange_trading_symbols if s != "NSE_UNKNOWN"}
+
+    async def get_quote(self, trading_symbol, exchange, segment):
+        self.quote_calls += 1
+        await asyncio.sleep(self.delay)
+        return {"last_price": 1.0}
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    clock = FakeClock()
+    cache = TTLCache(ttl=1.0, maxsize=2, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+    clock.now = 1.5
+    assert cache.get("a") is _MISSING
+    assert len(cache) == 1
+
+
+def test_ltp_only_fetches_uncached_symbols():
+    client = CountingClient()
+    cache = MarketDataCache(ttl=60, maxsize=100)
+
+    async def scenario():
+        first = await cache.get_ltp(client, ["NSE_A", "NSE_BB"], "CASH")
+        second = await cache.get_ltp(client, ["NSE_A", "NSE_BB", "NSE_CCC"], "CASH")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == {"NSE_A": 5.0, "NSE_BB": 6.0}
+    assert second == {"NSE_A": 5.0, "NSE_BB": 6.0, "NSE_CCC": 7.0}
+    assert client.ltp_calls == [("NSE_A", "NSE_BB"), ("NSE_CCC",)]
+
+
+def test_concurrent_misses_coalesce():
+    client = CountingClient(delay=0.05)
+    cache = MarketDataCache(ttl=60, maxsize=100)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(cache.get_quote(client, trading_symbol="RELIANCE", exchange="NSE", segment="CASH") for _ in range(20)),
+            *(cache.get_ltp(client, ["NSE_A", "NSE_UNKNOWN"], "CASH") for _ in range(20)),
+        )
+
+    results = asyncio.run(scenario())
+    assert client.quote_calls == 1
+    assert len(client.ltp_calls) == 1
+    assert results[-1] == {"NSE_A": 5.0}
+    assert cache.stats()["coalesced"] >= 38
+
+
+def test_upstream_error_reaches_every_waiter():
+    class FailingClient:
+        async def get_ltp(self, exchange_trading_symbols, segment):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("broker down")
+
+    cache = MarketDataCache(ttl=60, maxsize=100)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_ltp(FailingClient(), ["NSE_A"], "CASH") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.stats()["inflight"] == 0
+
+
+def test_greeks_are_cached_per_contract():
+    class GreeksClient:
+        def __init__(self):
+            self.calls = []
+
+        async def get_greeks(self, exchange, underlying, trading_symbol, expiry):
+            self.calls.append(trading_symbol)
+            await asyncio.sleep(0.01)
+            return {"greeks": {"delta": 0.5}}
+
+    client = GreeksClient()
+    cache = MarketDataCache(ttl=60, maxsize=100)
+
+    async def scenario():
+        calls = [("NIFTY26MAR22000CE", "2026-03-26")] * 5 + [("NIFTY26MAR22000PE", "2026-03-26")]
+        return await asyncio.gather(*(cache.get_greeks(client, "NSE", "NIFTY", symbol, expiry) for symbol, expiry in calls))
+
+    results = asyncio.run(scenario())
+    assert sorted(client.calls) == ["NIFTY26MAR22000CE", "NIFTY26MAR22000PE"]
+    assert results[0] == {"greeks": {"delta": 0.5}}
+
+
+def test_fetch_tasks_are_held_and_coalescing_is_per_loop():
+    import threading
+
+    cache = MarketDataCache(ttl=0.0)
+    started, release = threading.Event(), threading.Event()
+
+    async def blocked(exchange_trading_symbols, segment):
+        started.set()
+        await asyncio.to_thread(release.wait, 5)
+        return {s: 1.0 for s in exchange_trading_symbols}
+
+    async def quick(exchange_trading_symbols, segment):
+        return {s: 2.0 for s in exchange_trading_symbols}
+
+    other = threading.Thread(target=lambda: asyncio.run(cache.get_ltp(None, ["NSE_TCS"], "CASH", fetch=blocked)))
+    other.start()
+    assert started.wait(5)
+    # The fetch task is referenced by the cache while it runs
+    assert len(cache._tasks) == 1
+    # Another loop does not wait on the first loop's future; it fetches on its own
+    assert asyncio.run(cache.get_ltp(None, ["NSE_TCS"], "CASH", fetch=quick)) == {"NSE_TCS": 2.0}
+    assert cache.upstream_calls == 2 and cache.coalesced == 0
+    release.set()
+    other.join(5)
+    assert cache._tasks == set() and cache.stats()["inflight"] == 0
@@ -0,0 +1,143 @@
+import weakref
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import app.main as main_module
+from app.db.models import CandleDaily, HoldingDaily
+from app.services import instrument_index, monte_carlo, portfolio_snapshots, value_at_risk
+from app.services.dataset_version import CANDLES, bump
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+from app.services.valuation import Book
+
+AT = datetime(2026, 3, 3, 6, 0)
+INSTRUMENTS = [
+    {"trading_symbol": "TCS", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "lot_size": 1},
+    {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "instrument_type": "FUT",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 3, 26), "lot_size": 75},
+    {"trading_symbol": "NIFTY26MAR22000CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 3, 26), "strike_price": 22000, "lot_size": 75},
+    {"trading_symbol": "NIFTY26MAR21000PE", "exchange": "NSE", "segment": "FNO", "instrument_type": "PE",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 3, 26), "strike_price": 21000, "lot_size": 75},
+]
+
+
+def _closes():
+    rng = np.random.default_rng(3)
+    market = rng.normal(0, 0.01, 120)
+    return {
+        "NIFTY": 22000 * np.exp(np.cumsum(market)),
+        "TCS": 3000 * np.exp(np.cumsum(0.8 * market + rng.normal(0, 0.012, 120))),
+    }
+
+
+@pytest.fixture()
+def factory(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(value_at_risk, "VAR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(value_at_risk, "_matrix", None)
+    monkeypatch.setattr(instrument_index, "_index", InstrumentIndex(normalize_instruments(INSTRUMENTS)))
+    with session_factory() as session:
+        session.execute(insert(CandleDaily), [
+            {"symbol": symbol, "trade_date": date(2025, 11, 1) + timedelta(days=i), "close": close}
+            for symbol, closes in _closes().items() for i, close in enumerate(closes)
+        ])
+        session.add(HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 2), quantity=100, avg_price=2900.0))
+        portfolio_snapshots.insert_snapshots(session, [
+            {"kind": "position", "symbol": symbol, "captured_at": datetime(2026, 3, 3, 4, 0),
+             "quantity": quantity, "avg_price": 100.0, "ltp": None}
+            for symbol, quantity in (("NIFTY26MARFUT", -75), ("NIFTY26MAR22000CE", 150), ("BSEMISSING", 10))
+        ])
+        bump(session, CANDLES)
+        session.commit()
+    return session_factory
+
+
+def _inputs(factory, rows=None):
+    with factory() as session:
+        matrix = value_at_risk.get_return_matrix(session)
+    book = Book.from_rows(rows or [
+        {"kind": "holding", "symbol": "TCS", "quantity": 100, "avg_price": 0.0},
+        {"kind": "position", "symbol": "NIFTY26MARFUT", "quantity": -75, "avg_price": 0.0},
+        {"kind": "position", "symbol": "NIFTY26MAR22000CE", "quantity": 150, "avg_price": 0.0},
+        {"kind": "position", "symbol": "NIFTY26MAR21000PE", "quantity": -75, "avg_price": 0.0},
+    ])
+    return matrix, monte_carlo.build_inputs(matrix, instrument_index.get_instrument_index(), book, AT.date())
+
+
+def test_build_inputs_resolves_contracts_through_the_index(factory):
+    matrix, (inputs, underlyings, uncovered) = _inputs(factory)
+    assert underlyings == ["NIFTY", "TCS"] and uncovered == []
+    # TCS long 100; the future is a linear -75 on NIFTY
+    np.testing.assert_allclose(inputs.delta, [-75.0, 100.0])
+    np.testing.assert_allclose(inputs.option_strike, [22000.0, 21000.0])
+    np.testing.assert_allclose(inputs.option_years, [23 / 365.0] * 2)
+    np.testing.assert_allclose(inputs.factor @ inputs.factor.T, matrix.covariance, rtol=1e-10)
+    assert inputs.option_is_call.tolist() == [True, False]
+
+
+def test_seeded_results_do_not_depend_on_workers(factory):
+    _, (inputs, _, _) = _inputs(factory)
+    inline = monte_carlo.simulate(inputs, paths=3000, seed=11, workers=0, shard_paths=1000)
+    try:
+        pooled = monte_carlo.simulate(inputs, paths=3000, seed=11, workers=2, shard_paths=1000)
+    finally:
+        monte_carlo.shutdown_executor()
+    np.testing.assert_array_equal(inline, pooled)
+    assert not np.array_equal(inline, monte_carlo.simulate(inputs, paths=3000, seed=12, workers=0, shard_paths=1000))
+
+
+def test_linear_book_agrees_with_parametric_var(factory):
+    _, (inputs, _, _) = _inputs(factory, [{"kind": "holding", "symbol": "TCS", "quantity": 100, "avg_price": 0.0}])
+    pnl = monte_carlo.simulate(inputs, paths=40000, seed=5, workers=0)
+    volatility = 100 * inputs.spot[0] * inputs.factor[0, 0]
+    assert np.quantile(-pnl, 0.99) == pytest.approx(NormalDist().inv_cdf(0.99) * volatility, rel=0.05)
+
+
+def test_long_option_loss_is_capped_at_its_value(factory):
+    _, (inputs, _, _) = _inputs(factory, [{"kind": "position", "symbol": "NIFTY26MAR22000CE", "quantity": 75, "avg_price": 0.0}])
+    pnl = monte_carlo.simulate(inputs, paths=5000, horizon_days=20, seed=1, workers=0)
+    assert pnl.min() >= -75 * inputs.option_value[0] - 1e-6
+    # Convex payoff: the upside tail is longer than the downside
+    assert np.quantile(pnl, 0.99) > -np.quantile(pnl, 0.01)
+
+
+def test_options_age_on_the_calendar_their_expiry_is_measured_in():
+    # A trading week is a calendar week off the option's CALENDAR_DAYS clock
+    assert monte_carlo.horizon_years(5) == pytest.approx(7 / 365.0)
+
+
+def test_failed_shard_releases_its_views_of_the_block(factory, monkeypatch):
+    _, (inputs, _, _) = _inputs(factory)
+    views = []
+
+    def failing_shard(arrays, *args):
+        spot = arrays["spot"]
+        views.append(weakref.ref(spot))
+        raise ValueError("bad shard")
+
+    monkeypatch.setattr(monte_carlo, "simulate_shard", failing_shard)
+    block, layout = monte_carlo._share(inputs.arrays())
+    try:
+        with pytest.raises(ValueError, match="bad shard") as raised:
+            monte_carlo._run_shard(block.name, layout, 10, np.random.SeedSequence(1), 1, 0.0)
+        # Nothing, not even the traceback, still points into the closed block
+        assert raised.value and views[0]() is None
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_monte_carlo_endpoint(factory, monkeypatch):
+    monkeypatch.setattr(monte_carlo, "utcnow", lambda: AT)
+    client = TestClient(main_module.app)
+    params = {"paths": 2000, "seed": 9, "confidence": 0.95}
+    body = client.get("/risk/montecarlo", params=params).json()
+    assert body["lines"] == 4 and body["options"] == 1
+    assert body["uncovered"] == ["BSEMISSING"]
+    assert body["var"] > 0 and body["es"] >= body["var"]
+    assert client.get("/risk/montecarlo", params=params).json() == body
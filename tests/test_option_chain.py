@@ -0,0 +1,111 @@
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.routers import instruments as instruments_router
+from app.services import instrument_index
+from app.services.instrument_index import InstrumentIndex, set_instrument_index
+from app.services.instrument_job import normalize_instruments
+from app.services.option_chain import ChainNotFound
+
+
+def _chain_rows(underlying, expiries, strikes, skip=()):
+    rows = []
+    for expiry in expiries:
+        for strike in strikes:
+            for kind in ("CE", "PE"):
+                symbol = f"{underlying}{expiry}{strike}{kind}"
+                if symbol not in skip:
+                    rows.append(
+                        {
+                            "trading_symbol": symbol,
+                            "underlying_symbol": underlying,
+                            "instrument_type": kind,
+                            "expiry_date": expiry,
+                            "strike_price": strike,
+                            "lot_size": 75,
+                        }
+                    )
+    return rows
+
+
+ROWS = (
+    _chain_rows("NIFTY", ["2026-01-29", "2026-02-26"], range(22000, 24001, 100), skip={"NIFTY2026-01-2922000PE"})
+    + _chain_rows("BANKNIFTY", ["2026-01-29"], range(48000, 50001, 500))
+    + [{"trading_symbol": "NIFTY26JANFUT", "underlying_symbol": "NIFTY", "instrument_type": "FUT", "expiry_date": "2026-01-29"}]
+)
+
+
+@pytest.fixture()
+def index():
+    return InstrumentIndex(normalize_instruments(ROWS))
+
+
+def test_chain_pairs_legs_by_sorted_strike(index):
+    chain = index.chains.get("NIFTY", today=date(2026, 1, 1))
+
+    assert chain["expiry"] == date(2026, 1, 29)
+    assert chain["expiries"] == [date(2026, 1, 29), date(2026, 2, 26)]
+    strikes = [row["strike"] for row in chain["strikes"]]
+    assert strikes == sorted(strikes) and len(strikes) == 21
+    first = chain["strikes"][0]
+    assert first["CE"]["trading_symbol"] == "NIFTY2026-01-2922000CE"
+    # Missing legs stay empty; futures are not part of the chain
+    assert first["PE"] is None
+
+
+def test_expiry_defaults_to_next_live_one(index):
+    assert index.chains.get("NIFTY", today=date(2026, 2, 1))["expiry"] == date(2026, 2, 26)
+    assert index.chains.get("NIFTY", expiry=date(2026, 2, 26))["expiry"] == date(2026, 2, 26)
+    with pytest.raises(ChainNotFound):
+        index.chains.get("NIFTY", expiry=date(2026, 3, 26))
+    with pytest.raises(ChainNotFound):
+        index.chains.get("RELIANCE")
+
+
+def test_strike_window_and_atm_selection(index):
+    window = index.chains.get("NIFTY", expiry=date(2026, 1, 29), strike_min=22950, strike_max=23200)
+    assert [row["strike"] for row in window["strikes"]] == [23000.0, 23100.0, 23200.0]
+
+    atm = index.chains.get("NIFTY", expiry=date(2026, 1, 29), atm=23049, width=1)
+    assert atm["atm_strike"] == 23000.0
+    assert [row["strike"] for row in atm["strikes"]] == [22900.0, 23000.0, 23100.0]
+
+    edge = index.chains.get("NIFTY", expiry=date(2026, 1, 29), atm=30000, width=2)
+    assert edge["atm_strike"] == 24000.0
+    assert [row["strike"] for row in edge["strikes"]] == [23800.0, 23900.0, 24000.0]
+
+
+def test_refresh_rebuilds_only_changed_underlyings(monkeypatch, index):
+    monkeypatch.setattr(instrument_index, "_index", None)
+    set_instrument_index(index)
+    before = instrument_index.get_instrument_index().chains
+
+    changed = [dict(row, lot_size=30) if row["trading_symbol"].startswith("BANKNIFTY") else row for row in ROWS]
+    set_instrument_index(InstrumentIndex(normalize_instruments(changed)))
+    after = instrument_index.get_instrument_index().chains
+
+    assert (after.rebuilt, after.reused) == (1, 1)
+    assert after._chains["NIFTY"] is before._chains["NIFTY"]
+    assert after.get("BANKNIFTY")["strikes"][0]["CE"]["lot_size"] == 30
+
+
+def test_chain_endpoint(monkeypatch, index):
+    monkeypatch.setattr(main_module, "_start_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(main_module, "_stop_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(instrument_index, "_index", index)
+    main_module.app.dependency_overrides[instruments_router.get_db] = lambda: None
+    try:
+        client = TestClient(main_module.app)
+        response = client.get("/instruments/chain/BANKNIFTY?expiry=2026-01-29&atm=49100&width=1")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["atm_strike"] == 49000.0
+        assert [row["strike"] for row in body["strikes"]] == [48500.0, 49000.0, 49500.0]
+        assert body["strikes"][1]["PE"]["lot_size"] == 75
+
+        assert client.get("/instruments/chain/UNKNOWN").status_code == 404
+    finally:
+        main_module.app.dependency_overrides.clear()
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.brokers.market_cache import MarketDataCache
+from app.db.models import HoldingDaily
+from app.routers import risk as risk_router
+from app.services import black_scholes, instrument_index, portfolio_greeks, portfolio_snapshots, valuation
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+AT = datetime(2026, 3, 3, 6, 0)
+EXPIRY = date(2026, 3, 26)
+YEARS = 23 / 365.0
+SPOT = 22000.0
+RATE = black_scholes.RISK_FREE_RATE
+
+
+def _smile(strike):
+    return 0.15 + 0.3 * (strike / SPOT - 1) ** 2
+
+
+def _instruments():
+    rows = [
+        {"trading_symbol": "TCS", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "lot_size": 1},
+        {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "instrument_type": "FUT",
+         "underlying_symbol": "NIFTY", "expiry_date": EXPIRY, "lot_size": 75},
+        {"trading_symbol": "BANKNIFTY26MAR50000CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE",
+         "underlying_symbol": "BANKNIFTY", "expiry_date": EXPIRY, "strike_price": 50000, "lot_size": 35},
+    ]
+    for strike in range(21500, 22600, 100):
+        for kind in ("CE", "PE"):
+            rows.append({"trading_symbol": f"NIFTY26MAR{strike}{kind}", "exchange": "NSE", "segment": "FNO",
+                         "instrument_type": kind, "underlying_symbol": "NIFTY", "expiry_date": EXPIRY,
+                         "strike_price": strike, "lot_size": 75})
+    return normalize_instruments(rows)
+
+
+def _price(strike, kind):
+    return float(black_scholes.price(SPOT, strike, YEARS, _smile(strike), RATE, kind == "CE"))
+
+
+class StubMarketCache:
+    def __init__(self):
+        self.prices = {"NSE_NIFTY": SPOT}
+        for strike in range(21500, 22600, 100):
+            kind = "CE" if strike >= SPOT else "PE"
+            self.prices[f"NSE_NIFTY26MAR{strike}{kind}"] = _price(strike, kind)
+        # The held 21800 PE is not quoted: its vol comes from the chain's smile
+        del self.prices["NSE_NIFTY26MAR21800PE"]
+
+    async def get_ltp(self, client, exchange_trading_symbols, segment):
+        return {key: self.prices[key] for key in exchange_trading_symbols if key in self.prices}
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = []
+
+    async def get_greeks(self, exchange, underlying, trading_symbol, expiry):
+        self.calls.append(trading_symbol)
+        if trading_symbol == "NIFTY26MAR22000CE":
+            return {"greeks": {"delta": 0.52, "gamma": 0.0004, "theta": -12.5, "vega": 11.0, "iv": 15.1}}
+        if trading_symbol == "NIFTY26MAR21800PE":
+            await asyncio.sleep(1)
+        raise RuntimeError("rate limited")
+
+
+class StubPool:
+    def __init__(self, client):
+        self.client = client
+
+    async def acquire_async(self):
+        return self.client
+
+
+@pytest.fixture()
+def factory(session_factory, monkeypatch):
+    client = StubClient()
+    monkeypatch.setattr(instrument_index, "_index", InstrumentIndex(_instruments()))
+    monkeypatch.setattr(valuation, "get_market_cache", lambda: StubMarketCache())
+    greeks_cache = MarketDataCache(ttl=60)
+    monkeypatch.setattr(portfolio_greeks, "get_greeks_cache", lambda: greeks_cache)
+    monkeypatch.setattr(portfolio_greeks, "GREEKS_BROKER_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(risk_router, "get_adapter_pool", lambda account_id: StubPool(client))
+    with session_factory() as session:
+        session.add(HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 2), quantity=10, avg_price=3000.0))
+        portfolio_snapshots.insert_snapshots(session, [
+            {"kind": "position", "symbol": symbol, "captured_at": datetime(2026, 3, 3, 4, 0),
+             "quantity": quantity, "avg_price": 100.0, "ltp": None}
+            for symbol, quantity in (
+                ("NIFTY26MARFUT", -75), ("NIFTY26MAR22000CE", 150), ("NIFTY26MAR22100CE", -75),
+                ("NIFTY26MAR21800PE", 75), ("BANKNIFTY26MAR50000CE", 35),
+            )
+        ])
+        session.commit()
+    return client
+
+
+def test_parse_greeks():
+    assert portfolio_greeks.parse_greeks({"delta": "0.5", "gamma": 0, "vega": 1, "theta": -2}) == {
+        "delta": 0.5, "gamma": 0.0, "vega": 1.0, "theta": -2.0,
+    }
+    assert portfolio_greeks.parse_greeks({"greeks": {"delta": 0.5}}) is None
+    assert portfolio_greeks.parse_greeks(None) is None
+
+
+def test_greeks_endpoint_mixes_broker_and_local_greeks(factory):
+    client = TestClient(main_module.app)
+    body = client.get("/risk/greeks", params={"at": AT.isoformat()}).json()
+
+    assert body["sources"] == {"broker": 1, "local": 2, "linear": 2, "unavailable": 1}
+    assert body["unavailable"] == ["BANKNIFTY26MAR50000CE"]
+    local = {
+        (strike, kind): black_scholes.greeks(SPOT, strike, YEARS, _smile(strike), RATE, kind == "CE")
+        for strike, kind in ((22100, "CE"), (21800, "PE"))
+    }
+    expected = {
+        "delta": -75 + 10 + 150 * 0.52 - 75 * local[(22100, "CE")]["delta"] + 75 * local[(21800, "PE")]["delta"],
+        "vega": 150 * 11.0 - 75 * local[(22100, "CE")]["vega"] + 75 * local[(21800, "PE")]["vega"],
+    }
+    assert body["totals"]["delta"] == pytest.approx(float(expected["delta"]), abs=0.05)
+    # The 21800 PE's vol is interpolated between its quoted neighbours on the smile
+    assert body["totals"]["vega"] == pytest.approx(float(expected["vega"]), rel=0.01)
+
+    by_expiry = {(row["underlying"], row["expiry"]): row for row in body["by_expiry"]}
+    assert by_expiry[("NIFTY", "2026-03-26")]["lines"] == 4
+    assert by_expiry[("TCS", None)] == {"underlying": "TCS", "expiry": None, "lines": 1, "delta": 10.0, "gamma": 0.0, "vega": 0.0, "theta": 0.0}
+    assert [row["underlying"] for row in body["by_underlying"]] == ["NIFTY", "TCS"]
+
+    # Broker answers are cached; only the failed contracts are asked again
+    calls = len(factory.calls)
+    client.get("/risk/greeks", params={"at": AT.isoformat()})
+    assert sorted(factory.calls[calls:]) == ["BANKNIFTY26MAR50000CE", "NIFTY26MAR21800PE", "NIFTY26MAR22100CE"]
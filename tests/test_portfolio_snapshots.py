@@ -0,0 +1,271 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import app.main as main_module
+from app.db.models import PortfolioSnapshot, PortfolioSnapshotDaily
+from app.services import portfolio_snapshots
+
+
+@pytest.fixture()
+def factory(session_factory, monkeypatch):
+    monkeypatch.setattr(portfolio_snapshots, "SessionLocal", session_factory)
+    return session_factory
+
+
+class StubBroker:
+    """Holdings/positions payloads and LTPs that tests change between captures."""
+
+    def __init__(self):
+        self.holdings = []
+        self.positions = []
+        self.ltps = {}
+        self.fail_positions = False
+
+    async def get_holdings(self):
+        return {"holdings": self.holdings}
+
+    async def get_positions(self):
+        if self.fail_positions:
+            raise RuntimeError("positions down")
+        return {"positions": self.positions}
+
+
+class StubMarketCache:
+    def __init__(self, broker):
+        self.broker = broker
+        self.requests = []
+
+    async def get_ltp(self, client, exchange_trading_symbols, segment):
+        self.requests.append((segment, sorted(exchange_trading_symbols)))
+        return {key: self.broker.ltps[key] for key in exchange_trading_symbols if key in self.broker.ltps}
+
+
+class StubPool:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def acquire_async(self):
+        return self.broker
+
+
+@pytest.fixture()
+def broker(monkeypatch):
+    broker = StubBroker()
+    monkeypatch.setattr(portfolio_snapshots, "get_adapter_pool", lambda account_id: StubPool(broker))
+    cache = StubMarketCache(broker)
+    monkeypatch.setattr(portfolio_snapshots, "get_market_cache", lambda: cache)
+    broker.cache = cache
+    return broker
+
+
+def _capture_at(monkeypatch, when):
+    monkeypatch.setattr(portfolio_snapshots, "utcnow", lambda: when)
+    return asyncio.run(portfolio_snapshots.capture_snapshot())
+
+
+def _stored(factory):
+    with factory() as session:
+        return [
+            (row.kind, row.symbol, row.captured_at.hour, row.quantity, row.ltp)
+            for row in session.scalars(select(PortfolioSnapshot).order_by(
+                PortfolioSnapshot.captured_at, PortfolioSnapshot.kind, PortfolioSnapshot.symbol))
+        ]
+
+
+def test_encode_deltas_writes_only_changes():
+    previous = {
+        "TCS": {"quantity": 10.0, "avg_price": 3000.0, "ltp": 3500.0},
+        "INFY": {"quantity": 5.0, "avg_price": 1500.0, "ltp": 1600.0},
+        "IDEA": {"quantity": 0.0, "avg_price": None, "ltp": 12.0},
+        "SBIN": {"quantity": 20.0, "avg_price": 600.0, "ltp": 800.0},
+    }
+    rows = [
+        {"symbol": "TCS", "quantity": 10.0, "avg_price": 3000.0, "ltp": 3500.0},
+        # No LTP this time: the previous one carries over and nothing is written
+        {"symbol": "INFY", "quantity": 5.0, "avg_price": 1500.0, "ltp": None},
+        {"symbol": "SBIN", "quantity": 20.0, "avg_price": 600.0, "ltp": 800.5},
+        {"symbol": "HDFC", "quantity": 1.0, "avg_price": 1700.0, "ltp": None},
+    ]
+    at = datetime(2026, 3, 2, 5, 0)
+    deltas = portfolio_snapshots.encode_deltas("holding", rows, previous, at, tolerance=0.0)
+    assert [(d["symbol"], d["quantity"], d["ltp"]) for d in deltas] == [("SBIN", 20.0, 800.5), ("HDFC", 1.0, None)]
+
+    # Within tolerance an LTP tick alone is not a change; an absent held symbol is closed once
+    deltas = portfolio_snapshots.encode_deltas("holding", rows[:1] + rows[2:3], previous, at, tolerance=0.001)
+    assert [(d["symbol"], d["quantity"]) for d in deltas] == [("INFY", 0.0)]
+
+
+def test_normalize_positions_merges_products_and_keeps_markets():
+    rows, markets = portfolio_snapshots.normalize_snapshot(
+        "position",
+        {"positions": [
+            {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "quantity": 50, "net_price": 22000.0},
+            {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "quantity": 25, "net_price": 22300.0},
+            {"trading_symbol": "RELIANCE", "quantity": -10, "net_price": 2900.0, "ltp": 2950.0},
+        ]},
+    )
+    assert rows == [
+        {"symbol": "NIFTY26MARFUT", "quantity": 75.0, "avg_price": 22100.0, "ltp": None},
+        {"symbol": "RELIANCE", "quantity": -10.0, "avg_price": 2900.0, "ltp": 2950.0},
+    ]
+    assert markets == {"NIFTY26MARFUT": ("NSE", "FNO"), "RELIANCE": ("NSE", "CASH")}
+
+
+def test_capture_stores_change_points_only(factory, broker, monkeypatch):
+    broker.holdings = [{"trading_symbol": "TCS", "quantity": 10, "average_price": 3000.0},
+                       {"trading_symbol": "INFY", "quantity": 5, "average_price": 1500.0}]
+    broker.positions = [{"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "quantity": 50, "net_price": 22000.0}]
+    broker.ltps = {"NSE_TCS": 3500.0, "NSE_INFY": 1600.0, "NSE_NIFTY26MARFUT": 22100.0}
+
+    assert _capture_at(monkeypatch, datetime(2026, 3, 2, 4, 0)) == 3
+    assert sorted(broker.cache.requests) == [("CASH", ["NSE_INFY", "NSE_TCS"]), ("FNO", ["NSE_NIFTY26MARFUT"])]
+    # Nothing moved: nothing written
+    assert _capture_at(monkeypatch, datetime(2026, 3, 2, 5, 0)) == 0
+
+    broker.ltps["NSE_TCS"] = 3510.0
+    broker.holdings = broker.holdings[:1]
+    assert _capture_at(monkeypatch, datetime(2026, 3, 2, 6, 0)) == 2
+
+    # A failed positions call is not read as the position being closed
+    broker.fail_positions = True
+    assert _capture_at(monkeypatch, datetime(2026, 3, 2, 7, 0)) == 0
+
+    assert _stored(factory) == [
+        ("holding", "INFY", 4, 5.0, 1600.0),
+        ("holding", "TCS", 4, 10.0, 3500.0),
+        ("position", "NIFTY26MARFUT", 4, 50.0, 22100.0),
+        ("holding", "INFY", 6, 0.0, 1600.0),
+        ("holding", "TCS", 6, 10.0, 3510.0),
+    ]
+    with factory() as session:
+        held = portfolio_snapshots.state_at(session, datetime(2026, 3, 2, 6, 30))
+        assert [(r["kind"], r["symbol"], r["ltp"]) for r in held] == [
+            ("holding", "TCS", 3510.0), ("position", "NIFTY26MARFUT", 22100.0)]
+        before = portfolio_snapshots.state_at(session, datetime(2026, 3, 2, 5, 0), kind="holding")
+        assert [r["symbol"] for r in before] == ["INFY", "TCS"]
+
+
+def _seed(factory, points):
+    with factory() as session:
+        portfolio_snapshots.insert_snapshots(session, [
+            {"kind": "holding", "symbol": symbol, "captured_at": at, "quantity": qty, "avg_price": 100.0, "ltp": ltp}
+            for symbol, at, qty, ltp in points
+        ])
+        session.commit()
+
+
+def test_rollup_compacts_old_days_and_keeps_state(factory):
+    _seed(factory, [
+        ("TCS", datetime(2026, 3, 2, 4, 0), 10.0, 100.0),
+        ("TCS", datetime(2026, 3, 2, 6, 0), 10.0, 104.0),
+        ("TCS", datetime(2026, 3, 2, 8, 0), 10.0, 101.0),
+        ("TCS", datetime(2026, 3, 5, 4, 0), 12.0, 99.0),
+        ("INFY", datetime(2026, 3, 2, 4, 0), 5.0, 50.0),
+        ("INFY", datetime(2026, 3, 3, 5, 0), 0.0, 51.0),
+    ])
+    cutoff = datetime(2026, 3, 5)
+    with factory() as session:
+        counts = portfolio_snapshots.rollup_snapshots(session, cutoff)
+        session.commit()
+    assert counts == {"daily": 5, "keyframes": 1, "partitions_dropped": 0, "deleted": 5}
+
+    with factory() as session:
+        daily = [
+            (row.symbol, row.as_of_date.day, row.quantity, row.ltp, row.ltp_low, row.ltp_high, row.changes)
+            for row in session.scalars(select(PortfolioSnapshotDaily).order_by(
+                PortfolioSnapshotDaily.symbol, PortfolioSnapshotDaily.as_of_date))
+        ]
+        assert daily == [
+            ("INFY", 2, 5.0, 50.0, 50.0, 50.0, 1),
+            ("INFY", 3, 0.0, 51.0, 50.0, 51.0, 1),
+            ("TCS", 2, 10.0, 101.0, 100.0, 104.0, 3),
+            ("TCS", 3, 10.0, 101.0, 101.0, 101.0, 0),
+            ("TCS", 4, 10.0, 101.0, 101.0, 101.0, 0),
+        ]
+        # The keyframe at the cutoff keeps the state readable without the deleted rows
+        held = portfolio_snapshots.state_at(session, datetime(2026, 3, 5, 2, 0))
+        assert [(r["symbol"], r["quantity"], r["ltp"]) for r in held] == [("TCS", 10.0, 101.0)]
+        assert session.scalar(select(func.count()).select_from(PortfolioSnapshot)) == 2
+
+    # Nothing left before the cutoff: a rerun is a no-op
+    with factory() as session:
+        assert portfolio_snapshots.rollup_snapshots(session, cutoff)["daily"] == 0
+
+    # A late change-point for a day already rolled up replaces that day's row
+    _seed(factory, [("INFY", datetime(2026, 3, 3, 9, 0), 2.0, 52.0)])
+    with factory() as session:
+        # The 3rd, and the 4th it is carried through
+        assert portfolio_snapshots.rollup_snapshots(session, cutoff)["daily"] == 2
+        session.commit()
+    with factory() as session:
+        row = session.get(PortfolioSnapshotDaily, {"account_id": "default", "kind": "holding", "symbol": "INFY", "as_of_date": date(2026, 3, 3)})
+        assert (row.quantity, row.ltp, row.changes) == (2.0, 52.0, 1)
+
+
+def test_intraday_trigger_follows_market_hours():
+    from app.scheduler.scheduler import market_hours_trigger
+
+    trigger = market_hours_trigger(5)
+    fire, times = None, []
+    now = datetime(2026, 3, 2, tzinfo=timezone.utc)
+    while True:
+        fire = trigger.get_next_fire_time(fire, now)
+        if fire.date() != now.date():
+            break
+        times.append(fire.strftime("%H:%M"))
+        now = fire + timedelta(seconds=1)
+    assert times[0] == "03:45" and times[-1] == "10:00"
+    assert len(times) == 3 + 6 * 12 + 1
+
+
+def test_history_and_snapshot_endpoints(factory):
+    _seed(factory, [
+        ("TCS", datetime(2026, 3, 2, 4, 0), 10.0, 100.0),
+        ("TCS", datetime(2026, 3, 3, 4, 0), 10.0, 102.0),
+        ("TCS", datetime(2026, 3, 3, 6, 0), 12.0, 103.0),
+        ("TCS", datetime(2026, 3, 3, 8, 0), 12.0, 101.0),
+    ])
+    with factory() as session:
+        portfolio_snapshots.rollup_snapshots(session, datetime(2026, 3, 3))
+        session.commit()
+
+    client = TestClient(main_module.app)
+    response = client.get("/portfolio/history/TCS", params={"start": "2026-03-02T00:00:00", "end": "2026-03-03T07:00:00"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [(d["as_of_date"], d["ltp"]) for d in body["daily"]] == [("2026-03-02", 100.0)]
+    assert [(p["captured_at"], p["quantity"]) for p in body["intraday"]] == [
+        ("2026-03-03T00:00:00", 10.0), ("2026-03-03T04:00:00", 10.0), ("2026-03-03T06:00:00", 12.0)]
+
+    # The opening point is the state in effect at start
+    response = client.get("/portfolio/history/TCS", params={"start": "2026-03-03T05:00:00", "end": "2026-03-03T09:00:00"})
+    assert [p["ltp"] for p in response.json()["intraday"]] == [102.0, 103.0, 101.0]
+
+    response = client.get("/portfolio/snapshot", params={"at": "2026-03-03T07:00:00", "kind": "holding"})
+    assert [(r["symbol"], r["quantity"], r["ltp"]) for r in response.json()] == [("TCS", 12.0, 103.0)]
+    assert client.get("/portfolio/snapshot", params={"kind": "lot"}).status_code == 400
+    assert client.get("/portfolio/history/TCS", params={"start": "2026-03-04T00:00:00", "end": "2026-03-03T00:00:00"}).status_code == 400
+
+
+def test_accounts_are_rolled_up_and_read_separately(factory):
+    with factory() as session:
+        portfolio_snapshots.insert_snapshots(session, [
+            {"account_id": account_id, "kind": "holding", "symbol": "TCS", "captured_at": datetime(2026, 3, 2, 4, 0),
+             "quantity": qty, "avg_price": 100.0, "ltp": 100.0}
+            for account_id, qty in (("default", 10.0), ("family", 3.0))
+        ])
+        portfolio_snapshots.rollup_snapshots(session, datetime(2026, 3, 3))
+        session.commit()
+
+    with factory() as session:
+        daily = {(row.account_id, row.quantity) for row in session.scalars(select(PortfolioSnapshotDaily))}
+        assert daily == {("default", 10.0), ("family", 3.0)}
+        held = portfolio_snapshots.state_at(session, datetime(2026, 3, 3, 1, 0), account_id="family")
+        assert [(r["account_id"], r["quantity"]) for r in held] == [("family", 3.0)]
+
+    client = TestClient(main_module.app)
+    assert client.get("/portfolio/snapshot", params={"account_id": "nobody"}).status_code == 404
@@ -0,0 +1,156 @@
+import asyncio
+
+import httpx
+import pytest
+from growwapi.groww.exceptions import GrowwAPITimeoutException
+
+from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+from app.brokers.rate_limit import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_ORDER,
+    DEFAULT_RATE_LIMITS,
+    BrokerRateLimiter,
+    PriorityTokenBucket,
+    endpoint_class,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _limiter(**kwargs) -> BrokerRateLimiter:
+    limits = {name: (1000.0, 1000.0) for name in DEFAULT_RATE_LIMITS}
+    return BrokerRateLimiter(limits=limits, base_delay=0.0, max_delay=0.0, **kwargs)
+
+
+def test_endpoint_class_groups_urls():
+    assert endpoint_class("https://api.groww.in/v1/live-data/ltp") == "quotes"
+    assert endpoint_class("https://api.groww.in/v1/order/create") == "orders"
+    assert endpoint_class("https://api.groww.in/v1/margins/detail/orders") == "orders"
+    assert endpoint_class("https://api.groww.in/v1/historical/candle/range") == "historical"
+    assert endpoint_class("https://api.groww.in/v1/holdings/user") == "portfolio"
+    assert endpoint_class("https://growwapi-assets.groww.in/instruments/instrument.csv") == "instruments"
+    assert endpoint_class("https://api.groww.in/v1/changelog") == "changelog"
+
+
+def test_bucket_serves_waiters_by_priority():
+    now = [0.0]
+    bucket = PriorityTokenBucket(rate=1.0, burst=1.0, clock=lambda: now[0])
+    bucket._tokens = 0.0
+
+    bulk = bucket._enqueue(PRIORITY_BULK)
+    order = bucket._enqueue(PRIORITY_ORDER)
+    interactive = bucket._enqueue(PRIORITY_INTERACTIVE)
+
+    now[0] = 1.0
+    # Only the highest-priority waiter may take the single refilled token
+    assert bucket._try_take(bulk) > 0
+    assert bucket._try_take(interactive) > 0
+    assert bucket._try_take(order) == 0
+
+    now[0] = 2.0
+    assert bucket._try_take(bulk) > 0
+    assert bucket._try_take(interactive) == 0
+
+
+def test_send_retries_429_and_drains_bucket():
+    limiter = _limiter()
+    responses = [FakeResponse(429, {"Retry-After": "0"}), FakeResponse(200)]
+    calls = []
+
+    def send():
+        calls.append(1)
+        return responses[len(calls) - 1]
+
+    response = limiter.send("https://api.groww.in/v1/live-data/quote", send)
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+    assert limiter.stats()["quotes"]["throttled"] == 1
+    assert limiter.stats()["quotes"]["retries"] == 1
+
+
+def test_429_delay_is_taken_in_the_bucket_not_slept():
+    limiter = BrokerRateLimiter(limits={name: (10.0, 10.0) for name in DEFAULT_RATE_LIMITS}, max_delay=5.0)
+    url = "https://api.groww.in/v1/live-data/quote"
+    # The retry waits out the debt in the bucket, with every other quotes caller, and sleeps nothing more
+    assert limiter._retry_delay(url, 0, FakeResponse(429, {"Retry-After": "2"})) == 0
+    assert limiter.buckets["quotes"]._tokens == pytest.approx(-20.0, abs=0.5)
+    assert limiter._retry_delay(url, 0, FakeResponse(503, {"Retry-After": "2"})) == 2.0
+
+
+def test_order_create_is_not_retried_on_server_error_or_timeout():
+    limiter = _limiter()
+    calls = []
+
+    def server_error():
+        calls.append(1)
+        return FakeResponse(503)
+
+    def timeout():
+        calls.append(1)
+        raise GrowwAPITimeoutException()
+
+    assert limiter.send("https://api.groww.in/v1/order/create", server_error).status_code == 503
+    with pytest.raises(GrowwAPITimeoutException):
+        limiter.send("https://api.groww.in/v1/order/create", timeout)
+    assert len(calls) == 2
+
+
+def test_idempotent_reads_retry_until_budget_is_spent():
+    limiter = _limiter(max_retries=2)
+    calls = []
+
+    def server_error():
+        calls.append(1)
+        return FakeResponse(502)
+
+    assert limiter.send("https://api.groww.in/v1/holdings/user", server_error).status_code == 502
+    assert len(calls) == 3
+
+
+def test_async_adapter_retries_through_limiter():
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(1)
+        if len(attempts) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0"}, json={})
+        return httpx.Response(200, json={"status": "SUCCESS", "payload": {"holdings": []}})
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    adapter = AsyncGrowwAdapter("token", http, domain="https://broker.test/v1", limiter=_limiter())
+
+    assert asyncio.run(adapter.get_holdings_for_user()) == {"holdings": []}
+    assert len(attempts) == 2
+
+
+def test_sync_adapter_sends_changelog_and_instrument_csv_through_their_classes():
+    from app.brokers.groww_adapter import GrowwAdapter
+
+    class FakeSession:
+        def __init__(self):
+            self.urls = []
+
+        def get(self, url, **kwargs):
+            self.urls.append(url)
+            response = FakeResponse(200)
+            response.content = b"trading_symbol,exchange\nTCS,NSE\n"
+            response.json = lambda: {}
+            response.raise_for_status = lambda: None
+            return response
+
+    session = FakeSession()
+    limiter = _limiter()
+    adapter = GrowwAdapter("token", session=session, domain="https://broker.test/v1", limiter=limiter)
+    frame = adapter.get_all_instruments()
+
+    assert frame.to_dict("records") == [{"trading_symbol": "TCS", "exchange": "NSE"}]
+    assert session.urls[-1].endswith("/instruments/instrument.csv")
+    stats = limiter.stats()
+    assert stats["changelog"]["granted"] == 1 and stats["instruments"]["granted"] == 1
+    assert stats["portfolio"]["granted"] == 0
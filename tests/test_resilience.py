@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.brokers.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BrokerGuard,
+    BrokerUnavailableError,
+    CircuitBreaker,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def test_breaker_opens_then_probes_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, half_open_probes=1, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+    now[0] = 10.0
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time while half-open
+    assert breaker.allow() is False
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_failed_probe_reopens_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] = 5.0
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_after() == 5.0
+
+
+def test_guard_counts_5xx_and_errors_but_not_4xx():
+    guard = BrokerGuard(breaker_factory=lambda: CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    url = "https://api.groww.in/v1/historical/candle/range"
+
+    guard.call(url, lambda: FakeResponse(404))
+    guard.call(url, lambda: FakeResponse(503))
+
+    def boom():
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        guard.call(url, boom)
+    with pytest.raises(BrokerUnavailableError) as excinfo:
+        guard.call(url, lambda: FakeResponse(200))
+
+    assert excinfo.value.endpoint_class == "historical"
+    # Other classes are unaffected
+    assert guard.call("https://api.groww.in/v1/live-data/ltp", lambda: FakeResponse(200)).status_code == 200
+
+
+def test_bulkhead_rejects_calls_over_the_class_limit():
+    guard = BrokerGuard(bulkheads={"quotes": 2})
+    url = "https://api.groww.in/v1/live-data/quote"
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return FakeResponse(200)
+
+        running = [asyncio.ensure_future(guard.call_async(url, slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(BrokerUnavailableError):
+            await guard.call_async(url, slow)
+        # Orders have their own bulkhead
+        release.set()
+        await guard.call_async("https://api.groww.in/v1/order/list", slow)
+        await asyncio.gather(*running)
+
+    asyncio.run(scenario())
+    stats = guard.stats()["quotes"]["bulkhead"]
+    assert stats["rejected"] == 1
+    assert stats["active"] == 0
+    assert stats["peak"] == 2
+
+
+def test_unavailable_broker_maps_to_503_and_metrics_are_exposed(monkeypatch):
+    import app.main as main_module
+    from app.brokers.groww_pool import get_async_groww_client
+
+    monkeypatch.setattr(main_module, "_start_scheduler", lambda: None, raising=False)
+    monkeypatch.setattr(main_module, "_stop_scheduler", lambda: None, raising=False)
+
+    class DownClient:
+        async def get_holdings(self):
+            raise BrokerUnavailableError("portfolio", "circuit open", 12.5)
+
+    main_module.app.dependency_overrides[get_async_groww_client] = lambda: DownClient()
+    try:
+        client = TestClient(main_module.app)
+        response = client.get("/groww/holdings")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "13"
+
+        metrics = client.get("/metrics/broker").json()
+        assert set(metrics["endpoints"]) >= {"quotes", "orders", "historical"}
+        assert metrics["endpoints"]["orders"]["breaker"]["state"] == CLOSED
+    finally:
+        main_module.app.dependency_overrides.clear()
+
+
+def test_queued_and_retried_calls_do_not_hold_bulkhead_slots():
+    import httpx
+
+    from app.brokers.groww_async_adapter import AsyncGrowwAdapter
+    from app.brokers.rate_limit import DEFAULT_RATE_LIMITS, BrokerRateLimiter
+
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(1)
+        if len(attempts) == 1:
+            return httpx.Response(503, json={})
+        return httpx.Response(200, json={"status": "SUCCESS", "payload": {"ltp": 1}})
+
+    limits = {name: (200.0, 1.0) for name in DEFAULT_RATE_LIMITS}
+    limiter = BrokerRateLimiter(limits=limits, base_delay=0.0, max_delay=0.0)
+    guard = BrokerGuard(bulkheads={"quotes": 1}, breaker_factory=lambda: CircuitBreaker(failure_threshold=3))
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    adapter = AsyncGrowwAdapter("token", http, domain="https://broker.test/v1", limiter=limiter, guard=guard)
+
+    async def burst():
+        return await asyncio.gather(*(adapter.get_ltp(("NSE_TCS",), "CASH") for _ in range(5)))
+
+    # Five callers queue behind a one-token bucket and share a one-slot bulkhead without a rejection
+    assert len(asyncio.run(burst())) == 5
+    stats = guard.stats()["quotes"]
+    assert stats["bulkhead"]["rejected"] == 0 and stats["bulkhead"]["peak"] == 1
+    assert stats["breaker"]["state"] == CLOSED and len(attempts) == 6
+
+    # Each attempt is reported: with a one-failure breaker, the 503 opens it before the retry
+    attempts.clear()
+    guard = BrokerGuard(breaker_factory=lambda: CircuitBreaker(failure_threshold=1))
+    adapter = AsyncGrowwAdapter("token", http, domain="https://broker.test/v1", limiter=limiter, guard=guard)
+    with pytest.raises(BrokerUnavailableError):
+        asyncio.run(adapter.get_ltp(("NSE_TCS",), "CASH"))
+    assert len(attempts) == 1 and guard.stats()["quotes"]["breaker"]["state"] == OPEN
+
+
+def test_guards_are_per_account():
+    from app.brokers.resilience import get_broker_guard
+
+    assert get_broker_guard("acct-a") is get_broker_guard("acct-a")
+    assert get_broker_guard("acct-a") is not get_broker_guard("acct-b")
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import app.main as main_module
+from app.db.models import CandleDaily, HoldingDaily
+from app.services import black_scholes, instrument_index, portfolio_snapshots, stress, value_at_risk
+from app.services.dataset_version import CANDLES, bump
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+AT = datetime(2026, 3, 3, 6, 0)
+EXPIRY = date(2026, 3, 26)
+INSTRUMENTS = [
+    {"trading_symbol": "TCS", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "lot_size": 1},
+    {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "instrument_type": "FUT",
+     "underlying_symbol": "NIFTY", "expiry_date": EXPIRY, "lot_size": 75},
+    {"trading_symbol": "NIFTY26MAR22000CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE",
+     "underlying_symbol": "NIFTY", "expiry_date": EXPIRY, "strike_price": 22000, "lot_size": 75},
+    {"trading_symbol": "NIFTY26MAR21000PE", "exchange": "NSE", "segment": "FNO", "instrument_type": "PE",
+     "underlying_symbol": "NIFTY", "expiry_date": EXPIRY, "strike_price": 21000, "lot_size": 75},
+    {"trading_symbol": "NIFTY26FEB22000CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 2, 26), "strike_price": 22000, "lot_size": 75},
+]
+
+
+def _closes():
+    rng = np.random.default_rng(3)
+    market = rng.normal(0, 0.01, 120)
+    return {
+        "NIFTY": 22000 * np.exp(np.cumsum(market)),
+        "TCS": 3000 * np.exp(np.cumsum(0.8 * market + rng.normal(0, 0.012, 120))),
+    }
+
+
+def _position(session, symbol, quantity, captured_at=datetime(2026, 3, 3, 4, 0)):
+    portfolio_snapshots.insert_snapshots(session, [
+        {"kind": "position", "symbol": symbol, "captured_at": captured_at, "quantity": quantity, "avg_price": 100.0, "ltp": None}
+    ])
+
+
+@pytest.fixture()
+def factory(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(value_at_risk, "VAR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(value_at_risk, "_matrix", None)
+    monkeypatch.setattr(instrument_index, "_index", InstrumentIndex(normalize_instruments(INSTRUMENTS)))
+    monkeypatch.setattr(stress, "_markets", OrderedDict())
+    with session_factory() as session:
+        session.execute(insert(CandleDaily), [
+            {"symbol": symbol, "trade_date": date(2025, 11, 1) + timedelta(days=i), "close": close}
+            for symbol, closes in _closes().items() for i, close in enumerate(closes)
+        ])
+        session.add(HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 2), quantity=100, avg_price=2900.0))
+        for symbol, quantity in (("NIFTY26MARFUT", -75), ("NIFTY26MAR22000CE", 150), ("NIFTY26FEB22000CE", 75), ("BSEMISSING", 10)):
+            _position(session, symbol, quantity)
+        bump(session, CANDLES)
+        session.commit()
+    return session_factory
+
+
+def test_chain_reprices_live_contracts_per_lot():
+    index = InstrumentIndex(normalize_instruments(INSTRUMENTS))
+    chain = stress.build_chain(index, "NIFTY", 22000.0, 0.15, AT.date())
+    # The expired February call is left out; the underlying itself is a linear row
+    assert chain.symbols.tolist() == ["NIFTY", "NIFTY26MAR21000PE", "NIFTY26MAR22000CE", "NIFTY26MARFUT"]
+    assert chain.lot_size.tolist() == [1.0, 75.0, 75.0, 75.0]
+
+    surface = chain.reprice(np.array([-5.0, 0.0, 5.0]), np.array([-20.0, 0.0, 2.0]))
+    assert surface.shape == (4, 3, 3)
+    np.testing.assert_allclose(surface[3], 75 * 22000 * np.array([[-0.05] * 3, [0.0] * 3, [0.05] * 3]))
+    years = 23 / 365.0
+    base = black_scholes.price(22000.0, 22000, years, 0.15, black_scholes.RISK_FREE_RATE, True)
+    shocked = black_scholes.price(23100.0, 22000, years, 0.17, black_scholes.RISK_FREE_RATE, True)
+    assert surface[2, 2, 2] == pytest.approx(75 * (shocked - base))
+    assert surface[2, 1, 1] == pytest.approx(0.0, abs=1e-9)
+    # Vol cannot be shocked below the floor
+    floored = black_scholes.price(22000.0, 22000, years, stress.STRESS_MIN_VOL, black_scholes.RISK_FREE_RATE, True)
+    assert surface[2, 1, 0] == pytest.approx(75 * (floored - base))
+
+
+def test_grid_is_the_lots_weighted_sum_of_surfaces(factory, monkeypatch):
+    client = TestClient(main_module.app)
+    params = {"spot_range": 10, "spot_points": 5, "vol_range": 5, "vol_points": 3, "at": AT.isoformat()}
+    body = client.get("/risk/stress/grid", params=params).json()
+
+    assert body["spot_shocks"] == [-10.0, -5.0, 0.0, 5.0, 10.0] and body["vol_shocks"] == [-5.0, 0.0, 5.0]
+    assert body["uncovered"] == ["BSEMISSING", "NIFTY26FEB22000CE"]
+    by_underlying = {row["underlying"]: row for row in body["by_underlying"]}
+    assert sorted(by_underlying) == ["NIFTY", "TCS"]
+    total = np.array(body["total"])
+    np.testing.assert_allclose(total, np.array(by_underlying["NIFTY"]["pnl"]) + by_underlying["TCS"]["pnl"], atol=0.02)
+    assert total[2, 1] == pytest.approx(0.0, abs=0.01)
+
+    # Line by line revaluation of the NIFTY book agrees
+    nifty = by_underlying["NIFTY"]
+    spot, vol, years, rate = nifty["spot"], nifty["vol"], 23 / 365.0, black_scholes.RISK_FREE_RATE
+    for i, move in enumerate(body["spot_shocks"]):
+        for j, dv in enumerate(body["vol_shocks"]):
+            call = black_scholes.price(spot * (1 + move / 100), 22000, years, vol + dv / 100, rate, True)
+            expected = -75 * spot * move / 100 + 150 * (call - black_scholes.price(spot, 22000, years, vol, rate, True))
+            assert nifty["pnl"][i][j] == pytest.approx(float(expected), rel=1e-3, abs=1.0)
+    assert body["worst"]["pnl"] == pytest.approx(total.min(), abs=0.01)
+
+    # Surfaces are computed once per underlying and grid
+    calls = []
+    reprice = stress.Chain.reprice
+    monkeypatch.setattr(stress.Chain, "reprice", lambda self, *args: calls.append(self.underlying) or reprice(self, *args))
+    assert client.get("/risk/stress/grid", params=params).json() == body
+    assert calls == []
+    client.get("/risk/stress/grid", params=dict(params, vol_points=1))
+    assert sorted(calls) == ["NIFTY", "TCS"]
+
+
+def test_each_market_keeps_its_own_caches(factory, monkeypatch):
+    client = TestClient(main_module.app)
+    params = {"spot_points": 3, "vol_points": 3}
+    client.get("/risk/stress/grid", params=dict(params, at=AT.isoformat()))
+    client.get("/risk/stress/grid", params=dict(params, at=(AT + timedelta(days=1)).isoformat()))
+    assert len(stress._markets) == 2
+
+    # Alternating dates does not throw away the other date's surfaces
+    calls = []
+    reprice = stress.Chain.reprice
+    monkeypatch.setattr(stress.Chain, "reprice", lambda self, *args: calls.append(self.underlying) or reprice(self, *args))
+    client.get("/risk/stress/grid", params=dict(params, at=AT.isoformat()))
+    assert calls == []
+
+    # The least recently used market goes first
+    monkeypatch.setattr(stress, "STRESS_MARKET_CACHE_SIZE", 2)
+    client.get("/risk/stress/grid", params=dict(params, at=(AT + timedelta(days=2)).isoformat()))
+    assert [market[2] for market in stress._markets] == [AT.date(), AT.date() + timedelta(days=2)]
+
+
+def test_grid_size_is_bounded(factory):
+    client = TestClient(main_module.app)
+    assert client.get("/risk/stress/grid", params={"spot_points": 101, "vol_points": 101}).status_code == 400
+
+
+def test_scenarios_are_stored_and_reevaluated_incrementally(factory):
+    client = TestClient(main_module.app)
+    crash = {"description": "Index down 10%, vol up 8", "spot_shock": -10, "vol_shock": 8,
+             "overrides": {"TCS": {"spot_shock": -4}}}
+    assert client.put("/risk/stress/scenarios/crash", json=crash).json()["overrides"] == {
+        "TCS": {"spot_shock": -4.0, "vol_shock": None},
+    }
+    client.put("/risk/stress/scenarios/rally", json={"spot_shock": 5})
+    assert [row["name"] for row in client.get("/risk/stress/scenarios").json()] == ["crash", "rally"]
+
+    params = {"at": AT.isoformat()}
+    body = client.get("/risk/stress", params=params).json()
+    crash_result, rally_result = body["scenarios"]
+    assert crash_result["repriced_lines"] == 3
+    grid = client.get("/risk/stress/grid", params={"spot_range": 10, "spot_points": 3, "vol_range": 8, "vol_points": 3, **params}).json()
+    by_underlying = {row["underlying"]: row for row in grid["by_underlying"]}
+    assert crash_result["by_underlying"]["NIFTY"] == pytest.approx(by_underlying["NIFTY"]["pnl"][0][2], abs=0.02)
+    # TCS moves by its own override, 4% of 100 shares
+    assert crash_result["by_underlying"]["TCS"] == pytest.approx(-0.04 * 100 * by_underlying["TCS"]["spot"], abs=0.02)
+    rally = client.get("/risk/stress/grid", params={"spot_range": 5, "spot_points": 3, "vol_points": 1, **params}).json()
+    assert rally_result["pnl"] == pytest.approx(rally["total"][2][0], abs=0.02)
+
+    # Only the changed position is repriced, and the result matches a full evaluation
+    with factory() as session:
+        _position(session, "NIFTY26MAR21000PE", -75, datetime(2026, 3, 3, 5, 0))
+        session.commit()
+    incremental = client.get("/risk/stress", params=params).json()["scenarios"][0]
+    assert incremental["repriced_lines"] == 1
+    for market in stress._markets.values():
+        market.books.clear()
+    full = client.get("/risk/stress", params=params).json()["scenarios"][0]
+    assert full["repriced_lines"] == 4
+    assert incremental["pnl"] == pytest.approx(full["pnl"], abs=0.01)
+    assert client.get("/risk/stress", params=params).json()["scenarios"][0]["repriced_lines"] == 0
+
+    # Changing a scenario reprices it from scratch
+    client.put("/risk/stress/scenarios/crash", json=dict(crash, spot_shock=-20))
+    changed = client.get("/risk/stress", params={"name": "crash", **params}).json()["scenarios"]
+    assert [row["name"] for row in changed] == ["crash"] and changed[0]["repriced_lines"] == 4
+    deeper = client.get("/risk/stress/grid", params={"spot_range": 20, "spot_points": 3, "vol_range": 8, "vol_points": 3, **params}).json()
+    assert changed[0]["by_underlying"]["NIFTY"] == pytest.approx(deeper["by_underlying"][0]["pnl"][0][2], abs=0.02)
+
+    assert client.delete("/risk/stress/scenarios/rally").json() == {"deleted": "rally"}
+    assert client.delete("/risk/stress/scenarios/rally").status_code == 404
@@ -0,0 +1,155 @@
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from app.db.models import HoldingDaily
+from app.routers import risk as risk_router
+from app.services import instrument_index, portfolio_snapshots, valuation
+from app.services.instrument_index import InstrumentIndex
+from app.services.instrument_job import normalize_instruments
+
+INSTRUMENTS = [
+    {"trading_symbol": "TCS", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "lot_size": 1},
+    {"trading_symbol": "INFY", "exchange": "NSE", "segment": "CASH", "instrument_type": "EQ", "lot_size": 1},
+    {"trading_symbol": "NIFTY26MARFUT", "exchange": "NSE", "segment": "FNO", "instrument_type": "FUT",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 3, 26), "lot_size": 75},
+    {"trading_symbol": "NIFTY26MAR22000CE", "exchange": "NSE", "segment": "FNO", "instrument_type": "CE",
+     "underlying_symbol": "NIFTY", "expiry_date": date(2026, 3, 26), "strike_price": 22000, "lot_size": 75},
+]
+
+
+def _index():
+    return InstrumentIndex(normalize_instruments(INSTRUMENTS))
+
+
+def test_value_book_is_computed_over_arrays():
+    book = valuation.Book.from_rows([
+        {"kind": "holding", "symbol": "TCS", "quantity": 10, "avg_price": 3000.0},
+        {"kind": "position", "symbol": "NIFTY26MARFUT", "quantity": -150, "avg_price": 22000.0},
+        {"kind": "position", "symbol": "NIFTY26MAR22000CE", "quantity": 75, "avg_price": 100.0},
+        {"kind": "holding", "symbol": "DELISTED", "quantity": 5, "avg_price": 10.0},
+    ])
+    reference = valuation.reference_data(_index(), book.symbol)
+    ltp = np.array([3100.0, 21900.0, 120.0, np.nan])
+    # TCS closed yesterday at 3050; the option was opened today
+    day_open = np.array([3050.0, 21950.0, np.nan, np.nan])
+    lines = valuation.value_book(book, reference, ltp, day_open)
+
+    np.testing.assert_allclose(lines["market_value"][:3], [31000.0, -3285000.0, 9000.0])
+    np.testing.assert_allclose(lines["unrealized_pnl"][:3], [1000.0, 15000.0, 1500.0])
+    np.testing.assert_allclose(lines["day_pnl"][:3], [500.0, 7500.0, 1500.0])
+    np.testing.assert_allclose(lines["lots"][:3], [10.0, -2.0, 1.0])
+    assert lines["underlying"].tolist() == ["TCS", "NIFTY", "NIFTY", "DELISTED"]
+
+    summary = valuation.summarize(lines)
+    assert summary["unpriced"] == ["DELISTED"]
+    assert summary["totals"]["market_value"] == -3245000.0
+    assert summary["totals"]["gross_exposure"] == 3325000.0
+    nifty = summary["by_underlying"][0]
+    assert (nifty["underlying"], nifty["lines"], nifty["net_exposure"], nifty["day_pnl"]) == ("NIFTY", 2, -3276000.0, 9000.0)
+    assert [row["segment"] for row in summary["by_segment"]] == ["FNO", "CASH", "UNKNOWN"]
+
+
+class StubMarketCache:
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    async def get_ltp(self, client, exchange_trading_symbols, segment):
+        self.calls.append(segment)
+        if segment == "FNO":
+            raise RuntimeError("rate limited")
+        return {key: self.prices[key] for key in exchange_trading_symbols if key in self.prices}
+
+
+class StubPool:
+    async def acquire_async(self):
+        return object()
+
+
+@pytest.fixture()
+def factory(session_factory, monkeypatch):
+    monkeypatch.setattr(instrument_index, "_index", _index())
+    monkeypatch.setattr(risk_router, "get_adapter_pool", lambda account_id: StubPool())
+    return session_factory
+
+
+def test_valuation_endpoint_joins_holdings_positions_and_prices(factory, monkeypatch):
+    cache = StubMarketCache({"NSE_TCS": 3100.0, "NSE_INFY": 1500.0})
+    monkeypatch.setattr(valuation, "get_market_cache", lambda: cache)
+    monkeypatch.setattr(valuation, "utcnow", lambda: datetime(2026, 3, 3, 6, 1))
+    with factory() as session:
+        session.add_all([
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 2), quantity=10, avg_price=3000.0),
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 3), quantity=12, avg_price=3000.0),
+            HoldingDaily(symbol="INFY", as_of_date=date(2026, 3, 3), quantity=0, avg_price=1400.0),
+        ])
+        portfolio_snapshots.insert_snapshots(session, [
+            # Last prices before the trading day of 2026-03-03 (IST midnight is 18:30 UTC)
+            {"kind": "holding", "symbol": "TCS", "captured_at": datetime(2026, 3, 2, 10, 0),
+             "quantity": 12, "avg_price": 3000.0, "ltp": 3050.0},
+            {"kind": "position", "symbol": "NIFTY26MARFUT", "captured_at": datetime(2026, 3, 2, 10, 0),
+             "quantity": 75, "avg_price": 22000.0, "ltp": 22050.0},
+            # The futures quote fails now; the latest snapshot price stands in
+            {"kind": "position", "symbol": "NIFTY26MARFUT", "captured_at": datetime(2026, 3, 3, 5, 0),
+             "quantity": 75, "avg_price": 22000.0, "ltp": 22100.0},
+        ])
+        session.commit()
+
+    client = TestClient(main_module.app)
+    response = client.get("/risk/valuation", params={"at": "2026-03-03T06:00:00", "lines": "true"})
+    assert response.status_code == 200
+    body = response.json()
+    assert sorted(cache.calls) == ["CASH", "FNO"]
+    assert body["lines"] == 2 and body["unpriced"] == []
+    assert body["totals"] == {
+        "market_value": 12 * 3100.0 + 75 * 22100.0,
+        "cost": 12 * 3000.0 + 75 * 22000.0,
+        "unrealized_pnl": 12 * 100.0 + 75 * 100.0,
+        "day_pnl": 12 * 50.0 + 75 * 50.0,
+        "gross_exposure": 12 * 3100.0 + 75 * 22100.0,
+        "net_exposure": 12 * 3100.0 + 75 * 22100.0,
+    }
+    lines = {line["symbol"]: line for line in body["positions"]}
+    assert lines["NIFTY26MARFUT"]["lots"] == 1.0 and lines["NIFTY26MARFUT"]["ltp"] == 22100.0
+    assert lines["TCS"]["kind"] == "holding"
+    assert body["prices"] == "live"
+
+    # An earlier book is the holdings of its day at the prices recorded by then, not live quotes
+    cache.calls.clear()
+    body = client.get("/risk/valuation", params={"at": "2026-03-02T12:00:00"}).json()
+    assert cache.calls == [] and body["prices"] == "snapshots"
+    assert body["totals"]["market_value"] == 10 * 3050.0 + 75 * 22050.0
+    assert client.get("/risk/valuation", params={"account_id": "nobody"}).status_code == 404
+
+
+def test_day_pnl_of_holdings_bought_today(factory, monkeypatch):
+    monkeypatch.setattr(valuation, "get_market_cache", lambda: StubMarketCache({"NSE_TCS": 3100.0, "NSE_INFY": 1500.0}))
+    monkeypatch.setattr(valuation, "utcnow", lambda: datetime(2026, 3, 3, 6, 1))
+    with factory() as session:
+        session.add_all([
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 3), quantity=10, avg_price=3000.0),
+            HoldingDaily(symbol="INFY", as_of_date=date(2026, 3, 3), quantity=4, avg_price=1450.0),
+        ])
+        session.commit()
+    client = TestClient(main_module.app)
+    params = {"at": "2026-03-03T06:00:00", "lines": "true"}
+
+    # No opening state to tell what was bought today: unknown, not zero
+    body = client.get("/risk/valuation", params=params).json()
+    assert sorted(body["day_pnl_unknown"]) == ["INFY", "TCS"]
+    assert all(line["day_pnl"] is None for line in body["positions"])
+
+    with factory() as session:
+        portfolio_snapshots.insert_snapshots(session, [
+            {"kind": "holding", "symbol": "TCS", "captured_at": datetime(2026, 3, 2, 10, 0),
+             "quantity": 10, "avg_price": 3000.0, "ltp": 3050.0},
+        ])
+        session.commit()
+    # INFY was not held at the open, so it was bought today at its avg_price
+    body = client.get("/risk/valuation", params=params).json()
+    assert body["day_pnl_unknown"] == []
+    assert body["totals"]["day_pnl"] == 10 * 50.0 + 4 * 50.0
@@ -0,0 +1,128 @@
+import shutil
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import app.main as main_module
+from app.db.models import CandleDaily, HoldingDaily
+from app.services import value_at_risk
+from app.services.dataset_version import CANDLES, bump
+
+DAYS = 61
+
+
+def _closes(seed=7, symbols=("INFY", "RELIANCE", "TCS")):
+    rng = np.random.default_rng(seed)
+    shocks = rng.normal(0, 0.015, (len(symbols), DAYS))
+    # Correlated through a common factor
+    shocks += rng.normal(0, 0.01, DAYS)
+    return dict(zip(symbols, 100 * np.exp(np.cumsum(shocks, axis=1))))
+
+
+@pytest.fixture()
+def factory(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(value_at_risk, "VAR_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(value_at_risk, "VAR_MIN_OBSERVATIONS", 20)
+    monkeypatch.setattr(value_at_risk, "_matrix", None)
+    start = date(2026, 1, 1)
+    with session_factory() as session:
+        session.execute(insert(CandleDaily), [
+            {"symbol": symbol, "trade_date": start + timedelta(days=i), "close": close}
+            for symbol, closes in _closes().items() for i, close in enumerate(closes)
+        ] + [
+            # Too little history to be modelled
+            {"symbol": "NEWIPO", "trade_date": start + timedelta(days=DAYS - 1 - i), "close": 50.0 + i} for i in range(5)
+        ])
+        session.add_all([
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 1), quantity=10, avg_price=90.0),
+            HoldingDaily(symbol="TCS", as_of_date=date(2026, 3, 2), quantity=20, avg_price=90.0),
+            HoldingDaily(symbol="INFY", as_of_date=date(2026, 3, 2), quantity=-5, avg_price=110.0),
+            HoldingDaily(symbol="NEWIPO", as_of_date=date(2026, 3, 2), quantity=3, avg_price=50.0),
+        ])
+        bump(session, CANDLES)
+        session.commit()
+    return session_factory
+
+
+def test_var_matches_direct_computation(factory):
+    with factory() as session:
+        result = value_at_risk.value_at_risk(session, confidence=0.95)
+
+    closes = _closes()
+    weights = np.array([-5 * closes["INFY"][-1], 20 * closes["TCS"][-1]])
+    returns = np.diff(np.log(np.array([closes["INFY"], closes["TCS"]])), axis=1)
+    losses = -(weights @ returns)
+    var = np.quantile(losses, 0.95)
+    volatility = np.sqrt(weights @ np.cov(returns) @ weights)
+
+    assert result["holdings_as_of"] == date(2026, 3, 2)
+    assert result["observations"] == DAYS - 1 and result["symbols"] == 2
+    assert result["uncovered"] == ["NEWIPO"]
+    assert result["historical"]["var"] == pytest.approx(var, abs=0.01)
+    assert result["historical"]["es"] == pytest.approx(losses[losses >= var].mean(), abs=0.01)
+    assert result["parametric"]["var"] == pytest.approx(NormalDist().inv_cdf(0.95) * volatility, abs=0.01)
+    assert sum(c["component_var"] for c in result["contributions"]) == pytest.approx(result["parametric"]["var"], abs=0.05)
+    assert result["filtered"]["var"] > 0
+
+
+def test_ewma_filter_rescales_to_current_volatility():
+    calm, wild = np.full(50, 0.01), np.full(50, 0.04)
+    filtered = value_at_risk.ewma_filter(np.array([np.r_[calm, wild] * np.tile([1, -1], 50)]))
+    # Calm-period returns are scaled up to the recent, higher volatility
+    assert abs(filtered[0, 45]) > 0.025
+    assert filtered[0, -1] == pytest.approx(-0.04, rel=0.1)
+
+
+def test_matrix_is_memory_mapped_and_reused_until_candles_change(factory, monkeypatch, tmp_path):
+    with factory() as session:
+        matrix = value_at_risk.get_return_matrix(session)
+        assert isinstance(matrix.returns, np.memmap) and isinstance(matrix.covariance, np.memmap)
+
+        def no_rebuild(*args, **kwargs):
+            raise AssertionError("matrix rebuilt")
+
+        build = value_at_risk.ReturnMatrix.__dict__["build"]
+        monkeypatch.setattr(value_at_risk.ReturnMatrix, "build", no_rebuild)
+        assert value_at_risk.get_return_matrix(session) is matrix
+        # A new process (no matrix in memory) opens the saved files
+        monkeypatch.setattr(value_at_risk, "_matrix", None)
+        reopened = value_at_risk.get_return_matrix(session)
+        np.testing.assert_array_equal(reopened.returns, matrix.returns)
+
+        monkeypatch.setattr(value_at_risk.ReturnMatrix, "build", build)
+        bump(session, CANDLES)
+        session.commit()
+        rebuilt = value_at_risk.get_return_matrix(session)
+    assert rebuilt.version != matrix.version
+    assert [p.name for p in (tmp_path / "cache").iterdir()] == [f"{rebuilt.version}-{rebuilt.lookback}"]
+
+
+def test_cache_keeps_newer_versions_and_survives_pruning(factory, monkeypatch, tmp_path):
+    cache = tmp_path / "cache"
+    with factory() as session:
+        version = value_at_risk.get_stamp(session, CANDLES)
+        number, _, updated = version.partition(".")
+        # Left by a worker that already saw a later candles version
+        newer = cache / f"{int(number) + 1}.{int(updated) + 60}-250"
+        newer.mkdir(parents=True)
+        matrix = value_at_risk.get_return_matrix(session)
+        assert sorted(p.name for p in cache.iterdir()) == sorted([newer.name, f"{version}-{matrix.lookback}"])
+
+        # Another worker pruned this version's files; the next process rebuilds instead of failing
+        shutil.rmtree(cache / f"{version}-{matrix.lookback}")
+        monkeypatch.setattr(value_at_risk, "_matrix", None)
+        reopened = value_at_risk.get_return_matrix(session)
+    np.testing.assert_array_equal(reopened.returns, matrix.returns)
+
+
+def test_var_endpoint(factory):
+    client = TestClient(main_module.app)
+    response = client.get("/risk/var", params={"method": "historical", "horizon_days": 4})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["horizon_days"] == 4 and body["historical"]["var"] > 0 and "parametric" not in body
+    assert client.get("/risk/var", params={"method": "delta-gamma"}).status_code == 400